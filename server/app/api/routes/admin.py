@@ -0,0 +1,73 @@
+import secrets
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import ValidationError
+
+from app.api.routes import song
+from app.api.routes.health import probe_entries
+from app.core.config import get_settings
+from app.core.profiler import (
+    MAX_PROFILE_SECONDS,
+    ProfilerBusyError,
+    collapsed_stacks,
+    sample_stacks,
+    speedscope_profile,
+)
+from app.models.schemas import ReloadResponse
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """Admin routes need ``ADMIN_TOKEN``; without it they do not exist."""
+    expected = get_settings().admin_token
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+router = APIRouter(
+    prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.post("/reload", response_model=ReloadResponse)
+def reload_settings() -> ReloadResponse:
+    try:
+        changed, restart_required, probes = song.reload_song_service()
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid settings, keeping the running configuration: {exc}",
+        ) from exc
+    return ReloadResponse(
+        changed=changed,
+        restartRequired=restart_required,
+        configured=song.get_song_service().provider_router.configured,
+        providers=probe_entries(probes),
+    )
+
+
+@router.post("/profile", response_class=Response)
+def profile(
+    seconds: float = Query(5.0, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(10.0, alias="intervalMs", ge=1, le=1000),
+    format: Literal["speedscope", "collapsed"] = "speedscope",
+    thread: str | None = Query(
+        None, description="Only threads whose name contains this"
+    ),
+) -> Response:
+    """Sample stacks of the event loop and threadpool workers for ``seconds``."""
+    try:
+        result = sample_stacks(seconds, interval_ms / 1000, thread_filter=thread)
+    except ProfilerBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(result))
+    return JSONResponse(
+        speedscope_profile(result, name=f"{seconds:g}s sample"),
+        headers={
+            "Content-Disposition": 'attachment; filename="profile.speedscope.json"'
+        },
+    )
@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.api.routes import song
+from app.core.admission import owner_identity
+from app.core.config import get_settings
+from app.models.schemas import (
+    BatchItemResult,
+    BatchJobRequest,
+    BatchJobResponse,
+    GenerateResponse,
+)
+from app.services.batch_jobs import (
+    BatchJob,
+    BatchJobStore,
+    BatchRunner,
+    resolve_batch_provider,
+)
+
+
+router = APIRouter(prefix="/api/song/batches", tags=["batches"])
+
+
+@lru_cache
+def get_batch_runner() -> BatchRunner:
+    settings = get_settings()
+    return BatchRunner(
+        BatchJobStore(settings.batch_store_path),
+        song.get_song_service,
+        interval_seconds=settings.batch_poll_interval_seconds,
+        max_batch_size=settings.batch_max_requests,
+        price_factor=settings.batch_price_factor,
+    )
+
+
+def _owner(request: Request) -> str:
+    return owner_identity(request)
+
+
+def _job_response(job: BatchJob) -> BatchJobResponse:
+    return BatchJobResponse(
+        jobId=job.id,
+        provider=job.provider,
+        status=job.status,
+        total=len(job.items),
+        completed=sum(item.status == "completed" for item in job.items),
+        failed=sum(item.status == "failed" for item in job.items),
+        items=[
+            BatchItemResult(
+                index=item.position,
+                status=item.status,
+                result=(
+                    GenerateResponse.model_validate(item.response)
+                    if item.response is not None
+                    else None
+                ),
+                error=item.error,
+            )
+            for item in job.items
+        ],
+    )
+
+
+@router.post("", response_model=BatchJobResponse, status_code=202)
+def create_batch_job(payload: BatchJobRequest, request: Request) -> BatchJobResponse:
+    """Queue generate requests for the next provider batch submission."""
+    try:
+        provider = resolve_batch_provider(
+            song.get_song_service().provider_router, payload.provider
+        )
+    except LookupError as exc:
+        raise HTTPException(
+            status_code=422,
+            detail=f"No configured provider for '{payload.provider}' supports batch generation.",
+        ) from exc
+    store = get_batch_runner().store
+    owner = _owner(request)
+    job_id = store.create_job(owner, provider, payload.requests)
+    return _job_response(store.job(job_id, owner))
+
+
+@router.get("/{job_id}", response_model=BatchJobResponse)
+def get_batch_job(job_id: str, request: Request) -> BatchJobResponse:
+    job = get_batch_runner().store.job(job_id, _owner(request))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found.")
+    return _job_response(job)
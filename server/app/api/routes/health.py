@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+
+from app.api.routes import song
+from app.models.schemas import ProviderProbe, ReadinessResponse
+from app.services.readiness import ProbeResult
 
 
 router = APIRouter(prefix="/api", tags=["health"])
@@ -7,3 +11,29 @@ router = APIRouter(prefix="/api", tags=["health"])
 @router.get("/health")
 def health_check() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/ready", response_model=ReadinessResponse)
+def readiness_check(response: Response) -> ReadinessResponse:
+    """Cached prober results; 503 until warm and at least one provider is up."""
+    prober = song.get_provider_prober()
+    if not prober.ready:
+        response.status_code = 503
+    return ReadinessResponse(
+        ready=prober.ready,
+        warm=prober.warm,
+        providers=probe_entries(prober.results()),
+    )
+
+
+def probe_entries(results: list[ProbeResult]) -> list[ProviderProbe]:
+    return [
+        ProviderProbe(
+            provider=result.provider,
+            status=result.status,
+            latencyMs=result.latency_ms,
+            error=result.error,
+            checkedAt=result.checked_at,
+        )
+        for result in results
+    ]
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.routes import song
+from app.models.schemas import SongHistoryEntry, SongHistoryResponse, StructureName
+from app.services.song_export import (
+    EXPORT_MEDIA_TYPES,
+    ExportFormat,
+    ExportUnavailableError,
+    export_chunks,
+)
+from app.services.song_store import (
+    MAX_PAGE_SIZE,
+    SearchField,
+    SongFilters,
+    SongKind,
+    SongPage,
+    SongStore,
+    decode_cursor,
+    iter_song_records,
+)
+
+
+router = APIRouter(prefix="/api/history", tags=["history"])
+
+
+def _song_store() -> SongStore:
+    store = song.get_song_service().song_store
+    if store is None:
+        raise HTTPException(
+            status_code=404, detail="Song history is disabled on this server."
+        )
+    return store
+
+
+def _response(page: SongPage) -> SongHistoryResponse:
+    return SongHistoryResponse(
+        items=[
+            SongHistoryEntry(
+                id=record.id or 0,
+                createdAt=record.created_at,
+                kind=record.kind,
+                providerUsed=record.provider,
+                modelUsed=record.model,
+                latencyMs=record.latency_ms,
+                topic=record.topic,
+                genre=record.genre,
+                mood=record.mood,
+                structure=record.structure,
+                language=record.language,
+                title=record.title,
+                style=record.style,
+                lyrics=record.lyrics,
+                explanation=record.explanation,
+                request=record.request,
+                response=record.response,
+            )
+            for record in page.items
+        ],
+        nextCursor=page.next_cursor,
+    )
+
+
+@router.get("", response_model=SongHistoryResponse)
+def list_history(
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    provider: str | None = None,
+    kind: SongKind | None = None,
+) -> SongHistoryResponse:
+    store = _song_store()
+    try:
+        page = store.recent(limit=limit, cursor=cursor, provider=provider, kind=kind)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _response(page)
+
+
+@router.get("/search", response_model=SongHistoryResponse)
+def search_history(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    field: SearchField | None = None,
+) -> SongHistoryResponse:
+    store = _song_store()
+    try:
+        page = store.search(q, limit=limit, cursor=cursor, search_field=field)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _response(page)
+
+
+@router.get("/export")
+def export_history(
+    format: ExportFormat = "ndjson",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    provider: str | None = None,
+    genre: str | None = None,
+    structure: StructureName | None = None,
+    kind: SongKind | None = None,
+    cursor: str | None = None,
+) -> StreamingResponse:
+    """Stream every matching record oldest first, in constant memory.
+
+    Each record carries a ``cursor``; passing the last one received resumes
+    the export after it. Chunks are produced in the threadpool, so a long
+    export never blocks the event loop.
+    """
+    store = _song_store()
+    try:
+        decode_cursor(cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    filters = SongFilters(
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        provider=provider,
+        genre=genre,
+        structure=structure,
+        kind=kind,
+    )
+    records = iter_song_records(store.path, filters, cursor=cursor)
+    try:
+        chunks = export_chunks(records, format)
+    except ExportUnavailableError as exc:
+        raise HTTPException(status_code=501, detail=str(exc)) from exc
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "content-disposition": f'attachment; filename="songs.{format}"',
+        },
+    )
@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+
+from app.api.routes import song
+from app.api.routes.sessions import get_session_store
+from app.core.profiler import get_loop_lag_monitor
+from app.models.schemas import (
+    AdmissionStats,
+    ConcurrencyStats,
+    EventLoopStats,
+    MetricsResponse,
+    SessionStats,
+    SpeculationStats,
+)
+
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+
+@router.get("/metrics", response_model=MetricsResponse)
+def get_metrics() -> MetricsResponse:
+    admission = song.get_admission_controller().snapshot()
+    loop_monitor = get_loop_lag_monitor()
+    speculation = song.get_speculative_extensions()
+    return MetricsResponse(
+        admission=AdmissionStats.model_validate(admission),
+        concurrency=ConcurrencyStats.model_validate(
+            song.get_concurrency_limiter().snapshot()
+        ),
+        eventLoop=(
+            EventLoopStats.model_validate(loop_monitor.snapshot())
+            if loop_monitor.running
+            else None
+        ),
+        sessions=SessionStats.model_validate(get_session_store().snapshot()),
+        speculation=(
+            SpeculationStats.model_validate(speculation.snapshot())
+            if speculation is not None
+            else None
+        ),
+    )
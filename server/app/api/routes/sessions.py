@@ -0,0 +1,254 @@
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.requests import HTTPConnection
+from pydantic import ValidationError
+
+from app.api.routes import song
+from app.core.admission import owner_identity
+from app.core.config import get_settings
+from app.models.schemas import (
+    ExtendRequest,
+    ExtendResponse,
+    SessionCreateRequest,
+    SessionDocument,
+    SessionEditRequest,
+    SessionExtendRequest,
+    SessionExtendResponse,
+    SessionState,
+)
+from app.providers.base import use_prompt_cache_key
+from app.services.local_engine import template_extend_response
+from app.services.song_sessions import (
+    SessionConflictError,
+    SessionNotFoundError,
+    SongSession,
+    SongSessionStore,
+)
+
+
+router = APIRouter(prefix="/api/song/sessions", tags=["sessions"])
+
+
+@lru_cache
+def get_session_store() -> SongSessionStore:
+    settings = get_settings()
+    return SongSessionStore(
+        max_sessions=settings.session_max_count,
+        max_bytes=settings.session_max_bytes,
+        idle_seconds=settings.session_idle_seconds,
+    )
+
+
+def _owner(connection: HTTPConnection) -> str:
+    return owner_identity(connection)
+
+
+@contextmanager
+def _session_errors() -> Iterator[None]:
+    try:
+        yield
+    except SessionNotFoundError as exc:
+        raise HTTPException(
+            status_code=404, detail="Session not found or expired."
+        ) from exc
+    except SessionConflictError as exc:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Edits are based on an old version; the session is at version {exc.version}.",
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+def _state(session: SongSession) -> SessionState:
+    return SessionState(
+        sessionId=session.id,
+        version=session.version,
+        length=len(session.lyrics),
+        extensions=session.extensions,
+    )
+
+
+def _edit(connection: HTTPConnection, session_id: str, body: SessionEditRequest):
+    with _session_errors():
+        return get_session_store().edit(
+            session_id,
+            _owner(connection),
+            body.baseVersion,
+            [(edit.start, edit.end, edit.text) for edit in body.edits],
+        )
+
+
+async def _extend(
+    connection: HTTPConnection,
+    response: Response,
+    session_id: str,
+    body: SessionExtendRequest,
+) -> SessionExtendResponse:
+    store = get_session_store()
+    owner = _owner(connection)
+    with _session_errors():
+        session = store.get(session_id, owner)
+        if body.baseVersion is not None and body.baseVersion != session.version:
+            raise SessionConflictError(session.version)
+    if not session.lyrics.strip():
+        raise HTTPException(
+            status_code=422, detail="The session has no lyrics to extend yet."
+        )
+    payload = ExtendRequest(
+        currentLyrics=session.lyrics,
+        topic=session.topic,
+        style=session.style,
+        language=session.language,
+        provider=body.provider or session.provider,
+    )
+    service = song.get_song_service()
+
+    def extend(item: ExtendRequest) -> ExtendResponse:
+        with use_prompt_cache_key(session.cache_key):
+            return service.extend(item)
+
+    result = await song.run_service_call(
+        connection,
+        response,
+        extend,
+        payload,
+        priority="high",
+        fallback=template_extend_response,
+    )
+    with _session_errors():
+        # An edit or another extension during the upstream call wins.
+        updated = store.append(session_id, owner, session.version, result.addedLyrics)
+    return SessionExtendResponse(
+        **result.model_dump(),
+        sessionId=updated.id,
+        version=updated.version,
+        length=len(updated.lyrics),
+    )
+
+
+@router.post("", response_model=SessionDocument, status_code=201)
+def create_session(payload: SessionCreateRequest, request: Request) -> SessionDocument:
+    session = get_session_store().create(
+        owner=_owner(request),
+        topic=payload.topic,
+        style=payload.style,
+        language=payload.language,
+        provider=payload.provider,
+        lyrics=payload.lyrics,
+    )
+    return SessionDocument(
+        **_state(session).model_dump(),
+        topic=session.topic,
+        style=session.style,
+        language=session.language,
+        provider=session.provider,
+        lyrics=session.lyrics,
+    )
+
+
+@router.get("/{session_id}", response_model=SessionDocument)
+def get_session(session_id: str, request: Request) -> SessionDocument:
+    with _session_errors():
+        session = get_session_store().get(session_id, _owner(request))
+    return SessionDocument(
+        **_state(session).model_dump(),
+        topic=session.topic,
+        style=session.style,
+        language=session.language,
+        provider=session.provider,
+        lyrics=session.lyrics,
+    )
+
+
+@router.patch("/{session_id}", response_model=SessionState)
+def edit_session(
+    session_id: str, payload: SessionEditRequest, request: Request
+) -> SessionState:
+    return _state(_edit(request, session_id, payload))
+
+
+@router.post("/{session_id}/extend", response_model=SessionExtendResponse)
+async def extend_session(
+    session_id: str,
+    payload: SessionExtendRequest,
+    request: Request,
+    response: Response,
+) -> SessionExtendResponse:
+    return await _extend(request, response, session_id, payload)
+
+
+@router.delete("/{session_id}", status_code=204)
+def delete_session(session_id: str, request: Request) -> Response:
+    with _session_errors():
+        get_session_store().delete(session_id, _owner(request))
+    return Response(status_code=204)
+
+
+async def _handle_message(
+    websocket: WebSocket, session_id: str, message: object
+) -> dict[str, object]:
+    kind = message.get("type") if isinstance(message, dict) else None
+    try:
+        if kind == "edit":
+            session = _edit(websocket, session_id, SessionEditRequest(**message))
+            return {"type": "state", **_state(session).model_dump()}
+        if kind == "extend":
+            response = Response()
+            result = await _extend(
+                websocket, response, session_id, SessionExtendRequest(**message)
+            )
+            usage = {
+                name: value
+                for name, value in response.headers.items()
+                if name.startswith("x-")
+            }
+            return {"type": "extension", **result.model_dump(), "headers": usage}
+    except ValidationError as exc:
+        return {"type": "error", "status": 422, "detail": exc.errors(include_url=False)}
+    except HTTPException as exc:
+        return {"type": "error", "status": exc.status_code, "detail": exc.detail}
+    return {"type": "error", "status": 400, "detail": "Unknown message type."}
+
+
+@router.websocket("/{session_id}/ws")
+async def session_socket(websocket: WebSocket, session_id: str) -> None:
+    """Edit and extend a session over one connection.
+
+    Client messages are ``{"type": "edit", ...SessionEditRequest}`` and
+    ``{"type": "extend", ...SessionExtendRequest}``; every message gets one
+    ``state``, ``extension`` or ``error`` reply.
+    """
+    try:
+        session = get_session_store().get(session_id, _owner(websocket))
+    except SessionNotFoundError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await websocket.send_json({"type": "state", **_state(session).model_dump()})
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_json(
+                    {"type": "error", "status": 400, "detail": "Invalid JSON."}
+                )
+                continue
+            await websocket.send_json(
+                await _handle_message(websocket, session_id, message)
+            )
+    except WebSocketDisconnect:
+        return
@@ -1,39 +1,511 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
 from functools import lru_cache
+from typing import TypeVar
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.requests import HTTPConnection
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from app.core.config import get_settings
+from app.core.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    admission_identity,
+)
+from app.core.concurrency import AdaptiveLimiter, Priority, request_priority
+from app.core.config import (
+    Settings,
+    get_settings,
+    replace_settings,
+    requires_restart,
+)
+from app.core.deadline import Deadline, deadline_from_headers, use_deadline
+from app.core.tracing import span
 from app.models.schemas import (
     ExtendRequest,
     ExtendResponse,
     GenerateRequest,
     GenerateResponse,
+    ProviderRankingEntry,
     ProvidersResponse,
+    RoutingExplanation,
+    UsageResponse,
 )
 from app.providers.router import ProviderRouter
+from app.providers.routing_policy import Operation, parse_weights
+from app.services.local_engine import (
+    template_extend_response,
+    template_generate_response,
+)
+from app.services.readiness import ProbeResult, ProviderProber
 from app.services.song_service import SongService
+from app.services.song_store import SongStore
+from app.services.speculation import (
+    SpeculativeExtensions,
+    SpeculativeResult,
+    next_extend_after_extend,
+    next_extend_after_generate,
+)
+from app.services.staged_generation import StagedGenerator, parse_stage_targets
+from app.services.traffic_replay import replay_provider_factories
+from app.services.usage import UsageLedger, parse_price_table, track_request_usage
+
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/song", tags=["song"])
 
+DISCONNECT_POLL_SECONDS = 0.25
+# Upstream timeouts and missed deadlines cut the concurrency limit even
+# when the failure itself returned quickly.
+OVERLOAD_STATUS_CODES = {503, 504}
+
+_PayloadT = TypeVar("_PayloadT")
+_ResultT = TypeVar("_ResultT")
+
+_reload_lock = threading.Lock()
+
+
+# Swapped as a whole on reload. Handlers read it once per request, so
+# in-flight calls finish on the instance they started with.
+_song_service: SongService | None = None
+_service_lock = threading.Lock()
+
+
+def build_provider_router(
+    settings: Settings, previous: SongService | None = None
+) -> ProviderRouter:
+    """Build the router for ``settings``, replaying recorded traffic if set."""
+    return ProviderRouter(
+        settings=settings,
+        factories=(
+            replay_provider_factories(settings)
+            if settings.traffic_replay_path
+            else None
+        ),
+        stats=previous.provider_router.stats if previous else None,
+    )
+
+
+def build_song_service(
+    settings: Settings,
+    previous: SongService | None = None,
+    provider_router: ProviderRouter | None = None,
+) -> SongService:
+    """Build the service for ``settings``.
+
+    On reload, ``previous`` hands over its usage ledger, song store and live
+    routing stats, so in-memory state and history survive the swap.
+    """
+    if provider_router is None:
+        provider_router = build_provider_router(settings, previous)
+    prices = parse_price_table(settings.model_prices)
+    usage_ledger = previous.usage_ledger if previous else None
+    if usage_ledger is None:
+        usage_ledger = UsageLedger(
+            prices=prices,
+            rollup_path=settings.usage_rollup_path,
+            flush_interval_seconds=settings.usage_rollup_interval_seconds,
+        )
+    else:
+        usage_ledger.set_prices(prices)
+    if previous is not None:
+        song_store = previous.song_store
+    elif settings.song_store_path:
+        song_store = SongStore(
+            settings.song_store_path,
+            batch_size=settings.song_store_batch_size,
+            flush_interval_seconds=settings.song_store_flush_interval_seconds,
+        )
+    else:
+        song_store = None
+    staged_generator = (
+        StagedGenerator(provider_router, parse_stage_targets(settings.pipeline_stages))
+        if settings.generation_pipeline.strip().lower() == "staged"
+        else None
+    )
+    return SongService(
+        provider_router=provider_router,
+        usage_ledger=usage_ledger,
+        instrumental_mode=settings.instrumental_mode,
+        song_store=song_store,
+        lyric_repair=settings.lyric_repair,
+        staged_generator=staged_generator,
+        draft_models={
+            "gemini": settings.gemini_draft_model,
+            "openai": settings.openai_draft_model,
+        },
+    )
+
 
-@lru_cache
 def get_song_service() -> SongService:
+    global _song_service
+    service = _song_service
+    if service is None:
+        with _service_lock:
+            if _song_service is None:
+                _song_service = build_song_service(get_settings())
+            service = _song_service
+    return service
+
+
+def flush_song_service() -> None:
+    """Write buffered usage rollups of the running service, if one was built."""
+    service = _song_service
+    if service is not None and service.usage_ledger is not None:
+        service.usage_ledger.flush()
+
+
+def reload_song_service() -> tuple[list[str], list[str], list[ProbeResult]]:
+    """Re-read settings and atomically swap in a rebuilt service.
+
+    The new provider router is probed before the swap, which warms its
+    connection pools. Invalid settings raise ``ValidationError`` and leave
+    the running service untouched. Returns the names of the changed settings
+    that took effect, of those that only apply after a restart (admission,
+    limiter, stores and other components built once), and the probe results.
+    """
+    global _song_service
+    with _reload_lock:
+        settings = Settings()
+        previous = get_song_service()
+        old_values = get_settings().model_dump()
+        modified = [
+            name
+            for name, value in settings.model_dump().items()
+            if old_values.get(name) != value
+        ]
+        changed = [name for name in modified if not requires_restart(name)]
+        restart_required = [name for name in modified if requires_restart(name)]
+        provider_router = build_provider_router(settings, previous)
+        probes = get_provider_prober().retarget(provider_router)
+        service = build_song_service(settings, previous, provider_router)
+        with _service_lock:
+            replace_settings(settings)
+            _song_service = service
+    logger.info(
+        "settings_reloaded",
+        extra={
+            "event": "settings_reloaded",
+            "changed": ",".join(changed) or "none",
+            "restart_required": ",".join(restart_required) or None,
+        },
+    )
+    return changed, restart_required, probes
+
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        max_concurrency=settings.admission_max_concurrency,
+        client_concurrency=settings.admission_client_concurrency,
+        max_queue=settings.admission_max_queue,
+        client_queue=settings.admission_client_queue,
+        max_wait_seconds=settings.admission_max_wait_seconds,
+        weights=parse_weights(settings.admission_client_weights),
+    )
+
+
+@lru_cache
+def get_concurrency_limiter() -> AdaptiveLimiter:
+    settings = get_settings()
+    return AdaptiveLimiter(
+        initial_limit=settings.concurrency_limit_initial,
+        min_limit=settings.concurrency_limit_min,
+        max_limit=settings.concurrency_limit_max,
+        latency_tolerance=settings.concurrency_latency_tolerance,
+    )
+
+
+@lru_cache
+def get_speculative_extensions() -> SpeculativeExtensions | None:
+    settings = get_settings()
+    if not settings.speculative_extend:
+        return None
+    return SpeculativeExtensions(
+        client_budget=settings.speculative_client_budget,
+        ttl_seconds=settings.speculative_ttl_seconds,
+        max_entries=settings.speculative_max_entries,
+    )
+
+
+@lru_cache
+def get_provider_prober() -> ProviderProber:
+    settings = get_settings()
+    return ProviderProber(
+        get_song_service().provider_router,
+        interval_seconds=settings.readiness_probe_interval_seconds,
+        timeout_seconds=settings.readiness_probe_timeout_seconds,
+    )
+
+
+async def _cancel_on_disconnect(request: Request, deadline: Deadline) -> None:
+    while not deadline.expired:
+        if await request.is_disconnected():
+            deadline.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def run_service_call(
+    request: HTTPConnection,
+    response: Response,
+    handler: Callable[[_PayloadT], _ResultT],
+    payload: _PayloadT,
+    priority: Priority = "normal",
+    fallback: Callable[[_PayloadT], _ResultT] | None = None,
+) -> _ResultT:
+    """Run a blocking service call in the threadpool under a request deadline.
+
+    The deadline is visible to the service and providers through a context
+    variable, and is cancelled if the client disconnects so no further
+    fallbacks or re-prompts are started for it. Token usage recorded while
+    serving the call is returned in ``x-usage-*`` response headers.
+
+    ``request`` may also be a WebSocket; only plain requests are watched for
+    disconnects.
+
+    Calls are admitted per client (API key or IP) through the fair-share
+    admission controller; time spent queued counts against the deadline, and
+    a client that cannot be admitted gets a fast 429 with ``Retry-After``.
+
+    Once admitted, the adaptive concurrency limiter sheds work beyond what
+    the upstreams currently sustain, lowest priority first: a 503 with
+    ``Retry-After``, or with ``LOAD_SHED_TEMPLATE`` a local template answer
+    marked ``x-load-shed: template``. Only admitted calls hold limiter
+    slots, so a client flooding its own queue cannot shed anyone else, and
+    the latency the limiter adapts to excludes queueing.
+    """
     settings = get_settings()
-    provider_router = ProviderRouter(settings=settings)
-    return SongService(provider_router=provider_router)
+    deadline = deadline_from_headers(
+        request.headers,
+        default_seconds=settings.request_timeout_seconds,
+        max_seconds=settings.request_timeout_max_seconds,
+        min_attempt_seconds=settings.min_provider_attempt_seconds,
+    )
+    client = admission_identity(request)
+    watcher = (
+        asyncio.create_task(_cancel_on_disconnect(request, deadline))
+        if isinstance(request, Request)
+        else None
+    )
+    controller = get_admission_controller()
+    try:
+        with span("admission.wait", client=client) as wait_span:
+            try:
+                await controller.acquire(client, deadline.remaining())
+            except AdmissionRejected as exc:
+                wait_span.record_error("admission_rejected")
+                raise HTTPException(
+                    status_code=429,
+                    detail=str(exc),
+                    headers={"Retry-After": str(exc.retry_after)},
+                ) from exc
+        limiter = get_concurrency_limiter()
+        token = limiter.try_acquire(request_priority(request.headers, priority))
+        if token is None:
+            controller.release(client, 0.0)
+            if settings.load_shed_template and fallback is not None:
+                response.headers["x-load-shed"] = "template"
+                return fallback(payload)
+            raise HTTPException(
+                status_code=503,
+                detail="Server is at capacity, retry shortly.",
+                headers={"Retry-After": str(limiter.retry_after())},
+            )
+        dropped = False
+        try:
+            with use_deadline(deadline), track_request_usage() as request_usage:
+                result = await run_in_threadpool(handler, payload)
+        except HTTPException as exc:
+            dropped = exc.status_code in OVERLOAD_STATUS_CODES
+            raise
+        finally:
+            limiter.release(token, dropped=dropped)
+            controller.release(client, time.monotonic() - token.started)
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+    response.headers.update(request_usage.headers())
+    return result
+
+
+async def _run_speculation(
+    service: SongService, payload: ExtendRequest
+) -> SpeculativeResult | None:
+    """One speculative extend, or None when the limiter sheds it.
+
+    Speculations skip admission control, since the per-client budget already
+    bounds them, and take the limiter at ``low`` priority so they never hold
+    capacity a real request needs.
+    """
+    settings = get_settings()
+    limiter = get_concurrency_limiter()
+    token = limiter.try_acquire("low")
+    if token is None:
+        return None
+    deadline = Deadline.after(
+        settings.request_timeout_seconds, settings.min_provider_attempt_seconds
+    )
+    result: ExtendResponse | None = None
+    dropped = False
+    started = time.monotonic()
+    try:
+        with use_deadline(deadline), track_request_usage() as request_usage:
+            try:
+                result = await run_in_threadpool(service.speculate_extend, payload)
+            except HTTPException as exc:
+                dropped = exc.status_code in OVERLOAD_STATUS_CODES
+            except Exception:
+                logger.exception(
+                    "speculative_extend_failed",
+                    extra={"event": "speculative_extend_failed"},
+                )
+    finally:
+        limiter.release(token, dropped=dropped)
+    return SpeculativeResult(
+        response=result,
+        usage=request_usage,
+        latency_ms=(time.monotonic() - started) * 1000,
+    )
+
+
+def _speculate(
+    service: SongService, request: Request, predicted: ExtendRequest | None
+) -> None:
+    speculation = get_speculative_extensions()
+    if speculation is None or predicted is None:
+        return
+    speculation.schedule(
+        admission_identity(request),
+        predicted,
+        lambda item: _run_speculation(service, item),
+    )
 
 
 @router.post("/generate", response_model=GenerateResponse)
-def generate_song(payload: GenerateRequest) -> GenerateResponse:
+async def generate_song(
+    payload: GenerateRequest, request: Request, response: Response
+) -> GenerateResponse:
     service = get_song_service()
-    return service.generate(payload)
+    result = await run_service_call(
+        request,
+        response,
+        service.generate,
+        payload,
+        fallback=template_generate_response,
+    )
+    _speculate(service, request, next_extend_after_generate(payload, result))
+    return result
+
+
+def _usage_headers(response: Response) -> dict[str, str]:
+    return {
+        name: value for name, value in response.headers.items() if name.startswith("x-")
+    }
+
+
+def _tier_event(event: str, result: GenerateResponse, response: Response) -> str:
+    return (
+        json.dumps(
+            {
+                "event": event,
+                "result": result.model_dump(),
+                "headers": _usage_headers(response),
+            }
+        )
+        + "\n"
+    )
+
+
+@router.post("/generate/tiered")
+async def generate_song_tiered(
+    payload: GenerateRequest, request: Request, response: Response
+) -> StreamingResponse:
+    """Draft-then-refine generation as an NDJSON stream.
+
+    The draft from the fast model is the first line, so time to a usable
+    result is the draft model's latency. The refined pack follows as a
+    ``refined`` event, or an ``error`` event if refinement fails; the draft
+    stands either way. A failed draft is a plain HTTP error, as on
+    ``/generate``.
+    """
+    service = get_song_service()
+    draft = await run_service_call(
+        request,
+        response,
+        service.draft,
+        payload,
+        fallback=template_generate_response,
+    )
+    # The stream watches for disconnects itself; a second receiver on the
+    # same request would steal its messages.
+    connection = HTTPConnection(request.scope)
+
+    async def events() -> AsyncIterator[str]:
+        yield _tier_event("draft", draft, response)
+        refine_response = Response()
+        try:
+            # The user already has a usable draft, so refinement is shed
+            # first and keeps the draft when shed with a template answer.
+            refined = await run_service_call(
+                connection,
+                refine_response,
+                lambda item: service.refine(item, draft),
+                payload,
+                priority="low",
+                fallback=lambda _: draft,
+            )
+        except HTTPException as exc:
+            yield (
+                json.dumps(
+                    {"event": "error", "status": exc.status_code, "detail": exc.detail}
+                )
+                + "\n"
+            )
+            return
+        yield _tier_event("refined", refined, refine_response)
+
+    return StreamingResponse(
+        events(), media_type="application/x-ndjson", headers=_usage_headers(response)
+    )
 
 
 @router.post("/extend", response_model=ExtendResponse)
-def extend_song(payload: ExtendRequest) -> ExtendResponse:
+async def extend_song(
+    payload: ExtendRequest, request: Request, response: Response
+) -> ExtendResponse:
     service = get_song_service()
-    return service.extend(payload)
+    speculation = get_speculative_extensions()
+    hit = (
+        await speculation.take(admission_identity(request), payload)
+        if speculation is not None
+        else None
+    )
+    if hit is not None and hit.response is not None:
+        result = hit.response
+        response.headers["x-speculative"] = "hit"
+        response.headers.update(hit.usage.headers())
+        service.store_extension(payload, result, hit.latency_ms)
+    else:
+        # Extends continue a song the user is already working on, so they
+        # are the last to be shed.
+        result = await run_service_call(
+            request,
+            response,
+            service.extend,
+            payload,
+            priority="high",
+            fallback=template_extend_response,
+        )
+    _speculate(service, request, next_extend_after_extend(payload, result))
+    return result
 
 
 @router.get("/providers", response_model=ProvidersResponse)
@@ -44,4 +516,36 @@ def get_providers() -> ProvidersResponse:
         configured=provider_router.configured,
         defaultProvider=provider_router.default_provider,
         autoOrder=provider_router.auto_order,
+        routing=RoutingExplanation(
+            policy=provider_router.policy_name,
+            generate=_ranking(provider_router, "generate"),
+            extend=_ranking(provider_router, "extend"),
+        ),
     )
+
+
+def _ranking(
+    provider_router: ProviderRouter, operation: Operation
+) -> list[ProviderRankingEntry]:
+    return [
+        ProviderRankingEntry(
+            provider=item.provider,
+            score=round(item.score, 4),
+            reason=item.reason,
+            ewmaLatencyMs=item.stats.ewma_latency_ms,
+            p95LatencyMs=item.stats.p95_latency_ms,
+            errorRate=round(item.stats.error_rate, 4),
+            samples=item.stats.samples,
+            costWeight=item.cost_weight,
+        )
+        for item in provider_router.rank(operation)
+    ]
+
+
+@router.get("/usage", response_model=UsageResponse)
+def get_usage() -> UsageResponse:
+    service = get_song_service()
+    ledger = service.usage_ledger
+    if ledger is None:
+        return UsageResponse(totals=[], hourly=[])
+    return UsageResponse(**ledger.snapshot())
@@ -0,0 +1,87 @@
+"""Export stored songs from the command line.
+
+Usage (from ``server/``)::
+
+    python -m app.cli.export --format csv --since 2026-01-01 --output songs.csv
+
+Reads the database at ``--db`` or ``SONG_STORE_PATH`` through a read-only
+connection, so it can run next to a live server.
+"""
+
+import argparse
+import sys
+from collections.abc import Sequence
+from datetime import datetime
+from typing import get_args
+
+from app.core.config import get_settings
+from app.models.schemas import StructureName
+from app.services.song_export import ExportUnavailableError, export_chunks
+from app.services.song_store import SongFilters, decode_cursor, iter_song_records
+
+
+def _timestamp(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.export", description="Stream stored songs."
+    )
+    parser.add_argument("--db", help="Song store path (default: SONG_STORE_PATH)")
+    parser.add_argument(
+        "--format", choices=["ndjson", "csv", "parquet"], default="ndjson"
+    )
+    parser.add_argument("--output", "-o", help="Output file (default: stdout)")
+    parser.add_argument("--since", type=_timestamp, help="ISO date or unix time")
+    parser.add_argument("--until", type=_timestamp, help="ISO date or unix time")
+    parser.add_argument("--provider")
+    parser.add_argument("--genre")
+    parser.add_argument("--structure", choices=get_args(StructureName))
+    parser.add_argument("--kind", choices=["generate", "extend"])
+    parser.add_argument("--cursor", help="Resume after this record cursor")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    path = args.db or get_settings().song_store_path
+    if not path:
+        print("No song store: pass --db or set SONG_STORE_PATH.", file=sys.stderr)
+        return 2
+    try:
+        decode_cursor(args.cursor)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    filters = SongFilters(
+        since=args.since,
+        until=args.until,
+        provider=args.provider,
+        genre=args.genre,
+        structure=args.structure,
+        kind=args.kind,
+    )
+    records = iter_song_records(path, filters, cursor=args.cursor)
+    try:
+        chunks = export_chunks(records, args.format)
+    except ExportUnavailableError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        else:
+            output.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
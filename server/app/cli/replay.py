@@ -0,0 +1,240 @@
+"""Replay recorded traffic against a server and compare two runs.
+
+Usage (from ``server/``)::
+
+    python -m app.cli.replay run traffic.ndjson.gz --base-url http://127.0.0.1:8000 \
+        --speed 10 --output candidate.json
+    python -m app.cli.replay compare baseline.json candidate.json
+
+``run`` sends every recorded request at its recorded offset divided by
+``--speed`` and writes throughput, latency percentiles and the status mix.
+Start the server under test with ``TRAFFIC_REPLAY_PATH`` pointing at the same
+recording and the same ``TRAFFIC_REPLAY_SPEED``, so upstream calls are served
+from the recording and no network is needed. Each recorded client is sent as
+its own ``X-Forwarded-For`` address; set ``TRUSTED_PROXIES`` on the server to
+the replay host so per-client admission behaves as recorded. ``compare`` exits with 1 when
+the candidate is slower or fails more than ``--tolerance`` allows.
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Sequence
+from dataclasses import asdict, dataclass, field
+
+import httpx
+
+from app.cli.traces import percentile
+from app.core.admission import FORWARDED_FOR_HEADER
+from app.core.traffic import TrafficEntry, read_entries
+
+
+@dataclass
+class LatencySummary:
+    count: int = 0
+    mean_ms: float = 0.0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+
+
+@dataclass
+class ReplayReport:
+    requests: int
+    skipped: int
+    duration_s: float
+    throughput_rps: float
+    error_rate: float
+    latency: LatencySummary
+    statuses: dict[str, int] = field(default_factory=dict)
+    routes: dict[str, LatencySummary] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReplayReport":
+        data = dict(data)
+        data["latency"] = LatencySummary(**data["latency"])
+        data["routes"] = {
+            route: LatencySummary(**summary)
+            for route, summary in data.get("routes", {}).items()
+        }
+        return cls(**data)
+
+
+def _summarize(durations: list[float]) -> LatencySummary:
+    if not durations:
+        return LatencySummary()
+    ordered = sorted(durations)
+    return LatencySummary(
+        count=len(ordered),
+        mean_ms=round(sum(ordered) / len(ordered), 2),
+        p50_ms=round(percentile(ordered, 0.5), 2),
+        p95_ms=round(percentile(ordered, 0.95), 2),
+        p99_ms=round(percentile(ordered, 0.99), 2),
+    )
+
+
+# RFC 2544 benchmarking range: never a real client.
+REPLAY_CLIENT_NETWORK = ipaddress.ip_network("198.18.0.0/15")
+
+
+def replay_client_address(client: int) -> str:
+    return str(REPLAY_CLIENT_NETWORK[client % REPLAY_CLIENT_NETWORK.num_addresses])
+
+
+def replayable(entry: TrafficEntry) -> bool:
+    # Session and job ids from the recording do not exist on the target.
+    return "{" not in entry.route
+
+
+async def replay(
+    entries: Iterable[TrafficEntry],
+    client: httpx.AsyncClient,
+    speed: float = 1.0,
+    concurrency: int = 256,
+) -> ReplayReport:
+    """Send ``entries`` on their recorded schedule, ``speed`` times faster."""
+    entries = list(entries)
+    runnable = [entry for entry in entries if replayable(entry)]
+    speed = max(speed, 0.001)
+    slots = asyncio.Semaphore(max(concurrency, 1))
+    results: list[tuple[str, int, float]] = []
+    first = runnable[0].offset_s if runnable else 0.0
+    started = time.monotonic()
+
+    async def send(entry: TrafficEntry) -> None:
+        delay = (entry.offset_s - first) / speed - (time.monotonic() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with slots:
+            sent = time.monotonic()
+            try:
+                response = await client.request(
+                    entry.method,
+                    entry.route,
+                    json=entry.body,
+                    headers={FORWARDED_FOR_HEADER: replay_client_address(entry.client)},
+                )
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            results.append((entry.route, status, (time.monotonic() - sent) * 1000))
+
+    await asyncio.gather(*(send(entry) for entry in runnable))
+    duration = time.monotonic() - started
+    by_route: dict[str, list[float]] = defaultdict(list)
+    for route, _, latency in results:
+        by_route[route].append(latency)
+    statuses = Counter(str(status) for _, status, _ in results)
+    failed = sum(1 for _, status, _ in results if not 200 <= status < 400)
+    return ReplayReport(
+        requests=len(results),
+        skipped=len(entries) - len(runnable),
+        duration_s=round(duration, 3),
+        throughput_rps=round(len(results) / duration, 2) if duration else 0.0,
+        error_rate=round(failed / len(results), 4) if results else 0.0,
+        latency=_summarize([latency for _, _, latency in results]),
+        statuses=dict(sorted(statuses.items())),
+        routes={route: _summarize(values) for route, values in by_route.items()},
+    )
+
+
+def compare(
+    baseline: ReplayReport, candidate: ReplayReport, tolerance: float = 0.1
+) -> list[str]:
+    """Regressions of ``candidate`` beyond ``tolerance`` (a fraction)."""
+    regressions: list[str] = []
+    for name in ("p50_ms", "p95_ms", "p99_ms"):
+        before = getattr(baseline.latency, name)
+        after = getattr(candidate.latency, name)
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"latency {name}: {before:.1f} -> {after:.1f}")
+    if candidate.throughput_rps < baseline.throughput_rps * (1 - tolerance):
+        regressions.append(
+            f"throughput: {baseline.throughput_rps:.2f} -> "
+            f"{candidate.throughput_rps:.2f} req/s"
+        )
+    # Error rates are compared in absolute points; most runs start near zero.
+    if candidate.error_rate > baseline.error_rate + tolerance / 10:
+        regressions.append(
+            f"error rate: {baseline.error_rate:.2%} -> {candidate.error_rate:.2%}"
+        )
+    return regressions
+
+
+def _print_report(report: ReplayReport) -> None:
+    latency = report.latency
+    print(
+        f"{report.requests} requests ({report.skipped} skipped) in "
+        f"{report.duration_s:.1f}s, {report.throughput_rps:.2f} req/s, "
+        f"errors {report.error_rate:.2%}"
+    )
+    print(
+        f"latency ms: mean {latency.mean_ms:.1f}  p50 {latency.p50_ms:.1f}  "
+        f"p95 {latency.p95_ms:.1f}  p99 {latency.p99_ms:.1f}"
+    )
+    print("statuses: " + ", ".join(f"{k}={v}" for k, v in report.statuses.items()))
+
+
+async def _run(args: argparse.Namespace) -> ReplayReport:
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout
+    ) as client:
+        return await replay(
+            read_entries(args.path), client, args.speed, args.concurrency
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.replay", description="Replay recorded traffic."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Drive a server with a recording")
+    run.add_argument("path", help="Recording written with TRAFFIC_RECORD_PATH")
+    run.add_argument("--base-url", default="http://127.0.0.1:8000")
+    run.add_argument("--speed", type=float, default=1.0)
+    run.add_argument("--concurrency", type=int, default=256)
+    run.add_argument("--timeout", type=float, default=180.0)
+    run.add_argument("--output", "-o", help="Write the report as JSON")
+    check = commands.add_parser("compare", help="Compare two run reports")
+    check.add_argument("baseline")
+    check.add_argument("candidate")
+    check.add_argument("--tolerance", type=float, default=0.1)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "run":
+        try:
+            report = asyncio.run(_run(args))
+        except OSError as exc:
+            print(str(exc), file=sys.stderr)
+            return 2
+        _print_report(report)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as handle:
+                json.dump(asdict(report), handle, indent=2)
+        return 0
+    try:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = ReplayReport.from_dict(json.load(handle))
+        with open(args.candidate, encoding="utf-8") as handle:
+            candidate = ReplayReport.from_dict(json.load(handle))
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    regressions = compare(baseline, candidate, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions beyond tolerance.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""Summarise spans written by ``TRACING_EXPORTER=file``.
+
+Usage (from ``server/``)::
+
+    python -m app.cli.traces traces.jsonl
+
+Prints one row per span name with count, mean, p50, p95 and total time, so
+the stage that dominates request latency stands out.
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+
+@dataclass
+class StageSummary:
+    name: str
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    total_ms: float
+    errors: int
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(lines: Iterable[str]) -> list[StageSummary]:
+    durations: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        name = record["name"]
+        durations[name].append(float(record["durationMs"]))
+        if record.get("status") == "error":
+            errors[name] += 1
+    summaries: list[StageSummary] = []
+    for name, values in durations.items():
+        ordered = sorted(values)
+        total = sum(ordered)
+        summaries.append(
+            StageSummary(
+                name=name,
+                count=len(ordered),
+                mean_ms=total / len(ordered),
+                p50_ms=percentile(ordered, 0.5),
+                p95_ms=percentile(ordered, 0.95),
+                total_ms=total,
+                errors=errors[name],
+            )
+        )
+    return sorted(summaries, key=lambda item: item.total_ms, reverse=True)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.traces", description="Per-stage span timings."
+    )
+    parser.add_argument("path", help="Span file written by the file exporter")
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, encoding="utf-8") as handle:
+            summaries = summarize(handle)
+    except OSError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    print(
+        f"{'span':<28} {'count':>7} {'mean ms':>10} {'p50 ms':>10} "
+        f"{'p95 ms':>10} {'total ms':>12} {'errors':>7}"
+    )
+    for item in summaries:
+        print(
+            f"{item.name:<28} {item.count:>7} {item.mean_ms:>10.2f} "
+            f"{item.p50_ms:>10.2f} {item.p95_ms:>10.2f} {item.total_ms:>12.1f} "
+            f"{item.errors:>7}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
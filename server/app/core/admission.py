@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import ipaddress
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Collection, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from starlette.requests import HTTPConnection
+
+from app.core.config import get_settings
+
+
+API_KEY_HEADER = "x-api-key"
+FORWARDED_FOR_HEADER = "x-forwarded-for"
+MAX_IDLE_CLIENTS = 1000
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+
+def client_identity(
+    headers: Mapping[str, str],
+    client_host: str | None,
+    api_keys: Collection[str] | None = None,
+) -> str:
+    """Key for a caller: a hashed API key, else the client IP.
+
+    With ``api_keys`` given, only those keys count; any other key falls back
+    to the IP. Raw keys never leave this function, so they are safe to expose
+    in metrics.
+    """
+    api_key = headers.get(API_KEY_HEADER, "").strip()
+    if api_key and (api_keys is None or api_key in api_keys):
+        digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+        return f"key:{digest}"
+    return f"ip:{client_host or 'unknown'}"
+
+
+@lru_cache
+def parse_networks(raw: str) -> tuple[Network, ...]:
+    """Parse comma-separated addresses or CIDR ranges, skipping invalid ones."""
+    networks: list[Network] = []
+    for item in raw.split(","):
+        try:
+            networks.append(ipaddress.ip_network(item.strip(), strict=False))
+        except ValueError:
+            continue
+    return tuple(networks)
+
+
+@lru_cache
+def parse_api_keys(raw: str) -> frozenset[str]:
+    return frozenset(key.strip() for key in raw.split(",") if key.strip())
+
+
+def _trusted(address: str, networks: tuple[Network, ...]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_address(
+    headers: Mapping[str, str], peer: str | None, trusted_proxies: tuple[Network, ...]
+) -> str | None:
+    """The caller's IP address.
+
+    The connection's peer, unless it is a trusted proxy: then the nearest
+    ``X-Forwarded-For`` hop that is not itself a trusted proxy. Hops added
+    before the first untrusted one are client-controlled and ignored.
+    """
+    if peer is None or not _trusted(peer, trusted_proxies):
+        return peer
+    address = peer
+    hops = headers.get(FORWARDED_FOR_HEADER, "").split(",")
+    for hop in reversed([item.strip() for item in hops if item.strip()]):
+        address = hop
+        if not _trusted(hop, trusted_proxies):
+            break
+    return address
+
+
+def _connection_address(connection: HTTPConnection) -> str | None:
+    return client_address(
+        connection.headers,
+        connection.client.host if connection.client else None,
+        parse_networks(get_settings().trusted_proxies),
+    )
+
+
+def owner_identity(connection: HTTPConnection) -> str:
+    """Owner of sessions, batch jobs and idempotency keys.
+
+    Any API key counts: it only has to be secret, not registered.
+    """
+    return client_identity(connection.headers, _connection_address(connection))
+
+
+def admission_identity(connection: HTTPConnection) -> str:
+    """Fair-share identity for admission, load metrics and speculation budgets.
+
+    Only keys listed in ``ADMISSION_API_KEYS`` count, so a caller cannot get
+    extra slots by sending a fresh key with every request.
+    """
+    return client_identity(
+        connection.headers,
+        _connection_address(connection),
+        parse_api_keys(get_settings().admission_api_keys),
+    )
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class _ClientState:
+    weight: float
+    active: int = 0
+    finish_tag: float = 0.0
+    waiters: deque[tuple[asyncio.Future[None], float]] = field(default_factory=deque)
+    admitted: int = 0
+    rejected: int = 0
+
+
+class AdmissionController:
+    """Per-client concurrency caps with weighted fair queuing.
+
+    At most ``max_concurrency`` calls run at once and each client holds at
+    most ``client_concurrency`` of them. When slots free up, waiting clients
+    are served in start-time fair queuing order, so a client with weight 2
+    gets twice the share of a client with weight 1 under contention. Waiting
+    is bounded overall, per client, and in time; a rejected request fails
+    fast with a ``Retry-After`` estimate.
+
+    Runs on the event loop only, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        client_concurrency: int = 0,
+        max_queue: int = 64,
+        client_queue: int = 16,
+        max_wait_seconds: float = 30.0,
+        weights: dict[str, float] | None = None,
+        ewma_alpha: float = 0.2,
+    ):
+        self._max_concurrency = max(max_concurrency, 1)
+        # 0 leaves clients capped only by the global limit.
+        self._client_concurrency = (
+            client_concurrency if client_concurrency > 0 else self._max_concurrency
+        )
+        self._max_queue = max(max_queue, 0)
+        self._client_queue = max(client_queue, 0)
+        self._max_wait_seconds = max_wait_seconds
+        self._weights = weights or {}
+        self._alpha = ewma_alpha
+        self._clients: dict[str, _ClientState] = {}
+        self._active = 0
+        self._queued = 0
+        self._virtual_time = 0.0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._avg_wait_seconds = 0.0
+        self._avg_service_seconds = 1.0
+
+    def _state(self, client: str) -> _ClientState:
+        state = self._clients.get(client)
+        if state is None:
+            weight = self._weights.get(client, 1.0)
+            state = _ClientState(weight=weight if weight > 0 else 1.0)
+            self._clients[client] = state
+        return state
+
+    def _retry_after(self) -> int:
+        backlog = (self._queued + 1) * self._avg_service_seconds
+        return max(math.ceil(backlog / self._max_concurrency), 1)
+
+    def _reject(self, state: _ClientState, message: str) -> AdmissionRejected:
+        state.rejected += 1
+        self._rejected += 1
+        return AdmissionRejected(message, retry_after=self._retry_after())
+
+    def _grant(self, state: _ClientState, waited_seconds: float) -> None:
+        start_tag = max(self._virtual_time, state.finish_tag)
+        state.finish_tag = start_tag + 1.0 / state.weight
+        self._virtual_time = start_tag
+        state.active += 1
+        state.admitted += 1
+        self._active += 1
+        self._admitted += 1
+        self._avg_wait_seconds += self._alpha * (
+            waited_seconds - self._avg_wait_seconds
+        )
+
+    def try_acquire(self, client: str) -> bool:
+        """Take a slot without waiting; False when the client would have to queue."""
+        state = self._state(client)
+        if (
+            self._active < self._max_concurrency
+            and state.active < self._client_concurrency
+            and not state.waiters
+        ):
+            self._grant(state, 0.0)
+            return True
+        return False
+
+    async def acquire(self, client: str, max_wait_seconds: float | None = None) -> None:
+        if self.try_acquire(client):
+            return
+        state = self._state(client)
+        if self._queued >= self._max_queue or len(state.waiters) >= self._client_queue:
+            raise self._reject(state, "Too many queued requests.")
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (waiter, time.monotonic())
+        state.waiters.append(entry)
+        self._queued += 1
+        timeout = self._max_wait_seconds
+        if max_wait_seconds is not None:
+            timeout = min(timeout, max_wait_seconds)
+        try:
+            await asyncio.wait({waiter}, timeout=max(timeout, 0.0))
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(client, 0.0)
+            else:
+                self._drop_waiter(state, entry)
+            raise
+        if waiter.done() and not waiter.cancelled():
+            return
+        self._drop_waiter(state, entry)
+        self._timed_out += 1
+        raise self._reject(state, "Timed out waiting for a free slot.")
+
+    def _drop_waiter(
+        self, state: _ClientState, entry: tuple[asyncio.Future[None], float]
+    ) -> None:
+        entry[0].cancel()
+        try:
+            state.waiters.remove(entry)
+            self._queued -= 1
+        except ValueError:
+            pass
+        self._dispatch()
+
+    def release(self, client: str, service_seconds: float) -> None:
+        state = self._state(client)
+        state.active = max(state.active - 1, 0)
+        self._active = max(self._active - 1, 0)
+        if service_seconds > 0:
+            self._avg_service_seconds += self._alpha * (
+                service_seconds - self._avg_service_seconds
+            )
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._active < self._max_concurrency:
+            eligible = [
+                state
+                for state in self._clients.values()
+                if state.waiters and state.active < self._client_concurrency
+            ]
+            if not eligible:
+                break
+            state = min(
+                eligible,
+                key=lambda item: (
+                    max(self._virtual_time, item.finish_tag) + 1.0 / item.weight
+                ),
+            )
+            waiter, enqueued_at = state.waiters.popleft()
+            self._queued -= 1
+            if waiter.done():
+                continue
+            self._grant(state, now - enqueued_at)
+            waiter.set_result(None)
+        self._prune()
+
+    def _prune(self) -> None:
+        if len(self._clients) <= MAX_IDLE_CLIENTS:
+            return
+        for client, state in list(self._clients.items()):
+            if not state.active and not state.waiters:
+                del self._clients[client]
+
+    @asynccontextmanager
+    async def slot(
+        self, client: str, max_wait_seconds: float | None = None
+    ) -> AsyncIterator[None]:
+        await self.acquire(client, max_wait_seconds)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(client, time.monotonic() - started)
+
+    def snapshot(self) -> dict[str, object]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "maxConcurrency": self._max_concurrency,
+            "maxQueue": self._max_queue,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timedOut": self._timed_out,
+            "avgWaitMs": round(self._avg_wait_seconds * 1000, 2),
+            "avgServiceMs": round(self._avg_service_seconds * 1000, 2),
+            "clients": [
+                {
+                    "client": client,
+                    "weight": state.weight,
+                    "active": state.active,
+                    "queued": len(state.waiters),
+                    "admitted": state.admitted,
+                    "rejected": state.rejected,
+                }
+                for client, state in sorted(self._clients.items())
+                if state.active or state.waiters
+            ],
+        }
@@ -0,0 +1,129 @@
+import math
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Literal
+
+
+Priority = Literal["high", "normal", "low"]
+
+PRIORITY_HEADER = "x-request-priority"
+
+# Share of the adaptive limit each class may fill. Low-priority work is shed
+# first, so extends keep flowing while batch traffic backs off.
+PRIORITY_SHARES: dict[Priority, float] = {"high": 1.0, "normal": 0.9, "low": 0.5}
+_RANK: dict[Priority, int] = {"low": 0, "normal": 1, "high": 2}
+_PRIORITY_NAMES: dict[str, Priority] = {
+    "low": "low",
+    "batch": "low",
+    "normal": "normal",
+    "high": "high",
+}
+
+
+def request_priority(headers: Mapping[str, str], default: Priority) -> Priority:
+    """Route default, lowered (never raised) by ``x-request-priority``.
+
+    ``batch`` is accepted as an alias for ``low``.
+    """
+    value = headers.get(PRIORITY_HEADER, "").strip().lower()
+    requested = _PRIORITY_NAMES.get(value)
+    if requested is None or _RANK[requested] > _RANK[default]:
+        return default
+    return requested
+
+
+@dataclass
+class LimiterToken:
+    priority: Priority
+    started: float
+
+
+class AdaptiveLimiter:
+    """AIMD in-flight limit driven by observed latency.
+
+    Each completion is compared with a slow latency baseline. Within
+    ``latency_tolerance`` times the baseline, and with the limit actually
+    in use, the limit grows by one per limit's worth of completions. Above
+    it, or on a deadline failure, the limit is cut by ``backoff``. Only
+    requests that started after the previous cut can trigger another, so a
+    burst of slow completions counts as one congestion signal.
+
+    Requests over their class's share of the limit are rejected immediately
+    instead of queueing, which keeps latency and goodput flat under overload.
+    Runs on the event loop only.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 2,
+        max_limit: int = 128,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.9,
+        baseline_alpha: float = 0.05,
+    ):
+        self._min_limit = max(min_limit, 1)
+        self._max_limit = max(max_limit, self._min_limit)
+        self._limit = float(min(max(initial_limit, self._min_limit), self._max_limit))
+        self._tolerance = latency_tolerance
+        self._backoff = backoff
+        self._alpha = baseline_alpha
+        self._baseline_seconds: float | None = None
+        self._last_cut = 0.0
+        self._inflight = 0
+        self._accepted = 0
+        self._shed: dict[Priority, int] = {"high": 0, "normal": 0, "low": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def try_acquire(self, priority: Priority = "normal") -> LimiterToken | None:
+        allowed = max(int(self._limit * PRIORITY_SHARES[priority]), 1)
+        if self._inflight >= allowed:
+            self._shed[priority] += 1
+            return None
+        self._inflight += 1
+        self._accepted += 1
+        return LimiterToken(priority=priority, started=time.monotonic())
+
+    def release(self, token: LimiterToken, dropped: bool = False) -> None:
+        """Finish a request; ``dropped`` marks overload failures like deadlines."""
+        saturated = self._inflight >= self._limit / 2
+        self._inflight = max(self._inflight - 1, 0)
+        latency = time.monotonic() - token.started
+        baseline = self._baseline_seconds
+        congested = dropped or (
+            baseline is not None and latency > baseline * self._tolerance
+        )
+        if congested:
+            if token.started >= self._last_cut:
+                self._limit = max(self._limit * self._backoff, self._min_limit)
+                self._last_cut = time.monotonic()
+        elif saturated:
+            self._limit = min(self._limit + 1 / self._limit, self._max_limit)
+        if not dropped:
+            # Slow samples still move the baseline, only more slowly, so it
+            # can follow a genuine shift in request mix.
+            alpha = self._alpha / 4 if congested else self._alpha
+            self._baseline_seconds = (
+                latency if baseline is None else baseline + alpha * (latency - baseline)
+            )
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: about one typical request."""
+        return max(math.ceil(self._baseline_seconds or 1.0), 1)
+
+    def snapshot(self) -> dict[str, object]:
+        return {
+            "limit": self.limit,
+            "inflight": self._inflight,
+            "baselineLatencyMs": round((self._baseline_seconds or 0.0) * 1000, 2),
+            "accepted": self._accepted,
+            "shed": dict(self._shed),
+        }
@@ -1,8 +1,15 @@
-from functools import lru_cache
+import threading
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+ENV_FILE = "server/.env"
+
+
+DEFAULT_INSTRUMENTAL_MODE = "fast"
+DEFAULT_LYRIC_REPAIR = True
+
+
 class Settings(BaseSettings):
     gemini_api_key: str | None = None
     openai_api_key: str | None = None
@@ -10,15 +17,134 @@ class Settings(BaseSettings):
     auto_provider_order: str = "gemini,openai"
     gemini_model: str = "gemini-2.0-flash"
     openai_model: str = "gpt-4.1-mini"
+    # Fast first-tier models for tiered generation; the refine pass uses the
+    # models above.
+    gemini_draft_model: str = "gemini-2.0-flash-lite"
+    openai_draft_model: str = "gpt-4.1-nano"
+    local_llm_base_url: str | None = None
+    local_llm_api_key: str | None = None
+    local_llm_model: str = "local-model"
+    local_llm_timeout_seconds: float = 30.0
+    local_llm_max_connections: int = 20
+    provider_plugins: str = ""
+    request_timeout_seconds: float = 60.0
+    request_timeout_max_seconds: float = 120.0
+    min_provider_attempt_seconds: float = 3.0
+    readiness_probe_interval_seconds: float = 30.0
+    readiness_probe_timeout_seconds: float = 5.0
+    admission_max_concurrency: int = 16
+    admission_client_concurrency: int = 0
+    admission_max_queue: int = 64
+    admission_client_queue: int = 16
+    admission_max_wait_seconds: float = 30.0
+    admission_client_weights: str = ""
+    admission_api_keys: str = ""
+    trusted_proxies: str = ""
+    concurrency_limit_initial: int = 16
+    concurrency_limit_min: int = 2
+    concurrency_limit_max: int = 128
+    concurrency_latency_tolerance: float = 2.0
+    load_shed_template: bool = False
+    speculative_extend: bool = False
+    speculative_client_budget: int = 1
+    speculative_ttl_seconds: float = 300.0
+    speculative_max_entries: int = 1000
+    idempotency_ttl_seconds: float = 86400.0
+    idempotency_max_entries: int = 1000
+    idempotency_store_path: str | None = None
+    session_max_count: int = 1000
+    session_max_bytes: int = 64 * 1024 * 1024
+    session_idle_seconds: float = 3600.0
+    batch_store_path: str | None = None
+    batch_poll_interval_seconds: float = 60.0
+    batch_max_requests: int = 1000
+    batch_price_factor: float = 0.5
+    routing_policy: str = "static"
+    routing_weights: str = ""
+    provider_cost_weights: str = ""
+    routing_max_p95_ms: float = 15000.0
+    routing_max_error_rate: float = 0.5
+    routing_ewma_alpha: float = 0.2
+    routing_exploration: float = 0.05
+    instrumental_mode: str = DEFAULT_INSTRUMENTAL_MODE
+    template_fallback: bool = False
+    lyric_repair: bool = DEFAULT_LYRIC_REPAIR
+    generation_pipeline: str = "single"
+    pipeline_stages: str = ""
+    model_prices: str = ""
+    usage_rollup_path: str | None = None
+    usage_rollup_interval_seconds: float = 60.0
+    song_store_path: str | None = None
+    song_store_batch_size: int = 200
+    song_store_flush_interval_seconds: float = 0.5
+    admin_token: str | None = None
+    loop_lag_threshold_ms: float = 250.0
+    tracing_exporter: str = "none"
+    tracing_file_path: str = "traces.jsonl"
+    tracing_otlp_endpoint: str = "http://127.0.0.1:4318/v1/traces"
+    tracing_service_name: str = "loofi-suno-api"
+    tracing_sample_ratio: float = 1.0
+    traffic_record_path: str | None = None
+    traffic_replay_path: str | None = None
+    traffic_replay_speed: float = 1.0
+    settings_watch_interval_seconds: float = 0.0
 
     model_config = SettingsConfigDict(
-        env_file="server/.env",
+        env_file=ENV_FILE,
         env_file_encoding="utf-8",
         case_sensitive=False,
         extra="ignore",
     )
 
 
-@lru_cache
+# Settings read once when their component starts. A reload reports changes
+# to them as needing a restart instead of as applied.
+RESTART_REQUIRED_PREFIXES = (
+    "admission_",
+    "batch_",
+    "concurrency_",
+    "idempotency_",
+    "readiness_",
+    "session_",
+    "song_store_",
+    "speculative_",
+    "tracing_",
+    "usage_rollup_",
+)
+RESTART_REQUIRED_SETTINGS = {
+    "loop_lag_threshold_ms",
+    "settings_watch_interval_seconds",
+    "traffic_record_path",
+}
+# Read on every request despite their prefix.
+LIVE_SETTINGS = {"admission_api_keys"}
+
+
+def requires_restart(name: str) -> bool:
+    if name in LIVE_SETTINGS:
+        return False
+    return name in RESTART_REQUIRED_SETTINGS or name.startswith(
+        RESTART_REQUIRED_PREFIXES
+    )
+
+
+_settings: Settings | None = None
+_settings_lock = threading.Lock()
+
+
 def get_settings() -> Settings:
-    return Settings()
+    global _settings
+    settings = _settings
+    if settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings()
+            settings = _settings
+    return settings
+
+
+def replace_settings(settings: Settings) -> None:
+    """Publish reloaded settings; later ``get_settings()`` calls return them."""
+    global _settings
+    with _settings_lock:
+        _settings = settings
@@ -0,0 +1,121 @@
+import math
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+
+DEADLINE_HEADER = "x-request-deadline"
+TIMEOUT_HEADER = "x-request-timeout"
+
+
+@dataclass
+class Deadline:
+    """Time budget for one API request, shared by every provider attempt.
+
+    ``expires_at`` is on the ``time.monotonic`` clock. ``min_attempt_seconds``
+    is the smallest budget worth starting another upstream call with.
+    """
+
+    expires_at: float
+    min_attempt_seconds: float = 0.0
+    cancelled: bool = field(default=False)
+
+    @classmethod
+    def after(cls, seconds: float, min_attempt_seconds: float = 0.0) -> "Deadline":
+        return cls(
+            expires_at=time.monotonic() + max(seconds, 0.0),
+            min_attempt_seconds=min_attempt_seconds,
+        )
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def allows_attempt(self) -> bool:
+        """True when the remaining budget can cover a typical upstream call."""
+        remaining = self.remaining()
+        return remaining > 0.0 and remaining >= self.min_attempt_seconds
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+_current_deadline: ContextVar[Deadline | None] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+@contextmanager
+def use_deadline(deadline: Deadline | None) -> Iterator[Deadline | None]:
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def _parse_timeout(value: str) -> float | None:
+    text = value.strip().lower()
+    try:
+        if text.endswith("ms"):
+            seconds = float(text[:-2]) / 1000
+        elif text.endswith("s"):
+            seconds = float(text[:-1])
+        else:
+            seconds = float(text)
+    except ValueError:
+        return None
+    # NaN would slip past the max_seconds clamp and never expire.
+    return seconds if math.isfinite(seconds) else None
+
+
+def _parse_absolute_deadline(value: str) -> float | None:
+    try:
+        epoch = float(value.strip())
+    except ValueError:
+        return None
+    if not math.isfinite(epoch):
+        return None
+    # Accept both epoch seconds and epoch milliseconds.
+    if epoch > 1e11:
+        epoch /= 1000
+    return epoch - time.time()
+
+
+def deadline_from_headers(
+    headers: Mapping[str, str],
+    default_seconds: float,
+    max_seconds: float,
+    min_attempt_seconds: float = 0.0,
+) -> Deadline:
+    """Build a request deadline from client headers or the server default.
+
+    ``x-request-deadline`` is an absolute unix timestamp; ``x-request-timeout``
+    is a relative budget (``15``, ``15s`` or ``1500ms``). The tighter of the
+    two wins, ``default_seconds`` applies when neither is sent, and the
+    result never exceeds ``max_seconds``.
+    """
+    budgets: list[float] = []
+    absolute = headers.get(DEADLINE_HEADER)
+    if absolute:
+        parsed = _parse_absolute_deadline(absolute)
+        if parsed is not None:
+            budgets.append(parsed)
+    relative = headers.get(TIMEOUT_HEADER)
+    if relative:
+        parsed = _parse_timeout(relative)
+        if parsed is not None:
+            budgets.append(parsed)
+    seconds = min(min(budgets) if budgets else default_seconds, max_seconds)
+    return Deadline.after(seconds, min_attempt_seconds=min_attempt_seconds)
@@ -0,0 +1,309 @@
+"""``Idempotency-Key`` support for the paid generation routes.
+
+The first request with a key runs; duplicates that arrive while it is still
+running wait for it, and later duplicates within the TTL get the stored
+status, headers and body back unchanged, errors included. Keys are scoped to
+the client and route, and reusing a key for a different body is rejected.
+Responses carrying ``Retry-After`` (admission and load-shedding rejections)
+are not stored, because the work never ran and a retry should run it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from app.core.admission import owner_identity
+from app.core.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = "idempotent-replayed"
+IDEMPOTENT_PATHS = {"/api/song/generate", "/api/song/extend"}
+MAX_KEY_LENGTH = 255
+# Expired rows are purged from SQLite once every this many writes.
+PURGE_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at
+    ON idempotency_keys (expires_at);
+"""
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    headers: list[tuple[str, str]]
+    body: bytes
+    expires_at: float
+
+    def to_response(self, replayed: bool = False) -> Response:
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in self.headers
+        ]
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+
+class IdempotencyStore:
+    """Bounded in-memory LRU of responses, with an optional SQLite tier.
+
+    The memory tier holds the most recent ``max_entries`` keys. With
+    ``path``, every response is also written to SQLite, so keys survive
+    restarts and are shared by workers on one host.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400.0,
+        max_entries: int = 1000,
+        path: str | None = None,
+    ):
+        self._ttl = ttl_seconds
+        self._max_entries = max(max_entries, 1)
+        self._memory: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future[StoredResponse | None]] = {}
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._writes = 0
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self._ttl
+
+    def get(self, key: str) -> StoredResponse | None:
+        now = time.time()
+        with self._lock:
+            stored = self._memory.get(key)
+            if stored is not None:
+                if stored.expires_at > now:
+                    self._memory.move_to_end(key)
+                    return stored
+                del self._memory[key]
+            if self._connection is None:
+                return None
+            row = self._connection.execute(
+                "SELECT fingerprint, status, headers, body, expires_at "
+                "FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            stored = StoredResponse(
+                fingerprint=row[0],
+                status_code=row[1],
+                headers=[(name, value) for name, value in json.loads(row[2])],
+                body=bytes(row[3]),
+                expires_at=row[4],
+            )
+            self._remember(key, stored)
+            return stored
+
+    def _recent(self, key: str) -> StoredResponse | None:
+        with self._lock:
+            return self._memory.get(key)
+
+    def put(self, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._remember(key, stored)
+            if self._connection is None:
+                return
+            self._writes += 1
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys "
+                    "(key, fingerprint, status, headers, body, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        stored.fingerprint,
+                        stored.status_code,
+                        json.dumps(stored.headers),
+                        stored.body,
+                        stored.expires_at,
+                    ),
+                )
+                if self._writes % PURGE_EVERY == 0:
+                    self._connection.execute(
+                        "DELETE FROM idempotency_keys WHERE expires_at <= ?",
+                        (time.time(),),
+                    )
+
+    def _remember(self, key: str, stored: StoredResponse) -> None:
+        self._memory[key] = stored
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        produce: Callable[[], Awaitable[StoredResponse | None]],
+    ) -> tuple[StoredResponse | None, bool]:
+        """Return ``(response, replayed)`` for ``key``.
+
+        ``produce`` runs the request and returns what to store, or None for a
+        response that must not be stored. Duplicates that arrive while it runs
+        wait for it; if it stores nothing they run their own request. Raises
+        ``IdempotencyKeyReused`` for a known key with another fingerprint.
+        """
+        while True:
+            stored = await self._lookup(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    raise IdempotencyKeyReused(key)
+                return stored, True
+            pending = self._inflight.get(key)
+            if pending is None:
+                # A leader may have finished while SQLite was being read.
+                if self._recent(key) is None:
+                    break
+                continue
+            result = await asyncio.shield(pending)
+            if result is None:
+                continue
+            if result.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(key)
+            return result, True
+
+        future: asyncio.Future[StoredResponse | None] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._inflight[key] = future
+        stored = None
+        try:
+            stored = await produce()
+            if stored is not None:
+                await self._store(key, stored)
+            return stored, False
+        finally:
+            del self._inflight[key]
+            future.set_result(stored)
+
+    async def _lookup(self, key: str) -> StoredResponse | None:
+        if self._connection is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def _store(self, key: str, stored: StoredResponse) -> None:
+        if self._connection is None:
+            self.put(key, stored)
+        else:
+            await asyncio.to_thread(self.put, key, stored)
+
+
+def request_fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+async def idempotent_call(
+    request: Request,
+    call_next: Callable[[Request], Awaitable[Response]],
+    store: IdempotencyStore | None,
+) -> Response:
+    """Run ``call_next`` under the request's ``Idempotency-Key``, if any."""
+    key = request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+    if (
+        not key
+        or store is None
+        or request.method != "POST"
+        or request.url.path not in IDEMPOTENT_PATHS
+    ):
+        return await call_next(request)
+    if len(key) > MAX_KEY_LENGTH:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."
+            },
+        )
+    client = owner_identity(request)
+    scoped_key = f"{client} {request.url.path} {key}"
+    fingerprint = request_fingerprint(await request.body())
+    captured: list[StoredResponse] = []
+
+    async def produce() -> StoredResponse | None:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        captured.append(
+            StoredResponse(
+                fingerprint=fingerprint,
+                status_code=response.status_code,
+                headers=[
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in response.raw_headers
+                ],
+                body=body,
+                expires_at=time.time() + store.ttl_seconds,
+            )
+        )
+        if "retry-after" in response.headers:
+            return None
+        return captured[0]
+
+    try:
+        stored, replayed = await store.run(scoped_key, fingerprint, produce)
+    except IdempotencyKeyReused:
+        return JSONResponse(
+            status_code=422,
+            content={
+                "detail": "Idempotency-Key was already used with a different request."
+            },
+        )
+    if not replayed:
+        return captured[0].to_response()
+    logger.info(
+        "idempotent_replay",
+        extra={"event": "idempotent_replay", "path": request.url.path},
+    )
+    return stored.to_response(replayed=True)
+
+
+@lru_cache
+def get_idempotency_store() -> IdempotencyStore | None:
+    settings = get_settings()
+    if settings.idempotency_ttl_seconds <= 0:
+        return None
+    return IdempotencyStore(
+        ttl_seconds=settings.idempotency_ttl_seconds,
+        max_entries=settings.idempotency_max_entries,
+        path=settings.idempotency_store_path,
+    )
@@ -11,8 +11,22 @@ SAFE_LOG_FIELDS = {
     "status",
     "duration_ms",
     "provider",
+    "model",
+    "structure",
     "code",
     "retryable",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "cost_usd",
+    "changed",
+    "restart_required",
+    "lag_ms",
+    "stack",
+    "stage",
+    "count",
+    "score_before",
+    "score_after",
 }
 
 
@@ -0,0 +1,230 @@
+"""On-demand sampling profiler and event-loop lag monitor.
+
+The profiler polls ``sys._current_frames()`` from a background thread, so
+it sees the event loop and every threadpool worker without instrumenting
+them. It costs nothing while idle. The lag monitor pairs a heartbeat task on
+the loop with a watchdog thread. When the heartbeat stalls past the threshold,
+the watchdog logs the loop thread's stack while the blocking call is still on
+it.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import FrameType
+
+from app.core.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# (function, file, first line): one entry per function, whatever line is running.
+FrameKey = tuple[str, str, int]
+StackKey = tuple[str, tuple[FrameKey, ...]]
+
+MAX_PROFILE_SECONDS = 60.0
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+@dataclass
+class Profile:
+    duration_seconds: float
+    interval_seconds: float
+    samples: int = 0
+    stacks: Counter[StackKey] = field(default_factory=Counter)
+
+
+def _stack(frame: FrameType | None) -> tuple[FrameKey, ...]:
+    frames: list[FrameKey] = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+def _short_path(path: str) -> str:
+    parts = path.replace(os.sep, "/").split("/")
+    return "/".join(parts[-2:])
+
+
+def frame_label(frame: FrameKey) -> str:
+    name, path, line = frame
+    return f"{name} ({_short_path(path)}:{line})"
+
+
+_profile_lock = threading.Lock()
+
+
+def sample_stacks(
+    seconds: float, interval_seconds: float = 0.01, thread_filter: str | None = None
+) -> Profile:
+    """Sample every other thread's stack for ``seconds``.
+
+    Only one profile runs at a time; a concurrent call raises
+    ``ProfilerBusyError``. ``thread_filter`` keeps threads whose name
+    contains it, e.g. ``MainThread`` for the event loop.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running.")
+    try:
+        seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+        profile = Profile(duration_seconds=seconds, interval_seconds=interval_seconds)
+        own = threading.get_ident()
+        end = time.perf_counter() + seconds
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident, f"thread-{ident}")
+                if thread_filter and thread_filter not in name:
+                    continue
+                profile.stacks[(name, _stack(frame))] += 1
+            profile.samples += 1
+            if time.perf_counter() >= end:
+                break
+            time.sleep(interval_seconds)
+        return profile
+    finally:
+        _profile_lock.release()
+
+
+def collapsed_stacks(profile: Profile) -> str:
+    """Brendan Gregg's folded format, one ``thread;root;...;leaf count`` per line."""
+    lines = [
+        ";".join([thread, *(frame_label(frame) for frame in frames)]) + f" {count}"
+        for (thread, frames), count in profile.stacks.most_common()
+    ]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def speedscope_profile(profile: Profile, name: str = "profile") -> dict[str, object]:
+    """Speedscope file with one sampled profile per thread."""
+    frame_index: dict[FrameKey, int] = {}
+    frames: list[dict[str, object]] = []
+    per_thread: dict[str, tuple[list[list[int]], list[float]]] = {}
+    for (thread, stack), count in profile.stacks.items():
+        indices: list[int] = []
+        for frame in stack:
+            index = frame_index.get(frame)
+            if index is None:
+                index = frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indices.append(index)
+        samples, weights = per_thread.setdefault(thread, ([], []))
+        samples.append(indices)
+        weights.append(count * profile.interval_seconds)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "loofi-suno-api",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread, (samples, weights) in sorted(per_thread.items())
+        ],
+    }
+
+
+class LoopLagMonitor:
+    """Detects event-loop stalls and logs the stack of the blocking call."""
+
+    def __init__(self, threshold_ms: float = 250.0, interval_seconds: float = 0.05):
+        self._threshold_seconds = threshold_ms / 1000
+        self._interval_seconds = interval_seconds
+        self._beat = time.perf_counter()
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._reported_beat: float | None = None
+        self._last_lag_seconds = 0.0
+        self._max_lag_seconds = 0.0
+        self._stalls = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.perf_counter()
+            await asyncio.sleep(self._interval_seconds)
+            lag = time.perf_counter() - self._beat - self._interval_seconds
+            self._last_lag_seconds = max(lag, 0.0)
+            self._max_lag_seconds = max(self._max_lag_seconds, lag)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self._interval_seconds):
+            beat = self._beat
+            stalled = time.perf_counter() - beat - self._interval_seconds
+            if stalled < self._threshold_seconds or self._reported_beat == beat:
+                continue
+            # One report per stall, taken while the blocking call is running.
+            self._reported_beat = beat
+            self._stalls += 1
+            frame = sys._current_frames().get(self._loop_thread or 0)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logger.warning(
+                "event_loop_blocked",
+                extra={
+                    "event": "event_loop_blocked",
+                    "lag_ms": round(stalled * 1000, 1),
+                    "stack": stack,
+                },
+            )
+
+    def start(self) -> None:
+        """Start on the running loop; call from inside the loop (e.g. lifespan)."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self._interval_seconds + 1)
+            self._watchdog = None
+
+    def snapshot(self) -> dict[str, float | int]:
+        return {
+            "thresholdMs": round(self._threshold_seconds * 1000, 1),
+            "lastLagMs": round(self._last_lag_seconds * 1000, 2),
+            "maxLagMs": round(self._max_lag_seconds * 1000, 2),
+            "stalls": self._stalls,
+        }
+
+
+@lru_cache
+def get_loop_lag_monitor() -> LoopLagMonitor:
+    return LoopLagMonitor(threshold_ms=get_settings().loop_lag_threshold_ms)
@@ -0,0 +1,69 @@
+import logging
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsWatcher:
+    """Poll the env file and call ``on_change`` when it is modified.
+
+    Polling the mtime and size needs no extra dependency and costs one
+    ``stat`` per interval. A failing ``on_change`` is logged and the watcher
+    keeps running, so a bad edit can be fixed in place.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        interval_seconds: float,
+        on_change: Callable[[], object],
+    ):
+        self._path = Path(path)
+        self._interval_seconds = interval_seconds
+        self._on_change = on_change
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._signature = self._stat()
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = self._path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """Reload once if the file changed since the last check."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self._on_change()
+        except Exception:  # noqa: BLE001
+            logger.exception(
+                "settings_reload_failed", extra={"event": "settings_reload_failed"}
+            )
+            return False
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_seconds):
+            self.check()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="settings-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._interval_seconds + 1)
+            self._thread = None
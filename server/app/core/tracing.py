@@ -0,0 +1,405 @@
+"""Lightweight OpenTelemetry-compatible tracing.
+
+Spans nest through a context variable, so they follow a request into the
+threadpool and into parallel candidate workers (``copy_context``). Context is
+read from and written to W3C ``traceparent`` headers. Finished spans are
+exported in batches from a background thread; with no exporter configured
+every span is a shared no-op and tracing costs one attribute check.
+"""
+
+import functools
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, ParamSpec, TypeVar
+
+import httpx
+
+from app.core.config import Settings
+
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+SpanStatus = Literal["unset", "ok", "error"]
+AttributeValue = str | int | float | bool
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+    status: SpanStatus = "unset"
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: AttributeValue | None) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key.replace("__", "."), value)
+
+    def record_error(self, code: str) -> None:
+        self.status = "error"
+        self.attributes["error.code"] = code
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class _NoopSpan:
+    """Stand-in when tracing is off or the trace is not sampled."""
+
+    traceparent: str | None = None
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        pass
+
+    def set_attributes(self, **attributes: AttributeValue | None) -> None:
+        pass
+
+    def record_error(self, code: str) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+SpanLike = Span | _NoopSpan
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    def export(self, spans: list[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+def span_to_json(span: Span) -> dict[str, object]:
+    return {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_id,
+        "name": span.name,
+        "startTimeUnixNano": span.start_ns,
+        "durationMs": round(span.duration_ms, 3),
+        "status": span.status,
+        "attributes": span.attributes,
+    }
+
+
+class FileSpanExporter(SpanExporter):
+    """Append one JSON object per span; summarise with ``app.cli.traces``."""
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: list[Span]) -> None:
+        lines = "".join(json.dumps(span_to_json(span)) + "\n" for span in spans)
+        with self._path.open("a", encoding="utf-8") as handle:
+            handle.write(lines)
+
+
+def _otlp_value(value: AttributeValue) -> dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_OTLP_STATUS = {"unset": 0, "ok": 1, "error": 2}
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """POST spans as OTLP/JSON to a collector, e.g. ``:4318/v1/traces``."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout_seconds: float = 5.0):
+        self._endpoint = endpoint
+        self._service_name = service_name
+        self._client = httpx.Client(timeout=timeout_seconds)
+
+    def payload(self, spans: list[Span]) -> dict[str, object]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self._service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app.core.tracing"},
+                            "spans": [
+                                {
+                                    "traceId": span.trace_id,
+                                    "spanId": span.span_id,
+                                    "parentSpanId": span.parent_id or "",
+                                    "name": span.name,
+                                    "kind": 1,
+                                    "startTimeUnixNano": str(span.start_ns),
+                                    "endTimeUnixNano": str(
+                                        span.end_ns or span.start_ns
+                                    ),
+                                    "attributes": [
+                                        {"key": key, "value": _otlp_value(value)}
+                                        for key, value in span.attributes.items()
+                                    ],
+                                    "status": {"code": _OTLP_STATUS[span.status]},
+                                }
+                                for span in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def export(self, spans: list[Span]) -> None:
+        response = self._client.post(self._endpoint, json=self.payload(spans))
+        response.raise_for_status()
+
+    def shutdown(self) -> None:
+        self._client.close()
+
+
+class Tracer:
+    """Samples root spans and exports finished spans in background batches."""
+
+    def __init__(
+        self,
+        exporter: SpanExporter | None = None,
+        sample_ratio: float = 1.0,
+        batch_size: int = 256,
+        flush_interval_seconds: float = 2.0,
+        max_queue_size: int = 10000,
+    ):
+        self._exporter = exporter
+        self._sample_ratio = sample_ratio
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval_seconds
+        self._queue: queue.Queue[Span | None] = queue.Queue(maxsize=max_queue_size)
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._exporter is not None
+
+    def should_sample(self) -> bool:
+        return self._sample_ratio >= 1.0 or random.random() < self._sample_ratio
+
+    def finish(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def _start(self) -> None:
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._export_loop, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _export_loop(self) -> None:
+        running = True
+        while running:
+            item = self._queue.get()
+            batch: list[Span] = []
+            deadline = time.monotonic() + self._flush_interval
+            while True:
+                if item is None:
+                    running = False
+                else:
+                    batch.append(item)
+                if not running or len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get(
+                        timeout=max(deadline - time.monotonic(), 0.0)
+                    )
+                except queue.Empty:
+                    break
+            if batch and self._exporter is not None:
+                try:
+                    self._exporter.export(batch)
+                except Exception:  # noqa: BLE001
+                    logger.warning(
+                        "span_export_failed", extra={"event": "span_export_failed"}
+                    )
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=self._flush_interval + 5)
+            self._thread = None
+        if self._exporter is not None:
+            self._exporter.shutdown()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """Install ``tracer`` and return the previous one (which is not shut down)."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def build_tracer(settings: Settings) -> Tracer:
+    """Tracer for ``TRACING_EXPORTER``: ``none`` (default), ``file`` or ``otlp``."""
+    name = settings.tracing_exporter.strip().lower()
+    ratio = settings.tracing_sample_ratio
+    if name == "file":
+        return Tracer(FileSpanExporter(settings.tracing_file_path), sample_ratio=ratio)
+    if name == "otlp":
+        exporter = OtlpHttpSpanExporter(
+            settings.tracing_otlp_endpoint, settings.tracing_service_name
+        )
+        return Tracer(exporter, sample_ratio=ratio)
+    return Tracer()
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """``(trace_id, parent_span_id, sampled)`` from a W3C header, if valid."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def _new_id(length: int) -> str:
+    return f"{random.getrandbits(length * 4):0{length}x}"
+
+
+@contextmanager
+def start_request_span(
+    name: str, headers: Mapping[str, str], **attributes: AttributeValue | None
+) -> Iterator[SpanLike]:
+    """Root span for one request, continuing an incoming ``traceparent``."""
+    tracer = _tracer
+    if not tracer.enabled:
+        yield NOOP_SPAN
+        return
+    parent = parse_traceparent(headers.get(TRACEPARENT_HEADER))
+    sampled = parent[2] if parent else tracer.should_sample()
+    if not sampled:
+        yield NOOP_SPAN
+        return
+    root = Span(
+        name=name,
+        trace_id=parent[0] if parent else _new_id(32),
+        span_id=_new_id(16),
+        parent_id=parent[1] if parent else None,
+    )
+    root.set_attributes(**attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException:
+        root.status = "error"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.finish(root)
+
+
+@contextmanager
+def span(name: str, **attributes: AttributeValue | None) -> Iterator[SpanLike]:
+    """Child of the current span; a no-op outside a sampled trace.
+
+    Double underscores in keyword names become dots, so ``llm__model=...``
+    sets the ``llm.model`` attribute.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(
+        name=name,
+        trace_id=parent.trace_id,
+        span_id=_new_id(16),
+        parent_id=parent.span_id,
+    )
+    child.set_attributes(**attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException:
+        child.status = "error"
+        raise
+    finally:
+        _current_span.reset(token)
+        _tracer.finish(child)
+
+
+def trace_headers() -> dict[str, str]:
+    """Outgoing ``traceparent`` for upstream calls; empty outside a trace."""
+    current = _current_span.get()
+    if current is None:
+        return {}
+    return {TRACEPARENT_HEADER: current.traceparent}
+
+
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
+
+
+def traced(name: str) -> Callable[[Callable[_P, _R]], Callable[_P, _R]]:
+    """Decorator form of ``span`` for pure helpers such as prompt builders."""
+
+    def decorate(func: Callable[_P, _R]) -> Callable[_P, _R]:
+        @functools.wraps(func)
+        def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,177 @@
+"""Anonymised traffic recording for offline load replay.
+
+With ``TRAFFIC_RECORD_PATH`` set, every API request appends one JSON line:
+route template, anonymised body, status, server latency, its offset from the
+start of the recording, and each upstream provider attempt made while
+serving it (provider, model, latency, error code and output size). Free text
+is replaced by filler of the same length, so a recording holds no prompts or
+lyrics but keeps the payload sizes that drive token budgets.
+
+``app.services.traffic_replay`` serves the recorded upstream outcomes back as
+providers, and ``app.cli.replay`` drives a server with the recorded requests.
+"""
+
+import gzip
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import IO
+
+from app.core.config import get_settings
+
+
+RECORDED_PREFIXES = ("/api/song", "/api/history")
+# String values kept verbatim: they select behaviour, not content.
+KEPT_STRING_FIELDS = {"provider", "structure", "language", "voice", "fields"}
+FILLER = "x"
+
+
+@dataclass
+class UpstreamCall:
+    provider: str
+    model: str
+    operation: str
+    latency_ms: float
+    # ProviderErrorCode value for a failed attempt.
+    error: str | None = None
+    retryable: bool = False
+    # Character count of every output field, one dict per candidate.
+    outputs: list[dict[str, int]] = field(default_factory=list)
+    truncated: bool = False
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class TrafficEntry:
+    offset_s: float
+    method: str
+    route: str
+    # Pseudonymous client number, in order of first appearance.
+    client: int = 0
+    status: int = 0
+    duration_ms: float = 0.0
+    body: object = None
+    upstream: list[UpstreamCall] = field(default_factory=list)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "TrafficEntry":
+        data = json.loads(line)
+        data["upstream"] = [UpstreamCall(**call) for call in data.get("upstream", [])]
+        return cls(**data)
+
+
+_current_entry: ContextVar[TrafficEntry | None] = ContextVar(
+    "traffic_entry", default=None
+)
+_upstream_lock = threading.Lock()
+
+
+def anonymize(value: object, key: str | None = None) -> object:
+    """Replace free text with same-length filler; keep numbers and enums."""
+    if isinstance(value, dict):
+        return {name: anonymize(item, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return [anonymize(item, key) for item in value]
+    if isinstance(value, str) and key not in KEPT_STRING_FIELDS:
+        return FILLER * len(value)
+    return value
+
+
+def _open(path: Path) -> IO[str]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".gz":
+        return gzip.open(path, "at", encoding="utf-8")
+    return path.open("a", encoding="utf-8")
+
+
+def read_entries(path: str) -> Iterator[TrafficEntry]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield TrafficEntry.from_json(line)
+
+
+class TrafficRecorder:
+    """Appends ``TrafficEntry`` lines; a ``.gz`` path is written compressed.
+
+    Writes go through the file's buffer, so recording adds no disk I/O to
+    most requests. ``close`` flushes it.
+    """
+
+    def __init__(self, path: str):
+        self._handle = _open(Path(path))
+        self._started = time.monotonic()
+        self._clients: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def record(
+        self, method: str, route: str, client: str, body: bytes
+    ) -> Iterator[TrafficEntry]:
+        """Collect upstream calls for one request, then write its entry.
+
+        ``client`` is the admission identity; only its number is written.
+        The caller fills in ``route``, ``status`` and ``duration_ms``.
+        """
+        try:
+            decoded = anonymize(json.loads(body)) if body else None
+        except ValueError:
+            decoded = None
+        entry = TrafficEntry(
+            offset_s=round(time.monotonic() - self._started, 3),
+            method=method,
+            route=route,
+            client=self._client_number(client),
+            body=decoded,
+        )
+        token = _current_entry.set(entry)
+        try:
+            yield entry
+        finally:
+            _current_entry.reset(token)
+            self._write(entry)
+
+    def _client_number(self, client: str) -> int:
+        with self._lock:
+            return self._clients.setdefault(client, len(self._clients))
+
+    def _write(self, entry: TrafficEntry) -> None:
+        line = entry.to_json() + "\n"
+        with self._lock:
+            if not self._handle.closed:
+                self._handle.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle.close()
+
+
+def record_upstream(call: UpstreamCall) -> None:
+    """Attach one provider attempt to the request being recorded, if any."""
+    entry = _current_entry.get()
+    if entry is None:
+        return
+    # Candidate workers of one request may finish at the same time.
+    with _upstream_lock:
+        entry.upstream.append(call)
+
+
+def recording_upstream() -> bool:
+    return _current_entry.get() is not None
+
+
+@lru_cache
+def get_traffic_recorder() -> TrafficRecorder | None:
+    path = get_settings().traffic_record_path
+    return TrafficRecorder(path) if path else None
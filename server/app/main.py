@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
 from time import perf_counter
 from uuid import uuid4
@@ -12,14 +13,69 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api.routes.health import router as health_router
+from app.api.routes.history import router as history_router
+from app.api.routes.metrics import router as metrics_router
+from app.api.routes import song
+from app.api.routes.admin import router as admin_router
+from app.api.routes.batches import get_batch_runner
+from app.api.routes.batches import router as batches_router
+from app.api.routes.sessions import router as sessions_router
 from app.api.routes.song import router as song_router
+from app.core.admission import admission_identity
+from app.core.config import ENV_FILE, get_settings
+from app.core.idempotency import get_idempotency_store, idempotent_call
 from app.core.logging import setup_logging
+from app.core.profiler import get_loop_lag_monitor
+from app.core.settings_watcher import SettingsWatcher
+from app.core.traffic import RECORDED_PREFIXES, get_traffic_recorder
+from app.core.tracing import (
+    TRACEPARENT_HEADER,
+    build_tracer,
+    get_tracer,
+    set_tracer,
+    start_request_span,
+)
 
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Loofi Suno AI Generator API", version="1.0.0")
+set_tracer(build_tracer(get_settings()))
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # The first probe round warms provider connection pools; /api/ready stays
+    # 503 until it has finished.
+    prober = song.get_provider_prober()
+    prober.start()
+    loop_monitor = get_loop_lag_monitor()
+    if get_settings().loop_lag_threshold_ms > 0:
+        loop_monitor.start()
+    watcher = None
+    interval = get_settings().settings_watch_interval_seconds
+    if interval > 0:
+        watcher = SettingsWatcher(ENV_FILE, interval, song.reload_song_service)
+        watcher.start()
+    batch_runner = get_batch_runner()
+    batch_runner.start()
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        batch_runner.stop()
+        prober.stop()
+        loop_monitor.stop()
+        # Usage since the last periodic rollup would be lost on restart.
+        song.flush_song_service()
+        recorder = get_traffic_recorder()
+        if recorder is not None:
+            recorder.close()
+        get_tracer().shutdown()
+
+
+app = FastAPI(title="Loofi Suno AI Generator API", version="1.0.0", lifespan=lifespan)
 
 configured_origins = os.getenv("SUNO_CORS_ORIGINS", "").strip()
 default_origins = [
@@ -41,6 +97,11 @@ app.add_middleware(
 
 app.include_router(health_router)
 app.include_router(song_router)
+app.include_router(sessions_router)
+app.include_router(batches_router)
+app.include_router(history_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
 
 
 @app.middleware("http")
@@ -48,9 +109,41 @@ async def request_context_middleware(request: Request, call_next):
     request_id = request.headers.get("x-request-id") or uuid4().hex
     request.state.request_id = request_id
     start = perf_counter()
-    response = await call_next(request)
-    duration_ms = (perf_counter() - start) * 1000
+    recorder = get_traffic_recorder()
+    recording = (
+        recorder.record(
+            request.method,
+            request.url.path,
+            admission_identity(request),
+            await request.body(),
+        )
+        if recorder is not None and request.url.path.startswith(RECORDED_PREFIXES)
+        else nullcontext(None)
+    )
+    with recording as entry:
+        with start_request_span(
+            f"{request.method} {request.url.path}",
+            request.headers,
+            http__method=request.method,
+            http__target=request.url.path,
+            request_id=request_id,
+        ) as span:
+            response = await idempotent_call(
+                request, call_next, get_idempotency_store()
+            )
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.record_error(str(response.status_code))
+        duration_ms = (perf_counter() - start) * 1000
+        if entry is not None:
+            # The route template, so session and job ids stay out of the file.
+            route = request.scope.get("route")
+            entry.route = getattr(route, "path", request.url.path)
+            entry.status = response.status_code
+            entry.duration_ms = round(duration_ms, 2)
     response.headers["x-request-id"] = request_id
+    if span.traceparent:
+        response.headers[TRACEPARENT_HEADER] = span.traceparent
     logger.info(
         "request_complete",
         extra={
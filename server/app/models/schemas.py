@@ -1,10 +1,13 @@
-from typing import Literal
+from typing import Annotated, Any, Literal
 
 from pydantic import BaseModel, Field
 
 
-ProviderName = Literal["auto", "gemini", "openai"]
+# Provider names come from the provider registry, so they are validated by
+# shape here and resolved against the registry by the router.
+ProviderName = Annotated[str, Field(pattern=r"^[a-z][a-z0-9_-]*$", max_length=40)]
 StructureName = Literal["Auto", "Standard", "Pop", "Rap", "Ambient", "Custom"]
+PackField = Literal["title", "style", "lyrics", "explanation"]
 
 
 class GenerateRequest(BaseModel):
@@ -19,6 +22,36 @@ class GenerateRequest(BaseModel):
     provider: ProviderName = "auto"
     weirdness: int | None = Field(default=None, ge=0, le=100)
     styleInfluence: int | None = Field(default=None, ge=0, le=100)
+    variants: int = Field(default=1, ge=1, le=4)
+    # Pack keys to generate; the rest come back as empty strings. None = all.
+    fields: list[PackField] | None = Field(default=None, min_length=1)
+
+
+class SectionQuality(BaseModel):
+    tag: str
+    lines: int
+    avgSyllables: float | None = None
+    avgLineLength: float = 0.0
+
+
+class LyricQuality(BaseModel):
+    score: float
+    passed: bool
+    repaired: bool = False
+    issues: list[str] = Field(default_factory=list)
+    missingSections: list[str] = Field(default_factory=list)
+    duplicateLineRatio: float = 0.0
+    rhymeDensity: float = 0.0
+    languageMatch: bool | None = None
+    sections: list[SectionQuality] = Field(default_factory=list)
+
+
+class SongPack(BaseModel):
+    title: str
+    style: str
+    lyrics: str
+    explanation: str
+    quality: LyricQuality | None = None
 
 
 class GenerateResponse(BaseModel):
@@ -28,6 +61,10 @@ class GenerateResponse(BaseModel):
     explanation: str
     providerUsed: ProviderName
     modelUsed: str
+    packs: list[SongPack] = Field(default_factory=list)
+    quality: LyricQuality | None = None
+    # Set by tiered generation only: the fast draft or its refined version.
+    tier: Literal["draft", "refined"] | None = None
 
 
 class ExtendRequest(BaseModel):
@@ -44,7 +81,221 @@ class ExtendResponse(BaseModel):
     modelUsed: str
 
 
+class BatchJobRequest(BaseModel):
+    requests: list[GenerateRequest] = Field(min_length=1, max_length=1000)
+    provider: ProviderName = "auto"
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: Literal["queued", "submitted", "completed", "failed"]
+    result: GenerateResponse | None = None
+    error: str | None = None
+
+
+class BatchJobResponse(BaseModel):
+    jobId: str
+    provider: ProviderName
+    status: Literal["queued", "running", "completed"]
+    total: int
+    completed: int
+    failed: int
+    items: list[BatchItemResult] = Field(default_factory=list)
+
+
+class SessionCreateRequest(BaseModel):
+    topic: str = Field(min_length=1, max_length=500)
+    lyrics: str = ""
+    style: str = ""
+    language: str = "English"
+    provider: ProviderName = "auto"
+
+
+class LyricEdit(BaseModel):
+    """Replace ``lyrics[start:end]`` (character offsets) with ``text``."""
+
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+
+class SessionEditRequest(BaseModel):
+    baseVersion: int = Field(ge=0)
+    edits: list[LyricEdit] = Field(min_length=1, max_length=100)
+
+
+class SessionExtendRequest(BaseModel):
+    baseVersion: int | None = Field(default=None, ge=0)
+    provider: ProviderName | None = None
+
+
+class SessionState(BaseModel):
+    sessionId: str
+    version: int
+    length: int
+    extensions: int
+
+
+class SessionDocument(SessionState):
+    topic: str
+    style: str
+    language: str
+    provider: ProviderName
+    lyrics: str
+
+
+class SessionExtendResponse(ExtendResponse):
+    sessionId: str
+    version: int
+    length: int
+
+
+class ProviderRankingEntry(BaseModel):
+    provider: ProviderName
+    score: float
+    reason: str
+    ewmaLatencyMs: float | None = None
+    p95LatencyMs: float | None = None
+    errorRate: float = 0.0
+    samples: int = 0
+    costWeight: float = 1.0
+
+
+class RoutingExplanation(BaseModel):
+    policy: str
+    generate: list[ProviderRankingEntry] = Field(default_factory=list)
+    extend: list[ProviderRankingEntry] = Field(default_factory=list)
+
+
 class ProvidersResponse(BaseModel):
     configured: list[ProviderName]
     defaultProvider: ProviderName
     autoOrder: list[ProviderName]
+    routing: RoutingExplanation | None = None
+
+
+class UsageTotalsEntry(BaseModel):
+    provider: str
+    model: str
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    cost_usd: float
+
+
+class UsageHourlyEntry(UsageTotalsEntry):
+    hour: str
+
+
+class UsageResponse(BaseModel):
+    totals: list[UsageTotalsEntry]
+    hourly: list[UsageHourlyEntry]
+
+
+class SongHistoryEntry(BaseModel):
+    id: int
+    createdAt: float
+    kind: Literal["generate", "extend"]
+    providerUsed: str
+    modelUsed: str
+    latencyMs: float
+    topic: str
+    genre: str = ""
+    mood: str = ""
+    structure: str = ""
+    language: str = ""
+    title: str = ""
+    style: str = ""
+    lyrics: str = ""
+    explanation: str = ""
+    request: dict[str, Any] = Field(default_factory=dict)
+    response: dict[str, Any] = Field(default_factory=dict)
+
+
+class SongHistoryResponse(BaseModel):
+    items: list[SongHistoryEntry]
+    nextCursor: str | None = None
+
+
+class ProviderProbe(BaseModel):
+    provider: str
+    status: Literal["pending", "ok", "error"]
+    latencyMs: float | None = None
+    error: str | None = None
+    checkedAt: float | None = None
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    warm: bool
+    providers: list[ProviderProbe] = Field(default_factory=list)
+
+
+class ReloadResponse(BaseModel):
+    changed: list[str] = Field(default_factory=list)
+    restartRequired: list[str] = Field(default_factory=list)
+    configured: list[str] = Field(default_factory=list)
+    providers: list[ProviderProbe] = Field(default_factory=list)
+
+
+class AdmissionClientStats(BaseModel):
+    client: str
+    weight: float
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+
+
+class AdmissionStats(BaseModel):
+    active: int
+    queued: int
+    maxConcurrency: int
+    maxQueue: int
+    admitted: int
+    rejected: int
+    timedOut: int
+    avgWaitMs: float
+    avgServiceMs: float
+    clients: list[AdmissionClientStats] = Field(default_factory=list)
+
+
+class ConcurrencyStats(BaseModel):
+    limit: int
+    inflight: int
+    baselineLatencyMs: float
+    accepted: int
+    shed: dict[str, int] = Field(default_factory=dict)
+
+
+class SessionStats(BaseModel):
+    sessions: int
+    bytes: int
+    evicted: int
+
+
+class EventLoopStats(BaseModel):
+    thresholdMs: float
+    lastLagMs: float
+    maxLagMs: float
+    stalls: int
+
+
+class SpeculationStats(BaseModel):
+    scheduled: int
+    hits: int
+    discarded: int
+    skipped: int
+    pending: int
+    hitRate: float
+    wastedTokens: int
+    wastedCostUsd: float
+
+
+class MetricsResponse(BaseModel):
+    admission: AdmissionStats
+    concurrency: ConcurrencyStats
+    sessions: SessionStats
+    eventLoop: EventLoopStats | None = None
+    speculation: SpeculationStats | None = None
@@ -1,14 +1,46 @@
+import re
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
 from enum import Enum
 
+from app.core.deadline import current_deadline
+from app.core.tracing import SpanLike
 from app.models.schemas import GenerateRequest
 
 
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def __add__(self, other: "TokenUsage | None") -> "TokenUsage":
+        if other is None:
+            return self
+        return TokenUsage(
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            cached_tokens=self.cached_tokens + other.cached_tokens,
+        )
+
+    __radd__ = __add__
+
+
 @dataclass
 class ProviderResult:
     provider_name: str
     model_name: str
+    usage: TokenUsage | None = field(default=None, kw_only=True)
+    # True when the output hit the token budget and was repaired locally.
+    truncated: bool = field(default=False, kw_only=True)
 
 
 @dataclass
@@ -17,6 +49,9 @@ class GenerateProviderResult(ProviderResult):
     style: str
     lyrics: str
     explanation: str
+    # Staged generation: one result per upstream stage call, each billed to
+    # its own provider and model. ``usage`` stays None on the merged pack.
+    stages: list[ProviderResult] = field(default_factory=list, kw_only=True)
 
 
 @dataclass
@@ -24,12 +59,38 @@ class ExtendProviderResult(ProviderResult):
     added_lyrics: str
 
 
+@dataclass
+class BatchItemOutput:
+    """Raw reply for one request of a provider batch."""
+
+    model_name: str
+    text: str | None = None
+    truncated: bool = False
+    usage: TokenUsage | None = None
+    error: str | None = None
+
+
+@dataclass
+class BatchPoll:
+    """State of a submitted batch.
+
+    ``outputs`` is filled once ``done``, keyed by the ids given at submission.
+    Ids missing from it got no reply; ``error`` says why when the whole
+    batch failed or expired.
+    """
+
+    done: bool
+    outputs: dict[str, BatchItemOutput] = field(default_factory=dict)
+    error: str | None = None
+
+
 class ProviderErrorCode(str, Enum):
     CONFIGURATION = "configuration"
     AUTH = "auth"
     QUOTA = "quota"
     RATE_LIMIT = "rate_limit"
     TIMEOUT = "timeout"
+    DEADLINE = "deadline"
     NETWORK = "network"
     INVALID_RESPONSE = "invalid_response"
     UNKNOWN = "unknown"
@@ -48,6 +109,55 @@ class ProviderError(Exception):
         self.retryable = retryable
 
 
+_prompt_cache_key: ContextVar[str | None] = ContextVar("prompt_cache_key", default=None)
+
+
+def current_prompt_cache_key() -> str | None:
+    return _prompt_cache_key.get()
+
+
+@contextmanager
+def use_prompt_cache_key(key: str | None) -> Iterator[str | None]:
+    """Group upstream calls that share a prompt prefix, e.g. one song session.
+
+    Providers with keyed prompt caching route calls with the same key to the
+    same cache; the others rely on the prefix alone.
+    """
+    token = _prompt_cache_key.set(key)
+    try:
+        yield key
+    finally:
+        _prompt_cache_key.reset(token)
+
+
+def trace_usage(span: SpanLike, usage: TokenUsage | None) -> None:
+    """Copy token counts onto an ``llm.call`` span."""
+    if usage is not None:
+        span.set_attributes(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+        )
+
+
+def deadline_timeout(provider_label: str, retry: bool = False) -> float | None:
+    """Timeout for the next upstream call under the current request deadline.
+
+    Returns None when no deadline is active. Raises a DEADLINE error when the
+    budget is spent, or for retries when it cannot cover a typical call.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    if deadline.expired or (retry and not deadline.allows_attempt()):
+        raise ProviderError(
+            f"{provider_label} call skipped: request deadline exceeded.",
+            code=ProviderErrorCode.DEADLINE,
+            retryable=False,
+        )
+    return deadline.remaining()
+
+
 def classify_exception(exc: Exception) -> tuple[ProviderErrorCode, bool]:
     text = str(exc).lower()
     if any(
@@ -72,15 +182,178 @@ def classify_exception(exc: Exception) -> tuple[ProviderErrorCode, bool]:
     return ProviderErrorCode.UNKNOWN, False
 
 
+_REJECTION_TOKENS = (
+    "400",
+    "not supported",
+    "unsupported",
+    "invalid",
+    "unrecognized",
+    "unknown parameter",
+)
+
+
+def rejects_parameter(exc: ProviderError, *names: str) -> bool:
+    """Whether ``exc`` is the upstream refusing one of the named parameters.
+
+    Only a request error that names the parameter counts, so transient
+    failures never look like a missing capability.
+    """
+    text = exc.message.lower()
+    if not any(token in text for token in _REJECTION_TOKENS):
+        return False
+    return any(
+        re.search(rf"(?<!\w){re.escape(name.lower())}(?!\w)", text) for name in names
+    )
+
+
 class BaseLlmProvider(ABC):
     provider_name: str
+    # False for providers that answer locally and need no deadline budget.
+    requires_upstream: bool = True
+    # True for providers with an asynchronous batch API (``submit_batch``).
+    supports_batch: bool = False
 
     @abstractmethod
     def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
         raise NotImplementedError
 
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        """Return ``count`` alternative packs for the same request.
+
+        Providers that can sample several candidates from one upstream call
+        override this. The default issues ``count`` parallel calls.
+        """
+        return generate_packs_in_parallel(self, payload, count)
+
+    def generate_instrumental(
+        self, payload: GenerateRequest, count: int = 1
+    ) -> list[GenerateProviderResult]:
+        """Instrumental fast path: the model only writes title and arrangement.
+
+        Providers without a dedicated prompt fall back to full generation.
+        """
+        if count > 1:
+            return self.generate_packs(payload, count)
+        return [self.generate_pack(payload)]
+
     @abstractmethod
     def extend_lyrics(
         self, current_lyrics: str, topic: str, style: str, language: str
     ) -> ExtendProviderResult:
         raise NotImplementedError
+
+    def probe(self, timeout_seconds: float) -> None:
+        """Cheap upstream check for the readiness prober; raises ProviderError.
+
+        Upstream providers override this with a call that costs no tokens and
+        opens a pooled connection. Local providers have nothing to check.
+        """
+
+    def complete_text(
+        self,
+        system_instruction: str,
+        user_prompt: str,
+        max_tokens: int,
+        label: str,
+        model: str | None = None,
+        json_output: bool = False,
+    ) -> ExtendProviderResult:
+        """One free-form completion, used by the stages of staged generation.
+
+        ``model`` overrides the configured model for this call; ``json_output``
+        asks for a JSON object. Providers without support raise CONFIGURATION.
+        """
+        raise ProviderError(
+            f"{self.provider_name} does not support staged generation",
+            code=ProviderErrorCode.CONFIGURATION,
+        )
+
+    def repair_lyrics(
+        self,
+        payload: GenerateRequest,
+        lyrics: str,
+        issues: list[str],
+        missing_sections: list[str],
+        rewrite: bool,
+    ) -> ExtendProviderResult:
+        """Targeted fix after the local quality gate, returned as plain text.
+
+        Without ``rewrite`` only the missing sections come back; with it, the
+        full corrected lyrics. Providers without support raise CONFIGURATION.
+        """
+        raise ProviderError(
+            f"{self.provider_name} does not support lyric repair",
+            code=ProviderErrorCode.CONFIGURATION,
+        )
+
+    def with_model(self, model_name: str) -> "BaseLlmProvider":
+        """This provider with another model on the same client.
+
+        Used for the draft tier of tiered generation. Providers without a
+        model choice return themselves.
+        """
+        return self
+
+    def refine_pack(
+        self, payload: GenerateRequest, draft: GenerateProviderResult
+    ) -> GenerateProviderResult:
+        """Improve a draft pack; the reply is a full pack like ``generate_pack``.
+
+        Providers without support raise CONFIGURATION.
+        """
+        raise ProviderError(
+            f"{self.provider_name} does not support draft refinement",
+            code=ProviderErrorCode.CONFIGURATION,
+        )
+
+    def submit_batch(self, items: list[tuple[str, GenerateRequest]]) -> str:
+        """Submit ``(id, payload)`` generate requests as one deferred batch.
+
+        Returns the provider's batch id. Providers without a batch API raise
+        CONFIGURATION.
+        """
+        raise ProviderError(
+            f"{self.provider_name} does not support batch generation",
+            code=ProviderErrorCode.CONFIGURATION,
+        )
+
+    def poll_batch(self, batch_id: str, item_ids: list[str]) -> BatchPoll:
+        """Check a submitted batch; ``item_ids`` are in submission order."""
+        raise ProviderError(
+            f"{self.provider_name} does not support batch generation",
+            code=ProviderErrorCode.CONFIGURATION,
+        )
+
+
+def generate_packs_in_parallel(
+    provider: "BaseLlmProvider",
+    payload: GenerateRequest,
+    count: int,
+    call: Callable[[GenerateRequest], GenerateProviderResult] | None = None,
+) -> list[GenerateProviderResult]:
+    """Run ``count`` single-candidate calls concurrently.
+
+    ``call`` defaults to ``provider.generate_pack``.
+    """
+    call = call or provider.generate_pack
+    if count <= 0:
+        return []
+    if count == 1:
+        return [call(payload)]
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        # Each worker gets its own copy of the request context (deadline, ...).
+        futures = [
+            executor.submit(copy_context().run, call, payload) for _ in range(count)
+        ]
+        results: list[GenerateProviderResult] = []
+        first_error: ProviderError | None = None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except ProviderError as exc:
+                first_error = first_error or exc
+    if not results and first_error:
+        raise first_error
+    return results
@@ -1,68 +1,295 @@
+import copy
 import json
 
 from google import genai
 
+from app.core.tracing import span, trace_headers
 from app.models.schemas import GenerateRequest
 from app.providers.base import (
     BaseLlmProvider,
+    BatchItemOutput,
+    BatchPoll,
     ExtendProviderResult,
     GenerateProviderResult,
     ProviderErrorCode,
     ProviderError,
+    TokenUsage,
     classify_exception,
+    deadline_timeout,
+    generate_packs_in_parallel,
+    rejects_parameter,
+    trace_usage,
 )
-from app.services.prompt_builder import build_extend_messages, build_generation_messages
-from app.services.prompt_builder import sanitize_style_prompt
+from app.providers.parsing import (
+    parse_instrumental_fields,
+    parse_pack_fields,
+    parse_truncated_pack_fields,
+    trim_partial_line,
+)
+from app.services.prompt_builder import (
+    INSTRUMENTAL_FAST_OUTPUT_TOKENS,
+    PACK_FIELDS,
+    build_extend_messages,
+    build_generation_messages,
+    build_instrumental_messages,
+    build_refine_messages,
+    build_repair_messages,
+    compute_extend_budget,
+    compute_output_budget,
+    compute_repair_budget,
+)
+
+
+def _http_options(
+    timeout_seconds: float | None, headers: dict[str, str] | None = None
+) -> dict[str, object]:
+    options: dict[str, object] = {}
+    if timeout_seconds is not None:
+        # google-genai expects the per-request timeout in milliseconds.
+        options["timeout"] = max(int(timeout_seconds * 1000), 1)
+    if headers:
+        options["headers"] = headers
+    return options
+
+
+def _usage_from_response(response) -> TokenUsage | None:
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return None
+    # Thinking tokens are billed as output tokens.
+    completion = (getattr(metadata, "candidates_token_count", 0) or 0) + (
+        getattr(metadata, "thoughts_token_count", 0) or 0
+    )
+    return TokenUsage(
+        prompt_tokens=getattr(metadata, "prompt_token_count", 0) or 0,
+        completion_tokens=completion,
+        cached_tokens=getattr(metadata, "cached_content_token_count", 0) or 0,
+    )
+
+
+def _hit_token_limit(candidate) -> bool:
+    reason = getattr(candidate, "finish_reason", None)
+    return getattr(reason, "name", str(reason)) == "MAX_TOKENS"
+
+
+def _candidate_texts(response) -> list[tuple[str, bool]]:
+    """Text and a hit-the-token-limit flag for every candidate."""
+    candidates = getattr(response, "candidates", None) or []
+    texts: list[tuple[str, bool]] = []
+    for candidate in candidates:
+        content = getattr(candidate, "content", None)
+        parts = getattr(content, "parts", None) or []
+        text = "".join(
+            part.text
+            for part in parts
+            if getattr(part, "text", None) and not getattr(part, "thought", False)
+        )
+        texts.append((text, _hit_token_limit(candidate)))
+    if not texts:
+        texts.append((response.text or "", False))
+    return texts
+
+
+_BATCH_SUCCEEDED_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+_BATCH_FAILED_STATES = {
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
 
 
-def _clean_json(text: str | None) -> str:
-    if not text:
-        return "{}"
-    cleaned = text.strip()
-    if cleaned.startswith("```json"):
-        cleaned = cleaned[7:]
-    elif cleaned.startswith("```"):
-        cleaned = cleaned[3:]
-    if cleaned.endswith("```"):
-        cleaned = cleaned[:-3]
-    return cleaned.strip()
+def _batch_output(inlined, model_name: str) -> BatchItemOutput:
+    error = getattr(inlined, "error", None)
+    response = getattr(inlined, "response", None)
+    if error is not None or response is None:
+        message = getattr(error, "message", None)
+        return BatchItemOutput(model_name, error=message or "Batch request failed.")
+    text, truncated = _candidate_texts(response)[0]
+    return BatchItemOutput(
+        model_name, text=text, truncated=truncated, usage=_usage_from_response(response)
+    )
 
 
 class GeminiProvider(BaseLlmProvider):
     provider_name = "gemini"
+    supports_batch = True
 
     def __init__(self, api_key: str, model_name: str):
         self._client = genai.Client(api_key=api_key)
         self._model_name = model_name
+        self._native_candidates = True
 
     def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
-        system_instruction, user_prompt = build_generation_messages(payload)
+        return self._generate(payload, count=1)[0]
+
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        if count <= 1 or not self._native_candidates:
+            return generate_packs_in_parallel(self, payload, count)
+        try:
+            results = self._generate(payload, count=count)
+        except ProviderError as exc:
+            if exc.code != ProviderErrorCode.UNKNOWN:
+                raise
+            # Not every Gemini model accepts candidate_count > 1. Only an
+            # explicit rejection is remembered; any other failure falls back
+            # for this request alone.
+            if rejects_parameter(exc, "candidate_count", "candidateCount"):
+                self._native_candidates = False
+            return generate_packs_in_parallel(self, payload, count)
+        if len(results) < count:
+            results.extend(
+                generate_packs_in_parallel(self, payload, count - len(results))
+            )
+        return results
+
+    def probe(self, timeout_seconds: float) -> None:
+        try:
+            # Model metadata costs no tokens and leaves a warm pooled connection.
+            self._client.models.get(
+                model=self._model_name,
+                config={"http_options": _http_options(timeout_seconds)},
+            )
+        except Exception as exc:  # noqa: BLE001
+            code, retryable = classify_exception(exc)
+            raise ProviderError(
+                f"Gemini probe failed: {exc}",
+                code=code,
+                retryable=retryable,
+            ) from exc
+
+    def generate_instrumental(
+        self, payload: GenerateRequest, count: int = 1
+    ) -> list[GenerateProviderResult]:
+        def single(item: GenerateRequest) -> GenerateProviderResult:
+            return self._generate(item, count=1, instrumental=True)[0]
+
+        results: list[GenerateProviderResult] = []
+        if count > 1 and self._native_candidates:
+            try:
+                results = self._generate(payload, count=count, instrumental=True)
+            except ProviderError as exc:
+                if exc.code != ProviderErrorCode.UNKNOWN:
+                    raise
+                if rejects_parameter(exc, "candidate_count", "candidateCount"):
+                    self._native_candidates = False
+        if len(results) < count:
+            results.extend(
+                generate_packs_in_parallel(
+                    self, payload, count - len(results), call=single
+                )
+            )
+        return results
+
+    def with_model(self, model_name: str) -> "GeminiProvider":
+        clone = copy.copy(self)
+        clone._model_name = model_name
+        return clone
+
+    def refine_pack(
+        self, payload: GenerateRequest, draft: GenerateProviderResult
+    ) -> GenerateProviderResult:
+        fields = {name: getattr(draft, name) for name in PACK_FIELDS}
+        messages = build_refine_messages(payload, fields)
+        return self._generate(payload, count=1, messages=messages)[0]
+
+    def _generate(
+        self,
+        payload: GenerateRequest,
+        count: int,
+        instrumental: bool = False,
+        messages: tuple[str, str] | None = None,
+    ) -> list[GenerateProviderResult]:
+        if messages is not None:
+            system_instruction, user_prompt = messages
+            max_tokens = compute_output_budget(payload)
+            parse_fields = parse_pack_fields
+        elif instrumental:
+            system_instruction, user_prompt = build_instrumental_messages(payload)
+            max_tokens = INSTRUMENTAL_FAST_OUTPUT_TOKENS
+            parse_fields = parse_instrumental_fields
+        else:
+            system_instruction, user_prompt = build_generation_messages(payload)
+            max_tokens = compute_output_budget(payload)
+            parse_fields = parse_pack_fields
+        spent = TokenUsage()
         for attempt in range(2):
             try:
-                response = self._client.models.generate_content(
+                timeout = deadline_timeout("Gemini", retry=attempt > 0)
+                config: dict[str, object] = {
+                    "system_instruction": system_instruction,
+                    "response_mime_type": "application/json",
+                    "max_output_tokens": max_tokens,
+                }
+                if count > 1:
+                    config["candidate_count"] = count
+                with span(
+                    "llm.call",
+                    provider=self.provider_name,
                     model=self._model_name,
-                    contents=user_prompt,
-                    config={
-                        "system_instruction": system_instruction,
-                        "response_mime_type": "application/json",
-                    },
-                )
-                raw_text = response.text
-                if not raw_text:
+                    attempt=attempt,
+                    max_tokens=max_tokens,
+                    candidates=count,
+                ) as call_span:
+                    http_options = _http_options(timeout, trace_headers())
+                    if http_options:
+                        config["http_options"] = http_options
+                    response = self._client.models.generate_content(
+                        model=self._model_name,
+                        contents=user_prompt,
+                        config=config,
+                    )
+                    usage = _usage_from_response(response)
+                    trace_usage(call_span, usage)
+                spent += usage
+                results: list[GenerateProviderResult] = []
+                decode_error: json.JSONDecodeError | None = None
+                hit_budget = False
+                with span("response.parse"):
+                    for raw_text, truncated in _candidate_texts(response):
+                        if not raw_text:
+                            continue
+                        try:
+                            fields = parse_fields(raw_text, payload)
+                        except json.JSONDecodeError as exc:
+                            repaired = (
+                                parse_truncated_pack_fields(raw_text, payload)
+                                if truncated and not instrumental
+                                else None
+                            )
+                            if repaired is None:
+                                hit_budget = hit_budget or truncated
+                                decode_error = decode_error or exc
+                                continue
+                            fields = repaired
+                        results.append(
+                            GenerateProviderResult(
+                                provider_name=self.provider_name,
+                                model_name=self._model_name,
+                                truncated=truncated,
+                                **fields,
+                            )
+                        )
+                if results:
+                    # One upstream call served every candidate (and any
+                    # re-prompt before it); bill it to the first result.
+                    results[0].usage = spent
+                    return results
+                if hit_budget:
+                    # Nothing salvageable: retry once with a larger budget.
+                    max_tokens *= 2
                     raise ProviderError(
-                        "Gemini returned an empty response.",
+                        "Gemini output hit the token budget.",
                         code=ProviderErrorCode.INVALID_RESPONSE,
                         retryable=True,
                     )
-                parsed = json.loads(_clean_json(raw_text))
-                style = sanitize_style_prompt(str(parsed.get("style", "")), payload)
-                return GenerateProviderResult(
-                    provider_name=self.provider_name,
-                    model_name=self._model_name,
-                    title=str(parsed.get("title", "Untitled")),
-                    style=style,
-                    lyrics=str(parsed.get("lyrics", "")),
-                    explanation=str(parsed.get("explanation", "")),
+                if decode_error:
+                    raise decode_error
+                raise ProviderError(
+                    "Gemini returned an empty response.",
+                    code=ProviderErrorCode.INVALID_RESPONSE,
+                    retryable=True,
                 )
             except json.JSONDecodeError as exc:
                 if attempt == 0:
@@ -98,29 +325,140 @@ class GeminiProvider(BaseLlmProvider):
             retryable=True,
         )
 
+    def submit_batch(self, items: list[tuple[str, GenerateRequest]]) -> str:
+        requests = []
+        for _, payload in items:
+            system_instruction, user_prompt = build_generation_messages(payload)
+            requests.append(
+                {
+                    "contents": [{"role": "user", "parts": [{"text": user_prompt}]}],
+                    "config": {
+                        "system_instruction": system_instruction,
+                        "response_mime_type": "application/json",
+                        "max_output_tokens": compute_output_budget(payload),
+                    },
+                }
+            )
+        try:
+            with span(
+                "llm.batch_submit",
+                provider=self.provider_name,
+                model=self._model_name,
+                requests=len(items),
+            ):
+                job = self._client.batches.create(model=self._model_name, src=requests)
+        except Exception as exc:  # noqa: BLE001
+            code, retryable = classify_exception(exc)
+            raise ProviderError(
+                f"Gemini batch submission failed: {exc}",
+                code=code,
+                retryable=retryable,
+            ) from exc
+        return job.name
+
+    def poll_batch(self, batch_id: str, item_ids: list[str]) -> BatchPoll:
+        try:
+            job = self._client.batches.get(name=batch_id)
+        except Exception as exc:  # noqa: BLE001
+            code, retryable = classify_exception(exc)
+            raise ProviderError(
+                f"Gemini batch poll failed: {exc}",
+                code=code,
+                retryable=retryable,
+            ) from exc
+        state = getattr(job.state, "name", str(job.state))
+        if state in _BATCH_FAILED_STATES:
+            message = getattr(job.error, "message", None)
+            return BatchPoll(
+                done=True,
+                error=f"Gemini batch {state}" + (f": {message}" if message else "."),
+            )
+        if state not in _BATCH_SUCCEEDED_STATES:
+            return BatchPoll(done=False)
+        # Inline replies come back in submission order.
+        inlined = getattr(job.dest, "inlined_responses", None) or []
+        return BatchPoll(
+            done=True,
+            outputs={
+                item_id: _batch_output(reply, self._model_name)
+                for item_id, reply in zip(item_ids, inlined)
+            },
+        )
+
     def extend_lyrics(
         self, current_lyrics: str, topic: str, style: str, language: str
     ) -> ExtendProviderResult:
         system_instruction, user_prompt = build_extend_messages(
             current_lyrics, topic, style, language
         )
+        return self.complete_text(
+            system_instruction, user_prompt, compute_extend_budget(language), "extend"
+        )
+
+    def repair_lyrics(
+        self,
+        payload: GenerateRequest,
+        lyrics: str,
+        issues: list[str],
+        missing_sections: list[str],
+        rewrite: bool,
+    ) -> ExtendProviderResult:
+        system_instruction, user_prompt = build_repair_messages(
+            payload, lyrics, issues, missing_sections, rewrite
+        )
+        budget = compute_repair_budget(payload, missing_sections, rewrite)
+        return self.complete_text(system_instruction, user_prompt, budget, "repair")
+
+    def complete_text(
+        self,
+        system_instruction: str,
+        user_prompt: str,
+        max_tokens: int,
+        label: str,
+        model: str | None = None,
+        json_output: bool = False,
+    ) -> ExtendProviderResult:
+        model_name = model or self._model_name
         try:
-            response = self._client.models.generate_content(
-                model=self._model_name,
-                contents=user_prompt,
-                config={"system_instruction": system_instruction},
-            )
+            timeout = deadline_timeout("Gemini")
+            config: dict[str, object] = {
+                "system_instruction": system_instruction,
+                "max_output_tokens": max_tokens,
+            }
+            if json_output:
+                config["response_mime_type"] = "application/json"
+            with span(
+                "llm.call",
+                provider=self.provider_name,
+                model=model_name,
+                operation=label,
+                max_tokens=max_tokens,
+            ) as call_span:
+                http_options = _http_options(timeout, trace_headers())
+                if http_options:
+                    config["http_options"] = http_options
+                response = self._client.models.generate_content(
+                    model=model_name,
+                    contents=user_prompt,
+                    config=config,
+                )
+                usage = _usage_from_response(response)
+                trace_usage(call_span, usage)
+            text = (response.text or "").strip()
+            truncated = any(flag for _, flag in _candidate_texts(response))
             return ExtendProviderResult(
                 provider_name=self.provider_name,
-                model_name=self._model_name,
-                added_lyrics=(response.text or "").strip(),
+                model_name=model_name,
+                added_lyrics=trim_partial_line(text) if truncated else text,
+                usage=usage,
+                truncated=truncated,
             )
         except ProviderError:
             raise
         except Exception as exc:  # noqa: BLE001
             code, retryable = classify_exception(exc)
             raise ProviderError(
-                f"Gemini extend failed: {exc}",
+                f"Gemini {label} failed: {exc}",
                 code=code,
                 retryable=retryable,
             ) from exc
@@ -0,0 +1,44 @@
+import httpx
+from openai import OpenAI
+
+from app.providers.openai_provider import OpenAiProvider
+
+
+class LocalOpenAiProvider(OpenAiProvider):
+    """Any OpenAI-compatible endpoint: llama.cpp server, vLLM, Ollama, ..."""
+
+    provider_name = "local"
+    _max_tokens_param = "max_tokens"
+    # Local servers cache by prefix on their own and may reject unknown fields.
+    _prompt_cache_keys = False
+    supports_batch = False
+
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str,
+        api_key: str | None = None,
+        timeout_seconds: float = 30.0,
+        max_connections: int = 20,
+    ):
+        http_client = httpx.Client(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        # Local servers usually ignore the key, but the SDK requires one.
+        self._client = OpenAI(
+            api_key=api_key or "local",
+            base_url=base_url,
+            timeout=timeout_seconds,
+            max_retries=0,
+            http_client=http_client,
+        )
+        self._model_name = model_name
+        self._native_candidates = True
+
+    def _probe(self, timeout_seconds: float) -> None:
+        # Local servers do not all serve model lookups by id, but all list them.
+        self._client.models.list(timeout=timeout_seconds)
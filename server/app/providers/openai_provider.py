@@ -1,55 +1,280 @@
+import copy
 import json
 
-from openai import OpenAI
+from openai import NOT_GIVEN, OpenAI
+from openai.types.chat import ChatCompletion
 
+from app.core.tracing import span, trace_headers
 from app.models.schemas import GenerateRequest
 from app.providers.base import (
     BaseLlmProvider,
+    BatchItemOutput,
+    BatchPoll,
     ExtendProviderResult,
     GenerateProviderResult,
     ProviderErrorCode,
     ProviderError,
+    TokenUsage,
     classify_exception,
+    current_prompt_cache_key,
+    deadline_timeout,
+    generate_packs_in_parallel,
+    rejects_parameter,
+    trace_usage,
 )
-from app.services.prompt_builder import build_extend_messages, build_generation_messages
-from app.services.prompt_builder import sanitize_style_prompt
+from app.providers.parsing import (
+    parse_instrumental_fields,
+    parse_pack_fields,
+    parse_truncated_pack_fields,
+    trim_partial_line,
+)
+from app.services.prompt_builder import (
+    INSTRUMENTAL_FAST_OUTPUT_TOKENS,
+    PACK_FIELDS,
+    build_extend_messages,
+    build_generation_messages,
+    build_instrumental_messages,
+    build_refine_messages,
+    build_repair_messages,
+    compute_extend_budget,
+    compute_output_budget,
+    compute_repair_budget,
+)
+
+
+def _usage_from_response(response) -> TokenUsage | None:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return TokenUsage(
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+    )
+
+
+# Batch states after which no more output will come.
+_BATCH_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _batch_output(line: dict[str, object], model_name: str) -> BatchItemOutput:
+    """Decode one line of a Batch API output or error file."""
+    response = line.get("response") or {}
+    error = line.get("error")
+    if error or response.get("status_code") != 200:
+        body = response.get("body") or {}
+        detail = error or body.get("error") or {}
+        message = detail.get("message") if isinstance(detail, dict) else detail
+        return BatchItemOutput(
+            model_name, error=str(message or "Batch request failed.")
+        )
+    try:
+        completion = ChatCompletion.model_validate(response.get("body"))
+    except ValueError as exc:
+        return BatchItemOutput(model_name, error=f"Unreadable batch reply: {exc}")
+    if not completion.choices:
+        return BatchItemOutput(model_name, usage=_usage_from_response(completion))
+    choice = completion.choices[0]
+    return BatchItemOutput(
+        model_name,
+        text=choice.message.content,
+        truncated=choice.finish_reason == "length",
+        usage=_usage_from_response(completion),
+    )
 
 
 class OpenAiProvider(BaseLlmProvider):
     provider_name = "openai"
+    # Output cap parameter; OpenAI-compatible servers may only know max_tokens.
+    _max_tokens_param = "max_completion_tokens"
+    # OpenAI routes calls with the same ``prompt_cache_key`` to the same cache.
+    _prompt_cache_keys = True
+    supports_batch = True
 
     def __init__(self, api_key: str, model_name: str):
         self._client = OpenAI(api_key=api_key)
         self._model_name = model_name
+        self._native_candidates = True
 
     def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
-        system_instruction, user_prompt = build_generation_messages(payload)
+        return self._generate(payload, count=1)[0]
+
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        if count <= 1 or not self._native_candidates:
+            return generate_packs_in_parallel(self, payload, count)
+        try:
+            results = self._generate(payload, count=count)
+        except ProviderError as exc:
+            if exc.code != ProviderErrorCode.UNKNOWN:
+                raise
+            # Some models reject ``n`` > 1. Only an explicit rejection is
+            # remembered; any other failure falls back for this request alone.
+            if rejects_parameter(exc, "n"):
+                self._native_candidates = False
+            return generate_packs_in_parallel(self, payload, count)
+        if len(results) < count:
+            results.extend(
+                generate_packs_in_parallel(self, payload, count - len(results))
+            )
+        return results
+
+    def _cache_key_param(self) -> dict[str, str]:
+        key = current_prompt_cache_key()
+        if key is None or not self._prompt_cache_keys:
+            return {}
+        return {"prompt_cache_key": key}
+
+    def probe(self, timeout_seconds: float) -> None:
+        try:
+            self._probe(timeout_seconds)
+        except Exception as exc:  # noqa: BLE001
+            code, retryable = classify_exception(exc)
+            raise ProviderError(
+                f"{self.provider_name} probe failed: {exc}",
+                code=code,
+                retryable=retryable,
+            ) from exc
+
+    def _probe(self, timeout_seconds: float) -> None:
+        # Model metadata costs no tokens and leaves a warm pooled connection.
+        self._client.models.retrieve(self._model_name, timeout=timeout_seconds)
+
+    def generate_instrumental(
+        self, payload: GenerateRequest, count: int = 1
+    ) -> list[GenerateProviderResult]:
+        def single(item: GenerateRequest) -> GenerateProviderResult:
+            return self._generate(item, count=1, instrumental=True)[0]
+
+        results: list[GenerateProviderResult] = []
+        if count > 1 and self._native_candidates:
+            try:
+                results = self._generate(payload, count=count, instrumental=True)
+            except ProviderError as exc:
+                if exc.code != ProviderErrorCode.UNKNOWN:
+                    raise
+                if rejects_parameter(exc, "n"):
+                    self._native_candidates = False
+        if len(results) < count:
+            results.extend(
+                generate_packs_in_parallel(
+                    self, payload, count - len(results), call=single
+                )
+            )
+        return results
+
+    def with_model(self, model_name: str) -> "OpenAiProvider":
+        clone = copy.copy(self)
+        clone._model_name = model_name
+        return clone
+
+    def refine_pack(
+        self, payload: GenerateRequest, draft: GenerateProviderResult
+    ) -> GenerateProviderResult:
+        fields = {name: getattr(draft, name) for name in PACK_FIELDS}
+        messages = build_refine_messages(payload, fields)
+        return self._generate(payload, count=1, messages=messages)[0]
+
+    def _generate(
+        self,
+        payload: GenerateRequest,
+        count: int,
+        instrumental: bool = False,
+        messages: tuple[str, str] | None = None,
+    ) -> list[GenerateProviderResult]:
+        if messages is not None:
+            system_instruction, user_prompt = messages
+            max_tokens = compute_output_budget(payload)
+            parse_fields = parse_pack_fields
+        elif instrumental:
+            system_instruction, user_prompt = build_instrumental_messages(payload)
+            max_tokens = INSTRUMENTAL_FAST_OUTPUT_TOKENS
+            parse_fields = parse_instrumental_fields
+        else:
+            system_instruction, user_prompt = build_generation_messages(payload)
+            max_tokens = compute_output_budget(payload)
+            parse_fields = parse_pack_fields
+        spent = TokenUsage()
         for attempt in range(2):
             try:
-                response = self._client.chat.completions.create(
-                    model=self._model_name,
-                    response_format={"type": "json_object"},
-                    messages=[
+                timeout = deadline_timeout("OpenAI", retry=attempt > 0)
+                request: dict[str, object] = {
+                    "model": self._model_name,
+                    "response_format": {"type": "json_object"},
+                    "messages": [
                         {"role": "system", "content": system_instruction},
                         {"role": "user", "content": user_prompt},
                     ],
-                )
-                text = response.choices[0].message.content or "{}"
-                if text == "{}":
+                    self._max_tokens_param: max_tokens,
+                }
+                if count > 1:
+                    request["n"] = count
+                if timeout is not None:
+                    request["timeout"] = timeout
+                with span(
+                    "llm.call",
+                    provider=self.provider_name,
+                    model=self._model_name,
+                    attempt=attempt,
+                    max_tokens=max_tokens,
+                    candidates=count,
+                ) as call_span:
+                    request["extra_headers"] = trace_headers() or None
+                    response = self._client.chat.completions.create(**request)
+                    usage = _usage_from_response(response)
+                    trace_usage(call_span, usage)
+                spent += usage
+                results: list[GenerateProviderResult] = []
+                decode_error: json.JSONDecodeError | None = None
+                hit_budget = False
+                with span("response.parse", candidates=len(response.choices)):
+                    for choice in response.choices:
+                        text = choice.message.content or "{}"
+                        if text == "{}":
+                            continue
+                        truncated = getattr(choice, "finish_reason", None) == "length"
+                        try:
+                            fields = parse_fields(text, payload)
+                        except json.JSONDecodeError as exc:
+                            repaired = (
+                                parse_truncated_pack_fields(text, payload)
+                                if truncated and not instrumental
+                                else None
+                            )
+                            if repaired is None:
+                                hit_budget = hit_budget or truncated
+                                decode_error = decode_error or exc
+                                continue
+                            fields = repaired
+                        results.append(
+                            GenerateProviderResult(
+                                provider_name=self.provider_name,
+                                model_name=self._model_name,
+                                truncated=truncated,
+                                **fields,
+                            )
+                        )
+                if results:
+                    # One upstream call served every candidate (and any
+                    # re-prompt before it); bill it to the first result.
+                    results[0].usage = spent
+                    return results
+                if hit_budget:
+                    # Nothing salvageable: retry once with a larger budget.
+                    max_tokens *= 2
                     raise ProviderError(
-                        "OpenAI returned an empty JSON response.",
+                        "OpenAI output hit the token budget.",
                         code=ProviderErrorCode.INVALID_RESPONSE,
                         retryable=True,
                     )
-                parsed = json.loads(text)
-                style = sanitize_style_prompt(str(parsed.get("style", "")), payload)
-                return GenerateProviderResult(
-                    provider_name=self.provider_name,
-                    model_name=self._model_name,
-                    title=str(parsed.get("title", "Untitled")),
-                    style=style,
-                    lyrics=str(parsed.get("lyrics", "")),
-                    explanation=str(parsed.get("explanation", "")),
+                if decode_error:
+                    raise decode_error
+                raise ProviderError(
+                    "OpenAI returned an empty JSON response.",
+                    code=ProviderErrorCode.INVALID_RESPONSE,
+                    retryable=True,
                 )
             except json.JSONDecodeError as exc:
                 if attempt == 0:
@@ -85,32 +310,161 @@ class OpenAiProvider(BaseLlmProvider):
             retryable=True,
         )
 
+    def submit_batch(self, items: list[tuple[str, GenerateRequest]]) -> str:
+        lines = []
+        for custom_id, payload in items:
+            system_instruction, user_prompt = build_generation_messages(payload)
+            body = {
+                "model": self._model_name,
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {"role": "system", "content": system_instruction},
+                    {"role": "user", "content": user_prompt},
+                ],
+                self._max_tokens_param: compute_output_budget(payload),
+            }
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": body,
+                    }
+                )
+            )
+        try:
+            with span(
+                "llm.batch_submit",
+                provider=self.provider_name,
+                model=self._model_name,
+                requests=len(items),
+            ):
+                upload = self._client.files.create(
+                    file=("generate.jsonl", "\n".join(lines).encode()),
+                    purpose="batch",
+                )
+                batch = self._client.batches.create(
+                    input_file_id=upload.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h",
+                )
+        except Exception as exc:  # noqa: BLE001
+            code, retryable = classify_exception(exc)
+            raise ProviderError(
+                f"OpenAI batch submission failed: {exc}",
+                code=code,
+                retryable=retryable,
+            ) from exc
+        return batch.id
+
+    def poll_batch(self, batch_id: str, item_ids: list[str]) -> BatchPoll:
+        try:
+            batch = self._client.batches.retrieve(batch_id)
+            if batch.status not in _BATCH_FINAL_STATES:
+                return BatchPoll(done=False)
+            outputs: dict[str, BatchItemOutput] = {}
+            # Expired and cancelled batches still return what finished.
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                content = self._client.files.content(file_id).text
+                for raw in content.splitlines():
+                    if raw.strip():
+                        line = json.loads(raw)
+                        outputs[line["custom_id"]] = _batch_output(
+                            line, self._model_name
+                        )
+        except Exception as exc:  # noqa: BLE001
+            code, retryable = classify_exception(exc)
+            raise ProviderError(
+                f"OpenAI batch poll failed: {exc}",
+                code=code,
+                retryable=retryable,
+            ) from exc
+        error = None
+        if batch.status != "completed":
+            errors = getattr(batch.errors, "data", None) or []
+            error = f"OpenAI batch {batch.status}" + (
+                f": {errors[0].message}" if errors else "."
+            )
+        return BatchPoll(done=True, outputs=outputs, error=error)
+
     def extend_lyrics(
         self, current_lyrics: str, topic: str, style: str, language: str
     ) -> ExtendProviderResult:
         system_instruction, user_prompt = build_extend_messages(
             current_lyrics, topic, style, language
         )
+        return self.complete_text(
+            system_instruction, user_prompt, compute_extend_budget(language), "extend"
+        )
+
+    def repair_lyrics(
+        self,
+        payload: GenerateRequest,
+        lyrics: str,
+        issues: list[str],
+        missing_sections: list[str],
+        rewrite: bool,
+    ) -> ExtendProviderResult:
+        system_instruction, user_prompt = build_repair_messages(
+            payload, lyrics, issues, missing_sections, rewrite
+        )
+        budget = compute_repair_budget(payload, missing_sections, rewrite)
+        return self.complete_text(system_instruction, user_prompt, budget, "repair")
+
+    def complete_text(
+        self,
+        system_instruction: str,
+        user_prompt: str,
+        max_tokens: int,
+        label: str,
+        model: str | None = None,
+        json_output: bool = False,
+    ) -> ExtendProviderResult:
+        model_name = model or self._model_name
         try:
-            response = self._client.chat.completions.create(
-                model=self._model_name,
-                messages=[
-                    {"role": "system", "content": system_instruction},
-                    {"role": "user", "content": user_prompt},
-                ],
-            )
-            text = (response.choices[0].message.content or "").strip()
+            timeout = deadline_timeout("OpenAI")
+            with span(
+                "llm.call",
+                provider=self.provider_name,
+                model=model_name,
+                operation=label,
+                max_tokens=max_tokens,
+            ) as call_span:
+                response = self._client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_instruction},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    response_format=(
+                        {"type": "json_object"} if json_output else NOT_GIVEN
+                    ),
+                    timeout=timeout if timeout is not None else NOT_GIVEN,
+                    extra_headers=trace_headers() or None,
+                    **{self._max_tokens_param: max_tokens},
+                    **self._cache_key_param(),
+                )
+                usage = _usage_from_response(response)
+                trace_usage(call_span, usage)
+            choice = response.choices[0]
+            text = (choice.message.content or "").strip()
+            truncated = getattr(choice, "finish_reason", None) == "length"
             return ExtendProviderResult(
                 provider_name=self.provider_name,
-                model_name=self._model_name,
-                added_lyrics=text,
+                model_name=model_name,
+                added_lyrics=trim_partial_line(text) if truncated else text,
+                usage=usage,
+                truncated=truncated,
             )
         except ProviderError:
             raise
         except Exception as exc:  # noqa: BLE001
             code, retryable = classify_exception(exc)
             raise ProviderError(
-                f"OpenAI extend failed: {exc}",
+                f"OpenAI {label} failed: {exc}",
                 code=code,
                 retryable=retryable,
             ) from exc
@@ -0,0 +1,195 @@
+import json
+
+from app.models.schemas import GenerateRequest
+from app.providers.base import (
+    BatchItemOutput,
+    GenerateProviderResult,
+    ProviderError,
+    ProviderErrorCode,
+)
+from app.services.instrumental import (
+    arrangement_tags,
+    instrumental_lyrics,
+    instrumental_style,
+    local_title,
+    normalize_arrangement,
+)
+from app.services.prompt_builder import requested_fields, sanitize_style_prompt
+
+
+def clean_json(text: str | None) -> str:
+    if not text:
+        return "{}"
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    elif cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    return cleaned.strip()
+
+
+def parse_pack_fields(text: str, payload: GenerateRequest) -> dict[str, str]:
+    """Decode one JSON candidate into sanitized pack fields.
+
+    Raises ``json.JSONDecodeError`` when the candidate is not valid JSON so the
+    caller can decide whether to re-prompt. Keys the request did not ask for
+    come back empty.
+    """
+    parsed = json.loads(clean_json(text))
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError("Expected a JSON object", text, 0)
+    fields = requested_fields(payload)
+    return {
+        "title": str(parsed.get("title", "Untitled")) if "title" in fields else "",
+        "style": (
+            sanitize_style_prompt(str(parsed.get("style", "")), payload)
+            if "style" in fields
+            else ""
+        ),
+        "lyrics": str(parsed.get("lyrics", "")) if "lyrics" in fields else "",
+        "explanation": (
+            str(parsed.get("explanation", "")) if "explanation" in fields else ""
+        ),
+    }
+
+
+def select_fields(fields: dict[str, str], payload: GenerateRequest) -> dict[str, str]:
+    """Blank the pack keys the request did not ask for."""
+    wanted = requested_fields(payload)
+    return {name: value if name in wanted else "" for name, value in fields.items()}
+
+
+def _close_json(text: str) -> list[str]:
+    """Return candidate completions of a JSON document cut off mid-stream."""
+    stack: list[str] = []
+    in_string = False
+    escaped = False
+    string_start = 0
+    # (position, open containers) for each comma outside strings.
+    cut_points: list[tuple[int, list[str]]] = []
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+            string_start = index
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == ",":
+            cut_points.append((index, list(stack)))
+
+    candidates: list[str] = []
+    head = text
+    if in_string:
+        content = text[string_start + 1 :]
+        if escaped:
+            content = content[:-1]
+        # Drop a partial last line so truncated lyrics end on a full line.
+        last_break = content.rfind("\\n")
+        if last_break > 0:
+            content = content[:last_break]
+        head = text[: string_start + 1] + content + '"'
+    candidates.append(head.rstrip().rstrip(",") + "".join(reversed(stack)))
+    if cut_points:
+        position, open_stack = cut_points[-1]
+        candidates.append(text[:position] + "".join(reversed(open_stack)))
+    return candidates
+
+
+def parse_truncated_pack_fields(
+    text: str, payload: GenerateRequest
+) -> dict[str, str] | None:
+    """Salvage a pack from output that hit the token limit.
+
+    Closes any open string and containers locally instead of paying for a new
+    call. Returns None when nothing usable (title and lyrics, or whichever of
+    them was requested) survives.
+    """
+    wanted = requested_fields(payload)
+    required = [name for name in ("title", "lyrics") if name in wanted] or wanted
+    for candidate in _close_json(clean_json(text)):
+        try:
+            fields = parse_pack_fields(candidate, payload)
+        except json.JSONDecodeError:
+            continue
+        if all(fields[name].strip() for name in required):
+            return fields
+    return None
+
+
+def trim_partial_line(text: str) -> str:
+    """Drop the unfinished last line of plain-text output cut off mid-line."""
+    stripped = text.rstrip()
+    last_break = stripped.rfind("\n")
+    if last_break <= 0:
+        return stripped
+    return stripped[:last_break].rstrip()
+
+
+def parse_instrumental_fields(text: str, payload: GenerateRequest) -> dict[str, str]:
+    """Decode the instrumental fast-path reply into full pack fields.
+
+    Style is always computed locally; the arrangement falls back to the
+    structure plan when the model returns no usable tags.
+    """
+    parsed = json.loads(clean_json(text))
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError("Expected a JSON object", text, 0)
+    tags = normalize_arrangement(parsed.get("arrangement")) or arrangement_tags(payload)
+    return select_fields(
+        {
+            "title": str(parsed.get("title", "")) or local_title(payload.topic),
+            "style": instrumental_style(payload),
+            "lyrics": instrumental_lyrics(tags),
+            "explanation": str(parsed.get("explanation", "")),
+        },
+        payload,
+    )
+
+
+def pack_from_batch_output(
+    provider_name: str,
+    payload: GenerateRequest,
+    output: BatchItemOutput,
+) -> GenerateProviderResult:
+    """Turn one batch reply into a pack, as the interactive path would.
+
+    Batches get no re-prompt, so a reply that is not a usable pack raises
+    ``ProviderError`` for that item alone.
+    """
+    if output.error is not None or not output.text:
+        raise ProviderError(
+            output.error or f"{provider_name} returned an empty batch reply.",
+            code=ProviderErrorCode.INVALID_RESPONSE,
+        )
+    try:
+        fields = parse_pack_fields(output.text, payload)
+    except json.JSONDecodeError as exc:
+        repaired = (
+            parse_truncated_pack_fields(output.text, payload)
+            if output.truncated
+            else None
+        )
+        if repaired is None:
+            raise ProviderError(
+                f"{provider_name} returned invalid JSON in a batch reply: {exc}",
+                code=ProviderErrorCode.INVALID_RESPONSE,
+            ) from exc
+        fields = repaired
+    return GenerateProviderResult(
+        provider_name=provider_name,
+        model_name=output.model_name,
+        usage=output.usage,
+        truncated=output.truncated,
+        **fields,
+    )
@@ -0,0 +1,120 @@
+import importlib
+import logging
+from collections.abc import Callable
+from importlib.metadata import entry_points
+
+from app.core.config import Settings
+from app.providers.base import BaseLlmProvider
+from app.providers.gemini_provider import GeminiProvider
+from app.providers.local_provider import LocalOpenAiProvider
+from app.providers.openai_provider import OpenAiProvider
+from app.providers.template_provider import TEMPLATE_PROVIDER_NAME, TemplateProvider
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "loofi_suno.providers"
+
+# A factory returns a ready provider, or None when the settings do not
+# configure it (missing key, missing endpoint, ...).
+ProviderFactory = Callable[[Settings], BaseLlmProvider | None]
+
+
+def _gemini_factory(settings: Settings) -> BaseLlmProvider | None:
+    if not settings.gemini_api_key:
+        return None
+    return GeminiProvider(
+        api_key=settings.gemini_api_key,
+        model_name=settings.gemini_model,
+    )
+
+
+def _openai_factory(settings: Settings) -> BaseLlmProvider | None:
+    if not settings.openai_api_key:
+        return None
+    return OpenAiProvider(
+        api_key=settings.openai_api_key,
+        model_name=settings.openai_model,
+    )
+
+
+def _local_factory(settings: Settings) -> BaseLlmProvider | None:
+    if not settings.local_llm_base_url:
+        return None
+    return LocalOpenAiProvider(
+        base_url=settings.local_llm_base_url,
+        model_name=settings.local_llm_model,
+        api_key=settings.local_llm_api_key,
+        timeout_seconds=settings.local_llm_timeout_seconds,
+        max_connections=settings.local_llm_max_connections,
+    )
+
+
+def _template_factory(settings: Settings) -> BaseLlmProvider | None:
+    if not settings.template_fallback:
+        return None
+    return TemplateProvider()
+
+
+_REGISTRY: dict[str, ProviderFactory] = {
+    "gemini": _gemini_factory,
+    "openai": _openai_factory,
+    "local": _local_factory,
+    TEMPLATE_PROVIDER_NAME: _template_factory,
+}
+
+
+def register_provider(name: str, factory: ProviderFactory) -> None:
+    """Register a provider factory under ``name`` for every new router."""
+    _REGISTRY[name.strip().lower()] = factory
+
+
+def _load_reference(reference: str) -> ProviderFactory:
+    module_name, _, attribute = reference.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(f"Expected 'module:factory', got '{reference}'")
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute)
+
+
+def _entry_point_factories() -> dict[str, ProviderFactory]:
+    factories: dict[str, ProviderFactory] = {}
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            factories[entry_point.name.strip().lower()] = entry_point.load()
+        except Exception:  # noqa: BLE001
+            logger.warning(
+                "provider_plugin_failed",
+                extra={"event": "provider_plugin_failed", "provider": entry_point.name},
+            )
+    return factories
+
+
+def _configured_plugin_factories(settings: Settings) -> dict[str, ProviderFactory]:
+    """Parse ``PROVIDER_PLUGINS`` entries of the form ``name=module:factory``."""
+    factories: dict[str, ProviderFactory] = {}
+    for item in settings.provider_plugins.split(","):
+        name, _, reference = item.strip().partition("=")
+        if not name or not reference:
+            continue
+        try:
+            factories[name.strip().lower()] = _load_reference(reference.strip())
+        except Exception:  # noqa: BLE001
+            logger.warning(
+                "provider_plugin_failed",
+                extra={"event": "provider_plugin_failed", "provider": name.strip()},
+            )
+    return factories
+
+
+def load_provider_factories(settings: Settings) -> dict[str, ProviderFactory]:
+    """Return every known provider factory in registration order.
+
+    Built-ins come first, then installed entry points, then plugins named in
+    settings. Later sources may override earlier ones by name.
+    """
+    factories = dict(_REGISTRY)
+    factories.update(_entry_point_factories())
+    factories.update(_configured_plugin_factories(settings))
+    factories.pop("auto", None)
+    return factories
@@ -1,55 +1,143 @@
+import logging
+import random
+
 from app.core.config import Settings
 from app.models.schemas import ProviderName
 from app.providers.base import BaseLlmProvider, ProviderError, ProviderErrorCode
-from app.providers.gemini_provider import GeminiProvider
-from app.providers.openai_provider import OpenAiProvider
+from app.providers.registry import ProviderFactory, load_provider_factories
+from app.providers.routing_policy import (
+    Operation,
+    RankedProvider,
+    RoutingPolicy,
+    RoutingStats,
+    build_policy,
+    parse_weights,
+)
+from app.providers.template_provider import TEMPLATE_PROVIDER_NAME
+
+
+logger = logging.getLogger(__name__)
 
 
 class ProviderRouter:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        factories: dict[str, ProviderFactory] | None = None,
+        stats: RoutingStats | None = None,
+        rng: random.Random | None = None,
+    ):
         self._settings = settings
+        self._rng = rng or random.Random()
+        self._factories = (
+            factories if factories is not None else load_provider_factories(settings)
+        )
         self._providers: dict[str, BaseLlmProvider] = {}
+        # A reloaded router keeps the live latency and error history.
+        self._stats = stats or RoutingStats(alpha=settings.routing_ewma_alpha)
+        self._policy: RoutingPolicy = build_policy(
+            settings.routing_policy,
+            cost_weights=parse_weights(settings.provider_cost_weights),
+            split_weights=parse_weights(settings.routing_weights),
+            max_p95_ms=settings.routing_max_p95_ms,
+            max_error_rate=settings.routing_max_error_rate,
+        )
 
-        if settings.gemini_api_key:
-            self._providers["gemini"] = GeminiProvider(
-                api_key=settings.gemini_api_key,
-                model_name=settings.gemini_model,
-            )
-        if settings.openai_api_key:
-            self._providers["openai"] = OpenAiProvider(
-                api_key=settings.openai_api_key,
-                model_name=settings.openai_model,
-            )
+        for name, factory in self._factories.items():
+            # A broken plugin leaves its provider unconfigured, not the app down.
+            try:
+                provider = factory(settings)
+            except Exception:  # noqa: BLE001
+                logger.warning(
+                    "provider_plugin_failed",
+                    extra={"event": "provider_plugin_failed", "provider": name},
+                )
+                continue
+            if provider is not None:
+                self._providers[name] = provider
+
+    @property
+    def stats(self) -> RoutingStats:
+        return self._stats
+
+    @property
+    def known(self) -> list[ProviderName]:
+        return list(self._factories)
 
     @property
     def configured(self) -> list[ProviderName]:
-        return [name for name in ["gemini", "openai"] if name in self._providers]
+        return [name for name in self._factories if name in self._providers]
 
     @property
     def auto_order(self) -> list[ProviderName]:
-        allowed = {"gemini", "openai"}
+        allowed = set(self._factories)
         parsed = [
-            x.strip()
+            x.strip().lower()
             for x in self._settings.auto_provider_order.split(",")
-            if x.strip() in allowed
+            if x.strip().lower() in allowed
         ]
         order: list[ProviderName] = []
-        for name in parsed + ["gemini", "openai"]:
-            if name in allowed and name not in order:
-                order.append(name)  # type: ignore[arg-type]
+        for name in parsed + self.configured:
+            if name not in order:
+                order.append(name)
         return order
 
     @property
     def default_provider(self) -> ProviderName:
         value = self._settings.default_llm_provider.strip().lower()
-        if value in {"auto", "gemini", "openai"}:
-            return value  # type: ignore[return-value]
+        if value == "auto" or value in self._factories:
+            return value
         return "auto"
 
-    def resolve_order(self, requested: ProviderName) -> list[ProviderName]:
+    @property
+    def policy_name(self) -> str:
+        return self._policy.name
+
+    def rank(self, operation: Operation = "generate") -> list[RankedProvider]:
+        """Rank ``auto`` candidates for one operation under the active policy.
+
+        The static policy keeps the configured order, including providers that
+        are not configured. Live policies only rank configured providers. The
+        template engine always ranks last, whatever its measured latency.
+        """
+        candidates = self.auto_order
+        if self._policy.name != "static":
+            candidates = [name for name in candidates if name in self._providers]
+        ranked = self._policy.rank(candidates, self._stats, operation)
+        fallback = [item for item in ranked if item.provider == TEMPLATE_PROVIDER_NAME]
+        for item in fallback:
+            item.reason = "local template fallback"
+        return [item for item in ranked if item not in fallback] + fallback
+
+    def resolve_order(
+        self, requested: ProviderName, operation: Operation = "generate"
+    ) -> list[ProviderName]:
         if requested != "auto":
             return [requested]
-        return self.auto_order
+        return self._explore([item.provider for item in self.rank(operation)])
+
+    def _explore(self, order: list[ProviderName]) -> list[ProviderName]:
+        """Occasionally try a lower-ranked provider first.
+
+        Live stats only move on real attempts, so a provider demoted after a
+        slow or failing spell would otherwise never be measured again. A
+        ``ROUTING_EXPLORATION`` share of ``auto`` requests starts with one of
+        them instead; the rest of the order stays as the fallback.
+        """
+        candidates = [name for name in order[1:] if name != TEMPLATE_PROVIDER_NAME]
+        if (
+            self._policy.name == "static"
+            or not candidates
+            or self._rng.random() >= self._settings.routing_exploration
+        ):
+            return order
+        first = self._rng.choice(candidates)
+        return [first, *(name for name in order if name != first)]
+
+    def record_outcome(
+        self, name: ProviderName, operation: Operation, latency_ms: float, ok: bool
+    ) -> None:
+        self._stats.record(name, operation, latency_ms, ok)
 
     def get_provider(self, name: ProviderName) -> BaseLlmProvider:
         if name == "auto":
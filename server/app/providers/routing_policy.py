@@ -0,0 +1,295 @@
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Literal
+
+
+Operation = Literal["generate", "extend"]
+
+LATENCY_WINDOW = 200
+
+
+@dataclass
+class ProviderStats:
+    """Live latency and error statistics for one provider and operation."""
+
+    alpha: float
+    ewma_latency_ms: float | None = None
+    error_rate: float = 0.0
+    samples: int = 0
+    recent_latencies_ms: deque[float] = field(
+        default_factory=lambda: deque(maxlen=LATENCY_WINDOW)
+    )
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        self.samples += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            return
+        self.recent_latencies_ms.append(latency_ms)
+        if self.ewma_latency_ms is None:
+            self.ewma_latency_ms = latency_ms
+        else:
+            self.ewma_latency_ms += self.alpha * (latency_ms - self.ewma_latency_ms)
+
+    @property
+    def p95_latency_ms(self) -> float | None:
+        if not self.recent_latencies_ms:
+            return None
+        ordered = sorted(self.recent_latencies_ms)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+
+class RoutingStats:
+    """Thread-safe store of ``ProviderStats`` keyed by (provider, operation)."""
+
+    def __init__(self, alpha: float = 0.2):
+        self._alpha = alpha
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], ProviderStats] = {}
+
+    def record(
+        self, provider: str, operation: Operation, latency_ms: float, ok: bool
+    ) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                (provider, operation), ProviderStats(alpha=self._alpha)
+            )
+            stats.record(latency_ms, ok)
+
+    def get(self, provider: str, operation: Operation) -> ProviderStats:
+        with self._lock:
+            stats = self._stats.get((provider, operation))
+            if stats is None:
+                return ProviderStats(alpha=self._alpha)
+            return ProviderStats(
+                alpha=stats.alpha,
+                ewma_latency_ms=stats.ewma_latency_ms,
+                error_rate=stats.error_rate,
+                samples=stats.samples,
+                recent_latencies_ms=deque(
+                    stats.recent_latencies_ms, maxlen=LATENCY_WINDOW
+                ),
+            )
+
+
+@dataclass
+class RankedProvider:
+    provider: str
+    score: float
+    reason: str
+    stats: ProviderStats
+    cost_weight: float
+
+
+class RoutingPolicy(ABC):
+    """Orders candidate providers for one request.
+
+    ``candidates`` arrive in configured ``auto`` order. Providers whose error
+    rate exceeds ``max_error_rate`` are always moved behind healthy ones.
+    """
+
+    name: str
+
+    def __init__(
+        self,
+        cost_weights: dict[str, float] | None = None,
+        max_error_rate: float = 0.5,
+    ):
+        self._cost_weights = cost_weights or {}
+        self._max_error_rate = max_error_rate
+
+    def cost_weight(self, provider: str) -> float:
+        return self._cost_weights.get(provider, 1.0)
+
+    def rank(
+        self, candidates: list[str], stats: RoutingStats, operation: Operation
+    ) -> list[RankedProvider]:
+        ranked = self._rank([(name, stats.get(name, operation)) for name in candidates])
+        healthy = [
+            item for item in ranked if item.stats.error_rate <= self._max_error_rate
+        ]
+        degraded = [
+            item for item in ranked if item.stats.error_rate > self._max_error_rate
+        ]
+        for item in degraded:
+            item.reason = (
+                f"degraded (error rate {item.stats.error_rate:.2f}); {item.reason}"
+            )
+        return healthy + degraded
+
+    @abstractmethod
+    def _rank(
+        self, candidates: list[tuple[str, ProviderStats]]
+    ) -> list[RankedProvider]:
+        raise NotImplementedError
+
+
+class StaticPolicy(RoutingPolicy):
+    """Configured order, never reordered by live statistics."""
+
+    name = "static"
+
+    def rank(
+        self, candidates: list[str], stats: RoutingStats, operation: Operation
+    ) -> list[RankedProvider]:
+        return self._rank([(name, stats.get(name, operation)) for name in candidates])
+
+    def _rank(
+        self, candidates: list[tuple[str, ProviderStats]]
+    ) -> list[RankedProvider]:
+        return [
+            RankedProvider(
+                provider=name,
+                score=float(index),
+                reason="configured auto order",
+                stats=stats,
+                cost_weight=self.cost_weight(name),
+            )
+            for index, (name, stats) in enumerate(candidates)
+        ]
+
+
+class FastestPolicy(RoutingPolicy):
+    """Lowest EWMA latency first, inflated by the recent error rate.
+
+    Providers without samples score 0 so they are tried and measured.
+    """
+
+    name = "fastest"
+
+    def _rank(
+        self, candidates: list[tuple[str, ProviderStats]]
+    ) -> list[RankedProvider]:
+        ranked = []
+        for name, stats in candidates:
+            latency = stats.ewma_latency_ms or 0.0
+            ranked.append(
+                RankedProvider(
+                    provider=name,
+                    score=latency * (1.0 + stats.error_rate),
+                    reason=(
+                        "no samples yet"
+                        if stats.ewma_latency_ms is None
+                        else f"ewma latency {latency:.0f} ms"
+                    ),
+                    stats=stats,
+                    cost_weight=self.cost_weight(name),
+                )
+            )
+        return sorted(ranked, key=lambda item: item.score)
+
+
+class CheapestPolicy(RoutingPolicy):
+    """Lowest cost weight among providers whose p95 stays under the cap."""
+
+    name = "cheapest"
+
+    def __init__(self, max_p95_ms: float, **kwargs):
+        super().__init__(**kwargs)
+        self._max_p95_ms = max_p95_ms
+
+    def _rank(
+        self, candidates: list[tuple[str, ProviderStats]]
+    ) -> list[RankedProvider]:
+        within: list[RankedProvider] = []
+        over: list[RankedProvider] = []
+        for name, stats in candidates:
+            p95 = stats.p95_latency_ms
+            item = RankedProvider(
+                provider=name,
+                score=self.cost_weight(name),
+                reason=f"cost weight {self.cost_weight(name):g}",
+                stats=stats,
+                cost_weight=self.cost_weight(name),
+            )
+            if p95 is not None and p95 > self._max_p95_ms:
+                item.reason = (
+                    f"p95 {p95:.0f} ms over {self._max_p95_ms:.0f} ms; {item.reason}"
+                )
+                over.append(item)
+            else:
+                within.append(item)
+        return sorted(within, key=lambda item: item.score) + sorted(
+            over, key=lambda item: item.stats.p95_latency_ms or 0.0
+        )
+
+
+class WeightedPolicy(RoutingPolicy):
+    """Weighted random split for the first choice, scaled by health.
+
+    The remaining providers follow in descending effective weight.
+    """
+
+    name = "weighted"
+
+    def __init__(
+        self, weights: dict[str, float], rng: random.Random | None = None, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self._weights = weights
+        self._rng = rng or random.Random()
+
+    def _rank(
+        self, candidates: list[tuple[str, ProviderStats]]
+    ) -> list[RankedProvider]:
+        pool = [
+            RankedProvider(
+                provider=name,
+                score=self._weights.get(name, 1.0) * (1.0 - stats.error_rate),
+                reason=f"weight {self._weights.get(name, 1.0):g}",
+                stats=stats,
+                cost_weight=self.cost_weight(name),
+            )
+            for name, stats in candidates
+        ]
+        total = sum(max(item.score, 0.0) for item in pool)
+        if total <= 0:
+            return pool
+        pick = self._rng.uniform(0, total)
+        chosen = pool[-1]
+        for item in pool:
+            pick -= max(item.score, 0.0)
+            if pick <= 0:
+                chosen = item
+                break
+        rest = sorted(
+            (item for item in pool if item is not chosen),
+            key=lambda item: item.score,
+            reverse=True,
+        )
+        return [chosen, *rest]
+
+
+def parse_weights(raw: str) -> dict[str, float]:
+    """Parse ``name=value`` pairs, e.g. ``gemini=3,openai=1``."""
+    weights: dict[str, float] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip() or not value.strip():
+            continue
+        try:
+            weights[name.strip().lower()] = float(value)
+        except ValueError:
+            continue
+    return weights
+
+
+def build_policy(
+    name: str,
+    cost_weights: dict[str, float],
+    split_weights: dict[str, float],
+    max_p95_ms: float,
+    max_error_rate: float,
+) -> RoutingPolicy:
+    common = {"cost_weights": cost_weights, "max_error_rate": max_error_rate}
+    normalized = name.strip().lower()
+    if normalized == "fastest":
+        return FastestPolicy(**common)
+    if normalized == "cheapest":
+        return CheapestPolicy(max_p95_ms=max_p95_ms, **common)
+    if normalized == "weighted":
+        return WeightedPolicy(weights=split_weights, **common)
+    return StaticPolicy(**common)
@@ -0,0 +1,58 @@
+from app.models.schemas import GenerateRequest
+from app.providers.base import (
+    BaseLlmProvider,
+    ExtendProviderResult,
+    GenerateProviderResult,
+)
+from app.services.local_engine import (
+    TEMPLATE_MODEL_NAME,
+    template_extension,
+    template_pack_fields,
+)
+
+
+TEMPLATE_PROVIDER_NAME = "template"
+
+
+class TemplateProvider(BaseLlmProvider):
+    """Local phrase-bank engine: no network, no tokens, deterministic output.
+
+    Used as the last ``auto`` fallback during upstream outages and as a fake
+    backend for benchmarks.
+    """
+
+    provider_name = TEMPLATE_PROVIDER_NAME
+    # Needs no time budget, so request deadlines never skip it.
+    requires_upstream = False
+
+    def _result(self, fields: dict[str, str]) -> GenerateProviderResult:
+        return GenerateProviderResult(
+            provider_name=self.provider_name,
+            model_name=TEMPLATE_MODEL_NAME,
+            **fields,
+        )
+
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        return self._result(template_pack_fields(payload))
+
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        return [
+            self._result(template_pack_fields(payload, variant))
+            for variant in range(count)
+        ]
+
+    def generate_instrumental(
+        self, payload: GenerateRequest, count: int = 1
+    ) -> list[GenerateProviderResult]:
+        return self.generate_packs(payload, count)
+
+    def extend_lyrics(
+        self, current_lyrics: str, topic: str, style: str, language: str
+    ) -> ExtendProviderResult:
+        return ExtendProviderResult(
+            provider_name=self.provider_name,
+            model_name=TEMPLATE_MODEL_NAME,
+            added_lyrics=template_extension(current_lyrics, topic, style, language),
+        )
@@ -0,0 +1,450 @@
+"""Deferred bulk generation through provider batch APIs.
+
+Jobs are queued in SQLite. A background runner collects queued requests
+into one batch submission per provider (the OpenAI Batch API, Gemini batch
+mode), polls open submissions, and writes each finished song back to its
+job. Batch calls are billed at a discount and do not count against the
+interactive rate limits, at the cost of results arriving within hours
+instead of seconds.
+"""
+
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from app.models.schemas import GenerateRequest
+from app.providers.base import ProviderError
+from app.providers.parsing import pack_from_batch_output
+from app.providers.router import ProviderRouter
+from app.services.song_service import SongService
+
+
+logger = logging.getLogger(__name__)
+
+BatchItemStatus = Literal["queued", "submitted", "completed", "failed"]
+BatchJobStatus = Literal["queued", "running", "completed"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    provider TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    submission_id TEXT,
+    response TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS batch_items_status ON batch_items (status, provider);
+CREATE TABLE IF NOT EXISTS batch_submissions (
+    id TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    item_ids TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _item_id(job_id: str, position: int) -> str:
+    return f"{job_id}:{position}"
+
+
+def _split_item_id(item_id: str) -> tuple[str, int]:
+    job_id, _, position = item_id.rpartition(":")
+    return job_id, int(position)
+
+
+@dataclass
+class QueuedItem:
+    item_id: str
+    payload: GenerateRequest
+
+
+@dataclass
+class Submission:
+    id: str
+    provider: str
+    submitted_at: float
+    item_ids: list[str]
+
+
+@dataclass
+class BatchItem:
+    position: int
+    status: BatchItemStatus
+    response: dict[str, object] | None = None
+    error: str | None = None
+
+
+@dataclass
+class BatchJob:
+    id: str
+    provider: str
+    created_at: float
+    items: list[BatchItem]
+
+    @property
+    def status(self) -> BatchJobStatus:
+        if all(item.status in ("completed", "failed") for item in self.items):
+            return "completed"
+        if all(item.status == "queued" for item in self.items):
+            return "queued"
+        return "running"
+
+
+def resolve_batch_provider(provider_router: ProviderRouter, requested: str) -> str:
+    """First provider in the routing order that has a batch API.
+
+    Raises ``LookupError`` when none does.
+    """
+    for name in provider_router.resolve_order(requested, "generate"):
+        try:
+            provider = provider_router.get_provider(name)
+        except ProviderError:
+            continue
+        if provider.supports_batch:
+            return name
+    raise LookupError(requested)
+
+
+class BatchJobStore:
+    """SQLite job store; without ``path`` jobs live in memory until restart."""
+
+    def __init__(self, path: str | None = None):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            path or ":memory:", timeout=30, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def create_job(
+        self, owner: str, provider: str, payloads: list[GenerateRequest]
+    ) -> str:
+        job_id = secrets.token_urlsafe(12)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO batch_jobs (id, owner, provider, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job_id, owner, provider, time.time()),
+            )
+            self._connection.executemany(
+                "INSERT INTO batch_items (job_id, position, provider, request, status) "
+                "VALUES (?, ?, ?, ?, 'queued')",
+                [
+                    (job_id, position, provider, payload.model_dump_json())
+                    for position, payload in enumerate(payloads)
+                ],
+            )
+        return job_id
+
+    def job(self, job_id: str, owner: str) -> BatchJob | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT provider, created_at FROM batch_jobs WHERE id = ? AND owner = ?",
+                (job_id, owner),
+            ).fetchone()
+            if row is None:
+                return None
+            items = self._connection.execute(
+                "SELECT position, status, response, error FROM batch_items "
+                "WHERE job_id = ? ORDER BY position",
+                (job_id,),
+            ).fetchall()
+        return BatchJob(
+            id=job_id,
+            provider=row[0],
+            created_at=row[1],
+            items=[
+                BatchItem(
+                    position=position,
+                    status=status,
+                    response=json.loads(response) if response else None,
+                    error=error,
+                )
+                for position, status, response, error in items
+            ],
+        )
+
+    def queued(self, limit: int) -> dict[str, list[QueuedItem]]:
+        """Up to ``limit`` queued items per provider, oldest jobs first."""
+        with self._lock:
+            providers = [
+                row[0]
+                for row in self._connection.execute(
+                    "SELECT DISTINCT provider FROM batch_items WHERE status = 'queued'"
+                )
+            ]
+            queued: dict[str, list[QueuedItem]] = {}
+            for provider in providers:
+                rows = self._connection.execute(
+                    "SELECT i.job_id, i.position, i.request FROM batch_items i "
+                    "JOIN batch_jobs j ON j.id = i.job_id "
+                    "WHERE i.status = 'queued' AND i.provider = ? "
+                    "ORDER BY j.created_at, i.position LIMIT ?",
+                    (provider, limit),
+                ).fetchall()
+                queued[provider] = [
+                    QueuedItem(
+                        item_id=_item_id(job_id, position),
+                        payload=GenerateRequest.model_validate_json(request),
+                    )
+                    for job_id, position, request in rows
+                ]
+        return queued
+
+    def payload(self, item_id: str) -> GenerateRequest:
+        job_id, position = _split_item_id(item_id)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT request FROM batch_items WHERE job_id = ? AND position = ?",
+                (job_id, position),
+            ).fetchone()
+        return GenerateRequest.model_validate_json(row[0])
+
+    def mark_submitted(
+        self, submission_id: str, provider: str, item_ids: list[str]
+    ) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO batch_submissions (id, provider, submitted_at, item_ids) "
+                "VALUES (?, ?, ?, ?)",
+                (submission_id, provider, time.time(), json.dumps(item_ids)),
+            )
+            self._connection.executemany(
+                "UPDATE batch_items SET status = 'submitted', submission_id = ? "
+                "WHERE job_id = ? AND position = ?",
+                [(submission_id, *_split_item_id(item_id)) for item_id in item_ids],
+            )
+
+    def open_submissions(self) -> list[Submission]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, provider, submitted_at, item_ids FROM batch_submissions "
+                "WHERE done = 0 ORDER BY submitted_at"
+            ).fetchall()
+        return [
+            Submission(
+                id=row[0],
+                provider=row[1],
+                submitted_at=row[2],
+                item_ids=json.loads(row[3]),
+            )
+            for row in rows
+        ]
+
+    def submitted_item_ids(self, submission_id: str) -> set[str]:
+        """Items of ``submission_id`` that are still waiting for a result."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT job_id, position FROM batch_items "
+                "WHERE submission_id = ? AND status = 'submitted'",
+                (submission_id,),
+            ).fetchall()
+        return {_item_id(job_id, position) for job_id, position in rows}
+
+    def finish_item(
+        self,
+        item_id: str,
+        response: dict[str, object] | None = None,
+        error: str | None = None,
+    ) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE batch_items SET status = ?, response = ?, error = ? "
+                "WHERE job_id = ? AND position = ?",
+                (
+                    "completed" if response is not None else "failed",
+                    json.dumps(response) if response is not None else None,
+                    error,
+                    *_split_item_id(item_id),
+                ),
+            )
+
+    def close_submission(self, submission_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE batch_submissions SET done = 1 WHERE id = ?",
+                (submission_id,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class BatchRunner:
+    """Background submit/poll loop for ``BatchJobStore``.
+
+    Every ``interval_seconds`` queued items go out as one submission per
+    provider (at most ``max_batch_size`` requests each) and open submissions
+    are polled. Finished replies go through the same parsing and style
+    sanitizing as interactive calls, then ``SongService.finish_batch_result``
+    bills, scores and stores them. ``service`` is called each round, so a
+    settings reload applies to the next round.
+    """
+
+    def __init__(
+        self,
+        store: BatchJobStore,
+        service: Callable[[], SongService],
+        interval_seconds: float = 60.0,
+        max_batch_size: int = 1000,
+        price_factor: float = 0.5,
+    ):
+        self._store = store
+        self._service = service
+        self._interval_seconds = interval_seconds
+        self._max_batch_size = max(max_batch_size, 1)
+        self._price_factor = price_factor
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def store(self) -> BatchJobStore:
+        return self._store
+
+    def run_once(self) -> None:
+        with self._run_lock:
+            service = self._service()
+            self._submit_queued(service)
+            self._poll_open(service)
+
+    def _submit_queued(self, service: SongService) -> None:
+        for provider_name, items in self._store.queued(self._max_batch_size).items():
+            try:
+                provider = service.provider_router.get_provider(provider_name)
+                submission_id = provider.submit_batch(
+                    [(item.item_id, item.payload) for item in items]
+                )
+            except ProviderError as exc:
+                logger.warning(
+                    "batch_submit_failed",
+                    extra={
+                        "event": "batch_submit_failed",
+                        "provider": provider_name,
+                        "code": exc.code.value,
+                        "retryable": exc.retryable,
+                    },
+                )
+                # Retryable failures stay queued for the next round.
+                if not exc.retryable:
+                    for item in items:
+                        self._store.finish_item(item.item_id, error=str(exc))
+                continue
+            self._store.mark_submitted(
+                submission_id, provider_name, [item.item_id for item in items]
+            )
+            logger.info(
+                "batch_submitted",
+                extra={
+                    "event": "batch_submitted",
+                    "provider": provider_name,
+                    "count": len(items),
+                },
+            )
+
+    def _poll_open(self, service: SongService) -> None:
+        for submission in self._store.open_submissions():
+            try:
+                provider = service.provider_router.get_provider(submission.provider)
+                poll = provider.poll_batch(submission.id, submission.item_ids)
+            except ProviderError as exc:
+                logger.warning(
+                    "batch_poll_failed",
+                    extra={
+                        "event": "batch_poll_failed",
+                        "provider": submission.provider,
+                        "code": exc.code.value,
+                    },
+                )
+                continue
+            if not poll.done:
+                continue
+            latency_ms = (time.time() - submission.submitted_at) * 1000
+            # Items finished by an interrupted earlier round are already billed.
+            pending = self._store.submitted_item_ids(submission.id)
+            for item_id in submission.item_ids:
+                if item_id not in pending:
+                    continue
+                output = poll.outputs.get(item_id)
+                if output is None:
+                    self._store.finish_item(
+                        item_id, error=poll.error or "No reply in the batch output."
+                    )
+                    continue
+                payload = self._store.payload(item_id)
+                try:
+                    result = pack_from_batch_output(
+                        submission.provider, payload, output
+                    )
+                except ProviderError as exc:
+                    self._store.finish_item(item_id, error=str(exc))
+                    continue
+                try:
+                    response = service.finish_batch_result(
+                        payload, result, latency_ms, self._price_factor
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception(
+                        "batch_item_failed",
+                        extra={
+                            "event": "batch_item_failed",
+                            "provider": submission.provider,
+                        },
+                    )
+                    self._store.finish_item(item_id, error=str(exc))
+                    continue
+                self._store.finish_item(item_id, response=response.model_dump())
+            self._store.close_submission(submission.id)
+            logger.info(
+                "batch_completed",
+                extra={
+                    "event": "batch_completed",
+                    "provider": submission.provider,
+                    "count": len(submission.item_ids),
+                    "duration_ms": round(latency_ms, 2),
+                },
+            )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_seconds):
+            try:
+                self.run_once()
+            except Exception:  # noqa: BLE001
+                logger.exception(
+                    "batch_round_failed", extra={"event": "batch_round_failed"}
+                )
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="batch-runner", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
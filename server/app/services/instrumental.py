@@ -0,0 +1,91 @@
+import re
+
+from app.models.schemas import GenerateRequest
+from app.services.prompt_builder import (
+    STRUCTURE_GUIDE,
+    _fallback_instruments,
+    _infer_energy,
+    sanitize_style_prompt,
+)
+
+
+INSTRUMENTAL_MARKER = "[Instrumental]"
+MAX_ARRANGEMENT_TAGS = 10
+
+_TAG_PATTERN = re.compile(r"\[([^\[\]]+)\]")
+
+# Sung sections become their instrumental counterparts.
+_SECTION_RENAMES = {
+    "verse": "Theme",
+    "pre-chorus": "Build",
+    "chorus": "Main Motif",
+    "hook": "Main Motif",
+}
+
+_LOW_ENERGY_ARRANGEMENT = ["Intro", "Pad Swell", "Theme", "Breakdown", "Theme", "Outro"]
+_DEFAULT_ARRANGEMENT = ["Intro", "Build", "Drop", "Breakdown", "Build", "Drop", "Outro"]
+
+
+_TITLE_TRAILING_WORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "the", "to"}
+
+
+def instrumental_style(payload: GenerateRequest) -> str:
+    """Style prompt built locally from the request and genre instrument defaults."""
+    seed = ["Cinematic", *_fallback_instruments(payload)]
+    return sanitize_style_prompt(", ".join(seed), payload)
+
+
+def arrangement_tags(payload: GenerateRequest) -> list[str]:
+    """Arrangement tags derived from the structure plan, without any model call."""
+    planned = _TAG_PATTERN.findall(STRUCTURE_GUIDE.get(payload.structure, ""))
+    if not planned:
+        low = _infer_energy(payload) == "Low Energy" or payload.structure == "Ambient"
+        planned = _LOW_ENERGY_ARRANGEMENT if low else _DEFAULT_ARRANGEMENT
+    lead = _fallback_instruments(payload)[0]
+    tags: list[str] = []
+    for section in planned:
+        base, _, suffix = section.partition(" ")
+        renamed = _SECTION_RENAMES.get(base.lower(), base)
+        if base.lower() == "bridge":
+            tags.append(f"[Solo: {lead}]")
+            continue
+        tags.append(f"[{renamed}{' ' + suffix if suffix else ''}]")
+    return tags
+
+
+def normalize_arrangement(value: object) -> list[str]:
+    """Accept a list or a string of tags from the model and return clean tags."""
+    items = value if isinstance(value, list) else _TAG_PATTERN.findall(str(value or ""))
+    tags: list[str] = []
+    for item in items:
+        text = str(item).strip().strip("[]").strip()
+        if text and text.lower() != "instrumental":
+            tags.append(f"[{text}]")
+    return tags[:MAX_ARRANGEMENT_TAGS]
+
+
+def instrumental_lyrics(tags: list[str]) -> str:
+    return "\n".join([INSTRUMENTAL_MARKER, *tags])
+
+
+def local_title(topic: str) -> str:
+    words = re.findall(r"[\w']+", topic)[:5]
+    while words and words[-1].lower() in _TITLE_TRAILING_WORDS:
+        words.pop()
+    return " ".join(word.capitalize() for word in words) or "Untitled"
+
+
+def local_instrumental_fields(payload: GenerateRequest) -> dict[str, str]:
+    """A complete instrumental pack computed without any upstream call."""
+    instruments = " and ".join(_fallback_instruments(payload)).lower()
+    energy = _infer_energy(payload).lower()
+    genre = payload.genre or "genre-fusion"
+    return {
+        "title": local_title(payload.topic),
+        "style": instrumental_style(payload),
+        "lyrics": instrumental_lyrics(arrangement_tags(payload)),
+        "explanation": (
+            f"Instrumental {genre} arrangement led by {instruments} "
+            f"with {energy}, following the {payload.structure} structure."
+        ),
+    }
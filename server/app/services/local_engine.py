@@ -0,0 +1,226 @@
+import re
+import zlib
+from random import Random
+
+from app.models.schemas import (
+    ExtendRequest,
+    ExtendResponse,
+    GenerateRequest,
+    GenerateResponse,
+    SongPack,
+)
+from app.providers.parsing import select_fields
+from app.services.instrumental import local_instrumental_fields, local_title
+from app.services.phrase_banks import (
+    DEFAULT_GENRE_PHRASES,
+    DEFAULT_MOOD,
+    GENRE_PHRASES,
+    MOOD_ALIASES,
+    MOOD_IMAGERY,
+)
+from app.services.prompt_builder import (
+    STRUCTURE_GUIDE,
+    _fallback_instruments,
+    _infer_energy,
+    sanitize_style_prompt,
+)
+
+
+TEMPLATE_MODEL_NAME = "template-v1"
+
+_TAG_PATTERN = re.compile(r"\[([^\[\]]+)\]")
+_VERSE_PATTERN = re.compile(r"^\[verse(?: (\d+))?\]", re.IGNORECASE | re.MULTILINE)
+
+_STANDARD_SECTIONS = _TAG_PATTERN.findall(STRUCTURE_GUIDE["Standard"])
+_AMBIENT_SECTIONS = ["Intro", "Verse", "Interlude", "Verse 2", "Outro"]
+
+_SECTION_LINES = {
+    "intro": 2,
+    "verse": 4,
+    "pre-chorus": 2,
+    "chorus": 4,
+    "hook": 4,
+    "bridge": 2,
+    "interlude": 2,
+    "outro": 2,
+}
+_HOOK_SECTIONS = {"chorus", "hook", "outro"}
+
+
+def _rng(*parts: str) -> Random:
+    # crc32 instead of hash() so output is stable across processes.
+    return Random(zlib.crc32("\x1f".join(parts).encode("utf-8")))
+
+
+def _phrases(genre: str) -> dict[str, list[str]]:
+    lowered = genre.lower()
+    for key, phrases in GENRE_PHRASES.items():
+        if key in lowered:
+            return phrases
+    return DEFAULT_GENRE_PHRASES
+
+
+def _imagery(mood: str) -> dict[str, list[str]]:
+    lowered = mood.lower()
+    for word in re.findall(r"[a-z]+", lowered):
+        key = MOOD_ALIASES.get(word, word)
+        if key in MOOD_IMAGERY:
+            return MOOD_IMAGERY[key]
+    return MOOD_IMAGERY[DEFAULT_MOOD]
+
+
+def _topic_phrase(topic: str) -> str:
+    words = re.findall(r"[\w']+", topic)[:4]
+    return " ".join(words).lower() or "tonight"
+
+
+def planned_sections(structure: str) -> list[str]:
+    """Section tags the structure asks for, in order."""
+    if structure == "Ambient":
+        return _AMBIENT_SECTIONS
+    return _TAG_PATTERN.findall(STRUCTURE_GUIDE.get(structure, "")) or (
+        _STANDARD_SECTIONS
+    )
+
+
+def _fill(line: str, rng: Random, topic: str, imagery: dict[str, list[str]]) -> str:
+    return line.format(
+        topic=topic,
+        image=rng.choice(imagery["image"]),
+        place=rng.choice(imagery["place"]),
+    )
+
+
+class _Deck:
+    """Shuffled phrase bank dealt in order, so lines rarely repeat in a song."""
+
+    def __init__(self, lines: list[str], rng: Random):
+        self._lines = rng.sample(lines, len(lines))
+        self._next = 0
+
+    def deal(self, count: int) -> list[str]:
+        dealt = []
+        for _ in range(count):
+            dealt.append(self._lines[self._next % len(self._lines)])
+            self._next += 1
+        return dealt
+
+
+def _section_lines(
+    kind: str,
+    count: int,
+    rng: Random,
+    topic: str,
+    decks: dict[str, _Deck],
+    imagery: dict[str, list[str]],
+) -> list[str]:
+    deck = decks["hook"] if kind in _HOOK_SECTIONS else decks["verse"]
+    lines = [_fill(line, rng, topic, imagery) for line in deck.deal(count)]
+    return [line[0].upper() + line[1:] for line in lines]
+
+
+def _decks(phrases: dict[str, list[str]], rng: Random) -> dict[str, _Deck]:
+    return {kind: _Deck(lines, rng) for kind, lines in phrases.items()}
+
+
+def template_lyrics(payload: GenerateRequest, variant: int = 0) -> str:
+    """Structure-tagged lyric skeleton drawn from the phrase banks."""
+    rng = _rng(
+        payload.topic, payload.genre, payload.mood, payload.structure, str(variant)
+    )
+    topic = _topic_phrase(payload.topic)
+    decks = _decks(_phrases(payload.genre), rng)
+    imagery = _imagery(payload.mood)
+    # Choruses and hooks repeat verbatim, like a real refrain.
+    refrains: dict[str, list[str]] = {}
+    blocks: list[str] = []
+    if (payload.language or "English").strip().lower() != "english":
+        blocks.append(f"[Language: {payload.language}]")
+    for section in planned_sections(payload.structure):
+        kind = section.split(" ")[0].lower()
+        count = _SECTION_LINES.get(kind, 4)
+        if kind in ("chorus", "hook"):
+            lines = refrains.setdefault(
+                kind, _section_lines(kind, count, rng, topic, decks, imagery)
+            )
+        else:
+            lines = _section_lines(kind, count, rng, topic, decks, imagery)
+        blocks.append("\n".join([f"[{section}]", *lines]))
+    return "\n\n".join(blocks)
+
+
+def template_pack_fields(payload: GenerateRequest, variant: int = 0) -> dict[str, str]:
+    """A complete pack computed locally, without any upstream call.
+
+    Output is deterministic for a given request and ``variant``.
+    """
+    if payload.isInstrumental:
+        return local_instrumental_fields(payload)
+    instruments = " and ".join(_fallback_instruments(payload)).lower()
+    energy = _infer_energy(payload).lower()
+    genre = payload.genre or "genre-fusion"
+    seed = payload.mood or "Cinematic"
+    return {
+        "title": local_title(payload.topic),
+        "style": sanitize_style_prompt(seed, payload),
+        "lyrics": template_lyrics(payload, variant),
+        "explanation": (
+            f"Template {genre} draft with {instruments} and {energy}, following "
+            f"the {payload.structure} structure, generated locally without an AI "
+            "provider."
+        ),
+    }
+
+
+def template_extension(
+    current_lyrics: str, topic: str, style: str, language: str
+) -> str:
+    """One new section continuing ``current_lyrics``.
+
+    Adds a bridge when the song has none, otherwise the next numbered verse.
+    Genre and mood are read back from the style prompt.
+    """
+    verses = _VERSE_PATTERN.findall(current_lyrics)
+    if "[bridge" not in current_lyrics.lower():
+        section = "Bridge"
+    else:
+        section = f"Verse {max([int(n or 1) for n in verses] or [1]) + 1}"
+    rng = _rng(topic, style, current_lyrics[-200:], section)
+    kind = section.split(" ")[0].lower()
+    lines = _section_lines(
+        kind,
+        4,
+        rng,
+        _topic_phrase(topic),
+        _decks(_phrases(style), rng),
+        _imagery(style),
+    )
+    return "\n".join([f"[{section}]", *lines])
+
+
+def template_generate_response(payload: GenerateRequest) -> GenerateResponse:
+    """A full generate response from the local engine, for load shedding.
+
+    Keys outside ``payload.fields`` are blanked, as on the provider path.
+    """
+    packs = [
+        SongPack(**select_fields(template_pack_fields(payload, variant), payload))
+        for variant in range(payload.variants)
+    ]
+    return GenerateResponse(
+        **packs[0].model_dump(exclude={"quality"}),
+        providerUsed="template",
+        modelUsed=TEMPLATE_MODEL_NAME,
+        packs=packs,
+    )
+
+
+def template_extend_response(payload: ExtendRequest) -> ExtendResponse:
+    """A full extend response from the local engine, for load shedding."""
+    return ExtendResponse(
+        addedLyrics=template_extension(
+            payload.currentLyrics, payload.topic, payload.style, payload.language
+        ),
+        providerUsed="template",
+        modelUsed=TEMPLATE_MODEL_NAME,
+    )
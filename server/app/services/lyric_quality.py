@@ -0,0 +1,340 @@
+import re
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from app.services.prompt_builder import STRUCTURE_GUIDE
+
+
+_TAG_LINE = re.compile(r"^\s*\[([^\[\]]+)\]\s*$")
+_PLAN_TAG = re.compile(r"\[([^\[\]]+)\]")
+_WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+_VOWEL_GROUP = re.compile(r"[aeiouyàáâãäåæèéêëìíîïòóôõöøùúûüý]+")
+_RHYME_TAIL = re.compile(
+    r"[aeiouyàáâãäåæèéêëìíîïòóôõöøùúûüý]+[^aeiouyàáâãäåæèéêëìíîïòóôõöøùúûüý]*$"
+)
+_LATIN_LETTER = re.compile(r"[A-Za-z]")
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+# Sections whose lines are expected to repeat across the song.
+_REFRAIN_SECTIONS = {"chorus", "hook", "outro", "refrain", "post-chorus"}
+# Tags that should carry sung lines; others ([Instrumental], [Language: ..])
+# are directions and may be empty.
+_LYRIC_SECTIONS = _REFRAIN_SECTIONS | {"intro", "verse", "pre-chorus", "bridge"}
+
+MAX_DUPLICATE_LINE_RATIO = 0.3
+MAX_AVG_SYLLABLES = 18.0
+MIN_SCRIPT_LETTERS = 20
+MIN_STOP_WORD_HITS = 5
+
+_SCRIPT_RANGES: list[tuple[str, int, int]] = [
+    ("latin", 0x0041, 0x024F),
+    ("greek", 0x0370, 0x03FF),
+    ("cyrillic", 0x0400, 0x04FF),
+    ("hebrew", 0x0590, 0x05FF),
+    ("arabic", 0x0600, 0x06FF),
+    ("devanagari", 0x0900, 0x097F),
+    ("bengali", 0x0980, 0x09FF),
+    ("tamil", 0x0B80, 0x0BFF),
+    ("thai", 0x0E00, 0x0E7F),
+    ("hangul", 0x1100, 0x11FF),
+    ("kana", 0x3040, 0x30FF),
+    ("cjk", 0x4E00, 0x9FFF),
+    ("hangul", 0xAC00, 0xD7AF),
+]
+
+# Scripts a lyric in each language may be written in.
+LANGUAGE_SCRIPTS: dict[str, set[str]] = {
+    "arabic": {"arabic"},
+    "bengali": {"bengali"},
+    "chinese": {"cjk"},
+    "greek": {"greek"},
+    "hebrew": {"hebrew"},
+    "hindi": {"devanagari"},
+    "japanese": {"kana", "cjk"},
+    "korean": {"hangul"},
+    "persian": {"arabic"},
+    "russian": {"cyrillic"},
+    "tamil": {"tamil"},
+    "thai": {"thai"},
+    "ukrainian": {"cyrillic"},
+}
+
+STOP_WORDS: dict[str, set[str]] = {
+    "english": {"the", "and", "you", "is", "my", "in", "of", "to", "it", "we", "me"},
+    "spanish": {"el", "la", "que", "y", "en", "los", "mi", "tu", "es", "por", "con"},
+    "french": {"le", "la", "et", "les", "je", "tu", "est", "dans", "pas", "une", "mon"},
+    "german": {"der", "die", "und", "ich", "nicht", "ist", "das", "du", "mein", "ein"},
+    "portuguese": {"o", "que", "e", "do", "da", "em", "um", "não", "meu", "você"},
+    "italian": {"il", "che", "e", "di", "non", "la", "un", "sono", "mio", "per"},
+}
+
+
+@dataclass
+class SectionStats:
+    tag: str
+    lines: int
+    avg_syllables: float | None
+    avg_line_length: float
+
+
+@dataclass
+class QualityReport:
+    """Local lyric checks; ``passed`` is False when a repair is worthwhile."""
+
+    score: float
+    passed: bool
+    issues: list[str] = field(default_factory=list)
+    missing_sections: list[str] = field(default_factory=list)
+    duplicate_line_ratio: float = 0.0
+    rhyme_density: float = 0.0
+    language_match: bool | None = None
+    sections: list[SectionStats] = field(default_factory=list)
+    repaired: bool = False
+
+    @property
+    def needs_rewrite(self) -> bool:
+        """True when a section-only repair cannot fix every issue."""
+        return len(self.issues) > len(self.missing_sections)
+
+
+def planned_sections(structure: str) -> list[str]:
+    """Distinct section labels the structure plan asks for, lowercased."""
+    planned: list[str] = []
+    for tag in _PLAN_TAG.findall(STRUCTURE_GUIDE.get(structure, "")):
+        label = tag.strip().lower()
+        if label not in planned:
+            planned.append(label)
+    return planned
+
+
+def parse_sections(lyrics: str) -> list[tuple[str, list[str]]]:
+    """Split lyrics into ``(tag, lines)``; untagged leading lines use ``""``."""
+    sections: list[tuple[str, list[str]]] = []
+    current_tag = ""
+    current: list[str] = []
+    for raw in lyrics.splitlines():
+        match = _TAG_LINE.match(raw)
+        if match:
+            if current_tag or current:
+                sections.append((current_tag, current))
+            current_tag, current = match.group(1).strip(), []
+        elif raw.strip():
+            current.append(raw.strip())
+    if current_tag or current:
+        sections.append((current_tag, current))
+    return sections
+
+
+def _base(tag: str) -> str:
+    label = tag.split(":")[0].strip().lower()
+    return re.sub(r"\s+\d+$", "", label)
+
+
+def canonical_labels(tags: list[str]) -> list[str]:
+    """Plan-comparable labels: the second verse is ``verse 2`` however tagged."""
+    labels: list[str] = []
+    verses = 0
+    for tag in tags:
+        base = _base(tag)
+        if base == "verse":
+            verses += 1
+            labels.append("verse" if verses == 1 else f"verse {verses}")
+        else:
+            labels.append(base)
+    return labels
+
+
+def _syllables(line: str) -> int:
+    """Vowel groups in the line, a cheap and language-agnostic estimate."""
+    return len(_VOWEL_GROUP.findall(line.lower()))
+
+
+def _rhyme_key(line: str) -> str | None:
+    words = _WORD.findall(line.lower())
+    if not words:
+        return None
+    match = _RHYME_TAIL.search(words[-1])
+    return match.group(0) if match else None
+
+
+def _script_counts(text: str) -> Counter[str]:
+    counts: Counter[str] = Counter()
+    # ASCII letters are counted in one pass; only the rest is classified.
+    counts["latin"] = len(_LATIN_LETTER.findall(text))
+    for char in _NON_ASCII.findall(text):
+        if not char.isalpha():
+            continue
+        code = ord(char)
+        for script, low, high in _SCRIPT_RANGES:
+            if low <= code <= high:
+                counts[script] += 1
+                break
+    return counts
+
+
+def _language_match(text: str, language: str) -> bool | None:
+    """Script check for non-Latin languages, stop words for Latin ones.
+
+    Returns None when there is too little evidence either way.
+    """
+    normalized = (language or "English").strip().lower()
+    scripts = _script_counts(text)
+    total = sum(scripts.values())
+    if total < MIN_SCRIPT_LETTERS:
+        return None
+    dominant = scripts.most_common(1)[0][0]
+    expected = LANGUAGE_SCRIPTS.get(normalized)
+    if expected is not None:
+        return dominant in expected
+    if dominant != "latin":
+        # Latin-script language, non-Latin lyrics.
+        return normalized not in STOP_WORDS
+    if normalized not in STOP_WORDS:
+        return None
+    words = Counter(_WORD.findall(text.lower()))
+    hits = {
+        name: sum(words[word] for word in vocabulary)
+        for name, vocabulary in STOP_WORDS.items()
+    }
+    best = max(hits, key=hits.__getitem__)
+    if best == normalized or hits[best] < MIN_STOP_WORD_HITS:
+        return True
+    return hits[normalized] * 2 >= hits[best]
+
+
+def analyze_lyrics(
+    lyrics: str, structure: str, language: str, is_instrumental: bool = False
+) -> QualityReport:
+    """Score lyrics locally in well under a millisecond for a typical song."""
+    if is_instrumental:
+        return QualityReport(score=1.0, passed=True)
+
+    sections = parse_sections(lyrics)
+    labels = canonical_labels([tag for tag, _ in sections])
+    issues: list[str] = []
+
+    missing = [label for label in planned_sections(structure) if label not in labels]
+    for label in missing:
+        issues.append(f"missing section [{label.title()}]")
+
+    stats: list[SectionStats] = []
+    verse_lines: list[str] = []
+    rhyming = 0
+    rhyme_pairs = 0
+    for (tag, lines), label in zip(sections, labels):
+        if not lines:
+            stats.append(
+                SectionStats(tag=tag, lines=0, avg_syllables=None, avg_line_length=0.0)
+            )
+            continue
+        syllables = [_syllables(line) for line in lines]
+        latin = any(_LATIN_LETTER.search(line) for line in lines)
+        stats.append(
+            SectionStats(
+                tag=tag,
+                lines=len(lines),
+                avg_syllables=(
+                    round(sum(syllables) / len(lines), 2) if latin else None
+                ),
+                avg_line_length=round(sum(len(line) for line in lines) / len(lines), 2),
+            )
+        )
+        if label not in _REFRAIN_SECTIONS:
+            verse_lines.extend(line.lower() for line in lines)
+        keys = [_rhyme_key(line) for line in lines]
+        for index in range(1, len(keys)):
+            rhyme_pairs += 1
+            previous = keys[max(index - 2, 0) : index]
+            if keys[index] and keys[index] in previous:
+                rhyming += 1
+
+    if not any(stat.lines for stat in stats):
+        issues.append("no lyric lines")
+    empty = [
+        stat.tag
+        for stat, label in zip(stats, labels)
+        if stat.lines == 0 and _base(label) in _LYRIC_SECTIONS
+    ]
+    if empty:
+        issues.append(f"empty sections: {', '.join(empty)}")
+    long_sections = [
+        stat.tag or "untagged"
+        for stat in stats
+        if stat.avg_syllables is not None and stat.avg_syllables > MAX_AVG_SYLLABLES
+    ]
+    if long_sections:
+        issues.append(f"lines too long in: {', '.join(long_sections)}")
+
+    duplicate_ratio = (
+        1 - len(set(verse_lines)) / len(verse_lines) if verse_lines else 0.0
+    )
+    if duplicate_ratio > MAX_DUPLICATE_LINE_RATIO:
+        issues.append(f"repeated lines ({duplicate_ratio:.0%} of verse lines)")
+
+    language_match = _language_match(lyrics, language)
+    if language_match is False:
+        issues.append(f"lyrics are not in {language}")
+
+    score = 1.0
+    score -= min(0.15 * len(missing), 0.45)
+    score -= 0.1 if empty else 0.0
+    score -= 0.1 if long_sections else 0.0
+    score -= max(duplicate_ratio - MAX_DUPLICATE_LINE_RATIO, 0.0)
+    score -= 0.5 if language_match is False else 0.0
+    score -= 1.0 if "no lyric lines" in issues else 0.0
+    return QualityReport(
+        score=round(max(score, 0.0), 3),
+        passed=not issues,
+        issues=issues,
+        missing_sections=[label.title() for label in missing],
+        duplicate_line_ratio=round(duplicate_ratio, 3),
+        rhyme_density=round(rhyming / rhyme_pairs, 3) if rhyme_pairs else 0.0,
+        language_match=language_match,
+        sections=stats,
+    )
+
+
+def analyze_many(
+    items: Iterable[tuple[str, str, str, bool]],
+) -> list[QualityReport]:
+    """Analyse ``(lyrics, structure, language, is_instrumental)`` tuples in bulk."""
+    return [analyze_lyrics(*item) for item in items]
+
+
+def insert_sections(lyrics: str, added: str, structure: str) -> str:
+    """Splice sections from a repair reply into their planned positions.
+
+    Existing sections are matched to the plan in order; each added section is
+    placed before the first existing section planned after it.
+    """
+    plan = [
+        tag.strip().lower()
+        for tag in _PLAN_TAG.findall(STRUCTURE_GUIDE.get(structure, ""))
+    ]
+    sections = parse_sections(lyrics)
+    labels = canonical_labels([tag for tag, _ in sections])
+    positions: list[float] = []
+    pointer = 0
+    for label in labels:
+        try:
+            pointer = plan.index(label, pointer)
+        except ValueError:
+            pass
+        positions.append(pointer)
+
+    for tag, lines in parse_sections(added):
+        if not tag or not lines:
+            continue
+        label = _base(tag) if _base(tag) != "verse" else tag.strip().lower()
+        target = plan.index(label) if label in plan else len(plan)
+        index = next(
+            (i for i, position in enumerate(positions) if position > target),
+            len(sections),
+        )
+        sections.insert(index, (tag, lines))
+        positions.insert(index, target)
+
+    return "\n\n".join(
+        "\n".join(([f"[{tag}]"] if tag else []) + lines) for tag, lines in sections
+    )
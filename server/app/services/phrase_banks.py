@@ -0,0 +1,165 @@
+"""Phrase banks for the local template engine.
+
+Lines use ``{topic}``, ``{image}`` and ``{place}`` placeholders. Genre banks
+set the voice of verses and hooks; mood banks supply imagery.
+"""
+
+GENRE_PHRASES: dict[str, dict[str, list[str]]] = {
+    "pop": {
+        "verse": [
+            "I keep on thinking about {topic}",
+            "Every little moment feels like {image}",
+            "We were dancing in the {place}",
+            "Your name is written on the {image}",
+            "Turn the radio up, let it carry {topic}",
+            "Nothing else is moving but the {image}",
+        ],
+        "hook": [
+            "Oh, {topic}, don't let it go",
+            "We light it up like {image}",
+            "Say it louder, say it all night",
+            "This is ours, this is {topic}",
+        ],
+    },
+    "rock": {
+        "verse": [
+            "Engines roar across the {place}",
+            "I carved {topic} into the {image}",
+            "Broken strings and a stubborn heart",
+            "We never asked for the {image}",
+            "Back against the wall of {place}",
+            "Still standing tall through {topic}",
+        ],
+        "hook": [
+            "Raise it up, we won't back down",
+            "{topic} burning through the sound",
+            "Hear the thunder, feel the {image}",
+            "We are louder than the crowd",
+        ],
+    },
+    "rap": {
+        "verse": [
+            "Started from the {place}, now I'm telling {topic}",
+            "Every bar I spit is heavy like {image}",
+            "Counting every step, yeah, I kept it real",
+            "City never sleeps, neither do the deals",
+            "Pen to the page and the page to the {image}",
+            "They never saw me coming through {topic}",
+        ],
+        "hook": [
+            "Run it up, run it up, {topic}",
+            "Got the whole block moving to the {image}",
+            "We don't stop, we don't stop",
+            "Yeah, we made it to the top",
+        ],
+    },
+    "synthwave": {
+        "verse": [
+            "Neon rain on the {place}",
+            "Chasing {topic} through the midnight glow",
+            "Chrome reflections of the {image}",
+            "Radio static, signals from the past",
+            "Headlights fading down the {place}",
+            "Analog dreams of {topic}",
+        ],
+        "hook": [
+            "Drive into the {image}",
+            "{topic}, we're running out of night",
+            "Electric hearts in neon light",
+            "Hold on till the morning light",
+        ],
+    },
+    "ambient": {
+        "verse": [
+            "Slow light over the {place}",
+            "Breathing in {topic}",
+            "Soft echoes of the {image}",
+            "Everything drifts and settles",
+        ],
+        "hook": [
+            "Let it fall like {image}",
+            "Quiet, quiet {topic}",
+        ],
+    },
+    "jazz": {
+        "verse": [
+            "Smoke curls around the {place}",
+            "You hum a tune about {topic}",
+            "Brass and velvet, {image}",
+            "Late night stories, half a glass of blue",
+            "Piano keys remember {topic}",
+            "Counting rain drops on the {image}",
+        ],
+        "hook": [
+            "Swing low, sweet {topic}",
+            "Just you, me and the {image}",
+            "Play it slow, play it true",
+            "All night long for you",
+        ],
+    },
+}
+
+DEFAULT_GENRE_PHRASES: dict[str, list[str]] = {
+    "verse": [
+        "I carry {topic} like a quiet flame",
+        "Walking through the {place} again",
+        "Every step reminds me of the {image}",
+        "Holding on to what we made",
+        "Voices fading in the {place}",
+        "Still I'm reaching for {topic}",
+    ],
+    "hook": [
+        "{topic}, stay with me tonight",
+        "Shining like the {image}",
+        "We will find our way back home",
+        "Never walking on our own",
+    ],
+}
+
+MOOD_IMAGERY: dict[str, dict[str, list[str]]] = {
+    "happy": {
+        "image": ["summer sun", "golden sky", "open road", "bright parade"],
+        "place": ["sunlit street", "crowded beach", "rooftop party", "open field"],
+    },
+    "sad": {
+        "image": ["fading photograph", "empty chair", "cold window", "last goodbye"],
+        "place": ["empty station", "rainy street", "quiet room", "old hallway"],
+    },
+    "calm": {
+        "image": ["still water", "morning mist", "falling snow", "slow tide"],
+        "place": ["quiet shore", "mountain lake", "sleeping town", "garden path"],
+    },
+    "energetic": {
+        "image": ["lightning strike", "racing heart", "wildfire", "city lights"],
+        "place": ["main stage", "highway", "packed arena", "midnight club"],
+    },
+    "romantic": {
+        "image": ["candle light", "your reflection", "velvet night", "first kiss"],
+        "place": ["dance floor", "balcony", "moonlit bridge", "little cafe"],
+    },
+    "dark": {
+        "image": ["black smoke", "shattered glass", "storm cloud", "burning bridge"],
+        "place": ["back alley", "abandoned mill", "endless night", "cold basement"],
+    },
+}
+
+MOOD_ALIASES: dict[str, str] = {
+    "melancholic": "sad",
+    "nostalgic": "sad",
+    "dreamy": "calm",
+    "chill": "calm",
+    "peaceful": "calm",
+    "uplifting": "happy",
+    "euphoric": "happy",
+    "hopeful": "happy",
+    "aggressive": "energetic",
+    "angry": "energetic",
+    "epic": "energetic",
+    "hype": "energetic",
+    "love": "romantic",
+    "sensual": "romantic",
+    "moody": "dark",
+    "eerie": "dark",
+}
+
+DEFAULT_MOOD = "calm"
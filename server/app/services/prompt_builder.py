@@ -1,4 +1,7 @@
-from app.models.schemas import GenerateRequest
+import json
+
+from app.core.tracing import traced
+from app.models.schemas import GenerateRequest, PackField
 
 
 FIDELITY_TOKENS = ["44.1kHz", "Wide Stereo", "Clean Mix"]
@@ -12,6 +15,43 @@ STRUCTURE_GUIDE = {
     "Custom": "Create a structure that best matches the concept while keeping section labels explicit.",
 }
 
+PACK_FIELDS: tuple[PackField, ...] = ("title", "style", "lyrics", "explanation")
+
+# Output budgets, in tokens. Sections are a few short lines each; the pack
+# overhead covers title, style, explanation and JSON syntax.
+SECTION_OUTPUT_TOKENS = 90
+FIELD_OUTPUT_TOKENS = {"title": 30, "style": 80, "explanation": 90}
+JSON_OVERHEAD_TOKENS = 20
+PACK_OVERHEAD_TOKENS = JSON_OVERHEAD_TOKENS + sum(FIELD_OUTPUT_TOKENS.values())
+INSTRUMENTAL_OUTPUT_TOKENS = 320
+INSTRUMENTAL_FAST_OUTPUT_TOKENS = 160
+EXTEND_OUTPUT_TOKENS = 260
+REPAIR_OVERHEAD_TOKENS = 40
+PLAN_OUTPUT_TOKENS = 320
+STYLE_STAGE_OUTPUT_TOKENS = 160
+SECTION_TAG_TOKENS = 10
+DEFAULT_SECTION_COUNT = 8
+AMBIENT_SECTION_COUNT = 5
+
+# Scripts that tokenize into noticeably more tokens per word than English.
+DENSE_SCRIPT_LANGUAGES = {
+    "arabic",
+    "bengali",
+    "chinese",
+    "greek",
+    "hebrew",
+    "hindi",
+    "japanese",
+    "korean",
+    "persian",
+    "russian",
+    "tamil",
+    "thai",
+    "ukrainian",
+}
+DENSE_SCRIPT_FACTOR = 1.6
+LATIN_NON_ENGLISH_FACTOR = 1.2
+
 INSTRUMENT_HINTS = [
     "guitar",
     "piano",
@@ -92,6 +132,7 @@ def _dedupe(tokens: list[str]) -> list[str]:
     return ordered
 
 
+@traced("prompt.sanitize_style")
 def sanitize_style_prompt(style: str, payload: GenerateRequest) -> str:
     raw_tokens = [part.strip() for part in (style or "").split(",") if part.strip()]
     extracted_instruments = _extract_instruments(style)
@@ -133,6 +174,51 @@ def sanitize_style_prompt(style: str, payload: GenerateRequest) -> str:
     return style_prompt[:200].rstrip(", ")
 
 
+def structure_section_count(structure: str) -> int:
+    """Number of sections the structure plan asks for."""
+    if structure == "Ambient":
+        return AMBIENT_SECTION_COUNT
+    plan = STRUCTURE_GUIDE.get(structure, "")
+    return plan.count("[") or DEFAULT_SECTION_COUNT
+
+
+def _language_factor(language: str) -> float:
+    normalized = (language or "English").strip().lower()
+    if normalized == "english":
+        return 1.0
+    if normalized in DENSE_SCRIPT_LANGUAGES:
+        return DENSE_SCRIPT_FACTOR
+    return LATIN_NON_ENGLISH_FACTOR
+
+
+def requested_fields(payload: GenerateRequest) -> tuple[PackField, ...]:
+    """Pack keys the caller wants generated, in canonical order."""
+    if not payload.fields:
+        return PACK_FIELDS
+    return tuple(name for name in PACK_FIELDS if name in payload.fields)
+
+
+def compute_output_budget(payload: GenerateRequest) -> int:
+    """Max output tokens for one generated pack, counting requested keys only."""
+    fields = requested_fields(payload)
+    overhead = JSON_OVERHEAD_TOKENS + sum(
+        FIELD_OUTPUT_TOKENS.get(name, 0) for name in fields
+    )
+    if "lyrics" not in fields:
+        return overhead
+    if payload.isInstrumental:
+        return INSTRUMENTAL_OUTPUT_TOKENS - PACK_OVERHEAD_TOKENS + overhead
+    sections = structure_section_count(payload.structure)
+    lyric_tokens = sections * SECTION_OUTPUT_TOKENS * _language_factor(payload.language)
+    return int(overhead + lyric_tokens)
+
+
+def compute_extend_budget(language: str) -> int:
+    """Max output tokens for one added section."""
+    return int(EXTEND_OUTPUT_TOKENS * _language_factor(language))
+
+
+@traced("prompt.build_generation")
 def build_generation_messages(payload: GenerateRequest) -> tuple[str, str]:
     weirdness = (
         f"Weirdness: {payload.weirdness}."
@@ -145,19 +231,27 @@ def build_generation_messages(payload: GenerateRequest) -> tuple[str, str]:
         else "Style influence: choose automatically based on genre and topic."
     )
 
+    # Only the requested keys are asked for: every key the model skips is
+    # output it never has to write.
+    fields = requested_fields(payload)
     system_instruction = (
         "You are a senior Suno v5 producer and lyricist. "
-        "Return ONLY valid JSON with keys: title, style, lyrics, explanation. "
+        f"Return ONLY valid JSON with keys: {', '.join(fields)}. "
         "All values must be non-empty strings. "
-        "The style string must be tag-based and <= 200 characters. "
-        "Use top-loaded style ordering: [Mood], [Energy], [2 core instruments], "
-        "[Vocal identity], [Genre], then fidelity tokens. "
-        "Always include fidelity tokens: 44.1kHz, Wide Stereo, Clean Mix. "
-        "If instrumental is true, do not create sung lyrics. Return [Instrumental] and optional arrangement tags. "
-        "If non-English language requested, include explicit language tag in lyrics headers when helpful."
     )
-
-    structure_plan = STRUCTURE_GUIDE.get(payload.structure, STRUCTURE_GUIDE["Auto"])
+    if "style" in fields:
+        system_instruction += (
+            "The style string must be tag-based and <= 200 characters. "
+            "Use top-loaded style ordering: [Mood], [Energy], [2 core instruments], "
+            "[Vocal identity], [Genre], then fidelity tokens. "
+            "Always include fidelity tokens: 44.1kHz, Wide Stereo, Clean Mix. "
+        )
+    if "lyrics" in fields:
+        system_instruction += (
+            "If instrumental is true, do not create sung lyrics. Return [Instrumental] and optional arrangement tags. "
+            "If non-English language requested, include explicit language tag in lyrics headers when helpful."
+        )
+    system_instruction = system_instruction.rstrip()
 
     user_prompt = (
         f"Topic: {payload.topic}\n"
@@ -169,14 +263,62 @@ def build_generation_messages(payload: GenerateRequest) -> tuple[str, str]:
         f"Language: {payload.language}\n"
         f"Instrumental: {payload.isInstrumental}\n"
         f"{weirdness}\n"
-        f"{style_influence}\n"
-        f"Structure plan: {structure_plan}\n"
-        "Write natural, concise sections with Suno metatags like [Intro], [Verse], [Chorus], [Bridge], [Outro]."
+        f"{style_influence}"
     )
+    if "lyrics" in fields:
+        structure_plan = STRUCTURE_GUIDE.get(payload.structure, STRUCTURE_GUIDE["Auto"])
+        user_prompt += (
+            f"\nStructure plan: {structure_plan}\n"
+            "Write natural, concise sections with Suno metatags like [Intro], [Verse], [Chorus], [Bridge], [Outro]."
+        )
 
     return system_instruction, user_prompt
 
 
+@traced("prompt.build_instrumental")
+def build_instrumental_messages(payload: GenerateRequest) -> tuple[str, str]:
+    """Minimal prompt for the instrumental fast path.
+
+    Style is computed locally, so the model only writes a title, arrangement
+    tags and a one-sentence explanation.
+    """
+    fields = requested_fields(payload)
+    keys = [
+        key
+        for key, field in (
+            ("title", "title"),
+            ("arrangement", "lyrics"),
+            ("explanation", "explanation"),
+        )
+        if field in fields
+    ]
+    system_instruction = (
+        "You are a senior Suno v5 producer arranging an instrumental track. "
+        f"Return ONLY valid JSON with keys: {', '.join(keys)}. "
+    )
+    if "arrangement" in keys:
+        system_instruction += (
+            "arrangement is an array of 4-8 Suno section tags such as [Intro], [Build], "
+            "[Drop], [Breakdown], [Solo: Instrument], [Outro]. "
+        )
+    if "explanation" in keys:
+        system_instruction += "explanation is one short sentence. "
+    system_instruction += "No lyrics."
+
+    structure_plan = STRUCTURE_GUIDE.get(payload.structure, STRUCTURE_GUIDE["Auto"])
+
+    user_prompt = (
+        f"Topic: {payload.topic}\n"
+        f"Genre: {payload.genre or 'Any'}\n"
+        f"Mood: {payload.mood or 'Any'}\n"
+        f"Tempo: {payload.tempo or 'Any'}\n"
+        f"Structure plan: {structure_plan}"
+    )
+
+    return system_instruction, user_prompt
+
+
+@traced("prompt.build_extend")
 def build_extend_messages(
     current_lyrics: str, topic: str, style: str, language: str
 ) -> tuple[str, str]:
@@ -185,12 +327,173 @@ def build_extend_messages(
         "Return only NEW lines with section tags. Do not repeat existing lines."
     )
 
+    # The song comes first and the instruction last, so successive extends of
+    # one song share a growing prompt prefix that providers can cache.
     user_prompt = (
-        "Extend these lyrics with one additional coherent section.\n\n"
         f"Topic: {topic}\n"
         f"Style: {style or 'Any'}\n"
         f"Language: {language}\n\n"
-        f"Current lyrics:\n{current_lyrics}"
+        f"Current lyrics:\n{current_lyrics}\n\n"
+        "Extend these lyrics with one additional coherent section."
+    )
+
+    return system_instruction, user_prompt
+
+
+@traced("prompt.build_repair")
+def build_repair_messages(
+    payload: GenerateRequest,
+    lyrics: str,
+    issues: list[str],
+    missing_sections: list[str],
+    rewrite: bool,
+) -> tuple[str, str]:
+    """Targeted fix for lyrics that failed the local quality gate.
+
+    Without ``rewrite`` the model writes only the missing sections, which are
+    spliced in locally. With it, the model returns the corrected full lyrics.
+    """
+    system_instruction = (
+        "You repair Suno-ready lyrics. Return plain text only, no markdown fences. "
+        "Use [Section] tags on their own lines."
+    )
+    if rewrite:
+        task = (
+            "Rewrite these lyrics to fix the listed problems. Keep the topic, "
+            "voice and every good line; return the complete corrected lyrics."
+        )
+    else:
+        tags = ", ".join(f"[{section}]" for section in missing_sections)
+        task = (
+            f"Write only these missing sections: {tags}. Match the existing "
+            "voice and rhyme scheme. Do not repeat existing sections."
+        )
+    user_prompt = (
+        f"{task}\n\n"
+        f"Problems: {'; '.join(issues)}\n"
+        f"Topic: {payload.topic}\n"
+        f"Language: {payload.language}\n"
+        f"Structure: {STRUCTURE_GUIDE.get(payload.structure, '')}\n\n"
+        f"Current lyrics:\n{lyrics}"
+    )
+    return system_instruction, user_prompt
+
+
+@traced("prompt.build_refine")
+def build_refine_messages(
+    payload: GenerateRequest, draft: dict[str, str]
+) -> tuple[str, str]:
+    """Second tier of tiered generation: improve a fast model's draft pack.
+
+    The system instruction is the regular generation one, so both tiers
+    share a cacheable prefix and the reply parses like any other pack.
+    """
+    system_instruction, user_prompt = build_generation_messages(payload)
+    fields = requested_fields(payload)
+    draft_json = json.dumps(
+        {name: draft.get(name, "") for name in fields}, ensure_ascii=False
     )
+    user_prompt += (
+        f"\n\nDraft from a faster model:\n{draft_json}\n"
+        "Refine this draft instead of starting over: keep its concept and best "
+        "lines, tighten weak lines, fix structure, rhyme and meter, and return "
+        "the complete improved pack with the same keys."
+    )
+    return system_instruction, user_prompt
+
 
+@traced("prompt.build_plan")
+def build_plan_messages(
+    payload: GenerateRequest, sections: list[str]
+) -> tuple[str, str]:
+    """Planning stage of staged generation: section briefs and hooks only.
+
+    ``sections`` is the local structure plan, offered as a starting point.
+    """
+    system_instruction = (
+        "You are a senior Suno v5 songwriter planning a song before it is written. "
+        "Return ONLY valid JSON with keys: theme, hooks, sections. "
+        "theme is one sentence. hooks is an array of 1-3 short, singable lines "
+        "for the chorus or hook. sections is an array of objects with keys tag "
+        "and brief, in song order; tag is a Suno section name without brackets "
+        "(e.g. Verse 2) and brief is one sentence on what that section says. "
+        "Repeated sections such as the chorus reuse the same tag. No lyrics."
+    )
+    user_prompt = (
+        f"Topic: {payload.topic}\n"
+        f"Genre base: {payload.genre or 'Any'}\n"
+        f"Mood: {payload.mood or 'Any'}\n"
+        f"Voice: {payload.voice}\n"
+        f"Language: {payload.language}\n"
+        f"Structure: {payload.structure}\n"
+        f"Suggested sections: {', '.join(sections)}"
+    )
     return system_instruction, user_prompt
+
+
+@traced("prompt.build_section")
+def build_section_messages(
+    payload: GenerateRequest,
+    theme: str,
+    hooks: list[str],
+    outline: list[tuple[str, str]],
+    tag: str,
+) -> tuple[str, str]:
+    """Lyrics stage: one section, written with the whole outline in view."""
+    system_instruction = (
+        "You write one section of Suno-ready lyrics. Return plain text only, "
+        "no markdown fences. Start with the section tag on its own line, then "
+        "the lyric lines. Write only the requested section."
+    )
+    brief = next((item for name, item in outline if name == tag), "")
+    plan = "\n".join(f"[{name}] {item}" for name, item in outline)
+    user_prompt = (
+        f"Write the [{tag}] section: {brief}\n\n"
+        f"Topic: {payload.topic}\n"
+        f"Genre: {payload.genre or 'Any'}\n"
+        f"Mood: {payload.mood or 'Any'}\n"
+        f"Language: {payload.language}\n"
+        f"Theme: {theme}\n"
+        f"Hooks: {' / '.join(hooks) or 'none'}\n"
+        f"Song outline:\n{plan}"
+    )
+    return system_instruction, user_prompt
+
+
+@traced("prompt.build_style")
+def build_style_messages(payload: GenerateRequest, theme: str) -> tuple[str, str]:
+    """Title and style stage; runs in parallel with the lyrics stage."""
+    system_instruction = (
+        "You are a senior Suno v5 producer. "
+        "Return ONLY valid JSON with keys: title, style, explanation. "
+        "The style string must be tag-based and <= 200 characters, top-loaded as "
+        "[Mood], [Energy], [2 core instruments], [Vocal identity], [Genre]. "
+        "explanation is one or two sentences on the creative direction."
+    )
+    user_prompt = (
+        f"Topic: {payload.topic}\n"
+        f"Theme: {theme}\n"
+        f"Genre base: {payload.genre or 'Any'}\n"
+        f"Mood: {payload.mood or 'Any'}\n"
+        f"Voice: {payload.voice}\n"
+        f"Tempo: {payload.tempo or 'Any'}"
+    )
+    return system_instruction, user_prompt
+
+
+def compute_section_budget(language: str) -> int:
+    """Max output tokens for one section written by the lyrics stage."""
+    return int(SECTION_OUTPUT_TOKENS * _language_factor(language)) + SECTION_TAG_TOKENS
+
+
+def compute_repair_budget(
+    payload: GenerateRequest, missing_sections: list[str], rewrite: bool
+) -> int:
+    """Max output tokens for one repair call."""
+    sections = (
+        structure_section_count(payload.structure)
+        if rewrite
+        else max(len(missing_sections), 1)
+    )
+    lyric_tokens = sections * SECTION_OUTPUT_TOKENS * _language_factor(payload.language)
+    return int(REPAIR_OVERHEAD_TOKENS + lyric_tokens)
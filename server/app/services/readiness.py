@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Literal
+
+from app.providers.router import ProviderRouter
+
+
+logger = logging.getLogger(__name__)
+
+ProbeStatus = Literal["pending", "ok", "error"]
+
+
+@dataclass
+class ProbeResult:
+    provider: str
+    status: ProbeStatus = "pending"
+    latency_ms: float | None = None
+    error: str | None = None
+    checked_at: float | None = None
+
+
+class ProviderProber:
+    """Background prober behind ``/api/ready``.
+
+    Every ``interval_seconds`` each configured provider gets one cheap
+    ``probe`` call, run in parallel so a slow upstream does not delay the
+    others. The first round doubles as connection-pool warm-up. Readers only
+    see cached results, so the readiness endpoint never waits on upstreams.
+    """
+
+    def __init__(
+        self,
+        provider_router: ProviderRouter,
+        interval_seconds: float = 30.0,
+        timeout_seconds: float = 5.0,
+    ):
+        self._provider_router = provider_router
+        self._interval_seconds = interval_seconds
+        self._timeout_seconds = timeout_seconds
+        self._results: dict[str, ProbeResult] = {
+            name: ProbeResult(provider=name) for name in provider_router.configured
+        }
+        self._lock = threading.Lock()
+        self._warm = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def warm(self) -> bool:
+        return self._warm.is_set()
+
+    @property
+    def ready(self) -> bool:
+        """Warm, and at least one provider answered its last probe."""
+        return self.warm and any(
+            result.status == "ok" for result in self._results.values()
+        )
+
+    def results(self) -> list[ProbeResult]:
+        return list(self._results.values())
+
+    def _probe_one(self, provider_router: ProviderRouter, name: str) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            provider_router.get_provider(name).probe(self._timeout_seconds)
+        except Exception as exc:  # noqa: BLE001
+            return ProbeResult(
+                provider=name,
+                status="error",
+                latency_ms=round((time.perf_counter() - started) * 1000, 2),
+                error=str(exc),
+                checked_at=time.time(),
+            )
+        return ProbeResult(
+            provider=name,
+            status="ok",
+            latency_ms=round((time.perf_counter() - started) * 1000, 2),
+            checked_at=time.time(),
+        )
+
+    def _probe_router(self, provider_router: ProviderRouter) -> list[ProbeResult]:
+        names = provider_router.configured
+        if not names:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=len(names), thread_name_prefix="provider-probe"
+        ) as pool:
+            results = list(
+                pool.map(lambda name: self._probe_one(provider_router, name), names)
+            )
+        for result in results:
+            if result.status == "error":
+                logger.warning(
+                    "provider_probe_failed",
+                    extra={
+                        "event": "provider_probe_failed",
+                        "provider": result.provider,
+                        "duration_ms": result.latency_ms,
+                    },
+                )
+        return results
+
+    def probe_all(self) -> list[ProbeResult]:
+        provider_router = self._provider_router
+        results = self._probe_router(provider_router)
+        with self._lock:
+            # A round that raced a retarget describes the old router; drop it.
+            if provider_router is self._provider_router:
+                self._results = {result.provider: result for result in results}
+        self._warm.set()
+        return results
+
+    def retarget(self, provider_router: ProviderRouter) -> list[ProbeResult]:
+        """Probe a freshly built router, then report on it from now on.
+
+        Probing before the switch warms the new clients' connection pools
+        before any request reaches them.
+        """
+        results = self._probe_router(provider_router)
+        with self._lock:
+            self._provider_router = provider_router
+            self._results = {result.provider: result for result in results}
+        return results
+
+    def _run(self) -> None:
+        self.probe_all()
+        while not self._stop.wait(self._interval_seconds):
+            self.probe_all()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="provider-prober", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._timeout_seconds + 1)
+            self._thread = None
@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from typing import Literal
+
+from app.services.song_store import SongRecord, encode_cursor
+
+
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = [
+    "id",
+    "cursor",
+    "createdAt",
+    "kind",
+    "providerUsed",
+    "modelUsed",
+    "latencyMs",
+    "topic",
+    "genre",
+    "mood",
+    "structure",
+    "language",
+    "title",
+    "style",
+    "lyrics",
+    "explanation",
+    "request",
+]
+
+# Records per CSV chunk and per Parquet row group.
+EXPORT_BATCH_SIZE = 500
+
+
+class ExportUnavailableError(RuntimeError):
+    """The requested export format needs an optional dependency."""
+
+
+def export_row(record: SongRecord) -> dict[str, object]:
+    """Flat export view of a record; ``cursor`` resumes the export after it."""
+    return {
+        "id": record.id,
+        "cursor": encode_cursor(record.id or 0),
+        "createdAt": record.created_at,
+        "kind": record.kind,
+        "providerUsed": record.provider,
+        "modelUsed": record.model,
+        "latencyMs": record.latency_ms,
+        "topic": record.topic,
+        "genre": record.genre,
+        "mood": record.mood,
+        "structure": record.structure,
+        "language": record.language,
+        "title": record.title,
+        "style": record.style,
+        "lyrics": record.lyrics,
+        "explanation": record.explanation,
+        "request": record.request,
+    }
+
+
+def _batches(records: Iterable[SongRecord]) -> Iterator[list[SongRecord]]:
+    batch: list[SongRecord] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(records: Iterable[SongRecord]) -> Iterator[bytes]:
+    for batch in _batches(records):
+        yield "".join(
+            json.dumps(export_row(record), ensure_ascii=False) + "\n"
+            for record in batch
+        ).encode()
+
+
+def csv_chunks(records: Iterable[SongRecord]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in _batches(records):
+        for record in batch:
+            row = export_row(record)
+            row["request"] = json.dumps(row["request"], ensure_ascii=False)
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_chunks(records: Iterable[SongRecord]) -> Iterator[bytes]:
+    """Stream a Parquet file, one row group per batch.
+
+    Requires the optional ``pyarrow`` package. The import happens before the
+    first chunk so a missing dependency fails before any bytes are sent.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ExportUnavailableError(
+            "Parquet export requires the optional 'pyarrow' package."
+        ) from exc
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("cursor", pa.string()),
+            ("createdAt", pa.float64()),
+            ("kind", pa.string()),
+            ("providerUsed", pa.string()),
+            ("modelUsed", pa.string()),
+            ("latencyMs", pa.float64()),
+            *[(name, pa.string()) for name in EXPORT_COLUMNS[7:]],
+        ]
+    )
+
+    def chunks() -> Iterator[bytes]:
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for batch in _batches(records):
+                rows = [export_row(record) for record in batch]
+                for row in rows:
+                    row["request"] = json.dumps(row["request"], ensure_ascii=False)
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return chunks()
+
+
+def export_chunks(
+    records: Iterable[SongRecord], export_format: ExportFormat
+) -> Iterator[bytes]:
+    if export_format == "csv":
+        return csv_chunks(records)
+    if export_format == "parquet":
+        return parquet_chunks(records)
+    return ndjson_chunks(records)
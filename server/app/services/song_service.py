@@ -1,15 +1,38 @@
 import logging
+from time import perf_counter
 
 from fastapi import HTTPException
 
+from app.core.config import DEFAULT_INSTRUMENTAL_MODE, DEFAULT_LYRIC_REPAIR
+from app.core.deadline import current_deadline
+from app.core.tracing import span
+from app.core.traffic import UpstreamCall, record_upstream, recording_upstream
 from app.models.schemas import (
     ExtendRequest,
     ExtendResponse,
     GenerateRequest,
     GenerateResponse,
+    LyricQuality,
+    SectionQuality,
+    SongPack,
 )
-from app.providers.base import ProviderError, ProviderErrorCode
+from app.providers.base import (
+    BaseLlmProvider,
+    GenerateProviderResult,
+    ProviderError,
+    ProviderErrorCode,
+    ProviderResult,
+    TokenUsage,
+)
+from app.providers.parsing import select_fields
 from app.providers.router import ProviderRouter
+from app.providers.template_provider import TEMPLATE_PROVIDER_NAME
+from app.services.instrumental import local_instrumental_fields
+from app.services.lyric_quality import QualityReport, analyze_lyrics, insert_sections
+from app.services.prompt_builder import PACK_FIELDS, requested_fields
+from app.services.song_store import SongRecord, SongStore
+from app.services.staged_generation import StagedGenerator
+from app.services.usage import UsageLedger
 
 
 logger = logging.getLogger(__name__)
@@ -22,6 +45,7 @@ def _friendly_reason(error: ProviderError) -> str:
         ProviderErrorCode.QUOTA: "Provider credits or quota are exhausted.",
         ProviderErrorCode.RATE_LIMIT: "Provider is rate limited. Try again shortly.",
         ProviderErrorCode.TIMEOUT: "Provider request timed out.",
+        ProviderErrorCode.DEADLINE: "Request deadline was exceeded.",
         ProviderErrorCode.NETWORK: "Network issue while contacting provider.",
         ProviderErrorCode.INVALID_RESPONSE: "Provider returned invalid response format.",
         ProviderErrorCode.UNKNOWN: "Unknown provider error occurred.",
@@ -36,6 +60,7 @@ def _http_status_for_error(error: ProviderError) -> int:
         ProviderErrorCode.RATE_LIMIT: 429,
         ProviderErrorCode.CONFIGURATION: 503,
         ProviderErrorCode.TIMEOUT: 503,
+        ProviderErrorCode.DEADLINE: 504,
         ProviderErrorCode.NETWORK: 503,
         ProviderErrorCode.INVALID_RESPONSE: 502,
         ProviderErrorCode.UNKNOWN: 503,
@@ -50,44 +75,579 @@ def _format_error(provider_name: str, error: ProviderError) -> str:
     )
 
 
+# "full" sends instrumentals through the lyric prompt, "fast" asks the provider
+# only for title and arrangement, "local" makes no upstream call at all.
+INSTRUMENTAL_MODES = {"full", "fast", "local"}
+LOCAL_INSTRUMENTAL_MODEL = "instrumental-v1"
+
+# Errors raised before any upstream call; they say nothing about provider health.
+_LOCAL_ERROR_CODES = {ProviderErrorCode.CONFIGURATION, ProviderErrorCode.DEADLINE}
+
+
+def _deadline_error(attempt_index: int, provider: object) -> ProviderError | None:
+    """Return an error when the request deadline rules out this attempt.
+
+    The first attempt always runs while any budget remains; fallbacks only run
+    when the budget still covers a typical upstream call. Local providers
+    need no budget and are never skipped.
+    """
+    deadline = current_deadline()
+    if deadline is None or not getattr(provider, "requires_upstream", True):
+        return None
+    if deadline.expired or (attempt_index > 0 and not deadline.allows_attempt()):
+        return ProviderError(
+            "Request deadline exceeded before this provider was tried.",
+            code=ProviderErrorCode.DEADLINE,
+        )
+    return None
+
+
+def _drop_unrequested_fields(
+    results: list[GenerateProviderResult], payload: GenerateRequest
+) -> None:
+    """Blank pack keys the caller did not ask for.
+
+    Upstream replies already omit them; staged and template packs fill every
+    key regardless.
+    """
+    wanted = requested_fields(payload)
+    for result in results:
+        for name in PACK_FIELDS:
+            if name not in wanted:
+                setattr(result, name, "")
+
+
+def _upstream_call(
+    provider_name: str,
+    operation: str,
+    latency_ms: float,
+    error: ProviderError | None,
+    results: list[ProviderResult] | None,
+) -> UpstreamCall:
+    """Traffic-recording view of one attempt: sizes and timing, no content."""
+    results = results or []
+    billed = [
+        item
+        for result in results
+        for item in (getattr(result, "stages", None) or [result])
+    ]
+    usage = sum((item.usage for item in billed if item.usage), TokenUsage())
+    return UpstreamCall(
+        provider=provider_name,
+        model=results[0].model_name if results else "",
+        operation=operation,
+        latency_ms=round(latency_ms, 2),
+        error=error.code.value if error is not None else None,
+        retryable=error.retryable if error is not None else False,
+        outputs=[
+            {
+                name: len(value)
+                for name, value in vars(result).items()
+                if isinstance(value, str)
+                and name not in ("provider_name", "model_name")
+            }
+            for result in results
+        ],
+        truncated=any(result.truncated for result in results),
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+    )
+
+
+def _quality_model(report: QualityReport | None) -> LyricQuality | None:
+    if report is None:
+        return None
+    return LyricQuality(
+        score=report.score,
+        passed=report.passed,
+        repaired=report.repaired,
+        issues=report.issues,
+        missingSections=report.missing_sections,
+        duplicateLineRatio=report.duplicate_line_ratio,
+        rhymeDensity=report.rhyme_density,
+        languageMatch=report.language_match,
+        sections=[
+            SectionQuality(
+                tag=section.tag,
+                lines=section.lines,
+                avgSyllables=section.avg_syllables,
+                avgLineLength=section.avg_line_length,
+            )
+            for section in report.sections
+        ],
+    )
+
+
 class SongService:
-    def __init__(self, provider_router: ProviderRouter):
+    def __init__(
+        self,
+        provider_router: ProviderRouter,
+        usage_ledger: UsageLedger | None = None,
+        instrumental_mode: str = DEFAULT_INSTRUMENTAL_MODE,
+        song_store: SongStore | None = None,
+        lyric_repair: bool = DEFAULT_LYRIC_REPAIR,
+        staged_generator: StagedGenerator | None = None,
+        draft_models: dict[str, str] | None = None,
+    ):
         self._provider_router = provider_router
+        self._draft_models = {
+            name: model for name, model in (draft_models or {}).items() if model
+        }
+        self._staged_generator = staged_generator
+        self._usage_ledger = usage_ledger
+        self._song_store = song_store
+        self._lyric_repair = lyric_repair
+        self._instrumental_mode = (
+            instrumental_mode
+            if instrumental_mode in INSTRUMENTAL_MODES
+            else DEFAULT_INSTRUMENTAL_MODE
+        )
 
     @property
     def provider_router(self) -> ProviderRouter:
         return self._provider_router
 
+    @property
+    def usage_ledger(self) -> UsageLedger | None:
+        return self._usage_ledger
+
+    @property
+    def song_store(self) -> SongStore | None:
+        return self._song_store
+
+    def _record_attempt(
+        self,
+        provider_name: str,
+        operation: str,
+        started: float,
+        error: ProviderError | None = None,
+        results: list[ProviderResult] | None = None,
+    ) -> None:
+        if error is not None and error.code in _LOCAL_ERROR_CODES:
+            return
+        latency_ms = (perf_counter() - started) * 1000
+        self._provider_router.record_outcome(
+            provider_name, operation, latency_ms, ok=error is None
+        )
+        if recording_upstream():
+            record_upstream(
+                _upstream_call(provider_name, operation, latency_ms, error, results)
+            )
+
+    def _log_truncation(self, results: list[ProviderResult], operation: str) -> None:
+        for result in results:
+            if result.truncated:
+                logger.info(
+                    f"{operation}_output_truncated",
+                    extra={
+                        "event": f"{operation}_output_truncated",
+                        "provider": result.provider_name,
+                        "model": result.model_name,
+                    },
+                )
+
+    def _record_usage(
+        self,
+        results: list[ProviderResult],
+        structure: str | None = None,
+        price_factor: float = 1.0,
+    ) -> None:
+        if self._usage_ledger is None:
+            return
+        # Staged packs are billed per stage, each to its own provider and model.
+        billed = [
+            item
+            for result in results
+            for item in (getattr(result, "stages", None) or [result])
+        ]
+        for result in billed:
+            if result.usage is None:
+                continue
+            cost = self._usage_ledger.record(
+                result.provider_name, result.model_name, result.usage, price_factor
+            )
+            logger.info(
+                "provider_usage",
+                extra={
+                    "event": "provider_usage",
+                    "provider": result.provider_name,
+                    "model": result.model_name,
+                    "structure": structure,
+                    "prompt_tokens": result.usage.prompt_tokens,
+                    "completion_tokens": result.usage.completion_tokens,
+                    "cached_tokens": result.usage.cached_tokens,
+                    "cost_usd": cost,
+                },
+            )
+
+    def _quality_gate(
+        self,
+        provider: BaseLlmProvider,
+        payload: GenerateRequest,
+        results: list[GenerateProviderResult],
+        repair: bool = True,
+    ) -> list[QualityReport | None]:
+        """Score every pack locally and repair failing ones in place.
+
+        Packs generated without lyrics have nothing to score and get None.
+        """
+        if "lyrics" not in requested_fields(payload):
+            return [None] * len(results)
+        reports: list[QualityReport | None] = []
+        for result in results:
+            with span("quality.analyze") as analyze_span:
+                report = analyze_lyrics(
+                    result.lyrics,
+                    payload.structure,
+                    payload.language,
+                    payload.isInstrumental,
+                )
+                analyze_span.set_attributes(score=report.score, passed=report.passed)
+            if not report.passed and repair and self._lyric_repair:
+                with span(
+                    "quality.repair", provider=result.provider_name
+                ) as repair_span:
+                    report = self._repair(provider, payload, result, report)
+                    repair_span.set_attribute("repaired", report.repaired)
+            reports.append(report)
+        return reports
+
+    def _repair(
+        self,
+        provider: BaseLlmProvider,
+        payload: GenerateRequest,
+        result: GenerateProviderResult,
+        report: QualityReport,
+    ) -> QualityReport:
+        """One targeted repair call; kept only if it raises the local score."""
+        deadline = current_deadline()
+        if deadline is not None and not deadline.allows_attempt():
+            return report
+        rewrite = report.needs_rewrite
+        try:
+            fixed = provider.repair_lyrics(
+                payload, result.lyrics, report.issues, report.missing_sections, rewrite
+            )
+        except ProviderError as exc:
+            logger.info(
+                "lyric_repair_failed",
+                extra={
+                    "event": "lyric_repair_failed",
+                    "provider": result.provider_name,
+                    "code": exc.code.value,
+                },
+            )
+            return report
+        self._record_usage([fixed], structure=payload.structure)
+        if rewrite and fixed.truncated:
+            return report
+        lyrics = (
+            fixed.added_lyrics
+            if rewrite
+            else insert_sections(result.lyrics, fixed.added_lyrics, payload.structure)
+        )
+        repaired = analyze_lyrics(
+            lyrics, payload.structure, payload.language, payload.isInstrumental
+        )
+        logger.info(
+            "lyric_repair",
+            extra={
+                "event": "lyric_repair",
+                "provider": result.provider_name,
+                "structure": payload.structure,
+                "score_before": report.score,
+                "score_after": repaired.score,
+            },
+        )
+        if repaired.score <= report.score:
+            return report
+        result.lyrics = lyrics
+        repaired.repaired = True
+        return repaired
+
+    def _generate_local_instrumental(
+        self, payload: GenerateRequest
+    ) -> GenerateResponse:
+        fields = select_fields(local_instrumental_fields(payload), payload)
+        pack = SongPack(**fields)
+        return GenerateResponse(
+            **fields,
+            providerUsed=TEMPLATE_PROVIDER_NAME,
+            modelUsed=LOCAL_INSTRUMENTAL_MODEL,
+            packs=[pack] * payload.variants,
+        )
+
     def generate(self, payload: GenerateRequest) -> GenerateResponse:
-        errors: list[str] = []
-        last_error: ProviderError | None = None
-        order = self._provider_router.resolve_order(payload.provider)
-        for provider_name in order:
-            try:
-                provider = self._provider_router.get_provider(provider_name)
-                result = provider.generate_pack(payload)
-                return GenerateResponse(
+        started = perf_counter()
+        with span(
+            "song.generate",
+            structure=payload.structure,
+            variants=payload.variants,
+            instrumental=payload.isInstrumental,
+        ) as generate_span:
+            response = self._generate(payload)
+            generate_span.set_attributes(
+                provider=response.providerUsed, model=response.modelUsed
+            )
+        self._store_generated(payload, response, (perf_counter() - started) * 1000)
+        return response
+
+    def _store_generated(
+        self, payload: GenerateRequest, response: GenerateResponse, latency_ms: float
+    ) -> None:
+        if self._song_store is None:
+            return
+        self._song_store.add(
+            SongRecord(
+                kind="generate",
+                provider=response.providerUsed,
+                model=response.modelUsed,
+                latency_ms=latency_ms,
+                topic=payload.topic,
+                genre=payload.genre,
+                mood=payload.mood,
+                structure=payload.structure,
+                language=payload.language,
+                title=response.title,
+                style=response.style,
+                lyrics=response.lyrics,
+                explanation=response.explanation,
+                request=payload.model_dump(),
+                response=response.model_dump(),
+            )
+        )
+
+    def finish_batch_result(
+        self,
+        payload: GenerateRequest,
+        result: GenerateProviderResult,
+        latency_ms: float,
+        price_factor: float = 1.0,
+    ) -> GenerateResponse:
+        """Bill, score and store one pack that came back from a provider batch.
+
+        The quality gate only scores here: a repair would be an interactive
+        call, which is what batch mode keeps bulk work away from.
+        """
+        self._record_usage([result], payload.structure, price_factor)
+        self._log_truncation([result], "generate")
+        report = (
+            analyze_lyrics(
+                result.lyrics,
+                payload.structure,
+                payload.language,
+                payload.isInstrumental,
+            )
+            if "lyrics" in requested_fields(payload)
+            else None
+        )
+        quality = _quality_model(report)
+        response = GenerateResponse(
+            title=result.title,
+            style=result.style,
+            lyrics=result.lyrics,
+            explanation=result.explanation,
+            providerUsed=result.provider_name,  # type: ignore[arg-type]
+            modelUsed=result.model_name,
+            packs=[
+                SongPack(
                     title=result.title,
                     style=result.style,
                     lyrics=result.lyrics,
                     explanation=result.explanation,
-                    providerUsed=result.provider_name,  # type: ignore[arg-type]
-                    modelUsed=result.model_name,
-                )
-            except ProviderError as exc:
-                last_error = exc
-                errors.append(_format_error(provider_name, exc))
-                logger.warning(
-                    "generate_provider_failed",
-                    extra={
-                        "event": "generate_provider_failed",
-                        "provider": provider_name,
-                        "code": exc.code.value,
-                        "retryable": exc.retryable,
-                    },
+                    quality=quality,
                 )
+            ],
+            quality=quality,
+        )
+        self._store_generated(payload, response, latency_ms)
+        return response
+
+    def _pack_response(
+        self,
+        provider: BaseLlmProvider,
+        payload: GenerateRequest,
+        results: list[GenerateProviderResult],
+        repair: bool = True,
+    ) -> GenerateResponse:
+        _drop_unrequested_fields(results, payload)
+        self._record_usage(results, structure=payload.structure)
+        self._log_truncation(results, "generate")
+        packs = [
+            SongPack(
+                title=item.title,
+                style=item.style,
+                lyrics=item.lyrics,
+                explanation=item.explanation,
+                quality=_quality_model(report),
+            )
+            for item, report in zip(
+                results, self._quality_gate(provider, payload, results, repair)
+            )
+        ]
+        result = results[0]
+        return GenerateResponse(
+            title=result.title,
+            style=result.style,
+            lyrics=result.lyrics,
+            explanation=result.explanation,
+            providerUsed=result.provider_name,  # type: ignore[arg-type]
+            modelUsed=result.model_name,
+            packs=packs,
+            quality=packs[0].quality,
+        )
+
+    def draft(self, payload: GenerateRequest) -> GenerateResponse:
+        """First tier of tiered generation: a fast pack from the draft models.
 
-        if last_error and payload.provider != "auto":
+        Drafts skip staged generation and lyric repair and are not stored;
+        ``refine`` produces the pack that ends up in history.
+        """
+        with span(
+            "song.draft", structure=payload.structure, variants=payload.variants
+        ) as draft_span:
+            response = self._generate(payload, draft=True)
+            draft_span.set_attributes(
+                provider=response.providerUsed, model=response.modelUsed
+            )
+        response.tier = "draft"
+        return response
+
+    def refine(
+        self, payload: GenerateRequest, draft: GenerateResponse
+    ) -> GenerateResponse:
+        """Second tier: the draft's provider improves it with its regular model.
+
+        A draft no provider can refine (a template or local instrumental
+        pack) is stored and returned as it is, still marked ``draft``.
+        """
+        started = perf_counter()
+        with span("song.refine", provider=draft.providerUsed) as refine_span:
+            response = self._refine(payload, draft)
+            refine_span.set_attributes(model=response.modelUsed, tier=response.tier)
+        self._store_generated(payload, response, (perf_counter() - started) * 1000)
+        return response
+
+    def _refine(
+        self, payload: GenerateRequest, draft: GenerateResponse
+    ) -> GenerateResponse:
+        try:
+            provider = self._provider_router.get_provider(draft.providerUsed)
+        except ProviderError:
+            return draft
+        if (
+            not provider.requires_upstream
+            or draft.modelUsed == LOCAL_INSTRUMENTAL_MODEL
+        ):
+            return draft
+        drafted = GenerateProviderResult(
+            provider_name=draft.providerUsed,
+            model_name=draft.modelUsed,
+            title=draft.title,
+            style=draft.style,
+            lyrics=draft.lyrics,
+            explanation=draft.explanation,
+        )
+        started = perf_counter()
+        try:
+            result = provider.refine_pack(payload, drafted)
+        except ProviderError as exc:
+            self._record_attempt(draft.providerUsed, "generate", started, exc)
+            if exc.code == ProviderErrorCode.CONFIGURATION:
+                return draft
+            logger.warning(
+                "refine_provider_failed",
+                extra={
+                    "event": "refine_provider_failed",
+                    "provider": draft.providerUsed,
+                    "code": exc.code.value,
+                    "retryable": exc.retryable,
+                },
+            )
+            raise HTTPException(
+                status_code=_http_status_for_error(exc),
+                detail=f"Refinement failed. {_friendly_reason(exc)}",
+            ) from exc
+        self._record_attempt(draft.providerUsed, "generate", started, results=[result])
+        response = self._pack_response(provider, payload, [result])
+        response.tier = "refined"
+        return response
+
+    def _generate(
+        self, payload: GenerateRequest, draft: bool = False
+    ) -> GenerateResponse:
+        # An instrumental style is computed locally, so style-only requests
+        # need no upstream call at all.
+        if payload.isInstrumental and (
+            self._instrumental_mode == "local"
+            or requested_fields(payload) == ("style",)
+        ):
+            return self._generate_local_instrumental(payload)
+        fast_instrumental = payload.isInstrumental and self._instrumental_mode == "fast"
+        errors: list[str] = []
+        last_error: ProviderError | None = None
+        order = self._provider_router.resolve_order(payload.provider, "generate")
+        for index, provider_name in enumerate(order):
+            started = perf_counter()
+            with span(
+                "provider.attempt", provider=provider_name, attempt=index
+            ) as attempt_span:
+                try:
+                    provider = self._provider_router.get_provider(provider_name)
+                    if draft and provider_name in self._draft_models:
+                        provider = provider.with_model(
+                            self._draft_models[provider_name]
+                        )
+                    skipped = _deadline_error(index, provider)
+                    if skipped:
+                        # Keep going: a local fallback later in the order still runs.
+                        raise skipped
+                    started = perf_counter()
+                    if fast_instrumental:
+                        results = provider.generate_instrumental(
+                            payload, payload.variants
+                        )
+                    elif (
+                        not draft
+                        and self._staged_generator is not None
+                        and provider.requires_upstream
+                        and not payload.isInstrumental
+                        and "lyrics" in requested_fields(payload)
+                    ):
+                        results = self._staged_generator.generate_packs(
+                            provider, payload, payload.variants
+                        )
+                    elif payload.variants > 1:
+                        results = provider.generate_packs(payload, payload.variants)
+                    else:
+                        results = [provider.generate_pack(payload)]
+                    self._record_attempt(
+                        provider_name, "generate", started, results=results
+                    )
+                    attempt_span.set_attribute("model", results[0].model_name)
+                    # A draft goes out as fast as possible; the refine pass
+                    # is its repair.
+                    return self._pack_response(
+                        provider, payload, results, repair=not draft
+                    )
+                except ProviderError as exc:
+                    attempt_span.record_error(exc.code.value)
+                    self._record_attempt(provider_name, "generate", started, exc)
+                    last_error = exc
+                    errors.append(_format_error(provider_name, exc))
+                    logger.warning(
+                        "generate_provider_failed",
+                        extra={
+                            "event": "generate_provider_failed",
+                            "provider": provider_name,
+                            "code": exc.code.value,
+                            "retryable": exc.retryable,
+                        },
+                    )
+
+        if last_error and (
+            payload.provider != "auto" or last_error.code == ProviderErrorCode.DEADLINE
+        ):
             raise HTTPException(
                 status_code=_http_status_for_error(last_error),
                 detail=(
@@ -103,37 +663,94 @@ class SongService:
         )
 
     def extend(self, payload: ExtendRequest) -> ExtendResponse:
-        errors: list[str] = []
-        last_error: ProviderError | None = None
-        order = self._provider_router.resolve_order(payload.provider)
-        for provider_name in order:
-            try:
-                provider = self._provider_router.get_provider(provider_name)
-                result = provider.extend_lyrics(
-                    current_lyrics=payload.currentLyrics,
+        started = perf_counter()
+        with span("song.extend") as extend_span:
+            response = self._extend(payload)
+            extend_span.set_attributes(
+                provider=response.providerUsed, model=response.modelUsed
+            )
+        self.store_extension(payload, response, (perf_counter() - started) * 1000)
+        return response
+
+    def speculate_extend(self, payload: ExtendRequest) -> ExtendResponse:
+        """Run ``extend`` ahead of the user; the result is not stored."""
+        with span("song.speculate") as speculate_span:
+            response = self._extend(payload)
+            speculate_span.set_attributes(
+                provider=response.providerUsed, model=response.modelUsed
+            )
+        return response
+
+    def store_extension(
+        self, payload: ExtendRequest, response: ExtendResponse, latency_ms: float
+    ) -> None:
+        if self._song_store is not None:
+            self._song_store.add(
+                SongRecord(
+                    kind="extend",
+                    provider=response.providerUsed,
+                    model=response.modelUsed,
+                    latency_ms=latency_ms,
                     topic=payload.topic,
-                    style=payload.style,
                     language=payload.language,
+                    style=payload.style,
+                    lyrics=response.addedLyrics,
+                    request=payload.model_dump(),
+                    response=response.model_dump(),
                 )
-                return ExtendResponse(
-                    addedLyrics=result.added_lyrics,
-                    providerUsed=result.provider_name,  # type: ignore[arg-type]
-                    modelUsed=result.model_name,
-                )
-            except ProviderError as exc:
-                last_error = exc
-                errors.append(_format_error(provider_name, exc))
-                logger.warning(
-                    "extend_provider_failed",
-                    extra={
-                        "event": "extend_provider_failed",
-                        "provider": provider_name,
-                        "code": exc.code.value,
-                        "retryable": exc.retryable,
-                    },
-                )
+            )
+
+    def _extend(self, payload: ExtendRequest) -> ExtendResponse:
+        errors: list[str] = []
+        last_error: ProviderError | None = None
+        order = self._provider_router.resolve_order(payload.provider, "extend")
+        for index, provider_name in enumerate(order):
+            started = perf_counter()
+            with span(
+                "provider.attempt", provider=provider_name, attempt=index
+            ) as attempt_span:
+                try:
+                    provider = self._provider_router.get_provider(provider_name)
+                    skipped = _deadline_error(index, provider)
+                    if skipped:
+                        # Keep going: a local fallback later in the order still runs.
+                        raise skipped
+                    started = perf_counter()
+                    result = provider.extend_lyrics(
+                        current_lyrics=payload.currentLyrics,
+                        topic=payload.topic,
+                        style=payload.style,
+                        language=payload.language,
+                    )
+                    self._record_attempt(
+                        provider_name, "extend", started, results=[result]
+                    )
+                    attempt_span.set_attribute("model", result.model_name)
+                    self._record_usage([result])
+                    self._log_truncation([result], "extend")
+                    return ExtendResponse(
+                        addedLyrics=result.added_lyrics,
+                        providerUsed=result.provider_name,  # type: ignore[arg-type]
+                        modelUsed=result.model_name,
+                    )
+                except ProviderError as exc:
+                    attempt_span.record_error(exc.code.value)
+                    self._record_attempt(provider_name, "extend", started, exc)
+                    last_error = exc
+                    errors.append(_format_error(provider_name, exc))
+                    logger.warning(
+                        "extend_provider_failed",
+                        extra={
+                            "event": "extend_provider_failed",
+                            "provider": provider_name,
+                            "code": exc.code.value,
+                            "retryable": exc.retryable,
+                        },
+                    )
 
-        if last_error and payload.provider != "auto":
+        if last_error and (
+            payload.provider != "auto" or last_error.code == ProviderErrorCode.DEADLINE
+        ):
             raise HTTPException(
                 status_code=_http_status_for_error(last_error),
                 detail=(
@@ -0,0 +1,202 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+
+class SessionNotFoundError(KeyError):
+    pass
+
+
+class SessionConflictError(Exception):
+    def __init__(self, version: int):
+        super().__init__(f"Session is at version {version}.")
+        self.version = version
+
+
+@dataclass
+class SongSession:
+    """Server-side lyric document for an editing session.
+
+    ``version`` increases on every edit or accepted extension; clients send
+    the version their edits are based on.
+    """
+
+    id: str
+    owner: str
+    topic: str
+    style: str
+    language: str
+    provider: str
+    lyrics: str = ""
+    version: int = 0
+    extensions: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def cache_key(self) -> str:
+        """Prompt cache key for upstream calls; never reveals the session id."""
+        return "session-" + hashlib.sha256(self.id.encode()).hexdigest()[:16]
+
+    @property
+    def size(self) -> int:
+        """Approximate memory held by the session, in bytes."""
+        return len(self.lyrics) + len(self.topic) + len(self.style) + 256
+
+
+def apply_edits(lyrics: str, edits: list[tuple[int, int, str]]) -> str:
+    """Apply ``(start, end, text)`` splices in order.
+
+    Each splice replaces ``lyrics[start:end]`` of the result of the previous
+    one. Raises ``ValueError`` for a range outside the document.
+    """
+    for start, end, text in edits:
+        if not 0 <= start <= end <= len(lyrics):
+            raise ValueError(
+                f"Edit range {start}-{end} is outside the document "
+                f"(length {len(lyrics)})."
+            )
+        lyrics = lyrics[:start] + text + lyrics[end:]
+    return lyrics
+
+
+def append_section(lyrics: str, added: str) -> str:
+    added = added.strip()
+    if not added:
+        return lyrics
+    if not lyrics.strip():
+        return added
+    return f"{lyrics.rstrip()}\n\n{added}"
+
+
+class SongSessionStore:
+    """In-memory song sessions, evicted least recently used first.
+
+    Sessions are bounded by count and by total document size, and dropped
+    after ``idle_seconds`` without use. Callers get copies, so a session can
+    be read while another request edits it.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_seconds: float = 3600.0,
+    ):
+        self._max_sessions = max(max_sessions, 1)
+        self._max_bytes = max_bytes
+        self._idle_seconds = idle_seconds
+        self._sessions: OrderedDict[str, SongSession] = OrderedDict()
+        self._bytes = 0
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def create(
+        self,
+        owner: str,
+        topic: str,
+        style: str,
+        language: str,
+        provider: str,
+        lyrics: str = "",
+    ) -> SongSession:
+        session = SongSession(
+            id=secrets.token_urlsafe(16),
+            owner=owner,
+            topic=topic,
+            style=style,
+            language=language,
+            provider=provider,
+            lyrics=lyrics,
+        )
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            self._bytes += session.size
+            self._evict()
+            return replace(session)
+
+    def get(self, session_id: str, owner: str) -> SongSession:
+        with self._lock:
+            return replace(self._touch(session_id, owner))
+
+    def edit(
+        self,
+        session_id: str,
+        owner: str,
+        base_version: int,
+        edits: list[tuple[int, int, str]],
+    ) -> SongSession:
+        with self._lock:
+            session = self._touch(session_id, owner)
+            if base_version != session.version:
+                raise SessionConflictError(session.version)
+            lyrics = apply_edits(session.lyrics, edits)
+            self._update(session, lyrics)
+            return replace(session)
+
+    def append(
+        self, session_id: str, owner: str, base_version: int, added: str
+    ) -> SongSession:
+        """Append an extension written for the ``base_version`` lyrics."""
+        with self._lock:
+            session = self._touch(session_id, owner)
+            if base_version != session.version:
+                raise SessionConflictError(session.version)
+            session.extensions += 1
+            self._update(session, append_section(session.lyrics, added))
+            return replace(session)
+
+    def delete(self, session_id: str, owner: str) -> None:
+        with self._lock:
+            session = self._touch(session_id, owner)
+            del self._sessions[session.id]
+            self._bytes -= session.size
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evicted": self._evicted,
+            }
+
+    def _touch(self, session_id: str, owner: str) -> SongSession:
+        self._expire()
+        session = self._sessions.get(session_id)
+        # Another client's session looks exactly like a missing one.
+        if session is None or session.owner != owner:
+            raise SessionNotFoundError(session_id)
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _update(self, session: SongSession, lyrics: str) -> None:
+        self._bytes -= session.size
+        session.lyrics = lyrics
+        session.version += 1
+        self._bytes += session.size
+        self._evict()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self._idle_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used > cutoff:
+                break
+            self._drop_oldest()
+
+    def _evict(self) -> None:
+        # The newest session always stays, even when it alone is over the cap.
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self._max_sessions or self._bytes > self._max_bytes
+        ):
+            self._drop_oldest()
+
+    def _drop_oldest(self) -> None:
+        _, session = self._sessions.popitem(last=False)
+        self._bytes -= session.size
+        self._evicted += 1
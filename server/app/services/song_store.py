@@ -0,0 +1,410 @@
+import atexit
+import base64
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Literal
+
+
+logger = logging.getLogger(__name__)
+
+SongKind = Literal["generate", "extend"]
+SearchField = Literal["title", "lyrics", "style"]
+
+MAX_PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 500
+DEFAULT_QUEUE_SIZE = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    topic TEXT NOT NULL,
+    genre TEXT NOT NULL DEFAULT '',
+    mood TEXT NOT NULL DEFAULT '',
+    structure TEXT NOT NULL DEFAULT '',
+    language TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    style TEXT NOT NULL DEFAULT '',
+    lyrics TEXT NOT NULL DEFAULT '',
+    explanation TEXT NOT NULL DEFAULT '',
+    request TEXT NOT NULL DEFAULT '{}',
+    response TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS songs_provider_id ON songs (provider, id);
+CREATE INDEX IF NOT EXISTS songs_kind_id ON songs (kind, id);
+CREATE INDEX IF NOT EXISTS songs_created_at ON songs (created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+    title, lyrics, style, content='songs', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+    INSERT INTO songs_fts (rowid, title, lyrics, style)
+    VALUES (new.id, new.title, new.lyrics, new.style);
+END;
+CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+    INSERT INTO songs_fts (songs_fts, rowid, title, lyrics, style)
+    VALUES ('delete', old.id, old.title, old.lyrics, old.style);
+END;
+"""
+
+_COLUMNS = (
+    "created_at",
+    "kind",
+    "provider",
+    "model",
+    "latency_ms",
+    "topic",
+    "genre",
+    "mood",
+    "structure",
+    "language",
+    "title",
+    "style",
+    "lyrics",
+    "explanation",
+    "request",
+    "response",
+)
+_INSERT = (
+    f"INSERT INTO songs ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+)
+_SELECT = f"SELECT id, {', '.join(_COLUMNS)} FROM songs"
+
+
+@dataclass
+class SongRecord:
+    """One stored generation or extension with the request that produced it."""
+
+    kind: SongKind
+    provider: str
+    model: str
+    latency_ms: float
+    topic: str
+    genre: str = ""
+    mood: str = ""
+    structure: str = ""
+    language: str = ""
+    title: str = ""
+    style: str = ""
+    lyrics: str = ""
+    explanation: str = ""
+    request: dict[str, object] = field(default_factory=dict)
+    response: dict[str, object] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    id: int | None = None
+
+    def _row(self) -> tuple[object, ...]:
+        values = asdict(self)
+        values["request"] = json.dumps(self.request, separators=(",", ":"))
+        values["response"] = json.dumps(self.response, separators=(",", ":"))
+        return tuple(values[column] for column in _COLUMNS)
+
+
+@dataclass
+class SongPage:
+    items: list[SongRecord]
+    next_cursor: str | None
+
+
+@dataclass
+class SongFilters:
+    """Export filters; ``since``/``until`` are unix timestamps, inclusive."""
+
+    since: float | None = None
+    until: float | None = None
+    provider: str | None = None
+    genre: str | None = None
+    structure: str | None = None
+    kind: SongKind | None = None
+
+    def where(self) -> tuple[list[str], list[object]]:
+        clauses: list[str] = []
+        params: list[object] = []
+        if self.since is not None:
+            clauses.append("created_at >= ?")
+            params.append(self.since)
+        if self.until is not None:
+            clauses.append("created_at <= ?")
+            params.append(self.until)
+        for column in ("provider", "structure", "kind"):
+            value = getattr(self, column)
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if self.genre:
+            clauses.append("genre = ? COLLATE NOCASE")
+            params.append(self.genre)
+        return clauses, params
+
+
+def encode_cursor(song_id: int) -> str:
+    return base64.urlsafe_b64encode(str(song_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    """Return the id a page continues below, or None for the first page.
+
+    Raises ``ValueError`` for a malformed cursor.
+    """
+    if not cursor:
+        return None
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def fts_query(text: str, search_field: SearchField | None = None) -> str | None:
+    """Turn free text into a safe FTS5 query: every word must match.
+
+    Words are quoted so user input never reaches FTS5 syntax; the last word
+    matches as a prefix to support search-as-you-type.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    query = " ".join(terms)
+    if search_field:
+        return f"{search_field} : ({query})"
+    return query
+
+
+def _record_from_row(row: sqlite3.Row) -> SongRecord:
+    values = dict(row)
+    values["request"] = json.loads(values["request"] or "{}")
+    values["response"] = json.loads(values["response"] or "{}")
+    return SongRecord(**values)
+
+
+def _connect(path: Path | str, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        connection = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, timeout=30, check_same_thread=False
+        )
+    else:
+        connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def iter_song_records(
+    path: Path | str,
+    filters: SongFilters | None = None,
+    cursor: str | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[SongRecord]:
+    """Yield matching records oldest first, continuing after ``cursor``.
+
+    Rows are fetched in keyset chunks on a read-only connection, so memory
+    stays constant and the iterator can be resumed from any record's
+    ``encode_cursor(record.id)``.
+    """
+    clauses, params = (filters or SongFilters()).where()
+    after = decode_cursor(cursor) or 0
+    connection = _connect(path, read_only=True)
+    try:
+        while True:
+            where = " AND ".join(["id > ?", *clauses])
+            rows = connection.execute(
+                f"{_SELECT} WHERE {where} ORDER BY id LIMIT ?",
+                (after, *params, chunk_size),
+            ).fetchall()
+            for row in rows:
+                yield _record_from_row(row)
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1]["id"]
+    finally:
+        connection.close()
+
+
+class SongStore:
+    """SQLite song history with full-text search over title, lyrics and style.
+
+    ``add`` only enqueues; a background thread writes queued records in
+    batches of up to ``batch_size``, at least every ``flush_interval_seconds``,
+    so storage never adds latency to a request. The database runs in WAL mode
+    so reads proceed while a batch is being written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 200,
+        flush_interval_seconds: float = 0.5,
+        max_queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._batch_size = max(batch_size, 1)
+        self._flush_interval = flush_interval_seconds
+        self._queue: queue.Queue[SongRecord | None] = queue.Queue(max_queue_size)
+        self._local = threading.local()
+        self._closed = False
+
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+        self._writer = threading.Thread(
+            target=self._write_loop, name="song-store-writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.close)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _connect(self) -> sqlite3.Connection:
+        return _connect(self._path)
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def add(self, record: SongRecord) -> bool:
+        """Queue a record for writing. Returns False if it had to be dropped."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("song_store_full", extra={"event": "song_store_full"})
+            return False
+        return True
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        running = True
+        while running:
+            batch: list[SongRecord] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self._flush_interval
+            while True:
+                if item is None:
+                    running = False
+                else:
+                    batch.append(item)
+                if not running or len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get(
+                        timeout=max(deadline - time.monotonic(), 0.0)
+                    )
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    with connection:
+                        connection.executemany(
+                            _INSERT, [record._row() for record in batch]
+                        )
+            except sqlite3.Error:
+                logger.exception(
+                    "song_store_write_failed",
+                    extra={"event": "song_store_write_failed"},
+                )
+            finally:
+                for _ in range(len(batch) + (0 if running else 1)):
+                    self._queue.task_done()
+        connection.close()
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    def recent(
+        self,
+        limit: int = 20,
+        cursor: str | None = None,
+        provider: str | None = None,
+        kind: SongKind | None = None,
+    ) -> SongPage:
+        """Newest first, continuing below ``cursor`` (keyset pagination)."""
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        clauses: list[str] = []
+        params: list[object] = []
+        before = decode_cursor(cursor)
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        if provider:
+            clauses.append("provider = ?")
+            params.append(provider)
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = (
+            self._reader()
+            .execute(f"{_SELECT}{where} ORDER BY id DESC LIMIT ?", (*params, limit + 1))
+            .fetchall()
+        )
+        return self._page(rows, limit)
+
+    def search(
+        self,
+        text: str,
+        limit: int = 20,
+        cursor: str | None = None,
+        search_field: SearchField | None = None,
+    ) -> SongPage:
+        """Full-text matches, newest first, continuing below ``cursor``."""
+        query = fts_query(text, search_field)
+        if query is None:
+            return SongPage(items=[], next_cursor=None)
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        before = decode_cursor(cursor)
+        # Walking the FTS index by rowid keeps deep pages as cheap as the first.
+        sql = "SELECT rowid FROM songs_fts WHERE songs_fts MATCH ?"
+        params: list[object] = [query]
+        if before is not None:
+            sql += " AND rowid < ?"
+            params.append(before)
+        sql += " ORDER BY rowid DESC LIMIT ?"
+        params.append(limit + 1)
+        reader = self._reader()
+        ids = [row[0] for row in reader.execute(sql, params).fetchall()]
+        if not ids:
+            return SongPage(items=[], next_cursor=None)
+        placeholders = ", ".join("?" for _ in ids)
+        rows = reader.execute(
+            f"{_SELECT} WHERE id IN ({placeholders}) ORDER BY id DESC", ids
+        ).fetchall()
+        return self._page(rows, limit)
+
+    def _page(self, rows: list[sqlite3.Row], limit: int) -> SongPage:
+        items = [_record_from_row(row) for row in rows[:limit]]
+        next_cursor = (
+            encode_cursor(items[-1].id) if len(rows) > limit and items else None
+        )
+        return SongPage(items=items, next_cursor=next_cursor)
@@ -0,0 +1,204 @@
+"""Speculative pre-generation of the next extension.
+
+Editor users almost always press "extend" right after a generation or an
+extension. With ``SPECULATIVE_EXTEND`` on, the server predicts that request
+(the editor appends each section as ``lyrics + "\\n\\n" + added``) and starts
+it in the background. An extend that matches the prediction exactly is
+answered from it, or waits for it if it is still running. Speculations that
+are never claimed are dropped and their tokens are counted as wasted.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from app.models.schemas import (
+    ExtendRequest,
+    ExtendResponse,
+    GenerateRequest,
+    GenerateResponse,
+)
+from app.providers.template_provider import TEMPLATE_PROVIDER_NAME
+from app.services.usage import RequestUsage
+
+
+@dataclass
+class SpeculativeResult:
+    # None when the speculative call failed; its tokens still count.
+    response: ExtendResponse | None
+    usage: RequestUsage
+    latency_ms: float
+
+
+# Returns None when the work was shed before any upstream call.
+SpeculationRunner = Callable[[ExtendRequest], Awaitable[SpeculativeResult | None]]
+
+
+@dataclass
+class _Speculation:
+    client: str
+    task: "asyncio.Task[SpeculativeResult | None]"
+    created: float = field(default_factory=time.monotonic)
+
+
+def next_extend_after_generate(
+    payload: GenerateRequest, response: GenerateResponse
+) -> ExtendRequest | None:
+    if (
+        payload.isInstrumental
+        or not response.lyrics.strip()
+        or response.providerUsed == TEMPLATE_PROVIDER_NAME
+    ):
+        return None
+    return ExtendRequest(
+        currentLyrics=response.lyrics,
+        topic=payload.topic,
+        style=response.style,
+        language=payload.language,
+        provider=payload.provider,
+    )
+
+
+def next_extend_after_extend(
+    payload: ExtendRequest, response: ExtendResponse
+) -> ExtendRequest | None:
+    if (
+        not response.addedLyrics.strip()
+        or response.providerUsed == TEMPLATE_PROVIDER_NAME
+    ):
+        return None
+    return payload.model_copy(
+        update={"currentLyrics": f"{payload.currentLyrics}\n\n{response.addedLyrics}"}
+    )
+
+
+def _result(
+    task: "asyncio.Task[SpeculativeResult | None]",
+) -> SpeculativeResult | None:
+    if task.cancelled() or task.exception() is not None:
+        return None
+    return task.result()
+
+
+def _fingerprint(payload: ExtendRequest) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+
+
+class SpeculativeExtensions:
+    """Pending and finished speculations, keyed by client and request.
+
+    Each client holds at most ``client_budget`` speculations. A new one
+    replaces the client's oldest finished one, and is skipped while all of
+    them are still running. Speculations expire after ``ttl_seconds``. Used
+    from the event loop only.
+    """
+
+    def __init__(
+        self,
+        client_budget: int = 1,
+        ttl_seconds: float = 300.0,
+        max_entries: int = 1000,
+    ):
+        self._client_budget = max(client_budget, 1)
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max(max_entries, 1)
+        self._entries: OrderedDict[tuple[str, str], _Speculation] = OrderedDict()
+        self._scheduled = 0
+        self._hits = 0
+        self._discarded = 0
+        self._skipped = 0
+        self._wasted_tokens = 0
+        self._wasted_cost_usd = 0.0
+
+    def schedule(
+        self, client: str, predicted: ExtendRequest, run: SpeculationRunner
+    ) -> bool:
+        self._expire()
+        key = (client, _fingerprint(predicted))
+        if key in self._entries:
+            return False
+        owned = [k for k, entry in self._entries.items() if entry.client == client]
+        if len(owned) >= self._client_budget and not self._drop_finished(owned):
+            self._skipped += 1
+            return False
+        if len(self._entries) >= self._max_entries and not self._drop_finished(
+            list(self._entries)
+        ):
+            self._skipped += 1
+            return False
+        # A fresh context: the speculation must not report usage, spans or
+        # upstream calls into the request that triggered it.
+        task = asyncio.create_task(run(predicted), context=contextvars.Context())
+        self._entries[key] = _Speculation(client, task)
+        self._scheduled += 1
+        return True
+
+    async def take(
+        self, client: str, payload: ExtendRequest
+    ) -> SpeculativeResult | None:
+        """The speculation matching ``payload``, waiting for it if needed."""
+        self._expire()
+        entry = self._entries.pop((client, _fingerprint(payload)), None)
+        if entry is None:
+            return None
+        # A disconnecting client must not cancel work another path may reuse.
+        try:
+            result = await asyncio.shield(entry.task)
+        except Exception:
+            result = None
+        if result is None or result.response is None:
+            self._account_waste(result)
+            return None
+        self._hits += 1
+        return result
+
+    def snapshot(self) -> dict[str, float | int]:
+        return {
+            "scheduled": self._scheduled,
+            "hits": self._hits,
+            "discarded": self._discarded,
+            "skipped": self._skipped,
+            "pending": len(self._entries),
+            "hitRate": round(self._hits / self._scheduled, 4)
+            if self._scheduled
+            else 0.0,
+            "wastedTokens": self._wasted_tokens,
+            "wastedCostUsd": round(self._wasted_cost_usd, 6),
+        }
+
+    def _drop_finished(self, keys: list[tuple[str, str]]) -> bool:
+        """Drop the oldest finished speculation among ``keys``, if any."""
+        for key in keys:
+            entry = self._entries[key]
+            if entry.task.done():
+                del self._entries[key]
+                self._discard(entry)
+                return True
+        return False
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self._ttl_seconds
+        for key, entry in list(self._entries.items()):
+            if entry.created > cutoff:
+                break
+            del self._entries[key]
+            self._discard(entry)
+
+    def _discard(self, entry: _Speculation) -> None:
+        if entry.task.done():
+            self._account_waste(_result(entry.task))
+        else:
+            entry.task.add_done_callback(
+                lambda task: self._account_waste(_result(task))
+            )
+
+    def _account_waste(self, result: SpeculativeResult | None) -> None:
+        self._discarded += 1
+        if result is None:
+            return
+        self._wasted_tokens += result.usage.usage.total_tokens
+        self._wasted_cost_usd += result.usage.cost_usd or 0.0
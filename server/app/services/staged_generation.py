@@ -0,0 +1,322 @@
+import json
+import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass, field
+
+from app.core.tracing import span
+from app.models.schemas import GenerateRequest
+from app.providers.base import (
+    BaseLlmProvider,
+    ExtendProviderResult,
+    GenerateProviderResult,
+    ProviderError,
+    ProviderErrorCode,
+    ProviderResult,
+    generate_packs_in_parallel,
+)
+from app.providers.parsing import clean_json
+from app.providers.router import ProviderRouter
+from app.services.instrumental import local_title
+from app.services.local_engine import planned_sections
+from app.services.prompt_builder import (
+    PLAN_OUTPUT_TOKENS,
+    STYLE_STAGE_OUTPUT_TOKENS,
+    build_plan_messages,
+    build_section_messages,
+    build_style_messages,
+    compute_section_budget,
+    sanitize_style_prompt,
+)
+
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("plan", "lyrics", "style")
+MAX_PLAN_SECTIONS = 12
+
+_TAG_LINE = re.compile(r"^\[[^\[\]]+\]$")
+
+
+@dataclass
+class StageTarget:
+    """Provider and model for one stage; None means the attempt's own."""
+
+    provider: str | None = None
+    model: str | None = None
+
+
+def parse_stage_targets(raw: str) -> dict[str, StageTarget]:
+    """Parse ``stage=provider:model`` pairs.
+
+    Either part may be left out: ``plan=openai:gpt-4.1-nano,lyrics=gemini,
+    style=:gpt-4.1-mini``. Unknown stages are ignored.
+    """
+    targets: dict[str, StageTarget] = {}
+    for item in raw.split(","):
+        stage, _, value = item.partition("=")
+        stage = stage.strip().lower()
+        if stage not in STAGES or not value.strip():
+            continue
+        provider, _, model = value.partition(":")
+        targets[stage] = StageTarget(
+            provider=provider.strip().lower() or None, model=model.strip() or None
+        )
+    return targets
+
+
+@dataclass
+class SongPlan:
+    theme: str
+    hooks: list[str] = field(default_factory=list)
+    # (tag, brief) in song order; repeated sections share a tag.
+    sections: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def unique_tags(self) -> list[str]:
+        seen: dict[str, str] = {}
+        for tag, _ in self.sections:
+            seen.setdefault(tag.lower(), tag)
+        return list(seen.values())
+
+
+def local_plan(payload: GenerateRequest) -> SongPlan:
+    """The structure's own section list, used when the plan stage is unusable."""
+    return SongPlan(
+        theme=payload.topic,
+        sections=[(tag, "") for tag in planned_sections(payload.structure)],
+    )
+
+
+def parse_plan(text: str, payload: GenerateRequest) -> SongPlan:
+    """Decode the plan stage's JSON; raises ``json.JSONDecodeError``."""
+    parsed = json.loads(clean_json(text))
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError("Expected a JSON object", text, 0)
+    sections: list[tuple[str, str]] = []
+    for item in parsed.get("sections") or []:
+        if not isinstance(item, dict):
+            continue
+        tag = str(item.get("tag", "")).strip().strip("[]").strip()
+        if tag:
+            sections.append((tag, str(item.get("brief", "")).strip()))
+    if not sections:
+        raise json.JSONDecodeError("Plan has no sections", text, 0)
+    hooks = [str(hook).strip() for hook in parsed.get("hooks") or []]
+    return SongPlan(
+        theme=str(parsed.get("theme") or payload.topic),
+        hooks=[hook for hook in hooks if hook][:3],
+        sections=sections[:MAX_PLAN_SECTIONS],
+    )
+
+
+def _section_lines(text: str) -> list[str]:
+    lines = [
+        line.rstrip()
+        for line in text.strip().splitlines()
+        if line.strip() and not line.strip().startswith("```")
+    ]
+    if lines and _TAG_LINE.match(lines[0].strip()):
+        lines = lines[1:]
+    return lines
+
+
+class StagedGenerator:
+    """Plan, then every distinct section and the title/style in parallel.
+
+    A short planning call fixes the section outline and hooks. Each distinct
+    section is then written by its own call, so a long song costs roughly one
+    section's latency instead of the whole song's, while the title and style
+    call runs alongside. Each stage may use its own provider and model.
+
+    Unparseable plans fall back to the structure's section list, and a failed
+    title/style call to the local title and style. Sections that fail are left
+    out for the quality gate to report and repair; the attempt fails only
+    when no section could be written.
+    """
+
+    def __init__(
+        self,
+        provider_router: ProviderRouter,
+        targets: dict[str, StageTarget] | None = None,
+    ):
+        self._provider_router = provider_router
+        self._targets = targets or {}
+
+    def _stage(
+        self, stage: str, provider: BaseLlmProvider
+    ) -> tuple[BaseLlmProvider, str | None]:
+        target = self._targets.get(stage)
+        if target is None:
+            return provider, None
+        if target.provider:
+            provider = self._provider_router.get_provider(target.provider)
+        return provider, target.model
+
+    def generate_packs(
+        self, provider: BaseLlmProvider, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        return generate_packs_in_parallel(
+            provider, payload, count, call=lambda item: self.generate(provider, item)
+        )
+
+    def generate(
+        self, provider: BaseLlmProvider, payload: GenerateRequest
+    ) -> GenerateProviderResult:
+        stages: list[ProviderResult] = []
+        plan = self._plan(provider, payload, stages)
+        tags = plan.unique_tags
+        with ThreadPoolExecutor(max_workers=len(tags) + 1) as executor:
+            # Each worker gets its own copy of the request context.
+            style_future = executor.submit(
+                copy_context().run, self._style, provider, payload, plan
+            )
+            section_futures: dict[str, Future[ExtendProviderResult]] = {
+                tag: executor.submit(
+                    copy_context().run, self._section, provider, payload, plan, tag
+                )
+                for tag in tags
+            }
+            written: dict[str, list[str]] = {}
+            lyric_results: list[ExtendProviderResult] = []
+            first_error: ProviderError | None = None
+            for tag, future in section_futures.items():
+                try:
+                    result = future.result()
+                except ProviderError as exc:
+                    first_error = first_error or exc
+                    self._log_failure("lyrics", provider, exc)
+                    continue
+                lines = _section_lines(result.added_lyrics)
+                lyric_results.append(result)
+                if lines:
+                    written[tag.lower()] = lines
+            style_fields, style_result = style_future.result()
+        stages.extend(lyric_results)
+        if style_result is not None:
+            stages.append(style_result)
+        if not written:
+            raise first_error or ProviderError(
+                "Staged generation returned no lyrics.",
+                code=ProviderErrorCode.INVALID_RESPONSE,
+                retryable=True,
+            )
+        blocks = [
+            "\n".join([f"[{tag}]", *written[tag.lower()]])
+            for tag, _ in plan.sections
+            if tag.lower() in written
+        ]
+        lead = lyric_results[0]
+        return GenerateProviderResult(
+            provider_name=lead.provider_name,
+            model_name=lead.model_name,
+            truncated=any(result.truncated for result in lyric_results),
+            stages=stages,
+            lyrics="\n\n".join(blocks),
+            **style_fields,
+        )
+
+    def _plan(
+        self,
+        provider: BaseLlmProvider,
+        payload: GenerateRequest,
+        stages: list[ProviderResult],
+    ) -> SongPlan:
+        stage_provider, model = self._stage("plan", provider)
+        system_instruction, user_prompt = build_plan_messages(
+            payload, planned_sections(payload.structure)
+        )
+        with span("pipeline.plan", provider=stage_provider.provider_name) as plan_span:
+            result = stage_provider.complete_text(
+                system_instruction,
+                user_prompt,
+                PLAN_OUTPUT_TOKENS,
+                "plan",
+                model=model,
+                json_output=True,
+            )
+            stages.append(result)
+            try:
+                plan = parse_plan(result.added_lyrics, payload)
+            except json.JSONDecodeError:
+                plan_span.record_error("invalid_response")
+                plan = local_plan(payload)
+            plan_span.set_attribute("sections", len(plan.sections))
+        return plan
+
+    def _section(
+        self,
+        provider: BaseLlmProvider,
+        payload: GenerateRequest,
+        plan: SongPlan,
+        tag: str,
+    ) -> ExtendProviderResult:
+        stage_provider, model = self._stage("lyrics", provider)
+        system_instruction, user_prompt = build_section_messages(
+            payload, plan.theme, plan.hooks, plan.sections, tag
+        )
+        with span("pipeline.section", tag=tag):
+            return stage_provider.complete_text(
+                system_instruction,
+                user_prompt,
+                compute_section_budget(payload.language),
+                "section",
+                model=model,
+            )
+
+    def _style(
+        self, provider: BaseLlmProvider, payload: GenerateRequest, plan: SongPlan
+    ) -> tuple[dict[str, str], ExtendProviderResult | None]:
+        fields = {
+            "title": local_title(payload.topic),
+            "style": sanitize_style_prompt("", payload),
+            "explanation": plan.theme,
+        }
+        with span("pipeline.style") as style_span:
+            try:
+                stage_provider, model = self._stage("style", provider)
+                system_instruction, user_prompt = build_style_messages(
+                    payload, plan.theme
+                )
+                result = stage_provider.complete_text(
+                    system_instruction,
+                    user_prompt,
+                    STYLE_STAGE_OUTPUT_TOKENS,
+                    "style",
+                    model=model,
+                    json_output=True,
+                )
+            except ProviderError as exc:
+                style_span.record_error(exc.code.value)
+                self._log_failure("style", provider, exc)
+                return fields, None
+            try:
+                parsed = json.loads(clean_json(result.added_lyrics))
+            except json.JSONDecodeError:
+                parsed = None
+            if not isinstance(parsed, dict):
+                style_span.record_error("invalid_response")
+                return fields, result
+            fields["title"] = str(parsed.get("title") or fields["title"])
+            fields["style"] = sanitize_style_prompt(
+                str(parsed.get("style", "")), payload
+            )
+            fields["explanation"] = str(
+                parsed.get("explanation") or fields["explanation"]
+            )
+        return fields, result
+
+    @staticmethod
+    def _log_failure(
+        stage: str, provider: BaseLlmProvider, error: ProviderError
+    ) -> None:
+        logger.warning(
+            "pipeline_stage_failed",
+            extra={
+                "event": "pipeline_stage_failed",
+                "stage": stage,
+                "provider": provider.provider_name,
+                "code": error.code.value,
+            },
+        )
@@ -0,0 +1,164 @@
+"""Providers that serve recorded upstream outcomes, for offline load replay.
+
+With ``TRAFFIC_REPLAY_PATH`` set, every provider named in the recording is
+replaced by a ``ReplayProvider``. Each call takes the provider's next
+recorded attempt for that operation (cycling when they run out), waits its
+recorded latency divided by ``TRAFFIC_REPLAY_SPEED``, and then either raises
+the recorded error or returns filler text of the recorded size and token
+usage. Routing, admission, quality scoring and accounting all run for real;
+only the network is gone.
+"""
+
+import itertools
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+
+from app.core.config import Settings
+from app.core.traffic import UpstreamCall, read_entries
+from app.models.schemas import GenerateRequest
+from app.providers.base import (
+    BaseLlmProvider,
+    ExtendProviderResult,
+    GenerateProviderResult,
+    ProviderError,
+    ProviderErrorCode,
+    TokenUsage,
+    deadline_timeout,
+)
+from app.providers.registry import ProviderFactory
+from app.providers.template_provider import TEMPLATE_PROVIDER_NAME, TemplateProvider
+
+
+REPLAY_MODEL_NAME = "replay"
+_LINE = "la da la da la da la"
+_SECTION_TAGS = ["Verse", "Chorus"]
+
+
+def filler_text(length: int) -> str:
+    return (_LINE * (length // len(_LINE) + 1))[: max(length, 1)]
+
+
+def filler_lyrics(length: int) -> str:
+    """Tagged sections of filler lines, about ``length`` characters long."""
+    blocks: list[str] = []
+    size = 0
+    for index in itertools.count():
+        block = f"[{_SECTION_TAGS[index % 2]}]\n" + "\n".join([_LINE] * 4)
+        blocks.append(block)
+        size += len(block) + 2
+        if size >= length:
+            break
+    return "\n\n".join(blocks)
+
+
+class ReplayProvider(BaseLlmProvider):
+    def __init__(self, name: str, calls: Iterable[UpstreamCall], speed: float = 1.0):
+        self.provider_name = name
+        grouped: dict[str, list[UpstreamCall]] = defaultdict(list)
+        for call in calls:
+            grouped[call.operation].append(call)
+        self._calls: dict[str, Iterator[UpstreamCall]] = {
+            operation: itertools.cycle(items) for operation, items in grouped.items()
+        }
+        self._speed = max(speed, 0.001)
+        self._lock = threading.Lock()
+
+    def _replay(self, operation: str) -> UpstreamCall:
+        with self._lock:
+            calls = self._calls.get(operation)
+            call = next(calls) if calls is not None else None
+        if call is None:
+            raise ProviderError(
+                f"No recorded {operation} calls for {self.provider_name}",
+                code=ProviderErrorCode.CONFIGURATION,
+            )
+        delay = call.latency_ms / 1000 / self._speed
+        timeout = deadline_timeout(self.provider_name)
+        if timeout is not None and timeout < delay:
+            time.sleep(timeout)
+            raise ProviderError(
+                f"Replayed {self.provider_name} call timed out.",
+                code=ProviderErrorCode.TIMEOUT,
+                retryable=True,
+            )
+        time.sleep(delay)
+        if call.error is not None:
+            raise ProviderError(
+                f"Replayed {self.provider_name} error: {call.error}",
+                code=ProviderErrorCode(call.error),
+                retryable=call.retryable,
+            )
+        return call
+
+    @staticmethod
+    def _usage(call: UpstreamCall) -> TokenUsage:
+        return TokenUsage(
+            prompt_tokens=call.prompt_tokens, completion_tokens=call.completion_tokens
+        )
+
+    def _pack(
+        self, call: UpstreamCall, sizes: dict[str, int]
+    ) -> GenerateProviderResult:
+        return GenerateProviderResult(
+            provider_name=self.provider_name,
+            model_name=call.model or REPLAY_MODEL_NAME,
+            title=filler_text(sizes.get("title", 12)),
+            style=filler_text(sizes.get("style", 60)),
+            lyrics=filler_lyrics(sizes.get("lyrics", 600)),
+            explanation=filler_text(sizes.get("explanation", 80)),
+            truncated=call.truncated,
+        )
+
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        return self.generate_packs(payload, 1)[0]
+
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        call = self._replay("generate")
+        outputs = call.outputs or [{}]
+        results = [self._pack(call, outputs[i % len(outputs)]) for i in range(count)]
+        results[0].usage = self._usage(call)
+        return results
+
+    def refine_pack(
+        self, payload: GenerateRequest, draft: GenerateProviderResult
+    ) -> GenerateProviderResult:
+        return self.generate_pack(payload)
+
+    def extend_lyrics(
+        self, current_lyrics: str, topic: str, style: str, language: str
+    ) -> ExtendProviderResult:
+        call = self._replay("extend")
+        sizes = call.outputs[0] if call.outputs else {}
+        return ExtendProviderResult(
+            provider_name=self.provider_name,
+            model_name=call.model or REPLAY_MODEL_NAME,
+            added_lyrics=filler_lyrics(sizes.get("added_lyrics", 200)),
+            usage=self._usage(call),
+            truncated=call.truncated,
+        )
+
+
+def replay_provider_factories(settings: Settings) -> dict[str, ProviderFactory]:
+    """A replay factory per recorded upstream provider.
+
+    The local template engine needs no replay and keeps its own factory.
+    """
+    recorded: dict[str, list[UpstreamCall]] = defaultdict(list)
+    for entry in read_entries(settings.traffic_replay_path or ""):
+        for call in entry.upstream:
+            if call.provider != TEMPLATE_PROVIDER_NAME:
+                recorded[call.provider].append(call)
+    speed = settings.traffic_replay_speed
+
+    def factory(calls: list[UpstreamCall], name: str) -> ProviderFactory:
+        return lambda _: ReplayProvider(name, calls, speed)
+
+    factories = {name: factory(calls, name) for name, calls in recorded.items()}
+    factories[TEMPLATE_PROVIDER_NAME] = lambda current: (
+        TemplateProvider() if current.template_fallback else None
+    )
+    return factories
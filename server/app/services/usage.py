@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from app.providers.base import TokenUsage
+
+
+logger = logging.getLogger(__name__)
+
+HOURLY_RETENTION = 24 * 14
+
+
+@dataclass
+class ModelPrice:
+    """USD per one million tokens."""
+
+    input: float = 0.0
+    output: float = 0.0
+    cached_input: float | None = None
+
+    def cost(self, usage: TokenUsage) -> float:
+        cached_rate = self.input if self.cached_input is None else self.cached_input
+        cached = min(usage.cached_tokens, usage.prompt_tokens)
+        uncached = usage.prompt_tokens - cached
+        return (
+            uncached * self.input
+            + cached * cached_rate
+            + usage.completion_tokens * self.output
+        ) / 1_000_000
+
+
+def parse_price_table(raw: str) -> dict[str, ModelPrice]:
+    """Parse ``MODEL_PRICES``: a JSON object keyed by ``model`` or ``provider/model``.
+
+    Example: ``{"gpt-4.1-mini": {"input": 0.4, "output": 1.6, "cached_input": 0.1}}``
+    """
+    if not raw.strip():
+        return {}
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        logger.warning("model_prices_invalid", extra={"event": "model_prices_invalid"})
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    table: dict[str, ModelPrice] = {}
+    for key, value in data.items():
+        if not isinstance(value, dict):
+            continue
+        table[str(key).lower()] = ModelPrice(
+            input=float(value.get("input", 0.0)),
+            output=float(value.get("output", 0.0)),
+            cached_input=(
+                float(value["cached_input"]) if "cached_input" in value else None
+            ),
+        )
+    return table
+
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, usage: TokenUsage, cost: float | None) -> None:
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.cost_usd += cost or 0.0
+
+
+@dataclass
+class RequestUsage:
+    """Usage accumulated while serving one API request."""
+
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    cost_usd: float | None = None
+
+    def add(self, usage: TokenUsage, cost: float | None) -> None:
+        self.usage = self.usage + usage
+        if cost is not None:
+            self.cost_usd = (self.cost_usd or 0.0) + cost
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "x-usage-prompt-tokens": str(self.usage.prompt_tokens),
+            "x-usage-completion-tokens": str(self.usage.completion_tokens),
+            "x-usage-cached-tokens": str(self.usage.cached_tokens),
+        }
+        if self.cost_usd is not None:
+            headers["x-usage-cost-usd"] = f"{self.cost_usd:.6f}"
+        return headers
+
+
+_current_request_usage: ContextVar[RequestUsage | None] = ContextVar(
+    "request_usage", default=None
+)
+
+
+@contextmanager
+def track_request_usage() -> Iterator[RequestUsage]:
+    request_usage = RequestUsage()
+    token = _current_request_usage.set(request_usage)
+    try:
+        yield request_usage
+    finally:
+        _current_request_usage.reset(token)
+
+
+def _hour_bucket(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:00:00Z", time.gmtime(timestamp))
+
+
+class UsageLedger:
+    """In-memory usage totals per provider/model with an optional JSON rollup.
+
+    Totals are kept overall and per UTC hour. When ``rollup_path`` is set the
+    ledger loads it at startup and rewrites it at most every
+    ``flush_interval_seconds``.
+    """
+
+    def __init__(
+        self,
+        prices: dict[str, ModelPrice] | None = None,
+        rollup_path: str | None = None,
+        flush_interval_seconds: float = 60.0,
+    ):
+        self._prices = prices or {}
+        self._rollup_path = Path(rollup_path) if rollup_path else None
+        self._flush_interval = flush_interval_seconds
+        self._lock = threading.Lock()
+        # Serializes rollup writes, which share one temp file.
+        self._flush_lock = threading.Lock()
+        self._totals: dict[tuple[str, str], UsageTotals] = {}
+        self._hourly: dict[str, dict[tuple[str, str], UsageTotals]] = {}
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def set_prices(self, prices: dict[str, ModelPrice]) -> None:
+        """Swap the price table on a settings reload; totals are kept."""
+        self._prices = prices
+
+    def price_for(self, provider: str, model: str) -> ModelPrice | None:
+        return self._prices.get(f"{provider}/{model}".lower()) or self._prices.get(
+            model.lower()
+        )
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        usage: TokenUsage,
+        price_factor: float = 1.0,
+    ) -> float | None:
+        """Add one upstream call and return its cost, or None when unpriced.
+
+        ``price_factor`` scales the listed price, e.g. ``0.5`` for batch calls.
+        """
+        price = self.price_for(provider, model)
+        cost = price.cost(usage) * price_factor if price else None
+        key = (provider, model)
+        hour = _hour_bucket(time.time())
+        with self._lock:
+            self._totals.setdefault(key, UsageTotals()).add(usage, cost)
+            self._hourly.setdefault(hour, {}).setdefault(key, UsageTotals()).add(
+                usage, cost
+            )
+            while len(self._hourly) > HOURLY_RETENTION:
+                self._hourly.pop(min(self._hourly))
+            due = (
+                self._rollup_path is not None
+                and time.monotonic() - self._last_flush >= self._flush_interval
+            )
+            if due:
+                self._last_flush = time.monotonic()
+        current = _current_request_usage.get()
+        if current is not None:
+            current.add(usage, cost)
+        if due:
+            self.flush()
+        return cost
+
+    def snapshot(self) -> dict[str, list[dict[str, object]]]:
+        with self._lock:
+            totals = [
+                {"provider": provider, "model": model, **asdict(values)}
+                for (provider, model), values in sorted(self._totals.items())
+            ]
+            hourly = [
+                {"hour": hour, "provider": provider, "model": model, **asdict(values)}
+                for hour in sorted(self._hourly)
+                for (provider, model), values in sorted(self._hourly[hour].items())
+            ]
+        return {"totals": totals, "hourly": hourly}
+
+    def flush(self) -> None:
+        """Rewrite the rollup; a failed write is logged, never raised."""
+        if self._rollup_path is None:
+            return
+        temp_path = self._rollup_path.with_suffix(self._rollup_path.suffix + ".tmp")
+        with self._flush_lock:
+            snapshot = self.snapshot()
+            try:
+                self._rollup_path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path.write_text(
+                    json.dumps(snapshot, separators=(",", ":")), "utf-8"
+                )
+                os.replace(temp_path, self._rollup_path)
+            except OSError:
+                logger.exception(
+                    "usage_rollup_write_failed",
+                    extra={"event": "usage_rollup_write_failed"},
+                )
+
+    def _load(self) -> None:
+        if self._rollup_path is None or not self._rollup_path.exists():
+            return
+        try:
+            data = json.loads(self._rollup_path.read_text("utf-8"))
+        except (OSError, json.JSONDecodeError):
+            logger.warning(
+                "usage_rollup_unreadable", extra={"event": "usage_rollup_unreadable"}
+            )
+            return
+        for row in data.get("totals", []):
+            key = (str(row["provider"]), str(row["model"]))
+            self._totals[key] = _totals_from_row(row)
+        for row in data.get("hourly", []):
+            key = (str(row["provider"]), str(row["model"]))
+            self._hourly.setdefault(str(row["hour"]), {})[key] = _totals_from_row(row)
+
+
+def _totals_from_row(row: dict[str, object]) -> UsageTotals:
+    return UsageTotals(
+        requests=int(row.get("requests", 0)),
+        prompt_tokens=int(row.get("prompt_tokens", 0)),
+        completion_tokens=int(row.get("completion_tokens", 0)),
+        cached_tokens=int(row.get("cached_tokens", 0)),
+        cost_usd=float(row.get("cost_usd", 0.0)),
+    )
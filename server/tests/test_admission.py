@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.core.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    client_address,
+    client_identity,
+    parse_networks,
+)
+from app.main import app
+from app.models.schemas import GenerateRequest, GenerateResponse
+
+
+def test_client_identity_hashes_api_keys() -> None:
+    keyed = client_identity({"x-api-key": "secret"}, "10.0.0.1")
+    assert keyed.startswith("key:") and "secret" not in keyed
+    assert client_identity({}, "10.0.0.1") == "ip:10.0.0.1"
+    assert client_identity({}, None) == "ip:unknown"
+    # Unregistered keys cannot mint new admission identities.
+    assert client_identity({"x-api-key": "made-up"}, "10.0.0.1", {"secret"}) == (
+        "ip:10.0.0.1"
+    )
+    assert client_identity({"x-api-key": "secret"}, "10.0.0.1", {"secret"}) == keyed
+
+
+def test_client_address_trusts_forwarded_for_only_from_trusted_proxies() -> None:
+    proxies = parse_networks("10.0.0.0/8, not-an-ip")
+    forwarded = {"x-forwarded-for": "1.2.3.4, 203.0.113.7, 10.0.0.3"}
+    # The rightmost untrusted hop was added by our proxy; earlier ones are
+    # whatever the client sent.
+    assert client_address(forwarded, "10.0.0.2", proxies) == "203.0.113.7"
+    assert client_address(forwarded, "198.51.100.1", proxies) == "198.51.100.1"
+    assert client_address({}, "10.0.0.2", proxies) == "10.0.0.2"
+    assert client_address(forwarded, "10.0.0.2", ()) == "10.0.0.2"
+
+
+def test_weighted_fair_queuing_and_bounded_queue() -> None:
+    async def scenario() -> tuple[list[str], AdmissionRejected]:
+        controller = AdmissionController(
+            max_concurrency=1,
+            client_concurrency=1,
+            max_queue=8,
+            client_queue=4,
+            weights={"interactive": 2.0},
+        )
+        assert controller.try_acquire("holder")
+        served: list[str] = []
+
+        async def request(client: str) -> None:
+            await controller.acquire(client)
+            served.append(client)
+            await asyncio.sleep(0)
+            controller.release(client, 0.01)
+
+        tasks = [
+            asyncio.create_task(request(client))
+            for client in ["batch"] * 4 + ["interactive"] * 4
+        ]
+        await asyncio.sleep(0)
+        assert controller.snapshot()["queued"] == 8
+        try:
+            await controller.acquire("batch")
+        except AdmissionRejected as exc:
+            rejected = exc
+        controller.release("holder", 0.01)
+        await asyncio.gather(*tasks)
+        return served, rejected
+
+    served, rejected = asyncio.run(scenario())
+    assert rejected.retry_after >= 1
+    assert served[:3].count("interactive") == 2
+    assert sorted(served) == ["batch"] * 4 + ["interactive"] * 4
+
+
+def test_queued_request_times_out() -> None:
+    async def scenario() -> AdmissionController:
+        controller = AdmissionController(max_concurrency=1, max_wait_seconds=0.01)
+        controller.try_acquire("holder")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("waiter")
+        return controller
+
+    stats = asyncio.run(scenario()).snapshot()
+    assert stats["timedOut"] == 1 and stats["queued"] == 0
+
+
+class _FakeSongService:
+    def generate(self, payload: GenerateRequest) -> GenerateResponse:
+        return GenerateResponse(
+            title=payload.topic,
+            style="Pop",
+            lyrics="[Verse]\nHello",
+            explanation="",
+            providerUsed="gemini",
+            modelUsed="gemini-2.0-flash",
+        )
+
+
+def test_generate_route_returns_429_when_client_cannot_be_admitted(
+    monkeypatch,
+) -> None:
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(song, "get_song_service", lambda: _FakeSongService())
+    monkeypatch.setattr(song, "get_admission_controller", lambda: controller)
+    client = TestClient(app)
+
+    assert client.post("/api/song/generate", json={"topic": "Hi"}).status_code == 200
+    assert controller.try_acquire("other")
+    response = client.post("/api/song/generate", json={"topic": "Hi"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+    metrics = client.get("/api/metrics").json()["admission"]
+    assert metrics["admitted"] == 2 and metrics["rejected"] == 1
+    assert metrics["clients"] == [
+        {
+            "client": "other",
+            "weight": 1.0,
+            "active": 1,
+            "queued": 0,
+            "admitted": 1,
+            "rejected": 0,
+        }
+    ]
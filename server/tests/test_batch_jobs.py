@@ -0,0 +1,273 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from app.api.routes import batches, song
+from app.core.config import Settings
+from app.main import app
+from app.models.schemas import GenerateRequest
+from app.providers.base import TokenUsage
+from app.providers.gemini_provider import GeminiProvider
+from app.providers.openai_provider import OpenAiProvider
+from app.providers.router import ProviderRouter
+from app.services.batch_jobs import BatchJobStore, BatchRunner
+from app.services.song_service import SongService
+from app.services.usage import ModelPrice, UsageLedger
+
+
+PACK = {
+    "title": "Night Rain",
+    "style": "Synthwave, melancholic",
+    "lyrics": "[Verse]\nNeon on the water\n\n[Chorus]\nRain all night",
+    "explanation": "Rain",
+}
+
+
+class _BatchServer:
+    """Local stand-in for the OpenAI Files and Batch APIs.
+
+    A batch reports ``in_progress`` on its first poll and ``completed`` on
+    the next. Requests whose topic is ``broken`` get an unparseable reply.
+    """
+
+    def __init__(self) -> None:
+        self.files: dict[str, str] = {}
+        self.batches: dict[str, dict[str, object]] = {}
+
+    def _file(self, file_id: str, purpose: str) -> dict[str, object]:
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(self.files[file_id]),
+            "created_at": 0,
+            "filename": f"{file_id}.jsonl",
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def _reply(self, line: dict[str, object]) -> dict[str, object]:
+        prompt = line["body"]["messages"][1]["content"]
+        content = "not json" if "broken" in prompt else json.dumps(PACK)
+        return {
+            "id": f"reply-{line['custom_id']}",
+            "custom_id": line["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": line["body"]["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 1000,
+                        "completion_tokens": 500,
+                        "total_tokens": 1500,
+                    },
+                },
+            },
+            "error": None,
+        }
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/v1")
+        if path == "/files":
+            file_id = f"file-{len(self.files)}"
+            body = request.content.decode()
+            lines = [line for line in body.splitlines() if '"custom_id"' in line]
+            self.files[file_id] = "\n".join(lines)
+            return httpx.Response(200, json=self._file(file_id, "batch"))
+        if path == "/batches":
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+                "created_at": 0,
+                "input_file_id": json.loads(request.content)["input_file_id"],
+                "status": "validating",
+            }
+            return httpx.Response(200, json=self.batches[batch_id])
+        if path.startswith("/batches/"):
+            batch = self.batches[path.rsplit("/", 1)[1]]
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+            elif batch["status"] == "in_progress":
+                replies = [
+                    json.dumps(self._reply(json.loads(line)))
+                    for line in self.files[batch["input_file_id"]].splitlines()
+                ]
+                output_id = f"file-{len(self.files)}"
+                self.files[output_id] = "\n".join(replies)
+                batch.update(status="completed", output_file_id=output_id)
+            return httpx.Response(200, json=batch)
+        if path.startswith("/files/") and path.endswith("/content"):
+            return httpx.Response(200, text=self.files[path.split("/")[2]])
+        return httpx.Response(404, json={"error": {"message": "not found"}})
+
+
+def _service(server: _BatchServer) -> tuple[SongService, UsageLedger]:
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = OpenAI(
+        api_key="o-key",
+        base_url="http://batch.test/v1",
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(server)),
+    )
+    router = ProviderRouter(
+        Settings(openai_api_key="o-key"), factories={"openai": lambda _: provider}
+    )
+    ledger = UsageLedger(prices={"gpt-4.1-mini": ModelPrice(input=2.0, output=8.0)})
+    return SongService(provider_router=router, usage_ledger=ledger), ledger
+
+
+def test_batch_jobs_round_trip_through_a_stand_in_batch_server(monkeypatch) -> None:
+    server = _BatchServer()
+    service, ledger = _service(server)
+    runner = BatchRunner(BatchJobStore(), lambda: service, max_batch_size=10)
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    monkeypatch.setattr(batches, "get_batch_runner", lambda: runner)
+    client = TestClient(app)
+
+    created = client.post(
+        "/api/song/batches",
+        json={"requests": [{"topic": "Rain"}, {"topic": "broken"}, {"topic": "Sea"}]},
+    )
+    assert created.status_code == 202
+    job = created.json()
+    assert (job["provider"], job["status"], job["total"]) == ("openai", "queued", 3)
+    url = f"/api/song/batches/{job['jobId']}"
+
+    runner.run_once()
+    assert len(server.batches) == 1
+    assert client.get(url).json()["status"] == "running"
+
+    runner.run_once()
+    finished = client.get(url).json()
+    assert finished["status"] == "completed"
+    assert (finished["completed"], finished["failed"]) == (2, 1)
+    first, broken, _ = finished["items"]
+    assert first["result"]["title"] == "Night Rain"
+    assert first["result"]["modelUsed"] == "gpt-4.1-mini"
+    assert "Clean Mix" in first["result"]["style"]
+    assert first["result"]["quality"] is not None
+    assert "invalid JSON" in broken["error"]
+    # Two parsed replies, each billed at half the listed price.
+    totals = ledger.snapshot()["totals"][0]
+    assert totals["completion_tokens"] == 1000
+    assert totals["cost_usd"] == 2 * (1000 * 2.0 + 500 * 8.0) / 1_000_000 * 0.5
+
+    assert client.get("/api/song/batches/missing").status_code == 404
+
+
+def test_interrupted_poll_round_does_not_bill_items_twice(monkeypatch) -> None:
+    server = _BatchServer()
+    service, ledger = _service(server)
+    store = BatchJobStore()
+    runner = BatchRunner(store, lambda: service, max_batch_size=10)
+    job_id = store.create_job(
+        "me", "openai", [GenerateRequest(topic="Rain"), GenerateRequest(topic="Sea")]
+    )
+    runner.run_once()
+
+    finish = service.finish_batch_result
+
+    def fail_on_sea(payload, *args):
+        if payload.topic == "Sea":
+            raise RuntimeError("store unavailable")
+        return finish(payload, *args)
+
+    def crash(_: str) -> None:
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(service, "finish_batch_result", fail_on_sea)
+    monkeypatch.setattr(store, "close_submission", crash)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        runner.run_once()
+    monkeypatch.undo()
+    runner.run_once()
+
+    job = store.job(job_id, "me")
+    assert [item.status for item in job.items] == ["completed", "failed"]
+    assert "store unavailable" in job.items[1].error
+    assert store.open_submissions() == []
+    assert ledger.snapshot()["totals"][0]["requests"] == 1
+
+
+def test_batch_jobs_reject_providers_without_a_batch_api(monkeypatch) -> None:
+    service = SongService(
+        provider_router=ProviderRouter(Settings(template_fallback=True))
+    )
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    client = TestClient(app)
+
+    response = client.post("/api/song/batches", json={"requests": [{"topic": "Rain"}]})
+    assert response.status_code == 422
+
+
+def test_gemini_batch_maps_inline_replies_in_submission_order() -> None:
+    created = {}
+
+    def create(model, src):
+        created.update(model=model, src=src)
+        return SimpleNamespace(name="batches/1")
+
+    reply = SimpleNamespace(
+        response=SimpleNamespace(
+            candidates=[
+                SimpleNamespace(
+                    content=SimpleNamespace(
+                        parts=[SimpleNamespace(text=json.dumps(PACK), thought=False)]
+                    ),
+                    finish_reason="STOP",
+                )
+            ],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=10, candidates_token_count=5
+            ),
+        ),
+        error=None,
+    )
+    failed = SimpleNamespace(response=None, error=SimpleNamespace(message="quota"))
+    job = SimpleNamespace(
+        state=SimpleNamespace(name="JOB_STATE_SUCCEEDED"),
+        dest=SimpleNamespace(inlined_responses=[reply, failed]),
+    )
+
+    provider = GeminiProvider(api_key="g-key", model_name="gemini-2.0-flash")
+    provider._client = SimpleNamespace(
+        batches=SimpleNamespace(create=create, get=lambda name: job)
+    )
+    items = [("a", GenerateRequest(topic="x")), ("b", GenerateRequest(topic="y"))]
+    assert provider.submit_batch(items) == "batches/1"
+    assert len(created["src"]) == 2
+    assert created["src"][0]["config"]["response_mime_type"] == "application/json"
+
+    poll = provider.poll_batch("batches/1", ["a", "b"])
+    assert poll.done
+    assert json.loads(poll.outputs["a"].text) == PACK
+    assert poll.outputs["a"].usage == TokenUsage(prompt_tokens=10, completion_tokens=5)
+    assert poll.outputs["b"].error == "quota"
+
+
+def test_job_store_survives_a_restart(tmp_path) -> None:
+    path = str(tmp_path / "batches.db")
+    store = BatchJobStore(path)
+    job_id = store.create_job("me", "openai", [GenerateRequest(topic="Rain")])
+    store.close()
+
+    reloaded = BatchJobStore(path)
+    assert reloaded.job(job_id, "me").status == "queued"
+    assert reloaded.job(job_id, "someone else") is None
+    assert [item.item_id for item in reloaded.queued(10)["openai"]] == [f"{job_id}:0"]
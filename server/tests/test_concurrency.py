@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.core import concurrency, config
+from app.core.admission import AdmissionController
+from app.core.concurrency import AdaptiveLimiter, request_priority
+from app.main import app
+from app.models.schemas import GenerateRequest, GenerateResponse
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_request_priority_can_only_be_lowered() -> None:
+    assert request_priority({}, "high") == "high"
+    assert request_priority({"x-request-priority": "batch"}, "normal") == "low"
+    assert request_priority({"x-request-priority": "high"}, "normal") == "normal"
+    assert request_priority({"x-request-priority": "bogus"}, "normal") == "normal"
+
+
+def test_limit_grows_when_saturated_and_backs_off_on_slow_responses(
+    monkeypatch,
+) -> None:
+    clock = _Clock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock)
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=2, max_limit=8)
+
+    for _ in range(40):
+        tokens = [limiter.try_acquire("high") for _ in range(4)]
+        clock.now += 0.1
+        for token in tokens:
+            limiter.release(token)
+    assert limiter.limit > 4
+    grown = limiter.limit
+
+    slow = [limiter.try_acquire("high") for _ in range(3)]
+    clock.now += 5.0
+    for token in slow:
+        limiter.release(token)
+    # One burst of slow completions is a single congestion signal.
+    assert limiter.limit == int(grown * 0.9)
+    assert limiter.snapshot()["baselineLatencyMs"] < 1000
+
+
+def test_low_priority_is_shed_first() -> None:
+    limiter = AdaptiveLimiter(initial_limit=4)
+    held = [limiter.try_acquire("normal") for _ in range(2)]
+    assert all(held)
+    assert limiter.try_acquire("low") is None
+    assert limiter.try_acquire("normal") is not None
+    assert limiter.try_acquire("high") is not None
+    assert limiter.try_acquire("normal") is None
+    assert limiter.snapshot()["shed"] == {"high": 0, "normal": 1, "low": 1}
+
+
+class _FakeSongService:
+    def generate(self, payload: GenerateRequest) -> GenerateResponse:
+        return GenerateResponse(
+            title=payload.topic,
+            style="Pop",
+            lyrics="[Verse]\nHello",
+            explanation="",
+            providerUsed="gemini",
+            modelUsed="gemini-2.0-flash",
+        )
+
+
+def test_generate_route_sheds_load_with_503_or_template(monkeypatch) -> None:
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=2, max_limit=2)
+    monkeypatch.setattr(song, "get_song_service", lambda: _FakeSongService())
+    monkeypatch.setattr(song, "get_concurrency_limiter", lambda: limiter)
+    client = TestClient(app)
+
+    assert client.post("/api/song/generate", json={"topic": "Hi"}).status_code == 200
+    assert limiter.try_acquire("high")
+    response = client.post("/api/song/generate", json={"topic": "Hi"})
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+    monkeypatch.setenv("LOAD_SHED_TEMPLATE", "true")
+    monkeypatch.setattr(config, "_settings", None)
+    response = client.post(
+        "/api/song/generate", json={"topic": "Hi", "structure": "Pop", "variants": 2}
+    )
+    assert response.status_code == 200
+    assert response.headers["x-load-shed"] == "template"
+    body = response.json()
+    assert body["providerUsed"] == "template"
+    assert len(body["packs"]) == 2
+
+    metrics = client.get("/api/metrics").json()["concurrency"]
+    assert metrics["shed"]["normal"] == 2
+    assert metrics["inflight"] == 1
+
+
+class _SlowSongService(_FakeSongService):
+    def generate(self, payload: GenerateRequest) -> GenerateResponse:
+        time.sleep(0.05)
+        return super().generate(payload)
+
+
+def test_client_flooding_its_queue_does_not_shed_other_clients(monkeypatch) -> None:
+    monkeypatch.setenv("ADMISSION_API_KEYS", "flooder,other")
+    monkeypatch.setattr(config, "_settings", None)
+    limiter = AdaptiveLimiter()
+    controller = AdmissionController(client_concurrency=4)
+    monkeypatch.setattr(song, "get_song_service", lambda: _SlowSongService())
+    monkeypatch.setattr(song, "get_concurrency_limiter", lambda: limiter)
+    monkeypatch.setattr(song, "get_admission_controller", lambda: controller)
+
+    async def scenario() -> tuple[list[int], int]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+
+            async def call(key: str) -> int:
+                response = await client.post(
+                    "/api/song/generate",
+                    json={"topic": "Hi"},
+                    headers={"x-api-key": key},
+                )
+                return response.status_code
+
+            flood = [asyncio.create_task(call("flooder")) for _ in range(20)]
+            await asyncio.sleep(0.01)
+            other = await call("other")
+            return await asyncio.gather(*flood), other
+
+    flood, other = asyncio.run(scenario())
+    assert other == 200
+    assert flood == [200] * 20
+    # Queued calls hold no limiter slots and their wait is not latency.
+    assert limiter.snapshot()["shed"] == {"high": 0, "normal": 0, "low": 0}
+    assert limiter.limit >= 16
@@ -0,0 +1,89 @@
+import time
+
+from fastapi import HTTPException
+
+from app.core.deadline import Deadline, deadline_from_headers, use_deadline
+from app.models.schemas import GenerateRequest
+from app.providers.base import GenerateProviderResult, ProviderError, ProviderErrorCode
+from app.services.song_service import SongService
+
+
+def test_deadline_from_headers_prefers_client_budget_within_max() -> None:
+    deadline = deadline_from_headers(
+        {"x-request-timeout": "1500ms"}, default_seconds=60, max_seconds=120
+    )
+    assert 1.0 < deadline.remaining() <= 1.5
+
+    capped = deadline_from_headers(
+        {"x-request-timeout": "600"}, default_seconds=60, max_seconds=120
+    )
+    assert 119 < capped.remaining() <= 120
+
+    absolute = deadline_from_headers(
+        {"x-request-deadline": str(time.time() + 10)},
+        default_seconds=60,
+        max_seconds=120,
+    )
+    assert 9 < absolute.remaining() <= 10
+
+
+def test_deadline_from_headers_uses_default_for_invalid_values() -> None:
+    deadline = deadline_from_headers(
+        {"x-request-timeout": "soon"}, default_seconds=30, max_seconds=120
+    )
+    assert 29 < deadline.remaining() <= 30
+    for value in ("nan", "inf", "-infms", "NaNs"):
+        for header in ("x-request-timeout", "x-request-deadline"):
+            deadline = deadline_from_headers(
+                {header: value}, default_seconds=30, max_seconds=120
+            )
+            assert 29 < deadline.remaining() <= 30
+
+
+def test_cancelled_deadline_has_no_budget() -> None:
+    deadline = Deadline.after(30)
+    deadline.cancel()
+    assert deadline.expired
+    assert not deadline.allows_attempt()
+
+
+class _SlowFailingProvider:
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        raise ProviderError("upstream timed out", code=ProviderErrorCode.TIMEOUT)
+
+
+class _UnexpectedProvider:
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        raise AssertionError("fallback should have been skipped")
+
+
+class _Router:
+    def __init__(self, providers: dict[str, object]):
+        self._providers = providers
+
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        return list(self._providers)
+
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        pass
+
+    def get_provider(self, name: str):
+        return self._providers[name]
+
+
+def test_generate_skips_fallback_when_budget_is_too_small() -> None:
+    service = SongService(
+        provider_router=_Router(
+            {"gemini": _SlowFailingProvider(), "openai": _UnexpectedProvider()}
+        )
+    )
+    with use_deadline(Deadline.after(1.0, min_attempt_seconds=5.0)):
+        try:
+            service.generate(GenerateRequest(topic="Test"))
+        except HTTPException as exc:
+            assert exc.status_code == 504
+            assert "deadline" in str(exc.detail)
+        else:
+            raise AssertionError("Expected HTTPException")
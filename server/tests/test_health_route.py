@@ -1,6 +1,9 @@
 from fastapi.testclient import TestClient
 
+from app.api.routes import song
 from app.main import app
+from app.providers.base import ProviderError
+from app.services.readiness import ProviderProber
 
 
 client = TestClient(app)
@@ -11,3 +14,57 @@ def test_health_route_returns_ok_and_request_id() -> None:
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
     assert response.headers.get("x-request-id")
+
+
+class _ProbedProvider:
+    def __init__(self, error: Exception | None = None):
+        self._error = error
+        self.probes = 0
+
+    def probe(self, timeout_seconds: float) -> None:
+        self.probes += 1
+        if self._error is not None:
+            raise self._error
+
+
+class _ProbeRouter:
+    def __init__(self, providers: dict[str, _ProbedProvider]):
+        self._providers = providers
+        self.configured = list(providers)
+
+    def get_provider(self, name: str) -> _ProbedProvider:
+        return self._providers[name]
+
+
+def test_ready_route_reports_cached_probe_results(monkeypatch) -> None:
+    providers = {
+        "gemini": _ProbedProvider(ProviderError("Gemini probe failed: 401")),
+        "openai": _ProbedProvider(),
+    }
+    prober = ProviderProber(_ProbeRouter(providers))
+    monkeypatch.setattr(song, "get_provider_prober", lambda: prober)
+
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["warm"] is False
+    assert {item["status"] for item in response.json()["providers"]} == {"pending"}
+
+    prober.probe_all()
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] and body["warm"]
+    by_name = {item["provider"]: item for item in body["providers"]}
+    assert by_name["gemini"]["status"] == "error"
+    assert "401" in by_name["gemini"]["error"]
+    assert by_name["openai"]["status"] == "ok"
+    assert by_name["openai"]["latencyMs"] is not None
+    assert providers["openai"].probes == 1
+
+
+def test_prober_is_not_ready_without_a_healthy_provider() -> None:
+    prober = ProviderProber(_ProbeRouter({"gemini": _ProbedProvider(TimeoutError())}))
+    prober.start()
+    prober.stop()
+    assert prober.warm and not prober.ready
+    assert not ProviderProber(_ProbeRouter({})).probe_all()
@@ -0,0 +1,112 @@
+import asyncio
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.api.routes import song
+from app.core.concurrency import AdaptiveLimiter
+from app.core.idempotency import IdempotencyStore, StoredResponse
+from app.main import app
+from app.models.schemas import GenerateRequest, GenerateResponse
+
+
+class _CountingSongService:
+    def __init__(self, fail: bool = False) -> None:
+        self.calls = 0
+        self._fail = fail
+
+    def generate(self, payload: GenerateRequest) -> GenerateResponse:
+        self.calls += 1
+        if self._fail:
+            raise HTTPException(status_code=502, detail=f"Upstream broke #{self.calls}")
+        return GenerateResponse(
+            title=f"{payload.topic} #{self.calls}",
+            style="Pop",
+            lyrics="[Verse]\nHello",
+            explanation="",
+            providerUsed="gemini",
+            modelUsed="gemini-2.0-flash",
+        )
+
+
+def _client(monkeypatch, service: _CountingSongService) -> TestClient:
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    store = IdempotencyStore()
+    monkeypatch.setattr(main, "get_idempotency_store", lambda: store)
+    return TestClient(app)
+
+
+def test_duplicate_requests_replay_the_stored_response(monkeypatch) -> None:
+    service = _CountingSongService()
+    client = _client(monkeypatch, service)
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/song/generate", json={"topic": "Hi"}, headers=headers)
+    second = client.post("/api/song/generate", json={"topic": "Hi"}, headers=headers)
+    assert service.calls == 1
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+    reused = client.post("/api/song/generate", json={"topic": "Other"}, headers=headers)
+    assert reused.status_code == 422
+    client.post("/api/song/generate", json={"topic": "Hi"})
+    assert service.calls == 2
+
+
+def test_errors_are_replayed_but_retry_after_responses_are_not(monkeypatch) -> None:
+    service = _CountingSongService(fail=True)
+    client = _client(monkeypatch, service)
+    headers = {"Idempotency-Key": "retry-2"}
+
+    first = client.post("/api/song/generate", json={"topic": "Hi"}, headers=headers)
+    second = client.post("/api/song/generate", json={"topic": "Hi"}, headers=headers)
+    assert first.status_code == second.status_code == 502
+    assert second.content == first.content
+    assert service.calls == 1
+
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    monkeypatch.setattr(song, "get_concurrency_limiter", lambda: limiter)
+    token = limiter.try_acquire("high")
+    headers = {"Idempotency-Key": "retry-3"}
+    shed = client.post("/api/song/generate", json={"topic": "Hi"}, headers=headers)
+    assert shed.status_code == 503
+    limiter.release(token)
+    retried = client.post("/api/song/generate", json={"topic": "Hi"}, headers=headers)
+    assert retried.status_code == 502
+    assert service.calls == 2
+
+
+def test_concurrent_duplicates_wait_for_the_first_request() -> None:
+    async def scenario() -> tuple[int, list[bool]]:
+        store = IdempotencyStore()
+        calls = 0
+
+        async def produce() -> StoredResponse:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return StoredResponse("fp", 200, [], b"{}", expires_at=1e12)
+
+        results = await asyncio.gather(
+            *(store.run("key", "fp", produce) for _ in range(3))
+        )
+        return calls, sorted(replayed for _, replayed in results)
+
+    calls, replayed = asyncio.run(scenario())
+    assert calls == 1
+    assert replayed == [False, True, True]
+
+
+def test_sqlite_tier_survives_a_restart(tmp_path) -> None:
+    path = str(tmp_path / "idempotency.db")
+    stored = StoredResponse(
+        "fp", 201, [("content-type", "application/json")], b'{"a":1}', 1e12
+    )
+    IdempotencyStore(max_entries=1, path=path).put("key", stored)
+
+    reloaded = IdempotencyStore(max_entries=1, path=path)
+    assert reloaded.get("key") == stored
+    assert reloaded.get("missing") is None
@@ -0,0 +1,118 @@
+import json
+from types import SimpleNamespace
+
+from app.core.config import Settings
+from app.models.schemas import GenerateRequest
+from app.providers.base import GenerateProviderResult
+from app.providers.openai_provider import OpenAiProvider
+from app.services.instrumental import arrangement_tags, local_instrumental_fields
+from app.services.prompt_builder import INSTRUMENTAL_FAST_OUTPUT_TOKENS
+from app.services.song_service import SongService
+
+
+def test_local_instrumental_pack_uses_structure_and_genre_defaults() -> None:
+    payload = GenerateRequest(
+        topic="Neon city at night",
+        genre="Synthwave",
+        structure="Standard",
+        isInstrumental=True,
+    )
+    fields = local_instrumental_fields(payload)
+    assert fields["lyrics"].startswith("[Instrumental]\n[Intro]")
+    assert "[Solo: Analog Synth]" in fields["lyrics"]
+    assert "Instrumental Arrangement" in fields["style"]
+    assert "44.1kHz" in fields["style"]
+    assert fields["title"] == "Neon City At Night"
+
+
+def test_ambient_arrangement_stays_sparse() -> None:
+    tags = arrangement_tags(
+        GenerateRequest(topic="x", structure="Ambient", isInstrumental=True)
+    )
+    assert "[Drop]" not in tags
+    assert tags[0] == "[Intro]" and tags[-1] == "[Outro]"
+
+
+def test_openai_fast_path_asks_only_for_title_and_arrangement() -> None:
+    calls: list[dict] = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = json.dumps(
+            {
+                "title": "Chrome Horizon",
+                "arrangement": ["Intro", "[Build]", "[Drop]", "[Outro]"],
+                "explanation": "Pulsing build into a wide drop.",
+            }
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    payload = GenerateRequest(topic="Drive", genre="Synthwave", isInstrumental=True)
+    [result] = provider.generate_instrumental(payload)
+
+    assert calls[0]["max_completion_tokens"] == INSTRUMENTAL_FAST_OUTPUT_TOKENS
+    assert "arrangement" in calls[0]["messages"][0]["content"]
+    assert result.title == "Chrome Horizon"
+    assert result.lyrics == "[Instrumental]\n[Intro]\n[Build]\n[Drop]\n[Outro]"
+    assert "Analog Synth" in result.style
+
+
+class _NoCallRouter:
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        raise AssertionError("local mode must not route to a provider")
+
+
+class _FastProvider:
+    def generate_instrumental(
+        self, payload: GenerateRequest, count: int = 1
+    ) -> list[GenerateProviderResult]:
+        return [
+            GenerateProviderResult(
+                provider_name="gemini",
+                model_name="gemini-2.0-flash",
+                title="Fast",
+                style="Cinematic",
+                lyrics="[Instrumental]",
+                explanation="",
+            )
+        ]
+
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        raise AssertionError("fast mode must not use the full lyric prompt")
+
+
+class _SingleRouter:
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        return ["gemini"]
+
+    def get_provider(self, name: str):
+        return _FastProvider()
+
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        pass
+
+
+def test_song_service_instrumental_modes() -> None:
+    payload = GenerateRequest(topic="Rain", isInstrumental=True)
+
+    local = SongService(provider_router=_NoCallRouter(), instrumental_mode="local")
+    response = local.generate(payload)
+    assert response.providerUsed == "template"
+    assert response.lyrics.startswith("[Instrumental]")
+
+    fast = SongService(provider_router=_SingleRouter(), instrumental_mode="fast")
+    assert fast.generate(payload).title == "Fast"
+
+    # A service built outside the app uses the same default as the settings.
+    assert Settings().instrumental_mode == "fast"
+    assert SongService(provider_router=_SingleRouter()).generate(payload).title == (
+        "Fast"
+    )
@@ -0,0 +1,116 @@
+from app.core.config import Settings
+from app.core.deadline import Deadline, use_deadline
+from app.models.schemas import GenerateRequest, GenerateResponse
+from app.providers.base import GenerateProviderResult, ProviderError, ProviderErrorCode
+from app.providers.router import ProviderRouter
+from app.providers.template_provider import TemplateProvider
+from app.services.local_engine import (
+    template_extension,
+    template_generate_response,
+    template_pack_fields,
+)
+from app.services.song_service import SongService
+
+
+def test_template_pack_is_deterministic_and_follows_structure() -> None:
+    payload = GenerateRequest(
+        topic="Neon nights in Tokyo", genre="Synthwave", mood="Dreamy", structure="Pop"
+    )
+    fields = template_pack_fields(payload)
+    assert fields == template_pack_fields(payload)
+    assert fields["lyrics"] != template_pack_fields(payload, variant=1)["lyrics"]
+    assert fields["title"] == "Neon Nights In Tokyo"
+    assert "Analog Synth" in fields["style"]
+
+    tags = [line for line in fields["lyrics"].splitlines() if line.startswith("[")]
+    assert tags == [
+        "[Intro]",
+        "[Verse]",
+        "[Pre-Chorus]",
+        "[Chorus]",
+        "[Verse 2]",
+        "[Bridge]",
+        "[Chorus]",
+        "[Outro]",
+    ]
+    choruses = fields["lyrics"].split("[Chorus]\n")
+    assert choruses[1].split("\n\n")[0] == choruses[2].split("\n\n")[0]
+    GenerateResponse(**fields, providerUsed="template", modelUsed="template-v1")
+
+
+def test_template_extension_adds_bridge_then_next_verse() -> None:
+    lyrics = "[Verse]\nOne\n\n[Chorus]\nTwo\n\n[Verse 2]\nThree"
+    added = template_extension(lyrics, "Rain", "Sad, Rock", "English")
+    assert added.startswith("[Bridge]\n")
+
+    added = template_extension(lyrics + "\n\n" + added, "Rain", "Sad, Rock", "English")
+    assert added.startswith("[Verse 3]\n")
+
+
+class _DownProvider:
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        raise ProviderError("upstream outage", code=ProviderErrorCode.NETWORK)
+
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        return [self.generate_pack(payload)]
+
+
+class _Router:
+    def __init__(self, providers: dict[str, object]):
+        self._providers = providers
+
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        return list(self._providers)
+
+    def get_provider(self, name: str):
+        return self._providers[name]
+
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        pass
+
+
+def test_template_serves_auto_fallback_even_past_the_deadline() -> None:
+    service = SongService(
+        provider_router=_Router(
+            {
+                "gemini": _DownProvider(),
+                "openai": _DownProvider(),
+                "template": TemplateProvider(),
+            }
+        )
+    )
+    payload = GenerateRequest(topic="Rain", variants=2)
+    assert service.generate(payload).providerUsed == "template"
+
+    with use_deadline(Deadline.after(1.0, min_attempt_seconds=5.0)):
+        response = service.generate(payload)
+    assert response.providerUsed == "template"
+    assert response.modelUsed == "template-v1"
+    assert len(response.packs) == 2
+
+
+def test_template_fallback_honours_requested_fields() -> None:
+    payload = GenerateRequest(topic="Rain", fields=["title"], variants=2)
+    response = template_generate_response(payload)
+    assert response.title
+    assert (response.style, response.lyrics, response.explanation) == ("", "", "")
+    assert all(pack.title and not pack.lyrics for pack in response.packs)
+
+
+def test_router_ranks_template_last_under_live_policies() -> None:
+    router = ProviderRouter(
+        Settings(
+            gemini_api_key="key",
+            template_fallback=True,
+            routing_policy="fastest",
+            routing_exploration=0.0,
+        )
+    )
+    router.record_outcome("template", "generate", 0.1, ok=True)
+    router.record_outcome("gemini", "generate", 2500, ok=True)
+    assert router.resolve_order("auto") == ["gemini", "template"]
+    assert router.resolve_order("template") == ["template"]
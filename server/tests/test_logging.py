@@ -32,3 +32,22 @@ def test_json_formatter_includes_allowlisted_fields_only() -> None:
     assert payload["status"] == 200
     assert payload["duration_ms"] == 12.5
     assert "api_key" not in payload
+
+
+def test_lyric_repair_log_keeps_scores() -> None:
+    record = logging.LogRecord(
+        name="app.services.song_service",
+        level=logging.INFO,
+        pathname=__file__,
+        lineno=10,
+        msg="lyric_repair",
+        args=(),
+        exc_info=None,
+    )
+    record.event = "lyric_repair"
+    record.score_before = 0.42
+    record.score_after = 0.81
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert (payload["score_before"], payload["score_after"]) == (0.42, 0.81)
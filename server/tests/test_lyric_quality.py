@@ -0,0 +1,146 @@
+from app.core.config import Settings
+from app.models.schemas import GenerateRequest
+from app.providers.base import ExtendProviderResult, GenerateProviderResult
+from app.services.lyric_quality import analyze_lyrics, analyze_many, insert_sections
+from app.services.song_service import SongService
+
+
+POP_WITHOUT_BRIDGE = """[Intro]
+Lights come on across the bay
+
+[Verse]
+I walked the road where the river bends
+Counting every light until the evening ends
+
+[Pre-Chorus]
+Hold on, hold on
+
+[Chorus]
+We are the fire in the night
+We are the spark, we are the light
+
+[Verse 2]
+Morning finds us on the shore
+Asking for a little more
+
+[Chorus]
+We are the fire in the night
+We are the spark, we are the light
+
+[Outro]
+We are the light"""
+
+
+def test_analyze_lyrics_flags_structure_repetition_and_language() -> None:
+    report = analyze_lyrics(POP_WITHOUT_BRIDGE, "Pop", "English")
+    assert not report.passed
+    assert report.missing_sections == ["Bridge"]
+    assert not report.needs_rewrite
+    assert report.rhyme_density > 0.5
+    assert [section.tag for section in report.sections][:2] == ["Intro", "Verse"]
+
+    repeated = "[Verse]\n" + "Same line again and again\n" * 6
+    assert "repeated lines" in analyze_lyrics(repeated, "Auto", "English").issues[0]
+
+    spanish = (
+        "[Verse]\nYo camino por la calle de la noche\n"
+        "Y tu me miras con el corazón en la mano\n"
+        "En la ciudad que nunca duerme por ti"
+    )
+    report = analyze_lyrics(spanish, "Auto", "English")
+    assert report.language_match is False
+    assert report.needs_rewrite
+    assert analyze_lyrics(spanish, "Auto", "Spanish").passed
+
+    russian = "[Verse]\nЯ иду по улице ночью одна\nИ ветер поёт мне о тебе"
+    assert analyze_lyrics(russian, "Auto", "Russian").language_match is True
+    assert analyze_lyrics(russian, "Auto", "Japanese").language_match is False
+
+    reports = analyze_many([("[Instrumental]\n[Intro]", "Pop", "English", True)])
+    assert reports[0].passed
+
+
+def test_insert_sections_follows_the_structure_plan() -> None:
+    repaired = insert_sections(
+        POP_WITHOUT_BRIDGE, "[Bridge]\nEvery road leads back to you", "Pop"
+    )
+    tags = [line for line in repaired.splitlines() if line.startswith("[")]
+    assert tags == [
+        "[Intro]",
+        "[Verse]",
+        "[Pre-Chorus]",
+        "[Chorus]",
+        "[Verse 2]",
+        "[Bridge]",
+        "[Chorus]",
+        "[Outro]",
+    ]
+    assert analyze_lyrics(repaired, "Pop", "English").passed
+
+
+class _RepairingProvider:
+    def __init__(self) -> None:
+        self.repairs: list[tuple[list[str], bool]] = []
+
+    def generate_pack(self, payload: GenerateRequest) -> GenerateProviderResult:
+        return GenerateProviderResult(
+            provider_name="openai",
+            model_name="gpt-4.1-mini",
+            title="Fire",
+            style="Pop",
+            lyrics=POP_WITHOUT_BRIDGE,
+            explanation="",
+        )
+
+    def repair_lyrics(
+        self,
+        payload: GenerateRequest,
+        lyrics: str,
+        issues: list[str],
+        missing_sections: list[str],
+        rewrite: bool,
+    ) -> ExtendProviderResult:
+        self.repairs.append((missing_sections, rewrite))
+        return ExtendProviderResult(
+            provider_name="openai",
+            model_name="gpt-4.1-mini",
+            added_lyrics="[Bridge]\nEvery road leads back to you",
+        )
+
+
+class _Router:
+    def __init__(self, provider: object):
+        self._provider = provider
+
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        return ["openai"]
+
+    def get_provider(self, name: str):
+        return self._provider
+
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        pass
+
+
+def test_song_service_repairs_missing_sections_with_one_targeted_call() -> None:
+    provider = _RepairingProvider()
+    payload = GenerateRequest(topic="Fire", structure="Pop")
+
+    unrepaired = SongService(
+        provider_router=_Router(provider), lyric_repair=False
+    ).generate(payload)
+    assert unrepaired.quality is not None
+    assert unrepaired.quality.missingSections == ["Bridge"]
+    assert provider.repairs == []
+
+    # Repairs are on by default, as in the app.
+    assert Settings().lyric_repair
+    service = SongService(provider_router=_Router(provider))
+    response = service.generate(payload)
+    assert provider.repairs == [(["Bridge"], False)]
+    assert response.quality is not None
+    assert response.quality.repaired and response.quality.passed
+    assert "[Bridge]\nEvery road leads back to you" in response.lyrics
+    assert response.packs[0].lyrics == response.lyrics
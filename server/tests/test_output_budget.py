@@ -0,0 +1,124 @@
+import json
+from types import SimpleNamespace
+
+from app.core.config import Settings
+from app.models.schemas import GenerateRequest
+from app.providers.gemini_provider import GeminiProvider
+from app.providers.openai_provider import OpenAiProvider
+from app.providers.parsing import parse_pack_fields, parse_truncated_pack_fields
+from app.providers.router import ProviderRouter
+from app.services.prompt_builder import compute_output_budget
+from app.services.song_service import SongService
+
+
+def test_output_budget_follows_structure_instrumental_and_language() -> None:
+    rap = compute_output_budget(GenerateRequest(topic="x", structure="Rap"))
+    pop = compute_output_budget(GenerateRequest(topic="x", structure="Pop"))
+    instrumental = compute_output_budget(
+        GenerateRequest(topic="x", structure="Pop", isInstrumental=True)
+    )
+    japanese = compute_output_budget(
+        GenerateRequest(topic="x", structure="Pop", language="Japanese")
+    )
+    assert instrumental < rap < pop < japanese
+
+
+def test_truncated_pack_is_repaired_to_complete_lines() -> None:
+    text = (
+        '{"title": "Night", "style": "pop", "lyrics": "[Verse]\\nfirst line\\nsecond li'
+    )
+    fields = parse_truncated_pack_fields(text, GenerateRequest(topic="x"))
+    assert fields is not None
+    assert fields["title"] == "Night"
+    assert fields["lyrics"] == "[Verse]\nfirst line"
+
+
+def test_openai_sets_budget_and_retries_unsalvageable_truncation() -> None:
+    calls: list[dict] = []
+    outputs = iter(
+        [
+            ('{"title": "Night", "sty', "length"),
+            (
+                json.dumps({"title": "Night", "style": "", "lyrics": "[Verse]\nok"}),
+                "stop",
+            ),
+        ]
+    )
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content, reason = next(outputs)
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=content), finish_reason=reason
+                )
+            ]
+        )
+
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    payload = GenerateRequest(topic="x", structure="Rap")
+    result = provider.generate_pack(payload)
+
+    budget = compute_output_budget(payload)
+    assert calls[0]["max_completion_tokens"] == budget
+    assert calls[1]["max_completion_tokens"] == budget * 2
+    assert result.lyrics == "[Verse]\nok"
+    assert not result.truncated
+
+
+def test_gemini_flags_and_repairs_max_tokens_finish() -> None:
+    calls: list[dict] = []
+
+    def generate_content(**kwargs):
+        calls.append(kwargs)
+        text = '{"title": "Night", "style": "pop", "lyrics": "[Verse]\\nline\\nhal'
+        return SimpleNamespace(
+            candidates=[
+                SimpleNamespace(
+                    content=SimpleNamespace(parts=[SimpleNamespace(text=text)]),
+                    finish_reason=SimpleNamespace(name="MAX_TOKENS"),
+                )
+            ],
+            text=text,
+        )
+
+    provider = GeminiProvider(api_key="g-key", model_name="gemini-2.0-flash")
+    provider._client = SimpleNamespace(
+        models=SimpleNamespace(generate_content=generate_content)
+    )
+    payload = GenerateRequest(topic="x", isInstrumental=True)
+    result = provider.generate_pack(payload)
+
+    assert calls[0]["config"]["max_output_tokens"] == compute_output_budget(payload)
+    assert len(calls) == 1
+    assert result.truncated
+    assert result.lyrics == "[Verse]\nline"
+
+
+def test_partial_fields_shrink_the_budget_and_blank_the_rest() -> None:
+    payload = GenerateRequest(topic="x", structure="Pop", fields=["style"])
+    assert compute_output_budget(payload) < compute_output_budget(
+        GenerateRequest(topic="x", structure="Pop", fields=["lyrics"])
+    )
+    assert compute_output_budget(payload) < 150
+
+    fields = parse_pack_fields(
+        json.dumps({"style": "dreamy pads", "lyrics": "[Verse]\nunasked"}), payload
+    )
+    assert fields["lyrics"] == fields["title"] == fields["explanation"] == ""
+    assert "Clean Mix" in fields["style"]
+
+    service = SongService(
+        provider_router=ProviderRouter(Settings(template_fallback=True)),
+        lyric_repair=True,
+    )
+    response = service.generate(
+        GenerateRequest(topic="x", provider="template", fields=["title", "style"])
+    )
+    assert response.title and response.style
+    assert response.lyrics == response.packs[0].lyrics == ""
+    assert response.quality is None
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import config, profiler
+from app.core.profiler import (
+    LoopLagMonitor,
+    ProfilerBusyError,
+    collapsed_stacks,
+    sample_stacks,
+    speedscope_profile,
+)
+from app.main import app
+
+
+def _spin_until(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_captures_worker_stacks() -> None:
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_until, args=(stop,), name="spin-worker")
+    worker.start()
+    try:
+        result = sample_stacks(0.2, 0.005, thread_filter="spin-worker")
+    finally:
+        stop.set()
+        worker.join()
+
+    assert result.samples > 5
+    folded = collapsed_stacks(result)
+    assert folded.startswith("spin-worker;")
+    assert "_spin_until (tests/test_profiler.py:" in folded
+
+    document = speedscope_profile(result)
+    names = {frame["name"] for frame in document["shared"]["frames"]}
+    assert "_spin_until" in names
+    [thread_profile] = document["profiles"]
+    assert thread_profile["name"] == "spin-worker"
+    assert len(thread_profile["samples"]) == len(thread_profile["weights"])
+
+
+def test_only_one_profile_runs_at_a_time() -> None:
+    with profiler._profile_lock, pytest.raises(ProfilerBusyError):
+        sample_stacks(0.01)
+
+
+def _block_the_loop() -> None:
+    time.sleep(0.25)
+
+
+def test_loop_lag_monitor_logs_the_blocking_stack(caplog) -> None:
+    async def scenario() -> LoopLagMonitor:
+        monitor = LoopLagMonitor(threshold_ms=80, interval_seconds=0.01)
+        monitor.start()
+        await asyncio.sleep(0.03)
+        _block_the_loop()
+        await asyncio.sleep(0.03)
+        monitor.stop()
+        return monitor
+
+    with caplog.at_level(logging.WARNING, logger="app.core.profiler"):
+        stats = asyncio.run(scenario()).snapshot()
+    assert stats["stalls"] == 1
+    assert stats["maxLagMs"] >= 150
+    [record] = [r for r in caplog.records if r.getMessage() == "event_loop_blocked"]
+    assert "_block_the_loop" in record.stack
+
+
+def test_admin_profile_route(monkeypatch) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(config, "_settings", None)
+    client = TestClient(app)
+    headers = {"x-admin-token": "s3cret"}
+
+    response = client.post(
+        "/api/admin/profile",
+        params={"seconds": 0.05, "format": "collapsed"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    response = client.post(
+        "/api/admin/profile", params={"seconds": 0.05}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["profiles"]
+    assert client.post("/api/admin/profile").status_code == 401
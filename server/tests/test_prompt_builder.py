@@ -26,3 +26,15 @@ def test_build_generation_messages_contains_structure_plan() -> None:
     assert "top-loaded style ordering" in system_instruction
     assert "Structure plan:" in user_prompt
     assert "[Pre-Chorus]" in user_prompt
+
+
+def test_build_generation_messages_asks_only_for_requested_fields() -> None:
+    full, _ = build_generation_messages(GenerateRequest(topic="Rain"))
+    assert "keys: title, style, lyrics, explanation." in full
+
+    payload = GenerateRequest(topic="Rain", fields=["style", "title"])
+    system_instruction, user_prompt = build_generation_messages(payload)
+    assert "keys: title, style." in system_instruction
+    assert "top-loaded style ordering" in system_instruction
+    assert "sung lyrics" not in system_instruction
+    assert "Structure plan:" not in user_prompt
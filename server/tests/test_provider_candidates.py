@@ -0,0 +1,123 @@
+import json
+from types import SimpleNamespace
+
+from app.models.schemas import GenerateRequest
+from app.providers.base import ProviderError, ProviderErrorCode
+from app.providers.gemini_provider import GeminiProvider
+from app.providers.openai_provider import OpenAiProvider
+
+
+def _pack_json(title: str) -> str:
+    return json.dumps(
+        {
+            "title": title,
+            "style": "Dreamy, synthwave",
+            "lyrics": "[Verse]\nNeon rain",
+            "explanation": "ok",
+        }
+    )
+
+
+class _FakeOpenAiCompletions:
+    def __init__(self, reject_n: bool = False, fail_first: str | None = None):
+        self.calls: list[dict] = []
+        self._reject_n = reject_n
+        self._fail_first = fail_first
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        n = kwargs.get("n", 1)
+        if self._fail_first is not None:
+            error, self._fail_first = self._fail_first, None
+            raise RuntimeError(error)
+        if self._reject_n and n > 1:
+            raise RuntimeError("'n' is not supported with this model")
+        choices = [
+            SimpleNamespace(message=SimpleNamespace(content=_pack_json(f"Take {i}")))
+            for i in range(n)
+        ]
+        return SimpleNamespace(choices=choices)
+
+
+def _openai_provider(completions: _FakeOpenAiCompletions) -> OpenAiProvider:
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return provider
+
+
+def test_openai_generate_packs_uses_single_call_with_n() -> None:
+    completions = _FakeOpenAiCompletions()
+    provider = _openai_provider(completions)
+    payload = GenerateRequest(topic="Rain", genre="Synthwave", variants=3)
+
+    results = provider.generate_packs(payload, 3)
+
+    assert len(completions.calls) == 1
+    assert completions.calls[0]["n"] == 3
+    assert [item.title for item in results] == ["Take 0", "Take 1", "Take 2"]
+    assert all("44.1kHz" in item.style for item in results)
+
+
+def test_openai_generate_packs_falls_back_to_parallel_calls() -> None:
+    completions = _FakeOpenAiCompletions(reject_n=True)
+    provider = _openai_provider(completions)
+    payload = GenerateRequest(topic="Rain", variants=2)
+
+    results = provider.generate_packs(payload, 2)
+
+    assert len(results) == 2
+    assert [call.get("n") for call in completions.calls] == [2, None, None]
+    # The rejection is remembered.
+    provider.generate_packs(payload, 2)
+    assert [call.get("n") for call in completions.calls[3:]] == [None, None]
+
+
+def test_transient_error_does_not_disable_native_candidates() -> None:
+    completions = _FakeOpenAiCompletions(fail_first="500 internal server error")
+    provider = _openai_provider(completions)
+    payload = GenerateRequest(topic="Rain", variants=2)
+
+    assert len(provider.generate_packs(payload, 2)) == 2
+    assert len(provider.generate_packs(payload, 2)) == 2
+    # The failed call fell back to parallel calls; the next used ``n`` again.
+    assert [call.get("n") for call in completions.calls] == [2, None, None, 2]
+
+
+def test_gemini_generate_packs_reads_every_candidate() -> None:
+    calls: list[dict] = []
+
+    def generate_content(**kwargs):
+        calls.append(kwargs)
+        candidates = [
+            SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))
+            for text in [_pack_json("A"), "not json", _pack_json("C")]
+        ]
+        return SimpleNamespace(candidates=candidates, text=None)
+
+    provider = GeminiProvider(api_key="g-key", model_name="gemini-2.0-flash")
+    provider._client = SimpleNamespace(
+        models=SimpleNamespace(generate_content=generate_content)
+    )
+    payload = GenerateRequest(topic="Rain", variants=3)
+
+    results = provider.generate_packs(payload, 3)
+
+    assert calls[0]["config"]["candidate_count"] == 3
+    assert [item.title for item in results] == ["A", "C", "A"]
+    assert "candidate_count" not in calls[1]["config"]
+
+
+def test_gemini_generate_pack_surfaces_auth_errors() -> None:
+    def generate_content(**kwargs):
+        raise RuntimeError("401 unauthorized")
+
+    provider = GeminiProvider(api_key="g-key", model_name="gemini-2.0-flash")
+    provider._client = SimpleNamespace(
+        models=SimpleNamespace(generate_content=generate_content)
+    )
+    try:
+        provider.generate_packs(GenerateRequest(topic="Rain"), 2)
+    except ProviderError as exc:
+        assert exc.code == ProviderErrorCode.AUTH
+    else:
+        raise AssertionError("Expected ProviderError")
@@ -1,4 +1,5 @@
 from app.core.config import Settings
+from app.providers.registry import load_provider_factories
 from app.providers.router import ProviderRouter
 
 
@@ -13,3 +14,41 @@ def test_provider_router_order_and_defaults() -> None:
     assert router.configured == ["gemini", "openai"]
     assert router.default_provider == "auto"
     assert router.auto_order == ["openai", "gemini"]
+
+
+def test_provider_router_includes_configured_local_backend_in_auto() -> None:
+    settings = Settings(
+        gemini_api_key="g-key",
+        auto_provider_order="local,gemini",
+        default_llm_provider="local",
+        local_llm_base_url="http://127.0.0.1:8080/v1",
+        local_llm_model="qwen2.5-7b-instruct",
+    )
+    router = ProviderRouter(settings=settings)
+    assert router.configured == ["gemini", "local"]
+    assert router.auto_order == ["local", "gemini"]
+    assert router.default_provider == "local"
+    provider = router.get_provider("local")
+    assert provider.provider_name == "local"
+
+
+def test_provider_router_loads_plugins_from_settings() -> None:
+    settings = Settings(
+        provider_plugins="drafts=app.providers.registry:_local_factory",
+        local_llm_base_url="http://127.0.0.1:11434/v1",
+    )
+    router = ProviderRouter(settings=settings)
+    assert "drafts" in router.known
+    assert router.configured == ["local", "drafts"]
+    assert router.auto_order == ["gemini", "openai", "local", "drafts"]
+
+
+def test_provider_router_skips_a_plugin_whose_factory_raises() -> None:
+    def broken(_: Settings) -> None:
+        raise RuntimeError("missing SDK")
+
+    settings = Settings(gemini_api_key="g-key")
+    factories = {**load_provider_factories(settings), "broken": broken}
+    router = ProviderRouter(settings=settings, factories=factories)
+    assert "broken" in router.known
+    assert router.configured == ["gemini"]
@@ -0,0 +1,97 @@
+import random
+
+from app.core.config import Settings
+from app.providers.router import ProviderRouter
+from app.providers.routing_policy import (
+    CheapestPolicy,
+    FastestPolicy,
+    RoutingStats,
+    WeightedPolicy,
+)
+
+
+def test_fastest_policy_prefers_lower_ewma_latency_and_demotes_errors() -> None:
+    stats = RoutingStats(alpha=0.5)
+    for _ in range(5):
+        stats.record("gemini", "generate", 4000, ok=True)
+        stats.record("openai", "generate", 1500, ok=True)
+    ranked = FastestPolicy().rank(["gemini", "openai"], stats, "generate")
+    assert [item.provider for item in ranked] == ["openai", "gemini"]
+
+    for _ in range(5):
+        stats.record("openai", "generate", 1500, ok=False)
+    ranked = FastestPolicy().rank(["gemini", "openai"], stats, "generate")
+    assert [item.provider for item in ranked] == ["gemini", "openai"]
+    assert ranked[1].reason.startswith("degraded")
+
+
+def test_stats_are_tracked_per_operation() -> None:
+    stats = RoutingStats()
+    stats.record("gemini", "extend", 900, ok=True)
+    assert stats.get("gemini", "extend").samples == 1
+    assert stats.get("gemini", "generate").samples == 0
+
+
+def test_cheapest_policy_respects_p95_cap() -> None:
+    stats = RoutingStats()
+    for _ in range(20):
+        stats.record("local", "generate", 30000, ok=True)
+        stats.record("gemini", "generate", 2000, ok=True)
+    policy = CheapestPolicy(
+        max_p95_ms=10000, cost_weights={"local": 0.1, "gemini": 1.0, "openai": 3.0}
+    )
+    ranked = policy.rank(["openai", "gemini", "local"], stats, "generate")
+    assert [item.provider for item in ranked] == ["gemini", "openai", "local"]
+
+
+def test_weighted_policy_splits_first_choice_by_weight() -> None:
+    policy = WeightedPolicy(
+        weights={"gemini": 3.0, "openai": 1.0}, rng=random.Random(7)
+    )
+    firsts = [
+        policy.rank(["gemini", "openai"], RoutingStats(), "generate")[0].provider
+        for _ in range(400)
+    ]
+    share = firsts.count("gemini") / len(firsts)
+    assert 0.65 < share < 0.85
+
+
+def test_router_shifts_auto_order_from_live_outcomes() -> None:
+    router = ProviderRouter(
+        settings=Settings(
+            gemini_api_key="g-key",
+            openai_api_key="o-key",
+            auto_provider_order="gemini,openai",
+            routing_policy="fastest",
+            routing_exploration=0.0,
+        )
+    )
+    assert router.resolve_order("auto", "generate") == ["gemini", "openai"]
+    router.record_outcome("gemini", "generate", 9000, ok=True)
+    router.record_outcome("openai", "generate", 2000, ok=True)
+    assert router.resolve_order("auto", "generate") == ["openai", "gemini"]
+    assert router.resolve_order("auto", "extend") == ["gemini", "openai"]
+    assert router.policy_name == "fastest"
+
+
+def test_demoted_provider_recovers_through_exploration() -> None:
+    router = ProviderRouter(
+        settings=Settings(
+            gemini_api_key="g-key",
+            openai_api_key="o-key",
+            routing_policy="fastest",
+            routing_exploration=0.1,
+        ),
+        rng=random.Random(3),
+    )
+    for _ in range(10):
+        router.record_outcome("gemini", "generate", 8000, ok=False)
+        router.record_outcome("openai", "generate", 2000, ok=True)
+    assert router.rank("generate")[0].provider == "openai"
+
+    # Gemini is healthy and fast again, but only learns so when it is tried.
+    latencies = {"gemini": 500, "openai": 2000}
+    for _ in range(300):
+        first = router.resolve_order("auto", "generate")[0]
+        router.record_outcome(first, "generate", latencies[first], ok=True)
+    assert router.rank("generate")[0].provider == "gemini"
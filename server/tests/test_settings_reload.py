@@ -0,0 +1,111 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.core import config
+from app.core.settings_watcher import SettingsWatcher
+from app.core.traffic import TrafficEntry, UpstreamCall
+from app.main import app
+from app.services.traffic_replay import ReplayProvider
+
+
+@pytest.fixture
+def fresh_service(monkeypatch):
+    for name in ("GEMINI_API_KEY", "OPENAI_API_KEY", "LOCAL_LLM_BASE_URL"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("TEMPLATE_FALLBACK", "false")
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(song, "_song_service", None)
+    song.get_provider_prober.cache_clear()
+    yield
+    song.get_provider_prober.cache_clear()
+
+
+def test_admin_reload_swaps_service_and_keeps_state(fresh_service, monkeypatch) -> None:
+    client = TestClient(app)
+    old = song.get_song_service()
+    assert old.provider_router.configured == []
+    old.provider_router.record_outcome("gemini", "generate", 120.0, ok=True)
+
+    assert client.post("/api/admin/reload").status_code == 401
+    monkeypatch.setenv("TEMPLATE_FALLBACK", "true")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4.1")
+    response = client.post("/api/admin/reload", headers={"x-admin-token": "s3cret"})
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["changed"]) == {"template_fallback", "openai_model"}
+    assert body["configured"] == ["template"]
+    assert body["providers"][0]["status"] == "ok"
+
+    new = song.get_song_service()
+    assert new is not old
+    assert old.provider_router.configured == []
+    assert config.get_settings().openai_model == "gpt-4.1"
+    assert new.usage_ledger is old.usage_ledger
+    assert new.provider_router.stats.get("gemini", "generate").samples == 1
+    assert [item.provider for item in song.get_provider_prober().results()] == [
+        "template"
+    ]
+
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENCY", "8")
+    monkeypatch.setenv("SPECULATIVE_EXTEND", "true")
+    response = client.post("/api/admin/reload", headers={"x-admin-token": "s3cret"})
+    body = response.json()
+    # Built once at startup, so not reported as applied.
+    assert body["changed"] == []
+    assert set(body["restartRequired"]) == {
+        "admission_max_concurrency",
+        "speculative_extend",
+    }
+
+    current = song.get_song_service()
+    monkeypatch.setenv("ROUTING_EWMA_ALPHA", "not-a-number")
+    response = client.post("/api/admin/reload", headers={"x-admin-token": "s3cret"})
+    assert response.status_code == 400
+    assert song.get_song_service() is current
+
+
+def test_reload_keeps_replaying_recorded_traffic(
+    fresh_service, monkeypatch, tmp_path
+) -> None:
+    path = tmp_path / "traffic.ndjson"
+    call = UpstreamCall(
+        provider="openai", model="gpt", operation="generate", latency_ms=1.0
+    )
+    entry = TrafficEntry(0.0, "POST", "/api/song/generate", upstream=[call])
+    path.write_text(entry.to_json() + "\n")
+    monkeypatch.setenv("TRAFFIC_REPLAY_PATH", str(path))
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    provider = song.get_song_service().provider_router.get_provider("openai")
+    assert isinstance(provider, ReplayProvider)
+    song.reload_song_service()
+    provider = song.get_song_service().provider_router.get_provider("openai")
+    assert isinstance(provider, ReplayProvider)
+
+
+def test_admin_routes_are_hidden_without_token(fresh_service, monkeypatch) -> None:
+    monkeypatch.delenv("ADMIN_TOKEN")
+    response = TestClient(app).post(
+        "/api/admin/reload", headers={"x-admin-token": "s3cret"}
+    )
+    assert response.status_code == 404
+
+
+def test_settings_watcher_reloads_on_change(tmp_path) -> None:
+    env_file = tmp_path / ".env"
+    env_file.write_text("OPENAI_MODEL=gpt-4.1-mini\n")
+    calls: list[int] = []
+    watcher = SettingsWatcher(env_file, 60.0, lambda: calls.append(1))
+    assert not watcher.check()
+    env_file.write_text("OPENAI_MODEL=gpt-4.1-nano\n")
+    assert watcher.check()
+    assert calls == [1]
+
+    def broken() -> None:
+        raise ValueError("bad settings")
+
+    failing = SettingsWatcher(env_file, 60.0, broken)
+    env_file.write_text("OPENAI_MODEL=\n")
+    assert not failing.check()
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.cli import export as export_cli
+from app.main import app
+from app.services import song_export
+from app.services.song_store import (
+    SongFilters,
+    SongRecord,
+    SongStore,
+    iter_song_records,
+)
+
+
+def _store(tmp_path) -> SongStore:
+    store = SongStore(str(tmp_path / "songs.db"))
+    for index in range(6):
+        store.add(
+            SongRecord(
+                kind="generate",
+                provider="gemini" if index % 2 else "openai",
+                model="model",
+                latency_ms=10.0,
+                topic=f"Topic {index}",
+                genre="Synthwave" if index < 4 else "Rock",
+                structure="Pop",
+                title=f"Song {index}",
+                lyrics=f"[Verse]\nLine, with comma {index}",
+                request={"topic": f"Topic {index}"},
+                created_at=1_700_000_000 + index * 3600,
+            )
+        )
+    store.flush()
+    return store
+
+
+def test_iter_song_records_streams_in_chunks_and_resumes(tmp_path) -> None:
+    store = _store(tmp_path)
+    records = list(iter_song_records(store.path, chunk_size=2))
+    assert [record.title for record in records] == [f"Song {i}" for i in range(6)]
+
+    filters = SongFilters(genre="synthwave", provider="gemini")
+    assert [r.title for r in iter_song_records(store.path, filters)] == [
+        "Song 1",
+        "Song 3",
+    ]
+    since = SongFilters(since=1_700_000_000 + 4 * 3600)
+    assert [r.title for r in iter_song_records(store.path, since)] == [
+        "Song 4",
+        "Song 5",
+    ]
+    store.close()
+
+
+class _StoreOnlyService:
+    def __init__(self, store: SongStore):
+        self.song_store = store
+
+
+def test_ndjson_chunks_hold_a_batch_of_records(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(song_export, "EXPORT_BATCH_SIZE", 4)
+    _store(tmp_path)
+    records = list(iter_song_records(tmp_path / "songs.db", SongFilters()))
+    chunks = list(song_export.ndjson_chunks(records))
+    assert [chunk.count(b"\n") for chunk in chunks] == [4, 2]
+
+
+def test_export_route_streams_ndjson_and_csv(tmp_path, monkeypatch) -> None:
+    store = _store(tmp_path)
+    monkeypatch.setattr(song, "get_song_service", lambda: _StoreOnlyService(store))
+    monkeypatch.setattr(song_export, "EXPORT_BATCH_SIZE", 2)
+    client = TestClient(app)
+
+    response = client.get("/api/history/export", params={"provider": "openai"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["title"] for line in lines] == ["Song 0", "Song 2", "Song 4"]
+
+    resumed = client.get(
+        "/api/history/export",
+        params={"provider": "openai", "cursor": lines[0]["cursor"]},
+    )
+    assert [json.loads(line)["title"] for line in resumed.text.splitlines()] == [
+        "Song 2",
+        "Song 4",
+    ]
+
+    response = client.get(
+        "/api/history/export",
+        params={"format": "csv", "since": "2023-11-14T23:00:00+00:00"},
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == [f"Song {i}" for i in range(1, 6)]
+    assert rows[0]["lyrics"] == "[Verse]\nLine, with comma 1"
+    assert json.loads(rows[0]["request"]) == {"topic": "Topic 1"}
+    store.close()
+
+
+def test_export_cli_writes_file(tmp_path) -> None:
+    store = _store(tmp_path)
+    output = tmp_path / "songs.ndjson"
+    code = export_cli.main(
+        ["--db", str(store.path), "--genre", "rock", "--output", str(output)]
+    )
+    assert code == 0
+    titles = [json.loads(line)["title"] for line in output.read_text().splitlines()]
+    assert titles == ["Song 4", "Song 5"]
+    store.close()
+
+
+def test_export_parquet_row_groups(tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    store = _store(tmp_path)
+    data = b"".join(song_export.export_chunks(iter_song_records(store.path), "parquet"))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column("title").to_pylist() == [f"Song {i}" for i in range(6)]
+    store.close()
@@ -8,12 +8,17 @@ from app.models.schemas import (
     GenerateRequest,
     GenerateResponse,
 )
+from app.providers.routing_policy import RankedProvider, RoutingStats, StaticPolicy
 
 
 class _FakeProviderRouter:
     configured = ["gemini"]
     default_provider = "auto"
     auto_order = ["gemini", "openai"]
+    policy_name = "static"
+
+    def rank(self, operation: str) -> list[RankedProvider]:
+        return StaticPolicy().rank(self.auto_order, RoutingStats(), operation)
 
 
 class _FakeSongService:
@@ -44,11 +49,15 @@ def test_song_providers_route(monkeypatch) -> None:
     monkeypatch.setattr(song, "get_song_service", lambda: _FakeSongService())
     response = client.get("/api/song/providers")
     assert response.status_code == 200
-    assert response.json() == {
+    body = response.json()
+    routing = body.pop("routing")
+    assert body == {
         "configured": ["gemini"],
         "defaultProvider": "auto",
         "autoOrder": ["gemini", "openai"],
     }
+    assert routing["policy"] == "static"
+    assert [item["provider"] for item in routing["generate"]] == ["gemini", "openai"]
 
 
 def test_song_generate_route(monkeypatch) -> None:
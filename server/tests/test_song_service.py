@@ -44,16 +44,29 @@ class _WorkingProvider:
         )
 
 
+class _MultiCandidateProvider(_WorkingProvider):
+    def generate_packs(
+        self, payload: GenerateRequest, count: int
+    ) -> list[GenerateProviderResult]:
+        return [self.generate_pack(payload) for _ in range(count)]
+
+
 class _FakeRouter:
     def __init__(self, providers: dict[str, object], order: list[str]):
         self._providers = providers
         self._order = order
+        self.outcomes: list[tuple[str, str, bool]] = []
 
-    def resolve_order(self, requested: str) -> list[str]:
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
         if requested == "auto":
             return self._order
         return [requested]
 
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        self.outcomes.append((name, operation, ok))
+
     def get_provider(self, name: str):
         provider = self._providers.get(name)
         if not provider:
@@ -64,15 +77,14 @@ class _FakeRouter:
 
 
 def test_generate_uses_fallback_when_auto() -> None:
-    service = SongService(
-        provider_router=_FakeRouter(
-            providers={
-                "gemini": _FailingProvider(ProviderErrorCode.RATE_LIMIT),
-                "openai": _WorkingProvider(),
-            },
-            order=["gemini", "openai"],
-        )
+    router = _FakeRouter(
+        providers={
+            "gemini": _FailingProvider(ProviderErrorCode.RATE_LIMIT),
+            "openai": _WorkingProvider(),
+        },
+        order=["gemini", "openai"],
     )
+    service = SongService(provider_router=router)
     response = service.generate(
         GenerateRequest(
             topic="Test",
@@ -81,6 +93,10 @@ def test_generate_uses_fallback_when_auto() -> None:
     )
     assert response.providerUsed == "openai"
     assert response.title == "Working Result"
+    assert router.outcomes == [
+        ("gemini", "generate", False),
+        ("openai", "generate", True),
+    ]
 
 
 def test_generate_maps_auth_error_to_401_for_direct_provider() -> None:
@@ -124,3 +140,17 @@ def test_extend_returns_503_after_auto_exhaustion() -> None:
         assert "No available provider" in str(exc.detail)
     else:
         raise AssertionError("Expected HTTPException")
+
+
+def test_generate_returns_all_requested_variants() -> None:
+    service = SongService(
+        provider_router=_FakeRouter(
+            providers={"openai": _MultiCandidateProvider()},
+            order=["openai"],
+        )
+    )
+    response = service.generate(
+        GenerateRequest(topic="Test", provider="openai", variants=3)
+    )
+    assert len(response.packs) == 3
+    assert response.title == response.packs[0].title
@@ -0,0 +1,180 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routes import sessions, song
+from app.main import app
+from app.models.schemas import ExtendRequest, ExtendResponse
+from app.providers.base import current_prompt_cache_key, use_prompt_cache_key
+from app.providers.openai_provider import OpenAiProvider
+from app.services.song_sessions import (
+    SessionConflictError,
+    SessionNotFoundError,
+    SongSessionStore,
+)
+
+
+class _SessionSongService:
+    def __init__(self) -> None:
+        self.calls: list[tuple[ExtendRequest, str | None]] = []
+
+    def extend(self, payload: ExtendRequest) -> ExtendResponse:
+        self.calls.append((payload, current_prompt_cache_key()))
+        return ExtendResponse(
+            addedLyrics=f"[Verse {len(self.calls) + 1}]\nMore lines",
+            providerUsed="openai",
+            modelUsed="gpt-4.1-mini",
+        )
+
+
+def _client(monkeypatch) -> tuple[TestClient, _SessionSongService]:
+    service = _SessionSongService()
+    store = SongSessionStore()
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    monkeypatch.setattr(sessions, "get_session_store", lambda: store)
+    return TestClient(app), service
+
+
+def test_store_applies_edits_and_rejects_stale_versions() -> None:
+    store = SongSessionStore()
+    session = store.create("me", "Rain", "", "English", "auto", "[Verse]\nHello")
+
+    edited = store.edit(session.id, "me", 0, [(8, 13, "Goodbye"), (0, 0, "! ")])
+    assert edited.lyrics == "! [Verse]\nGoodbye"
+    assert edited.version == 1
+    with pytest.raises(SessionConflictError) as conflict:
+        store.edit(session.id, "me", 0, [(0, 1, "")])
+    assert conflict.value.version == 1
+    with pytest.raises(ValueError):
+        store.edit(session.id, "me", 1, [(5, 500, "")])
+    with pytest.raises(SessionNotFoundError):
+        store.get(session.id, "someone else")
+
+
+def test_store_evicts_least_recently_used_sessions_over_the_byte_cap() -> None:
+    store = SongSessionStore(max_bytes=1500)
+    first = store.create("me", "a", "", "English", "auto", "x" * 300)
+    second = store.create("me", "b", "", "English", "auto", "x" * 300)
+    store.get(first.id, "me")
+    store.create("me", "c", "", "English", "auto", "x" * 300)
+
+    assert store.get(first.id, "me").topic == "a"
+    with pytest.raises(SessionNotFoundError):
+        store.get(second.id, "me")
+    assert store.snapshot()["evicted"] == 1
+
+
+def test_session_routes_extend_from_server_side_lyrics(monkeypatch) -> None:
+    client, service = _client(monkeypatch)
+    created = client.post(
+        "/api/song/sessions",
+        json={"topic": "Rain", "lyrics": "[Verse]\nHello", "provider": "openai"},
+    )
+    assert created.status_code == 201
+    session_id = created.json()["sessionId"]
+    url = f"/api/song/sessions/{session_id}"
+
+    patched = client.patch(
+        url, json={"baseVersion": 0, "edits": [{"start": 8, "end": 13, "text": "Hi"}]}
+    )
+    assert patched.json() == {
+        "sessionId": session_id,
+        "version": 1,
+        "length": 10,
+        "extensions": 0,
+    }
+    stale = client.patch(
+        url, json={"baseVersion": 0, "edits": [{"start": 0, "end": 0}]}
+    )
+    assert stale.status_code == 409
+
+    extended = client.post(f"{url}/extend", json={"baseVersion": 1})
+    assert extended.status_code == 200
+    assert extended.json()["version"] == 2
+    payload, cache_key = service.calls[0]
+    assert payload.currentLyrics == "[Verse]\nHi"
+    assert payload.provider == "openai"
+    assert cache_key is not None and session_id not in cache_key
+    assert client.get(url).json()["lyrics"] == "[Verse]\nHi\n\n[Verse 2]\nMore lines"
+
+    assert client.delete(url).status_code == 204
+    assert client.get(url).status_code == 404
+
+
+def test_extend_conflicts_with_an_edit_made_during_the_upstream_call(
+    monkeypatch,
+) -> None:
+    client, service = _client(monkeypatch)
+    session_id = client.post(
+        "/api/song/sessions", json={"topic": "Rain", "lyrics": "[Verse]\nHello"}
+    ).json()["sessionId"]
+    url = f"/api/song/sessions/{session_id}"
+    extend = service.extend
+
+    def extend_while_editing(payload: ExtendRequest) -> ExtendResponse:
+        edit = {"baseVersion": 0, "edits": [{"start": 0, "end": 0, "text": "! "}]}
+        assert client.patch(url, json=edit).status_code == 200
+        return extend(payload)
+
+    monkeypatch.setattr(service, "extend", extend_while_editing)
+    extended = client.post(f"{url}/extend", json={})
+    assert extended.status_code == 409
+    session = client.get(url).json()
+    assert session["lyrics"] == "! [Verse]\nHello"
+    assert (session["version"], session["extensions"]) == (1, 0)
+
+
+def test_websocket_pushes_state_and_extensions(monkeypatch) -> None:
+    client, _ = _client(monkeypatch)
+    session_id = client.post(
+        "/api/song/sessions", json={"topic": "Rain", "lyrics": "[Verse]\nHello"}
+    ).json()["sessionId"]
+
+    with client.websocket_connect(f"/api/song/sessions/{session_id}/ws") as socket:
+        assert socket.receive_json()["version"] == 0
+        socket.send_json(
+            {"type": "edit", "baseVersion": 0, "edits": [{"start": 0, "end": 0}]}
+        )
+        assert socket.receive_json()["type"] == "state"
+        socket.send_json({"type": "extend"})
+        message = socket.receive_json()
+        assert message["type"] == "extension"
+        assert message["version"] == 2
+        assert message["addedLyrics"].startswith("[Verse 2]")
+        socket.send_json({"type": "edit", "baseVersion": 0, "edits": []})
+        assert socket.receive_json()["status"] == 422
+        socket.send_text("not json")
+        assert socket.receive_json() == {
+            "type": "error",
+            "status": 400,
+            "detail": "Invalid JSON.",
+        }
+        socket.send_json({"type": "bogus"})
+        assert socket.receive_json()["status"] == 400
+
+
+def test_prompt_cache_key_reaches_openai() -> None:
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content="[Verse]\nMore"),
+                    finish_reason="stop",
+                )
+            ]
+        )
+
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    provider.extend_lyrics("[Verse]\nHello", "Rain", "", "English")
+    with use_prompt_cache_key("session-abc"):
+        provider.extend_lyrics("[Verse]\nHello", "Rain", "", "English")
+
+    assert "prompt_cache_key" not in calls[0]
+    assert calls[1]["prompt_cache_key"] == "session-abc"
@@ -0,0 +1,90 @@
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.main import app
+from app.services.song_store import SongRecord, SongStore, fts_query
+
+
+def _record(index: int, **overrides) -> SongRecord:
+    values = {
+        "kind": "generate",
+        "provider": "gemini" if index % 2 else "openai",
+        "model": "model",
+        "latency_ms": 100.0 + index,
+        "topic": f"Topic {index}",
+        "title": f"Song {index}",
+        "style": "Melancholic, synthwave",
+        "lyrics": f"[Verse]\nLine number {index}",
+    }
+    values.update(overrides)
+    return SongRecord(**values)
+
+
+def test_song_store_pages_newest_first_with_keyset_cursor(tmp_path) -> None:
+    store = SongStore(str(tmp_path / "songs.db"), batch_size=3)
+    for index in range(7):
+        assert store.add(_record(index))
+    store.flush()
+
+    first = store.recent(limit=3)
+    assert [item.title for item in first.items] == ["Song 6", "Song 5", "Song 4"]
+    second = store.recent(limit=3, cursor=first.next_cursor)
+    assert [item.title for item in second.items] == ["Song 3", "Song 2", "Song 1"]
+    last = store.recent(limit=3, cursor=second.next_cursor)
+    assert [item.title for item in last.items] == ["Song 0"]
+    assert last.next_cursor is None
+
+    gemini = store.recent(provider="gemini")
+    assert {item.provider for item in gemini.items} == {"gemini"}
+    assert len(gemini.items) == 3
+    store.close()
+
+
+def test_song_store_full_text_search(tmp_path) -> None:
+    store = SongStore(str(tmp_path / "songs.db"))
+    store.add(_record(1, title="Neon Rain", lyrics="[Verse]\nCity lights"))
+    store.add(_record(2, title="Desert Sun", lyrics="[Verse]\nNeon signs fade"))
+    store.add(_record(3, title="Ocean", style="Calm, ambient"))
+    store.flush()
+
+    assert [item.title for item in store.search("neon").items] == [
+        "Desert Sun",
+        "Neon Rain",
+    ]
+    assert [
+        item.title for item in store.search("neon", search_field="title").items
+    ] == ["Neon Rain"]
+    assert [item.title for item in store.search("amb").items] == ["Ocean"]
+    page = store.search("neon", limit=1)
+    assert [item.title for item in page.items] == ["Desert Sun"]
+    assert [
+        item.title for item in store.search("neon", cursor=page.next_cursor).items
+    ] == ["Neon Rain"]
+    assert fts_query('"; DROP TABLE songs --') == '"DROP" "TABLE" "songs"*'
+    store.close()
+
+
+class _StoreOnlyService:
+    def __init__(self, store: SongStore):
+        self.song_store = store
+
+
+def test_history_routes(tmp_path, monkeypatch) -> None:
+    store = SongStore(str(tmp_path / "songs.db"))
+    store.add(_record(1, title="Neon Rain"))
+    store.flush()
+    monkeypatch.setattr(song, "get_song_service", lambda: _StoreOnlyService(store))
+    client = TestClient(app)
+
+    response = client.get("/api/history")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["nextCursor"] is None
+    assert body["items"][0]["title"] == "Neon Rain"
+    assert body["items"][0]["providerUsed"] == "gemini"
+
+    response = client.get("/api/history/search", params={"q": "neon"})
+    assert [item["title"] for item in response.json()["items"]] == ["Neon Rain"]
+
+    assert client.get("/api/history", params={"cursor": "%%%"}).status_code == 400
+    store.close()
@@ -0,0 +1,186 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.main import app
+from app.models.schemas import (
+    ExtendRequest,
+    ExtendResponse,
+    GenerateRequest,
+    GenerateResponse,
+)
+from app.providers.base import TokenUsage
+from app.services.speculation import (
+    SpeculativeExtensions,
+    SpeculativeResult,
+    next_extend_after_extend,
+    next_extend_after_generate,
+)
+from app.services.usage import RequestUsage
+
+
+def _extend(lyrics: str) -> ExtendRequest:
+    return ExtendRequest(currentLyrics=lyrics, topic="Rain", style="Synthwave")
+
+
+def _result(tokens: int) -> SpeculativeResult:
+    usage = RequestUsage()
+    usage.add(TokenUsage(prompt_tokens=tokens, completion_tokens=tokens), 0.001)
+    return SpeculativeResult(
+        response=ExtendResponse(
+            addedLyrics="[Bridge]\nDawn", providerUsed="openai", modelUsed="gpt"
+        ),
+        usage=usage,
+        latency_ms=5.0,
+    )
+
+
+def test_prediction_matches_the_editor_follow_up_extend() -> None:
+    payload = GenerateRequest(topic="Rain", provider="openai")
+    generated = GenerateResponse(
+        title="Rain",
+        style="Synthwave",
+        lyrics="[Verse]\nRain",
+        explanation="",
+        providerUsed="openai",
+        modelUsed="gpt",
+    )
+    first = next_extend_after_generate(payload, generated)
+    assert first == ExtendRequest(
+        currentLyrics="[Verse]\nRain",
+        topic="Rain",
+        style="Synthwave",
+        provider="openai",
+    )
+    added = ExtendResponse(
+        addedLyrics="[Chorus]\nHold", providerUsed="openai", modelUsed="gpt"
+    )
+    second = next_extend_after_extend(first, added)
+    assert second.currentLyrics == "[Verse]\nRain\n\n[Chorus]\nHold"
+
+    instrumental = payload.model_copy(update={"isInstrumental": True})
+    assert next_extend_after_generate(instrumental, generated) is None
+    template = added.model_copy(update={"providerUsed": "template"})
+    assert next_extend_after_extend(first, template) is None
+
+
+def test_store_serves_hits_and_counts_discarded_tokens_as_waste() -> None:
+    async def scenario() -> dict:
+        store = SpeculativeExtensions(client_budget=1)
+        release = asyncio.Event()
+
+        async def slow(_: ExtendRequest) -> SpeculativeResult:
+            await release.wait()
+            return _result(50)
+
+        async def fast(_: ExtendRequest) -> SpeculativeResult:
+            return _result(100)
+
+        assert store.schedule("a", _extend("one"), slow)
+        # The budget is in use by a running speculation.
+        assert not store.schedule("a", _extend("two"), fast)
+        release.set()
+        hit = await store.take("a", _extend("one"))
+        assert hit is not None and hit.usage.usage.total_tokens == 100
+
+        assert store.schedule("a", _extend("three"), fast)
+        await asyncio.sleep(0)
+        # A finished speculation makes room for the next one.
+        assert store.schedule("a", _extend("four"), fast)
+        await asyncio.sleep(0)
+        assert await store.take("a", _extend("three")) is None
+        assert await store.take("b", _extend("four")) is None
+        return store.snapshot()
+
+    assert asyncio.run(scenario()) == {
+        "scheduled": 3,
+        "hits": 1,
+        "discarded": 1,
+        "skipped": 1,
+        "pending": 1,
+        "hitRate": 0.3333,
+        "wastedTokens": 200,
+        "wastedCostUsd": 0.001,
+    }
+
+
+class _FakeProviderRouter:
+    configured = ["openai"]
+
+
+class _FakeSongService:
+    provider_router = _FakeProviderRouter()
+
+    def __init__(self) -> None:
+        self.extends: list[str] = []
+        self.speculations: list[str] = []
+        self.stored: list[str] = []
+
+    def generate(self, payload: GenerateRequest) -> GenerateResponse:
+        return GenerateResponse(
+            title="Rain",
+            style="Synthwave",
+            lyrics="[Verse]\nRain on the glass",
+            explanation="",
+            providerUsed="openai",
+            modelUsed="gpt-4.1-mini",
+        )
+
+    def _added(self, payload: ExtendRequest) -> ExtendResponse:
+        count = payload.currentLyrics.count("[")
+        return ExtendResponse(
+            addedLyrics=f"[Part {count}]\nStill raining",
+            providerUsed="openai",
+            modelUsed="gpt-4.1-mini",
+        )
+
+    def extend(self, payload: ExtendRequest) -> ExtendResponse:
+        self.extends.append(payload.currentLyrics)
+        return self._added(payload)
+
+    def speculate_extend(self, payload: ExtendRequest) -> ExtendResponse:
+        self.speculations.append(payload.currentLyrics)
+        return self._added(payload)
+
+    def store_extension(
+        self, payload: ExtendRequest, response: ExtendResponse, latency_ms: float
+    ) -> None:
+        self.stored.append(response.addedLyrics)
+
+
+def test_extend_matching_the_prediction_is_served_speculatively(monkeypatch) -> None:
+    service = _FakeSongService()
+    store = SpeculativeExtensions()
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    monkeypatch.setattr(song, "get_speculative_extensions", lambda: store)
+
+    with TestClient(app) as client:
+        generated = client.post(
+            "/api/song/generate", json={"topic": "Rain", "provider": "openai"}
+        ).json()
+        body = {
+            "currentLyrics": generated["lyrics"],
+            "topic": "Rain",
+            "style": generated["style"],
+            "provider": "openai",
+        }
+        first = client.post("/api/song/extend", json=body)
+        assert first.status_code == 200
+        assert first.headers["x-speculative"] == "hit"
+        assert first.json()["addedLyrics"] == "[Part 1]\nStill raining"
+
+        # The user edited the lyrics, so the next prediction misses.
+        edited = {**body, "currentLyrics": "[Verse]\nSomething else"}
+        second = client.post("/api/song/extend", json=edited)
+        assert "x-speculative" not in second.headers
+        metrics = client.get("/api/metrics").json()["speculation"]
+
+    assert service.extends == ["[Verse]\nSomething else"]
+    assert service.speculations[:2] == [
+        "[Verse]\nRain on the glass",
+        "[Verse]\nRain on the glass\n\n[Part 1]\nStill raining",
+    ]
+    assert service.stored == ["[Part 1]\nStill raining"]
+    assert metrics["hits"] == 1
+    assert metrics["scheduled"] >= 2
@@ -0,0 +1,163 @@
+import json
+import re
+import threading
+import time
+
+from app.models.schemas import GenerateRequest
+from app.providers.base import (
+    ExtendProviderResult,
+    ProviderError,
+    ProviderErrorCode,
+    TokenUsage,
+)
+from app.services.song_service import SongService
+from app.services.staged_generation import (
+    StagedGenerator,
+    StageTarget,
+    parse_stage_targets,
+)
+from app.services.usage import UsageLedger
+
+
+PLAN = {
+    "theme": "Leaving the city at dawn",
+    "hooks": ["Dawn on the highway"],
+    "sections": [
+        {"tag": "Intro", "brief": "Engine idles"},
+        {"tag": "Verse", "brief": "Packing the car"},
+        {"tag": "Chorus", "brief": "The hook"},
+        {"tag": "Verse 2", "brief": "City in the mirror"},
+        {"tag": "Chorus", "brief": "The hook again"},
+        {"tag": "Outro", "brief": "Open road"},
+    ],
+}
+
+SECTION_SECONDS = 0.15
+
+
+class _StageProvider:
+    provider_name = "openai"
+    requires_upstream = True
+
+    def __init__(self, plan: str = json.dumps(PLAN), fail_style: bool = False):
+        self._plan = plan
+        self._fail_style = fail_style
+        self.calls: list[tuple[str, str | None]] = []
+        self._lock = threading.Lock()
+
+    def complete_text(
+        self,
+        system_instruction: str,
+        user_prompt: str,
+        max_tokens: int,
+        label: str,
+        model: str | None = None,
+        json_output: bool = False,
+    ) -> ExtendProviderResult:
+        with self._lock:
+            self.calls.append((label, model))
+        if label == "plan":
+            text = self._plan
+        elif label == "style":
+            if self._fail_style:
+                raise ProviderError("down", code=ProviderErrorCode.NETWORK)
+            text = json.dumps(
+                {"title": "Dawn Drive", "style": "Hopeful, synth", "explanation": "Up"}
+            )
+        else:
+            time.sleep(SECTION_SECONDS)
+            tag = re.search(r"Write the \[([^\]]+)\]", user_prompt).group(1)
+            text = f"[{tag}]\n{tag} line one\n{tag} line two"
+        return ExtendProviderResult(
+            provider_name=self.provider_name,
+            model_name=model or "gpt-4.1-mini",
+            added_lyrics=text,
+            usage=TokenUsage(prompt_tokens=10, completion_tokens=5),
+        )
+
+
+class _Router:
+    def __init__(self, provider: object):
+        self._provider = provider
+
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        return ["openai"]
+
+    def get_provider(self, name: str):
+        return self._provider
+
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        pass
+
+
+def test_parse_stage_targets() -> None:
+    assert parse_stage_targets(
+        "plan=openai:gpt-4.1-nano, lyrics=gemini, style=:gpt-4.1-mini, bogus=x"
+    ) == {
+        "plan": StageTarget("openai", "gpt-4.1-nano"),
+        "lyrics": StageTarget("gemini", None),
+        "style": StageTarget(None, "gpt-4.1-mini"),
+    }
+
+
+def test_staged_generation_writes_sections_in_parallel() -> None:
+    provider = _StageProvider()
+    router = _Router(provider)
+    ledger = UsageLedger()
+    service = SongService(
+        provider_router=router,
+        usage_ledger=ledger,
+        staged_generator=StagedGenerator(
+            router, parse_stage_targets("plan=:gpt-4.1-nano")
+        ),
+        lyric_repair=False,
+    )
+
+    started = time.perf_counter()
+    response = service.generate(GenerateRequest(topic="Dawn", structure="Pop"))
+    elapsed = time.perf_counter() - started
+
+    # Five distinct sections, written concurrently rather than one by one.
+    assert elapsed < SECTION_SECONDS * 3
+    labels = [label for label, _ in provider.calls]
+    assert labels.count("section") == 5
+    assert labels[0] == "plan" and "style" in labels
+    assert ("plan", "gpt-4.1-nano") in provider.calls
+    blocks = response.lyrics.split("\n\n")
+    assert [block.splitlines()[0] for block in blocks] == [
+        "[Intro]",
+        "[Verse]",
+        "[Chorus]",
+        "[Verse 2]",
+        "[Chorus]",
+        "[Outro]",
+    ]
+    assert blocks[2] == blocks[4]
+    assert response.title == "Dawn Drive"
+    assert "Clean Mix" in response.style
+    totals = {
+        item["model"]: item["completion_tokens"] for item in ledger.snapshot()["totals"]
+    }
+    assert totals == {"gpt-4.1-mini": 30, "gpt-4.1-nano": 5}
+
+
+def test_unusable_plan_and_style_fall_back_locally() -> None:
+    provider = _StageProvider(plan="not json", fail_style=True)
+    router = _Router(provider)
+    service = SongService(
+        provider_router=router, staged_generator=StagedGenerator(router)
+    )
+
+    response = service.generate(GenerateRequest(topic="night drive", structure="Rap"))
+    assert [line for line in response.lyrics.splitlines() if line.startswith("[")] == [
+        "[Intro]",
+        "[Hook]",
+        "[Verse]",
+        "[Hook]",
+        "[Verse 2]",
+        "[Outro]",
+    ]
+    assert response.title == "Night Drive"
+    assert response.explanation == "night drive"
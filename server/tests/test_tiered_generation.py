@@ -0,0 +1,124 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.core.config import Settings
+from app.main import app
+from app.models.schemas import GenerateRequest
+from app.providers.openai_provider import OpenAiProvider
+from app.providers.router import ProviderRouter
+from app.services.prompt_builder import (
+    build_generation_messages,
+    build_refine_messages,
+)
+from app.services.song_service import SongService
+
+
+DRAFT = {
+    "title": "Rain Draft",
+    "style": "Synthwave",
+    "lyrics": "[Verse]\nRain on the glass",
+    "explanation": "First pass",
+}
+REFINED = {
+    "title": "Night Rain",
+    "style": "Synthwave, melancholic",
+    "lyrics": "[Verse]\nRain on the glass tonight\n\n[Chorus]\nHold the light",
+    "explanation": "Tightened",
+}
+
+
+def _service(fail_refine: bool = False) -> tuple[SongService, list[dict]]:
+    calls: list[dict] = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if kwargs["model"] == "gpt-4.1-nano":
+            content = json.dumps(DRAFT)
+        elif fail_refine:
+            raise RuntimeError("invalid api key")
+        else:
+            content = json.dumps(REFINED)
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=content), finish_reason="stop"
+                )
+            ]
+        )
+
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    router = ProviderRouter(
+        Settings(openai_api_key="o-key"), factories={"openai": lambda _: provider}
+    )
+    service = SongService(
+        provider_router=router, draft_models={"openai": "gpt-4.1-nano"}
+    )
+    return service, calls
+
+
+def test_refine_prompt_carries_the_draft_after_the_generation_prompt() -> None:
+    payload = GenerateRequest(topic="Rain", fields=["title", "lyrics"])
+    system, user = build_refine_messages(payload, DRAFT)
+    base_system, base_user = build_generation_messages(payload)
+
+    assert system == base_system
+    assert user.startswith(base_user)
+    draft = json.loads(user.split("Draft from a faster model:\n")[1].splitlines()[0])
+    assert draft == {"title": "Rain Draft", "lyrics": DRAFT["lyrics"]}
+
+
+def test_draft_uses_the_fast_model_and_refine_the_regular_one() -> None:
+    service, calls = _service()
+    payload = GenerateRequest(topic="Rain", provider="openai")
+
+    draft = service.draft(payload)
+    assert (draft.title, draft.modelUsed, draft.tier) == (
+        "Rain Draft",
+        "gpt-4.1-nano",
+        "draft",
+    )
+
+    refined = service.refine(payload, draft)
+    assert (refined.title, refined.modelUsed, refined.tier) == (
+        "Night Rain",
+        "gpt-4.1-mini",
+        "refined",
+    )
+    assert [call["model"] for call in calls] == ["gpt-4.1-nano", "gpt-4.1-mini"]
+    assert "Rain on the glass" in calls[1]["messages"][1]["content"]
+
+
+def test_tiered_route_streams_the_draft_then_the_refined_pack(monkeypatch) -> None:
+    service, _ = _service()
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/song/generate/tiered", json={"topic": "Rain", "provider": "openai"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["draft", "refined"]
+    assert events[0]["result"]["title"] == "Rain Draft"
+    assert events[1]["result"]["tier"] == "refined"
+    assert events[1]["result"]["quality"] is not None
+
+
+def test_tiered_route_keeps_the_draft_when_refinement_fails(monkeypatch) -> None:
+    service, _ = _service(fail_refine=True)
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/song/generate/tiered", json={"topic": "Rain", "provider": "openai"}
+    )
+    draft, error = [json.loads(line) for line in response.text.splitlines()]
+    assert draft["result"]["tier"] == "draft"
+    assert (error["event"], error["status"]) == ("error", 401)
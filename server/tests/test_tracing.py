@@ -0,0 +1,129 @@
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.cli import traces as traces_cli
+from app.core import tracing
+from app.core.tracing import (
+    FileSpanExporter,
+    OtlpHttpSpanExporter,
+    Span,
+    SpanExporter,
+    Tracer,
+    parse_traceparent,
+    span,
+)
+from app.main import app
+from app.providers.template_provider import TemplateProvider
+from app.services.song_service import SongService
+
+
+class _ListExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+
+class _Router:
+    def __init__(self, provider: object):
+        self._provider = provider
+
+    def resolve_order(self, requested: str, operation: str = "generate") -> list[str]:
+        return ["template"]
+
+    def get_provider(self, name: str):
+        return self._provider
+
+    def record_outcome(
+        self, name: str, operation: str, latency_ms: float, ok: bool
+    ) -> None:
+        pass
+
+
+INCOMING = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+def test_parse_traceparent() -> None:
+    assert parse_traceparent(INCOMING) == (
+        "4bf92f3577b34da6a3ce929d0e0e4736",
+        "00f067aa0ba902b7",
+        True,
+    )
+    assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert parse_traceparent("garbage") is None
+    with span("outside a trace") as noop:
+        assert noop is tracing.NOOP_SPAN
+
+
+def test_request_spans_cover_the_pipeline_and_continue_traceparent(
+    monkeypatch,
+) -> None:
+    exporter = _ListExporter()
+    tracer = Tracer(exporter)
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    service = SongService(provider_router=_Router(TemplateProvider()))
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+
+    response = TestClient(app).post(
+        "/api/song/generate",
+        json={"topic": "Night drive", "structure": "Pop"},
+        headers={"traceparent": INCOMING},
+    )
+    assert response.status_code == 200
+    tracer.shutdown()
+
+    outgoing = parse_traceparent(response.headers["traceparent"])
+    assert outgoing is not None
+    assert outgoing[0] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    by_name = {item.name: item for item in exporter.spans}
+    root = by_name["POST /api/song/generate"]
+    assert root.parent_id == "00f067aa0ba902b7"
+    assert root.attributes["http.status_code"] == 200
+    assert {
+        "admission.wait",
+        "song.generate",
+        "provider.attempt",
+        "prompt.sanitize_style",
+        "quality.analyze",
+    } <= set(by_name)
+    attempt = by_name["provider.attempt"]
+    assert attempt.attributes["provider"] == "template"
+    assert attempt.attributes["model"] == "template-v1"
+    assert attempt.parent_id == by_name["song.generate"].span_id
+    assert {item.trace_id for item in exporter.spans} == {outgoing[0]}
+
+
+def test_file_exporter_feeds_the_stage_summary(tmp_path) -> None:
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(FileSpanExporter(str(path)))
+    for duration in (10, 20, 30):
+        item = Span(name="llm.call", trace_id="a" * 32, span_id="b" * 16)
+        item.start_ns -= duration * 1_000_000
+        tracer.finish(item)
+    failed = Span(name="provider.attempt", trace_id="a" * 32, span_id="c" * 16)
+    failed.record_error("timeout")
+    tracer.finish(failed)
+    tracer.shutdown()
+
+    summaries = traces_cli.summarize(path.read_text().splitlines())
+    assert summaries[0].name == "llm.call"
+    assert summaries[0].count == 3
+    assert 19 < summaries[0].p50_ms < 22
+    assert summaries[1].errors == 1
+    assert traces_cli.main([str(path)]) == 0
+
+
+def test_otlp_payload_shape() -> None:
+    exporter = OtlpHttpSpanExporter("http://127.0.0.1:4318/v1/traces", "svc")
+    item = Span(name="llm.call", trace_id="a" * 32, span_id="b" * 16)
+    item.set_attributes(llm__model="gpt-4.1-mini", prompt_tokens=12, reprompt=True)
+    item.record_error("timeout")
+    body = exporter.payload([item])
+    exporter.shutdown()
+    otlp_span = body["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["status"] == {"code": 2}
+    attributes = {entry["key"]: entry["value"] for entry in otlp_span["attributes"]}
+    assert attributes["llm.model"] == {"stringValue": "gpt-4.1-mini"}
+    assert attributes["prompt_tokens"] == {"intValue": "12"}
+    assert attributes["reprompt"] == {"boolValue": True}
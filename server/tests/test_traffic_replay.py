@@ -0,0 +1,158 @@
+import asyncio
+import gzip
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.api.routes import song
+from app.cli.replay import LatencySummary, ReplayReport, compare, replay
+from app.core.config import Settings
+from app.core.traffic import TrafficRecorder, UpstreamCall, read_entries
+from app.models.schemas import GenerateRequest
+from app.providers.base import ProviderError, ProviderErrorCode
+from app.providers.router import ProviderRouter
+from app.services.song_service import SongService
+from app.services.traffic_replay import ReplayProvider, replay_provider_factories
+
+
+CALLS = [
+    UpstreamCall(
+        provider="openai",
+        model="gpt-4.1-mini",
+        operation="generate",
+        latency_ms=5.0,
+        outputs=[{"title": 9, "style": 40, "lyrics": 400, "explanation": 30}],
+        prompt_tokens=300,
+        completion_tokens=200,
+    ),
+    UpstreamCall(
+        provider="openai",
+        model="gpt-4.1-mini",
+        operation="generate",
+        latency_ms=5.0,
+        error="rate_limit",
+        retryable=True,
+    ),
+]
+
+
+def _service(calls: list[UpstreamCall]) -> SongService:
+    router = ProviderRouter(
+        Settings(), factories={"openai": lambda _: ReplayProvider("openai", calls)}
+    )
+    return SongService(provider_router=router)
+
+
+def test_recorder_writes_anonymised_requests_with_upstream_outcomes(
+    monkeypatch, tmp_path
+) -> None:
+    path = tmp_path / "traffic.ndjson.gz"
+    recorder = TrafficRecorder(str(path))
+    monkeypatch.setattr(main, "get_traffic_recorder", lambda: recorder)
+    monkeypatch.setattr(song, "get_song_service", lambda: _service(CALLS))
+    client = TestClient(app=main.app)
+
+    body = {"topic": "My secret topic", "provider": "openai", "structure": "Pop"}
+    assert client.post("/api/song/generate", json=body).status_code == 200
+    assert client.get("/api/health").status_code == 200
+    recorder.close()
+
+    assert b"secret" not in gzip.decompress(path.read_bytes())
+    (entry,) = read_entries(str(path))
+    assert (entry.method, entry.route, entry.status) == (
+        "POST",
+        "/api/song/generate",
+        200,
+    )
+    assert entry.body == {
+        "topic": "x" * len("My secret topic"),
+        "provider": "openai",
+        "structure": "Pop",
+    }
+    (call,) = entry.upstream
+    assert (call.provider, call.model, call.error) == ("openai", "gpt-4.1-mini", None)
+    assert call.outputs[0]["title"] == 9
+    assert call.outputs[0]["lyrics"] >= 400
+    assert call.completion_tokens == 200
+
+
+def test_replay_provider_serves_recorded_sizes_and_errors() -> None:
+    provider = ReplayProvider("openai", CALLS)
+    payload = GenerateRequest(topic="x")
+
+    pack = provider.generate_pack(payload)
+    assert len(pack.title) == 9
+    assert pack.lyrics.startswith("[Verse]") and len(pack.lyrics) >= 400
+    assert pack.usage.completion_tokens == 200
+    with pytest.raises(ProviderError) as error:
+        provider.generate_pack(payload)
+    assert error.value.code == ProviderErrorCode.RATE_LIMIT
+    # The recording cycles.
+    assert provider.generate_pack(payload).title == pack.title
+
+
+def test_replay_drives_a_server_backed_by_the_recording(monkeypatch, tmp_path) -> None:
+    path = tmp_path / "traffic.ndjson"
+    recorder = TrafficRecorder(str(path))
+    monkeypatch.setattr(main, "get_traffic_recorder", lambda: recorder)
+    service = _service(CALLS)
+    monkeypatch.setattr(song, "get_song_service", lambda: service)
+    client = TestClient(app=main.app)
+    for _ in range(2):
+        client.post("/api/song/generate", json={"topic": "Rain", "provider": "openai"})
+    client.get("/api/song/sessions/abc")
+    recorder.close()
+
+    factories = replay_provider_factories(Settings(traffic_replay_path=str(path)))
+    replayed = SongService(
+        provider_router=ProviderRouter(Settings(), factories=factories)
+    )
+    monkeypatch.setattr(main, "get_traffic_recorder", lambda: None)
+    monkeypatch.setattr(song, "get_song_service", lambda: replayed)
+
+    async def run() -> ReplayReport:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://replay.test"
+        ) as replay_client:
+            return await replay(read_entries(str(path)), replay_client, speed=100)
+
+    report = asyncio.run(run())
+    assert (report.requests, report.skipped) == (2, 1)
+    assert report.statuses == {"200": 1, "429": 1}
+    assert report.error_rate == 0.5
+    assert report.routes["/api/song/generate"].count == 2
+
+
+def test_compare_flags_slower_or_failing_candidates() -> None:
+    baseline = ReplayReport(
+        requests=100,
+        skipped=0,
+        duration_s=10.0,
+        throughput_rps=10.0,
+        error_rate=0.01,
+        latency=LatencySummary(
+            count=100, mean_ms=90, p50_ms=80, p95_ms=200, p99_ms=300
+        ),
+    )
+    same = ReplayReport.from_dict(
+        {**baseline.__dict__, "latency": baseline.latency.__dict__}
+    )
+    assert compare(baseline, same) == []
+
+    slower = ReplayReport.from_dict(
+        {
+            **baseline.__dict__,
+            "throughput_rps": 8.0,
+            "error_rate": 0.05,
+            "latency": {**baseline.latency.__dict__, "p95_ms": 260},
+        }
+    )
+    regressions = compare(baseline, slower)
+    assert [line.split(":")[0] for line in regressions] == [
+        "latency p95_ms",
+        "throughput",
+        "error rate",
+    ]
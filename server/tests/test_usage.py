@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.api.routes import song
+from app.main import app
+from app.models.schemas import GenerateRequest
+from app.providers.base import TokenUsage
+from app.providers.openai_provider import OpenAiProvider
+from app.services.usage import UsageLedger, parse_price_table, track_request_usage
+
+
+def test_parse_price_table_and_cost() -> None:
+    prices = parse_price_table(
+        '{"gpt-4.1-mini": {"input": 0.4, "output": 1.6, "cached_input": 0.1}}'
+    )
+    ledger = UsageLedger(prices=prices)
+    cost = ledger.record(
+        "openai",
+        "gpt-4.1-mini",
+        TokenUsage(
+            prompt_tokens=1_000_000, completion_tokens=500_000, cached_tokens=500_000
+        ),
+    )
+    assert cost is not None
+    assert round(cost, 6) == round(0.5 * 0.4 + 0.5 * 0.1 + 0.5 * 1.6, 6)
+    assert ledger.record("gemini", "unpriced", TokenUsage(prompt_tokens=10)) is None
+
+
+def test_ledger_tracks_request_usage_and_persists_rollup(tmp_path) -> None:
+    rollup = tmp_path / "usage.json"
+    ledger = UsageLedger(
+        prices=parse_price_table('{"openai/gpt-4.1-mini": {"input": 1, "output": 2}}'),
+        rollup_path=str(rollup),
+        flush_interval_seconds=0,
+    )
+    with track_request_usage() as request_usage:
+        ledger.record("openai", "gpt-4.1-mini", TokenUsage(100, 50, 0))
+        ledger.record("openai", "gpt-4.1-mini", TokenUsage(10, 5, 4))
+
+    headers = request_usage.headers()
+    assert headers["x-usage-prompt-tokens"] == "110"
+    assert headers["x-usage-completion-tokens"] == "55"
+    assert headers["x-usage-cached-tokens"] == "4"
+    assert "x-usage-cost-usd" in headers
+
+    saved = json.loads(rollup.read_text("utf-8"))
+    assert saved["totals"][0]["requests"] == 2
+    assert len(saved["hourly"]) == 1
+
+    reloaded = UsageLedger(rollup_path=str(rollup))
+    assert reloaded.snapshot()["totals"][0]["prompt_tokens"] == 110
+
+
+def test_openai_provider_reports_usage_across_reprompts() -> None:
+    responses = iter(
+        ["not json", json.dumps({"title": "T", "style": "", "lyrics": "x"})]
+    )
+
+    def create(**kwargs):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=next(responses)))],
+            usage=SimpleNamespace(
+                prompt_tokens=100,
+                completion_tokens=20,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=64),
+            ),
+        )
+
+    provider = OpenAiProvider(api_key="o-key", model_name="gpt-4.1-mini")
+    provider._client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    result = provider.generate_pack(GenerateRequest(topic="Rain"))
+    assert result.usage == TokenUsage(
+        prompt_tokens=200, completion_tokens=40, cached_tokens=128
+    )
+
+
+def test_shutdown_flushes_buffered_rollup(tmp_path, monkeypatch) -> None:
+    rollup = tmp_path / "usage.json"
+    ledger = UsageLedger(rollup_path=str(rollup), flush_interval_seconds=3600)
+    service = SimpleNamespace(usage_ledger=ledger)
+    monkeypatch.setattr(song, "_song_service", service)
+
+    with TestClient(app):
+        ledger.record(
+            "openai", "gpt", TokenUsage(prompt_tokens=10, completion_tokens=5)
+        )
+        # Still inside the flush interval, so nothing is written yet.
+        assert not rollup.exists()
+
+    saved = json.loads(rollup.read_text("utf-8"))
+    assert saved["totals"][0]["model"] == "gpt"
+
+
+def test_failed_rollup_write_does_not_fail_the_request(tmp_path) -> None:
+    # The rollup's parent is a file, so every write fails.
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    ledger = UsageLedger(
+        rollup_path=str(blocker / "usage.json"), flush_interval_seconds=0
+    )
+
+    ledger.record("openai", "gpt", TokenUsage(prompt_tokens=10, completion_tokens=5))
+    assert ledger.snapshot()["totals"][0]["prompt_tokens"] == 10
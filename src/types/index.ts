@@ -1,4 +1,6 @@
-export type LlmProvider = 'auto' | 'gemini' | 'openai';
+export type LlmProvider = 'auto' | 'gemini' | 'openai' | 'local' | (string & {});
+
+export type PackField = 'title' | 'style' | 'lyrics' | 'explanation';
 
 export interface SunoSettings {
   topic: string;
@@ -12,6 +14,27 @@ export interface SunoSettings {
   provider: LlmProvider;
   weirdness?: number | null;
   styleInfluence?: number | null;
+  variants?: number;
+  fields?: PackField[] | null;
+}
+
+export interface LyricQuality {
+  score: number;
+  passed: boolean;
+  repaired: boolean;
+  issues: string[];
+  missingSections: string[];
+  duplicateLineRatio: number;
+  rhymeDensity: number;
+  languageMatch: boolean | null;
+}
+
+export interface SongPackCandidate {
+  title: string;
+  style: string;
+  lyrics: string;
+  explanation: string;
+  quality?: LyricQuality | null;
 }
 
 export interface SunoPack {
@@ -21,6 +44,9 @@ export interface SunoPack {
   explanation: string;
   providerUsed?: LlmProvider;
   modelUsed?: string;
+  packs?: SongPackCandidate[];
+  quality?: LyricQuality | null;
+  tier?: 'draft' | 'refined' | null;
 }
 
 export interface HistoryItem {